@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# benchmark.py
+
+import argparse
+import json
+import sys
+
+from src.benchmarks.fixtures import load_fixture, synthetic_fixture
+from src.benchmarks.runner import compare_results, create_vad_service, run_suite
+
+
+def print_results(results):
+    """シナリオごとの主な計測値を表にして表示する"""
+    print(f"フィクスチャ: {results['fixture']['name']} ({results['fixture']['duration']:.1f}秒, "
+          f"正解区間 {results['fixture']['speech_segments']}個)")
+    print("-" * 100)
+    print(f"{'シナリオ':<20}{'VADブロック/秒':>14}{'RTF':>8}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}"
+          f"{'メモリ(MB)':>12}{'F1':>7}{'区間再現率':>10}")
+    for s in results["scenarios"]:
+        latencies = [s[f"latency_{p}"] for p in ("p50", "p90", "p99")]
+        latency_text = "".join(f"{v * 1000:>10.1f}" if v is not None else f"{'-':>10}" for v in latencies)
+        print(f"{s['name']:<20}{s['vad_blocks_per_second']:>14.0f}{s['real_time_factor']:>8.3f}{latency_text}"
+              f"{s['traced_peak_mb']:>12.2f}{s['frame_f1']:>7.3f}{s['segment_recall']:>10.2f}")
+    print("-" * 100)
+
+
+def print_comparison(rows, baseline_commit=None):
+    """前回の結果との差を表示する"""
+    print(f"比較対象: {baseline_commit or '(コミット不明)'}")
+    for name, metric, old, new, change, improved in rows:
+        mark = "  " if abs(change) < 0.05 else ("+ " if improved else "- ")
+        print(f"{mark}{name:<20}{metric:<24}{old:>12.4f} → {new:>12.4f} ({change:+.1%})")
+    print("+ は5%以上の改善、- は5%以上の悪化")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='VoiceScribeのパイプラインのベンチマーク（マイク・APIは使わない）')
+    parser.add_argument('--audio', type=str, metavar='FILE',
+                        help='録音済みの音声ファイル。省略時は合成音声を使う')
+    parser.add_argument('--labels', type=str, metavar='FILE',
+                        help='--audio の正解区間（Audacityのラベル書き出しかJSON）。省略時は 音声ファイル名.labels.txt を探す')
+    parser.add_argument('--duration', type=float, default=60.0,
+                        help='合成音声の長さ（秒） (デフォルト: 60)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='合成音声の乱数シード (デフォルト: 0)')
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=[256, 512, 1024],
+                        help='計測するブロックサイズ (デフォルト: 256 512 1024)')
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=[8000, 16000],
+                        help='計測するサンプルレート (デフォルト: 8000 16000)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='偽の認識サービスの遅延（秒） (デフォルト: 0.05)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='偽の認識サービスの遅延のばらつき（秒） (デフォルト: 0)')
+    parser.add_argument('--pace', type=float, default=0.0,
+                        help='実時間の何倍速で音声を流すか。0なら待たずに流す (デフォルト: 0)')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='音声認識を並行実行する数 (デフォルト: 4)')
+    parser.add_argument('-o', '--output', type=str, metavar='PATH',
+                        help='結果をJSONで保存する')
+    parser.add_argument('--compare', type=str, metavar='PATH',
+                        help='前回保存した結果と比べる')
+    args = parser.parse_args()
+
+    if args.audio:
+        fixture = load_fixture(args.audio, args.labels)
+    else:
+        fixture = synthetic_fixture(duration=args.duration, seed=args.seed)
+
+    results = run_suite(
+        fixture,
+        block_sizes=args.block_sizes,
+        sample_rates=args.sample_rates,
+        vad_service=create_vad_service(),
+        recognition_latency=args.latency,
+        recognition_jitter=args.jitter,
+        pace=args.pace,
+        transcription_workers=args.workers
+    )
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に保存しました")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print_comparison(compare_results(results, baseline), baseline.get("environment", {}).get("git_commit"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
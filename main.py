@@ -1,51 +1,104 @@
 # main.py
 
-import os
 import argparse
-from datetime import datetime
 from dotenv import load_dotenv
 
 # .envファイルを読み込む
 load_dotenv()
 
 from src.application.audio_controller import AudioController
+from src.application.batch_transcriber import BatchTranscriber
+from src.application.multi_source_controller import CaptureSource, MultiSourceController
+from src.application.transcription_server import TranscriptionServer
+from src.domain.wakeword_detector import WakewordDetector
+from src.infrastructure.audio_source import find_input_device, native_input_format, open_audio_source
+from src.infrastructure.cached_recognition_service import TranscriptionCache
+from src.infrastructure.metrics import JsonlMetricsDumper, MetricsRegistry, PrometheusExporter, set_metrics
+from src.infrastructure.transcript_writer import FORMATS, TranscriptWriter
 
-def append_to_text_file(text, metadata, output_file="output.txt"):
-    """音声認識結果をテキストファイルに追記する"""
-    if text is None or metadata is None:
-        return
-
-    # 出力ディレクトリがなければ作成
-    output_dir = os.path.dirname(output_file)
-    if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
+def create_transcript_writer(output_file="output.txt", output_format="text", rotate_size=None, rotate_interval=None):
+    """出力ファイルを開いたままにして、結果をまとめて書き出すライターを作る"""
+    return TranscriptWriter(
+        output_file,
+        format=output_format,
+        rotate_bytes=int(rotate_size * 1024 * 1024) if rotate_size else None,  # MB単位で指定
+        rotate_interval=rotate_interval
+    )
 
-    # タイムスタンプと認識テキストを追記
-    timestamp = metadata["timestamp"]
-    prefix = "ウェイクワード" if metadata["is_wake_word"] else "音声認識"
-    
-    with open(output_file, 'a', encoding='utf-8') as f:
-        f.write(f"[{timestamp}] {prefix}: {text}\n")
+def write_transcript(writer, metadata):
+    """音声認識結果をファイルに書き込み、画面にも表示する"""
+    if metadata is None:
+        return
+    writer.write(metadata)
 
-    if metadata["is_wake_word"]:
-        print(f"ウェイクワード検出: {text}")
+    if metadata.get("error"):
+        print(f"認識失敗: {metadata['error']}")
+    elif metadata["is_wake_word"]:
+        print(f"ウェイクワード検出（{metadata['wake_word']}）: {metadata['text']}")
     else:
-        print(f"音声認識結果: {text}")
+        print(f"音声認識結果: {metadata['text']}")
 
 def on_speech_detected(audio_data, metadata):
     """音声検出時のコールバック関数"""
     print(f"音声検出: {metadata['text']}")
 
-def main(output_file="output.txt", device_id=None, device_name=None, list_devices=False, recognition_service="google"):
+def on_partial_result(text, metadata):
+    """発話中の部分認識結果のコールバック関数"""
+    print(f"認識中: {text}")
+
+def create_transcription_cache(cache_path):
+    """認識結果のキャッシュを作る（パス指定なしならキャッシュしない）"""
+    if not cache_path:
+        return None
+    return TranscriptionCache(db_path=cache_path)
+
+def create_wakeword_detector(wakewords=None, wakewords_file=None, max_distance=0):
+    """ウェイクワード（コマンドのフレーズ）を指定されていれば、その照合器を作る。無ければNone（デフォルトを使う）"""
+    words = list(wakewords or [])
+    if wakewords_file:
+        with open(wakewords_file, encoding="utf-8") as f:
+            words += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not words and not max_distance:
+        return None
+    return WakewordDetector(words or None, max_distance=max_distance)
+
+def start_metrics(metrics_port=None, metrics_file=None, metrics_interval=10.0):
+    """計測を有効にして、指定された出力先（Prometheus / JSONL）を起動する。止める関数のリストを返す"""
+    if metrics_port is None and not metrics_file:
+        return []
+    registry = set_metrics(MetricsRegistry())
+    sinks = []
+    if metrics_port is not None:
+        sinks.append(PrometheusExporter(registry, port=metrics_port).start())
+    if metrics_file:
+        sinks.append(JsonlMetricsDumper(registry, metrics_file, interval=metrics_interval).start())
+    return [sink.stop for sink in sinks]
+
+def main(output_file="output.txt", device_id=None, device_name=None, list_devices=False, recognition_service="google",
+         transcription_workers=2, partial_interval=None, cache_path=None, rate_limit=None, race=False,
+         output_format="text", rotate_size=None, rotate_interval=None, capture=None, pace=1.0,
+         overflow_policy="drop_oldest", inference_process=False, capture_rate=None, capture_channels=1,
+         channel_mix="mean", mix_channel=0, native_format=False, wakeword_detector=None):
     # デバイス一覧表示モード
     if list_devices:
         AudioController.list_audio_devices()
         return
     
+    # デバイスのままの形式で録って、こちらで16kHzモノラルに変換する
+    if native_format and not capture:
+        # 名前で指定されたマイクは、形式を調べる前にIDにしておく（見つからなければデフォルトのマイク）
+        if device_name is not None and device_id is None:
+            device_id = find_input_device(device_name)
+        capture_rate, capture_channels = native_input_format(device_id)
+        print(f"デバイスの形式 {capture_rate}Hz・{capture_channels}チャンネルで録音します")
+
     # コントローラを初期化
     controller = AudioController(
         sample_rate=16000,
-        channels=1,
+        channels=capture_channels,  # 録音するチャンネル数（2以上ならモノラルにまとめる）
+        capture_sample_rate=capture_rate,  # 録音するサンプルレート（Noneなら16kHz）
+        channel_mix=channel_mix,  # 多チャンネルのまとめ方
+        mix_channel=mix_channel,  # channel_mix="select" で使うチャンネル
         block_size=512,
         silence_threshold=0.5,  # VADの発話閾値
         silence_duration=1.0,   # これだけ連続で無音なら切り出し
@@ -53,19 +106,205 @@ def main(output_file="output.txt", device_id=None, device_name=None, list_device
         on_speech_detected=on_speech_detected,  # コールバック関数を設定
         device=device_id,       # マイクデバイスID
         device_name=device_name, # マイクデバイス名
-        recognition_service=recognition_service  # 音声認識サービス
+        audio_source=open_audio_source(capture, sample_rate=capture_rate or 16000, channels=capture_channels,
+                                       block_size=512, pace=pace) if capture else None,
+        recognition_service=recognition_service,  # 音声認識サービス
+        transcription_workers=transcription_workers,  # 音声認識の並行実行数
+        partial_interval=partial_interval,  # 発話中の部分認識の間隔（秒）
+        on_partial_result=on_partial_result,  # 部分認識結果のコールバック関数
+        transcription_cache=create_transcription_cache(cache_path),  # 認識結果のキャッシュ
+        rate_limit=rate_limit,  # 1分あたりの認識リクエスト数の上限
+        race_recognition=race,  # 複数サービス指定時に上位2つへ同時に送る
+        overflow_policy=overflow_policy,  # 処理が追いつかず録音キューが満杯になったときの方針
+        inference_process=inference_process,  # VAD（とローカル認識）の推論を別プロセスで行う
+        wakeword_detector=wakeword_detector  # ウェイクワードの照合器（Noneならデフォルトのウェイクワード）
     )
     
     # 録音開始
+    writer = create_transcript_writer(output_file, output_format, rotate_size, rotate_interval)
     controller.start_listening()
     try:
         # 常時ループで音声データを取得
         for audio_data, metadata in controller.run_forever():
             if audio_data is not None and metadata is not None:
-                append_to_text_file(metadata['text'], metadata, output_file)
+                write_transcript(writer, metadata)
     finally:
-        # 終了時には確実に停止
+        # 終了時には確実に停止し、書き残しを書き出す
         controller.stop_listening()
+        writer.close()
+        report_capture_losses(controller.get_queue_stats())
+
+def report_capture_losses(stats):
+    """処理が追いつかずに捨てた音声や、デバイス側のあふれがあれば表示する"""
+    if stats["dropped_blocks"] or stats["overflows"]:
+        print(f"警告: 録音キューが満杯で {stats['dropped_seconds']:.1f}秒分の音声を捨てました"
+              f"（方針: {stats['policy']}、最大滞留 {stats['peak_backlog']}/{stats['capacity']}ブロック）。"
+              f"デバイス側のあふれ: {stats['overflows']}回")
+
+def run_multi_source(source_specs, output_file="output.txt", recognition_service="google", transcription_workers=2,
+                     partial_interval=None, cache_path=None, rate_limit=None, race=False,
+                     output_format="text", rotate_size=None, rotate_interval=None, overflow_policy="drop_oldest",
+                     capture_rate=None, wakeword_detector=None):
+    """複数のマイク（チャンネル）を1プロセスで同時に録音して文字起こしする"""
+    controller = MultiSourceController(
+        [CaptureSource.parse(spec) for spec in source_specs],
+        sample_rate=16000,
+        capture_sample_rate=capture_rate,
+        block_size=512,
+        silence_threshold=0.5,
+        silence_duration=1.0,
+        recognition_service=recognition_service,
+        transcription_workers=transcription_workers,
+        partial_interval=partial_interval,
+        on_speech_detected=on_speech_detected,
+        on_partial_result=on_partial_result,
+        transcription_cache=create_transcription_cache(cache_path),
+        rate_limit=rate_limit,
+        race_recognition=race,
+        overflow_policy=overflow_policy,
+        wakeword_detector=wakeword_detector
+    )
+    writer = create_transcript_writer(output_file, output_format, rotate_size, rotate_interval)
+    controller.start_listening()
+    try:
+        for audio_data, metadata in controller.run_forever():
+            if audio_data is not None and metadata is not None:
+                write_transcript(writer, metadata)
+    finally:
+        controller.stop_listening()
+        controller.shutdown()
+        writer.close()
+
+def run_batch(input_files, output_dir=None, recognition_service="google", jobs=4, transcription_workers=4,
+              cache_path=None, rate_limit=None, race=False, output_format="timed", wakeword_detector=None):
+    """録音済みファイルをまとめて文字起こしする"""
+    cache = create_transcription_cache(cache_path)
+    transcriber = BatchTranscriber(
+        output_dir=output_dir,
+        output_format=output_format,           # 出力形式（timed, text, jsonl, srt, vtt）
+        max_concurrent_files=jobs,             # 同時に処理するファイル数
+        transcription_workers=transcription_workers,  # 全ファイルで共有する音声認識の並行数
+        sample_rate=16000,
+        silence_threshold=0.5,
+        silence_duration=1.0,
+        recognition_service=recognition_service,
+        transcription_cache=cache,  # 再実行時は認識済みの区間にAPIを呼ばない
+        rate_limit=rate_limit,
+        race_recognition=race,
+        wakeword_detector=wakeword_detector
+    )
+    try:
+        transcriber.run(input_files)
+    finally:
+        transcriber.shutdown()
+        if cache is not None:
+            stats = cache.get_stats()
+            print(f"認識キャッシュ: ヒット {stats['memory_hits'] + stats['disk_hits']}件 / "
+                  f"ミス {stats['misses']}件（ヒット率 {stats['hit_ratio']:.0%}）")
+            cache.close()
+
+def run_server(port, host="127.0.0.1", max_connections=16, recognition_service="google", transcription_workers=4,
+               partial_interval=None, cache_path=None, rate_limit=None, race=False, wakeword_detector=None):
+    """WebSocketで音声を受けて文字起こしするサーバーとして動かす"""
+    cache = create_transcription_cache(cache_path)
+    server = TranscriptionServer(
+        host=host,
+        port=port,
+        max_connections=max_connections,      # 超えた接続はHTTP 503で断る
+        transcription_workers=transcription_workers,  # 全接続で共有する音声認識の並行数
+        sample_rate=16000,
+        silence_threshold=0.5,
+        silence_duration=1.0,
+        recognition_service=recognition_service,
+        partial_interval=partial_interval,
+        transcription_cache=cache,
+        rate_limit=rate_limit,
+        race_recognition=race,
+        wakeword_detector=wakeword_detector
+    )
+    try:
+        server.run()
+    finally:
+        if cache is not None:
+            cache.close()
+
+def run(args, service):
+    """コマンドライン引数に応じて、サーバー・ファイル文字起こし・複数マイク・1マイクのどれかを実行する"""
+    wakeword_detector = create_wakeword_detector(args.wakewords, args.wakewords_file, args.wakeword_distance)
+    if args.serve is not None:
+        run_server(
+            args.serve,
+            host=args.host,
+            max_connections=args.max_connections,
+            recognition_service=service,
+            transcription_workers=args.workers,
+            partial_interval=args.partial,
+            cache_path=args.cache,
+            rate_limit=args.rate_limit,
+            race=args.race,
+            wakeword_detector=wakeword_detector
+        )
+        return
+
+    if args.input:
+        run_batch(
+            args.input,
+            output_dir=args.output_dir,
+            recognition_service=service,
+            jobs=args.jobs,
+            transcription_workers=args.workers,
+            cache_path=args.cache,
+            rate_limit=args.rate_limit,
+            race=args.race,
+            output_format=args.format or "timed",
+            wakeword_detector=wakeword_detector
+        )
+        return
+
+    if args.sources:
+        run_multi_source(
+            args.sources,
+            output_file=args.output,
+            recognition_service=service,
+            transcription_workers=args.workers,
+            partial_interval=args.partial,
+            cache_path=args.cache,
+            rate_limit=args.rate_limit,
+            race=args.race,
+            output_format=args.format or "text",
+            rotate_size=args.rotate_size,
+            rotate_interval=args.rotate_interval,
+            overflow_policy=args.overflow_policy,
+            capture_rate=args.capture_rate,
+            wakeword_detector=wakeword_detector
+        )
+        return
+
+    main(
+        output_file=args.output,
+        device_id=args.device,
+        device_name=args.name,
+        list_devices=args.list,
+        recognition_service=service,
+        transcription_workers=args.workers,
+        partial_interval=args.partial,
+        cache_path=args.cache,
+        rate_limit=args.rate_limit,
+        race=args.race,
+        output_format=args.format or "text",
+        rotate_size=args.rotate_size,
+        rotate_interval=args.rotate_interval,
+        capture=args.capture,
+        pace=args.pace,
+        overflow_policy=args.overflow_policy,
+        inference_process=args.inference_process,
+        capture_rate=args.capture_rate,
+        capture_channels=args.channels,
+        channel_mix=args.channel_mix,
+        mix_channel=args.mix_channel,
+        native_format=args.native_format,
+        wakeword_detector=wakeword_detector
+    )
 
 if __name__ == "__main__":
     # コマンドライン引数の設定
@@ -75,15 +314,80 @@ if __name__ == "__main__":
     parser.add_argument('-d', '--device', type=int, help='使用するマイクデバイスのID')
     parser.add_argument('-n', '--name', type=str, help='使用するマイクデバイスの名前（部分一致）')
     parser.add_argument('-l', '--list', action='store_true', help='利用可能なマイクデバイスの一覧を表示')
-    parser.add_argument('-s', '--service', type=str, default='google', choices=['google', 'openai', 'groq'],
+    parser.add_argument('-s', '--service', type=str, default='google', choices=['google', 'openai', 'groq', 'local'],
                         help='使用する音声認識サービス (デフォルト: google)')
+    parser.add_argument('-w', '--workers', type=int, default=2,
+                        help='音声認識を並行実行する数 (デフォルト: 2)')
+    parser.add_argument('-p', '--partial', type=float, metavar='SECONDS',
+                        help='発話中も指定秒数ごとに部分認識結果を表示する')
+    parser.add_argument('--sources', type=str, nargs='+', metavar='[NAME=]DEVICE[:CHANNEL]',
+                        help='複数のマイク（チャンネル）から同時に録音する。例: --sources 窓側=1:0 廊下側=1:1 3')
+    parser.add_argument('-i', '--input', type=str, nargs='+', metavar='FILE',
+                        help='マイクの代わりに録音済みの音声ファイルをまとめて文字起こしする')
+    parser.add_argument('--output-dir', type=str,
+                        help='ファイル文字起こしの出力先ディレクトリ (デフォルト: 入力ファイルと同じ場所)')
+    parser.add_argument('-j', '--jobs', type=int, default=4,
+                        help='ファイル文字起こしで同時に処理するファイル数 (デフォルト: 4)')
+    parser.add_argument('--cache', type=str, metavar='PATH',
+                        help='認識結果をSQLiteファイルにキャッシュし、同じ音声の再認識を省く')
+    parser.add_argument('--rate-limit', type=int, metavar='PER_MINUTE',
+                        help='1分あたりの認識リクエスト数の上限。0で無制限 (デフォルト: Google無料枠は20)')
+    parser.add_argument('-f', '--format', type=str, choices=list(FORMATS),
+                        help='出力形式 (デフォルト: 録音は text、ファイル文字起こしは timed)')
+    parser.add_argument('--rotate-size', type=float, metavar='MB',
+                        help='出力ファイルがこの大きさを超えたら時刻付きの名前に付け替えて新しいファイルにする')
+    parser.add_argument('--rotate-interval', type=float, metavar='SECONDS',
+                        help='出力ファイルをこの秒数ごとに付け替えて新しいファイルにする')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='計測値を http://127.0.0.1:PORT/metrics でPrometheus形式で公開する')
+    parser.add_argument('--metrics-file', type=str, metavar='PATH',
+                        help='計測値を一定間隔でJSONLファイルに追記する')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, metavar='SECONDS',
+                        help='--metrics-file に書き出す間隔 (デフォルト: 10秒)')
+    parser.add_argument('--fallback', type=str, nargs='+', choices=['google', 'openai', 'groq', 'local'],
+                        help='-s のサービスが失敗・遅延したときに順に切り替える音声認識サービス')
+    parser.add_argument('--capture', type=str, metavar='FILE|-',
+                        help='マイクの代わりに音声ファイルを再生して入力する。- なら標準入力から16bitのPCMを読む（--capture-rate, --channels の形式）')
+    parser.add_argument('--pace', type=float, default=1.0,
+                        help='--capture のファイルを何倍速で流すか。0なら待たずに流す (デフォルト: 1.0)')
+    parser.add_argument('--overflow-policy', type=str, default='drop_oldest',
+                        choices=['drop_oldest', 'drop_newest', 'degrade'],
+                        help='処理が追いつかず録音キューが満杯になったときの方針 (デフォルト: drop_oldest)')
+    parser.add_argument('--capture-rate', type=int, metavar='HZ',
+                        help='マイク（--capture - なら標準入力）のサンプルレート。16kHz以外なら16kHzに変換する (デフォルト: 16000)')
+    parser.add_argument('--channels', type=int, default=1,
+                        help='録音するチャンネル数。2以上なら --channel-mix でモノラルにまとめる (デフォルト: 1)')
+    parser.add_argument('--channel-mix', type=str, default='mean', choices=['mean', 'select', 'loudest'],
+                        help='多チャンネルのまとめ方。mean は平均、select は --mix-channel の1チャンネル、'
+                             'loudest は一番大きいチャンネル (デフォルト: mean)')
+    parser.add_argument('--mix-channel', type=int, default=0, metavar='N',
+                        help='--channel-mix select で使うチャンネル（0始まり） (デフォルト: 0)')
+    parser.add_argument('--native-format', action='store_true',
+                        help='マイクをデバイスのままのサンプルレート・チャンネル数で録音して、16kHzモノラルに変換する')
+    parser.add_argument('--inference-process', action='store_true',
+                        help='VADの推論（-s local ならWhisperも）を別プロセスで行い、録音が推論に待たされないようにする（1マイクのときのみ）')
+    parser.add_argument('--wakewords', type=str, nargs='+', metavar='WORD',
+                        help='ウェイクワード（コマンドのフレーズ）。ひらがな・カタカナ・全角・ローマ字の違いは無視する（デフォルト: アウラ）')
+    parser.add_argument('--wakewords-file', type=str, metavar='PATH',
+                        help='ウェイクワードを1行に1つ書いたファイル（何千個でもよい）')
+    parser.add_argument('--wakeword-distance', type=int, default=0, metavar='N',
+                        help='ウェイクワードの誤認識をこの編集距離まで許す。4文字以上の語だけに効く（デフォルト: 0）')
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='マイクの代わりにWebSocketで音声を受けるサーバーとして動かす（ws://HOST:PORT/stream）')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='--serve で待ち受けるアドレス（デフォルト: 127.0.0.1）')
+    parser.add_argument('--max-connections', type=int, default=16, metavar='N',
+                        help='--serve で同時に受け付ける接続数。超えた接続は503で断る（デフォルト: 16）')
+    parser.add_argument('--race', action='store_true',
+                        help='--fallback 指定時、上位2つのサービスに同時に送って先に返った結果を使う')
     
     args = parser.parse_args()
-    
-    main(
-        output_file=args.output,
-        device_id=args.device,
-        device_name=args.name,
-        list_devices=args.list,
-        recognition_service=args.service
-    )
+    # フェイルオーバー先があれば、サービスをリストで渡す
+    service = [args.service] + args.fallback if args.fallback else args.service
+    stop_metrics = start_metrics(args.metrics_port, args.metrics_file, args.metrics_interval)
+    try:
+        run(args, service)
+    finally:
+        for stop in stop_metrics:
+            stop()
+
@@ -1 +1,3 @@
 from .audio_controller import AudioController
+from .transcription_worker import TranscriptionPool
+from .multi_source_controller import CaptureSource, MultiSourceController
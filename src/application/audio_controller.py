@@ -1,19 +1,41 @@
 # application/audio_controller.py
 
 import numpy as np
-import sounddevice as sd
-import queue
 import time
-import wave
 import io
 import os
 from datetime import datetime
 
+from src.domain.audio_buffer import AudioRingBuffer, BlockRingBuffer, SegmentBuffer
+from src.domain.energy_gate import EnergyGate
+from src.domain.resampler import AudioConverter
+from src.domain.speech_segmenter import SpeechSegmenter
 from src.domain.vad_service import VADService
 from src.domain.wakeword_detector import WakewordDetector
+from src.application.transcription_worker import TranscriptionPool
+from src.application.streaming_transcriber import StreamingTranscriber
+from src.application.segment_coalescer import SegmentCoalescer
+from src.infrastructure.audio_source import MicrophoneSource, find_input_device, list_input_devices
 from src.infrastructure.speech_recognition_service import SpeechRecognitionService
 from src.infrastructure.groq_recognition_service import GroqRecognitionService
 from src.infrastructure.openai_recognition_service import OpenAIRecognitionService
+from src.infrastructure.local_recognition_service import LocalRecognitionService
+from src.infrastructure.inference_worker import ProcessRecognitionService, ProcessVADService
+from src.infrastructure.cached_recognition_service import CachedRecognitionService
+from src.infrastructure.failover_recognition_service import FailoverRecognitionService
+from src.infrastructure.metrics import DURATION_BUCKETS, RATIO_BUCKETS, get_metrics
+from src.infrastructure.rate_limiter import (
+    RateLimitedRecognitionService, TokenBucket, find_rate_limiter, rate_limit_from_env
+)
+
+
+def record_block_metrics(metrics, audio_seconds, vad_seconds, total_seconds):
+    """1ブロック分のVAD時間・処理した音声の長さ・実時間比を記録する"""
+    metrics.histogram("voicescribe_vad_seconds", "1ブロックのVAD推論にかかった時間").observe(vad_seconds)
+    metrics.counter("voicescribe_audio_seconds_total", "処理した音声の長さの合計").inc(audio_seconds)
+    if audio_seconds > 0:
+        metrics.histogram("voicescribe_real_time_factor", "処理時間 / 音声の長さ（1未満なら実時間より速い）",
+                          buckets=RATIO_BUCKETS).observe(total_seconds / audio_seconds, stage="vad")
 
 
 class AudioController:
@@ -24,226 +46,762 @@ class AudioController:
 
     def __init__(
         self,
-        sample_rate=16000,
-        channels=1,
+        sample_rate=16000,       # VADと音声認識に渡すサンプルレート（16000か8000）
+        channels=1,              # 録音するチャンネル数。2以上なら channel_mix でモノラルにまとめる
         dtype=np.float32,
-        block_size=512,
-        silence_threshold=0.7,   # VADの閾値
+        block_size=512,          # sample_rate で数えたブロックの長さ（録音はこれと同じ時間分ずつ）
+        capture_sample_rate=None,  # 録音デバイスのサンプルレート（44100, 48000など）。Noneなら sample_rate のまま録音する
+        channel_mix="mean",      # 多チャンネルのまとめ方: mean（平均）, select（mix_channel だけ）, loudest（一番大きいチャンネル）
+        mix_channel=0,           # channel_mix="select" で使うチャンネル
+        silence_threshold=0.7,   # VADの閾値（区間の開始に必要な発話確率）
         silence_duration=1.0,    # 無音判定に必要な継続秒数
-        min_amplitude=0.01,      # ノイズ判定用の最低振幅
+        offset_threshold=None,   # 区間の継続に必要な発話確率。Noneなら silence_threshold - 0.15
+        min_speech_duration=0.1,  # これより短い発話の区間は認識に回さず捨てる（秒）
+        min_amplitude=0.01,      # ノイズ判定用の最低振幅。これ未満の窓はVADモデルに通さない。Noneで一次判定なし
         pre_buffer_duration=0.5,  # 音声区間開始前のバッファ保持時間（秒）
+        max_utterance_duration=60.0,  # 1発話の最大長（秒）。超えたら強制的に切り出す。Noneで無制限
         on_speech_detected=None,  # 音声検出時のコールバック関数
         device=None,             # 使用するマイクデバイスID
         device_name=None,        # 使用するマイクデバイス名
-        recognition_service="google"  # 使用する音声認識サービス（google, openai, groq）
+        audio_source=None,       # マイクの代わりに使う入力ソース（FileSource, StdinSource, ReplaySourceなど）
+        recognition_service="google",  # 使用する音声認識サービス（google, openai, groq, local）またはそのインスタンス。リストならフェイルオーバー
+        queue_timeout=0.1,       # キュー待ちの最大ブロック時間（秒）。停止フラグの確認間隔も兼ねる
+        capture_buffer_blocks=256,  # 録音キューに溜められるブロック数（512サンプル・16kHzなら約8秒）。超えた分は捨てる。0なら録音キューを持たない（process_audioで外から渡す場合）
+        overflow_policy="drop_oldest",  # 録音キューが満杯のとき: drop_oldest（古い方を捨てる）, drop_newest（新しい方を捨てる）, degrade（VADを軽くして追いつく）
+        degrade_backlog=None,    # degrade のとき、これだけ溜まったらVADモデルを通さず一次判定だけで処理する（ブロック数）。Noneなら容量の1/4
+        transcription_workers=2,  # 音声認識を並行実行するスレッド数
+        max_pending_transcriptions=8,  # 認識待ちの区間数の上限。超えると空くまで待つ
+        partial_interval=None,   # 発話中の部分認識の間隔（秒）。Noneなら部分認識しない
+        partial_commit_pause=0.3,  # 発話中にこれだけ無音が続いたら、そこまでを確定として認識する（秒）
+        on_partial_result=None,  # 部分認識結果のコールバック関数 (text, metadata)
+        vad_service=None,        # 共有するVADServiceのインスタンス（省略時は新しく読み込む）
+        wakeword_detector=None,  # 共有するWakewordDetector（省略時はデフォルトのウェイクワードで作る）
+        transcription_executor=None,  # 共有する認識用のスレッドプール（省略時は自前で作る）
+        source_id=None,          # 入力ソースの識別子（複数マイク時にメタデータに付く）
+        transcription_cache=None,  # 認識結果のキャッシュ（TranscriptionCache）。同じ音声はAPIを呼ばずに返す
+        rate_limit=None,         # 1分あたりの認識リクエスト数の上限。Noneなら環境変数かサービスの既定値（Google無料枠は20）、0で無制限
+        coalesce_max_duration=30.0,  # リクエスト枠が少ないとき、短い区間をこの長さまでまとめて認識する（秒）。Noneでまとめない
+        recognition_deadline=10.0,  # 複数サービス指定時の、1サービスあたりの認識の締め切り（秒）
+        race_recognition=False,  # 複数サービス指定時に、上位2つへ同時に送って速い方を使うか
+        inference_process=False,  # VADの推論（local指定時は音声認識も）を別プロセスで行うか。録音コールバックがGILで待たされなくなる
+        metrics=None             # 計測値の入れ物（MetricsRegistry）。省略時はプロセス全体の設定（既定は計測しない）
     ):
         self.sample_rate = sample_rate
-        self.channels = channels
+        self.channels = 1  # VAD以降はモノラルで扱う
         self.dtype = dtype
         self.block_size = block_size
+        self.channel_mix = channel_mix
+        self.mix_channel = mix_channel
+        self.source_id = source_id
+        self.metrics = metrics if metrics is not None else get_metrics()
+        # 別プロセスで推論する場合、自分で作った子プロセスのサービス（start_listening/stop_listeningで起動・停止する）
+        self.inference_process = inference_process
+        self.worker_services = []
 
         # マイクデバイス設定
         self.device = device
         # デバイス名が指定された場合、IDを検索
         if device_name is not None:
-            devices = sd.query_devices()
-            for i, dev in enumerate(devices):
-                if device_name.lower() in dev['name'].lower() and dev['max_input_channels'] > 0:
-                    self.device = i
-                    print(f"マイク '{device_name}' を見つけました (ID: {i})")
-                    break
+            device_id = find_input_device(device_name)
+            if device_id is not None:
+                self.device = device_id
+                print(f"マイク '{device_name}' を見つけました (ID: {device_id})")
             else:
                 print(f"警告: '{device_name}'という名前のマイクが見つかりませんでした。デフォルトマイクを使用します。")
+        # 入力ソース（省略時はstart_listeningでマイクを開く）
+        self.audio_source = audio_source
+        self.source_finished = False
 
-        self.audio_queue = queue.Queue()
+        # 録音コールバックから処理ループへ渡す、事前確保したブロックのリング（溜めすぎたら捨てる）
+        self.capture_buffer_blocks = capture_buffer_blocks
+        self.overflow_policy = overflow_policy
+        self._configure_capture(capture_sample_rate or sample_rate, channels)
+        self.degrade_backlog = degrade_backlog if degrade_backlog is not None else max(capture_buffer_blocks // 4, 1)
+        self._reported_losses = {"dropped_samples": 0, "overflows": 0}
+        self.queue_timeout = queue_timeout
         self.is_running = False
-        self.stream = None
+
+        # キューの統計情報（深さとデキュー遅延）
+        self.queue_stats = {
+            "depth": 0,               # 直近の取り出し時点でのキュー深さ
+            "peak_depth": 0,          # これまでの最大キュー深さ
+            "blocks": 0,              # 取り出したブロック数
+            "last_latency_ms": 0.0,   # 直近ブロックのデキュー遅延
+            "degraded_blocks": 0,     # 溜まりすぎてVADを軽くして処理したブロック数
+            "max_latency_ms": 0.0,    # 最大デキュー遅延
+            "total_latency_ms": 0.0,  # 平均算出用の累積遅延
+        }
 
         # VAD・Wakewordサービス
-        self.vad_service = VADService(threshold=silence_threshold)
-        self.wakeword_detector = WakewordDetector()
+        # VADモデルは共有できるように、隠れ状態はコントローラごとのストリームに持たせる
+        # 明らかな無音はモデルを呼ぶ前にエネルギーとゼロ交差率の一次判定で落とす
+        if vad_service is None:
+            vad_class = ProcessVADService if inference_process else VADService
+            vad_service = vad_class(
+                threshold=silence_threshold,
+                energy_gate=EnergyGate(min_amplitude=min_amplitude) if min_amplitude is not None else None
+            )
+            if inference_process:
+                self.worker_services.append(vad_service)
+        self.vad_service = vad_service
+        self.vad_stream = self.vad_service.create_stream()
+        # ウェイクワードの照合器は作るときに組み立てるから、ソースや接続をまたいで使い回せる
+        self.wakeword_detector = wakeword_detector if wakeword_detector is not None else WakewordDetector()
         
+        # 音声認識の非同期実行設定（プールはrun_foreverの間だけ生かす）
+        self.transcription_workers = transcription_workers
+        self.max_pending_transcriptions = max_pending_transcriptions
+        self.transcription_executor = transcription_executor
+        self.transcription_pool = None
+
         # 音声認識サービスの初期化
-        self.stt_service = self._initialize_recognition_service(recognition_service)
+        self.recognition_deadline = recognition_deadline
+        self.race_recognition = race_recognition
+        self.stt_service = self._initialize_recognition_service(recognition_service, rate_limit)
+        # キャッシュはレート制限の外側に置く（キャッシュに当たった区間はリクエスト枠を使わない）
+        if transcription_cache is not None and not isinstance(self.stt_service, CachedRecognitionService):
+            self.stt_service = CachedRecognitionService(self.stt_service, transcription_cache)
+
+        # リクエスト枠が少ないときに短い区間をまとめる（レート制限があるサービスのみ）
+        self.rate_limiter = find_rate_limiter(self.stt_service)
+        self.coalescer = None
+        if self.rate_limiter is not None and coalesce_max_duration:
+            self.coalescer = SegmentCoalescer(
+                self.rate_limiter,
+                sample_rate,
+                max_duration=coalesce_max_duration
+            )
 
         # 無音関連設定
         self.silence_duration = silence_duration
         self.min_amplitude = min_amplitude
 
-        # 音声バッファ関連
-        self.speech_buffer = []  # 音声区間のバッファ
-        self.is_speech_active = False  # 現在音声区間かどうか
-        
-        # プリバッファ関連
+        # 区間検出（開始と継続で閾値を分け、短すぎる発話は捨て、長すぎる区間は静かな所で分割する）
+        self.window_size = VADService.WINDOW_SIZES[sample_rate]
+        onset_threshold = self.vad_service.threshold
+        if offset_threshold is None:
+            offset_threshold = max(onset_threshold - 0.15, 0.0)
+        self.segmenter = SpeechSegmenter.from_durations(
+            self.window_size / sample_rate,
+            silence_duration=silence_duration,
+            min_speech_duration=min_speech_duration,
+            # 区間の先頭にはプリロールが付くから、その分を差し引いた長さで切る
+            max_segment_duration=None if max_utterance_duration is None else max(
+                max_utterance_duration - pre_buffer_duration, self.window_size * 2 / sample_rate),
+            onset_threshold=onset_threshold,
+            offset_threshold=offset_threshold
+        )
+
+        # プリバッファ関連（固定長のリングバッファ）
         self.pre_buffer_size = int(pre_buffer_duration * sample_rate)
-        self.pre_buffer = []
+        self.pre_buffer = AudioRingBuffer(self.pre_buffer_size)
+
+        # 音声バッファ関連（プリロールと音声区間を連続領域に溜める。最大長は区間検出側で切る）
+        self.max_utterance_duration = max_utterance_duration
+        self.speech_buffer = SegmentBuffer(initial_capacity=sample_rate * 5)
+        self.is_speech_active = False  # 現在音声区間かどうか
+
+        # 処理済みのサンプル数と、処理中の区間の開始位置・最後の発話位置（区間のオフセット算出用）
+        self.processed_samples = 0
+        self.segment_start_sample = 0
+        self.last_speech_sample = 0
 
         # コールバック
         self.on_speech_detected = on_speech_detected
 
-    def _initialize_recognition_service(self, service_name):
-        """音声認識サービスを初期化する"""
-        service_name = service_name.lower()
-        
+        # 発話中の部分認識（オプトイン）
+        self.partial_transcriber = None
+        if partial_interval is not None:
+            self.partial_transcriber = StreamingTranscriber(
+                self.stt_service,
+                sample_rate,
+                interval=partial_interval,
+                commit_pause=partial_commit_pause,
+                on_partial_result=on_partial_result
+            )
+
+    def _initialize_recognition_service(self, service_name, rate_limit=None):
+        """音声認識サービスを初期化する。リクエスト数の上限があればレート制限で包む"""
+        if isinstance(service_name, (list, tuple)):
+            return self._initialize_failover_service(service_name, rate_limit)
+        if not isinstance(service_name, str):
+            # 初期化済みのサービスが渡された場合はそのまま使う（上限の指定があれば、まだ包まれていないときだけ包む）
+            if rate_limit and find_rate_limiter(service_name) is None:
+                return self._apply_rate_limit(service_name, rate_limit)
+            return service_name
+        return self._create_recognition_service(service_name.lower(), rate_limit)
+
+    def _initialize_failover_service(self, service_names, rate_limit=None):
+        """
+        複数の音声認識サービスを、失敗時に切り替えるフェイルオーバー構成で初期化する。
+        APIキーの無いサービスは外す。各サービスは失敗を例外で知らせるように作るわ。
+        """
+        backends = []
+        for name in dict.fromkeys(name.lower() for name in service_names):
+            if name in ("openai", "groq") and not os.getenv(f"{name.upper()}_API_KEY"):
+                print(f"{name} のAPIキーが無いので、フェイルオーバー先から外します")
+                continue
+            backends.append((name, self._create_recognition_service(name, rate_limit, raise_errors=True)))
+        if not backends:
+            raise ValueError("使える音声認識サービスがありません")
+        print(f"音声認識サービスを {' → '.join(name for name, _ in backends)} の順で使います"
+              f"{'（上位2つに同時送信）' if self.race_recognition else ''}")
+        return FailoverRecognitionService(backends, deadline=self.recognition_deadline, race=self.race_recognition)
+
+    def _create_recognition_service(self, service_name, rate_limit=None, raise_errors=False):
+        """名前から音声認識サービスを1つ作る。APIキーが無ければGoogleにする"""
         if service_name == "openai" and os.getenv("OPENAI_API_KEY"):
             print("OpenAI Whisperを使用した音声認識サービスを初期化します")
-            return OpenAIRecognitionService(language="ja-JP")
+            service = OpenAIRecognitionService(language="ja-JP", raise_errors=raise_errors, metrics=self.metrics)
+            default_limit = rate_limit_from_env("OPENAI")
         elif service_name == "groq" and os.getenv("GROQ_API_KEY"):
             print("Groq APIを使用した音声認識サービスを初期化します")
-            return GroqRecognitionService(language="ja-JP")
+            service = GroqRecognitionService(language="ja-JP", raise_errors=raise_errors, metrics=self.metrics)
+            default_limit = rate_limit_from_env("GROQ")
+        elif service_name == "local":
+            print("ローカルのWhisperモデルを使用した音声認識サービスを初期化します")
+            # 認識プールのワーカー数だけ同時に推論できるようにする
+            options = dict(language="ja-JP", num_workers=self.transcription_workers, raise_errors=raise_errors)
+            if self.inference_process:
+                # モデルは子プロセスで読み込む。音声は共有メモリのスロットで渡す
+                service = ProcessRecognitionService(
+                    LocalRecognitionService,
+                    options,
+                    model_name=LocalRecognitionService.resolve_model_name(),
+                    language="ja",
+                    slots=self.transcription_workers,
+                    sample_rate=self.sample_rate,
+                    metrics=self.metrics
+                )
+                self.worker_services.append(service)
+            else:
+                service = LocalRecognitionService(metrics=self.metrics, **options)
+            default_limit = 0
         else:
             # デフォルトはGoogle Speech Recognition
             print("Google Speech Recognitionを使用した音声認識サービスを初期化します")
             # Google Cloud Speech APIのキーがあれば使用
             if os.getenv("GOOGLE_API_KEY"):
                 print("Google Cloud Speech APIキーを使用します")
+                default_limit = rate_limit_from_env("GOOGLE")
             else:
                 print("Google Speech Recognition無料枠を使用します（1分間に20回までのリクエスト制限あり）")
-            return SpeechRecognitionService(language="ja-JP")
+                default_limit = rate_limit_from_env("GOOGLE", default=20)
+            service = SpeechRecognitionService(language="ja-JP", raise_errors=raise_errors, metrics=self.metrics)
+
+        return self._apply_rate_limit(service, default_limit if rate_limit is None else rate_limit)
+
+    @staticmethod
+    def _apply_rate_limit(service, rate_limit):
+        """1分あたりの上限が指定されていれば、サービスをトークンバケットで包む"""
+        if not rate_limit:
+            return service
+        print(f"音声認識のリクエストを1分間に{rate_limit}回までに制限します")
+        return RateLimitedRecognitionService(service, TokenBucket.for_quota(int(rate_limit), period=60.0))
+
+    def _configure_capture(self, capture_sample_rate, capture_channels):
+        """
+        録音する形式を決めて、録音キューと変換器を作り直す。
+        録音はデバイスのままの形式でキューに溜め、取り出してから sample_rate のモノラルに変換するわ
+        （録音コールバックではコピーしかしない）。同じ形式なら変換器は作らない。
+        """
+        self.capture_sample_rate = capture_sample_rate
+        self.capture_channels = capture_channels
+        # 1ブロックの時間はパイプラインと揃える（16kHzの512サンプルなら、48kHzでは1536サンプル）
+        self.capture_block_size = max(int(round(self.block_size * capture_sample_rate / self.sample_rate)), 1)
+        # 外から process_audio で渡されるだけのコントローラ（複数マイク・ファイル・サーバー）はキューを確保しない
+        self.capture_buffer = BlockRingBuffer(
+            capacity=self.capture_buffer_blocks,
+            block_size=self.capture_block_size,
+            channels=capture_channels,
+            dtype=self.dtype,
+            policy=self.overflow_policy
+        ) if self.capture_buffer_blocks else None
+        self.converter = AudioConverter(capture_sample_rate, capture_channels, self.sample_rate,
+                                        mix=self.channel_mix, channel=self.mix_channel)
+        if self.converter.is_passthrough:
+            self.converter = None
+
+    def _convert(self, audio: np.ndarray) -> np.ndarray:
+        """録音した形式の音声を sample_rate のモノラルにする"""
+        if self.converter is None:
+            return audio
+        started = time.perf_counter()
+        converted = self.converter.process(audio)
+        if self.metrics.enabled:
+            self.metrics.histogram("voicescribe_resample_seconds", "録音した音声のモノラル化とサンプルレート変換の時間").observe(
+                time.perf_counter() - started)
+        return converted
 
     def _audio_callback(self, indata, frames, time_info, status):
+        # PortAudio側で入力があふれた（コールバックが間に合わなかった）回数を数える
+        if status is not None and getattr(status, "input_overflow", False):
+            self.capture_buffer.record_overflow()
         if self.is_running:
-            self.audio_queue.put(indata.copy())
+            # 事前確保したリングにコピーする（デキュー遅延を測るために投入時刻も一緒に書く）
+            self.capture_buffer.write(indata, time.monotonic())
+
+    def _on_source_finished(self):
+        """ファイルや標準入力のソースが最後まで渡し終えたときに呼ばれる"""
+        self.source_finished = True
+        # 待機中の消費側をすぐに起こす
+        self.capture_buffer.wake()
 
     def start_listening(self):
-        """音声入力ストリームを開始する"""
-        print("AudioController: 録音開始")
+        """音声入力ストリームを開始する（入力ソースの指定が無ければマイク）"""
+        if not self.capture_buffer_blocks:
+            raise ValueError("AudioController: capture_buffer_blocks=0 のコントローラは録音できないわ。process_audio で音声を渡してちょうだい")
+        if self.audio_source is None:
+            self.audio_source = MicrophoneSource(
+                sample_rate=self.capture_sample_rate,
+                channels=self.capture_channels,
+                dtype=self.dtype,
+                block_size=self.capture_block_size,
+                device=self.device
+            )
+        source_format = (self.audio_source.sample_rate, self.audio_source.channels)
+        if source_format != (self.capture_sample_rate, self.capture_channels):
+            # ファイルなど形式の決まったソースは、その形式で受け取って変換する
+            self._configure_capture(*source_format)
+        if self.converter is not None:
+            print(f"AudioController: {self.capture_sample_rate}Hz・{self.capture_channels}チャンネルで録音して"
+                  f"{self.sample_rate}Hz・モノラルに変換するわ")
+        # 推論の子プロセスを先に起動しておく（モデルの読み込みを待ってから録音を始める）
+        for service in self.worker_services:
+            service.start()
+        print(f"AudioController: 録音開始（{type(self.audio_source).__name__}）")
         self.is_running = True
-        
-        # 使用するデバイスの情報を表示
-        if self.device is not None:
-            try:
-                device_info = sd.query_devices(self.device)
-                print(f"使用マイク: {device_info['name']} (ID: {self.device})")
-            except Exception as e:
-                print(f"マイク情報取得エラー: {e}")
-                print("デフォルトマイクを使用します。")
-                self.device = None
-        else:
-            print("デフォルトマイクを使用します。")
-        
-        self.stream = sd.InputStream(
-            samplerate=self.sample_rate,
-            channels=self.channels,
-            dtype=self.dtype,
-            blocksize=self.block_size,
-            callback=self._audio_callback,
-            device=self.device
-        )
-        self.stream.start()
+        self.source_finished = False
+        self.audio_source.start(self._audio_callback, on_finished=self._on_source_finished)
 
     def stop_listening(self):
         """音声入力ストリームを停止する"""
         print("AudioController: 録音停止")
         self.is_running = False
-        if self.stream:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
-
-    def save_to_wav(self, audio_data: np.ndarray, filename: str):
-        """NumPyの音声配列をWAVファイルに保存する"""
-        if audio_data is None or audio_data.size == 0:
-            return
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(2)
-            wf.setframerate(self.sample_rate)
-            wf.writeframes((audio_data * 32767).astype('int16').tobytes())
-        print(f"AudioController: 音声ファイル保存完了 -> {filename}")
+        # 待機中の消費側をすぐに起こす
+        if self.capture_buffer is not None:
+            self.capture_buffer.wake()
+        if self.audio_source is not None:
+            self.audio_source.stop()
+        for service in self.worker_services:
+            service.stop()
 
     def update_pre_buffer(self, chunk: np.ndarray):
-        """プリバッファを更新する"""
+        """プリバッファを更新する（容量を超えた分は古い方から上書きされる）"""
         self.pre_buffer.append(chunk)
-        # プリバッファのサイズを制限
-        total_samples = sum(len(c) for c in self.pre_buffer)
-        while total_samples > self.pre_buffer_size:
-            removed = self.pre_buffer.pop(0)
-            total_samples -= len(removed)
 
     def process_speech_segment(self):
-        """音声区間を処理して音声データとメタデータを返す"""
-        if not self.speech_buffer:
+        """音声区間を同期的に処理して音声データとメタデータを返す"""
+        segment = self._take_segment()
+        if segment is None:
             return None, None
 
-        # プリバッファと音声バッファを結合
-        audio_data = np.concatenate(self.pre_buffer + self.speech_buffer)
-        
+        audio_data, context = segment
         # 音声認識実行
-        recognized_text = self.stt_service.transcribe(audio_data, self.sample_rate)
-        is_wake = self.wakeword_detector.detect(recognized_text)
+        transcribe = context.pop("transcribe", None) or self.stt_service.transcribe
+        recognized_text = transcribe(audio_data, self.sample_rate)
+        return self._finalize_segment(audio_data, context, recognized_text)
+
+    def _take_segment(self):
+        """
+        溜まっている音声区間を取り出して (audio_data, context) を返す。
+        区間が空ならNoneを返す。
+        """
+        if len(self.speech_buffer) == 0:
+            return None
+
+        # プリロール込みの音声区間をコピーせずに取り出す（バッファは空になる）
+        audio_data = self.speech_buffer.detach()
+        context = {
+            # 区間が閉じた時刻をタイムスタンプにする（認識完了を待たない）
+            "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+            # 処理開始からの区間の位置（秒）。終わりは最後に発話と判定された位置
+            "start_offset": self.segment_start_sample / self.sample_rate,
+            "end_offset": self.last_speech_sample / self.sample_rate,
+            "source_id": self.source_id,
+            # 発話が終わってから結果が出るまでの遅延を測る起点
+            "closed_at": time.monotonic(),
+        }
+        if self.metrics.enabled:
+            self.metrics.counter("voicescribe_segments_total", "切り出した音声区間の数").inc(source=self.source_id)
+            self.metrics.histogram("voicescribe_segment_duration_seconds", "切り出した音声区間の長さ",
+                                   buckets=DURATION_BUCKETS).observe(len(audio_data) / self.sample_rate)
+        # 最大長で分割された場合、続きの区間はここから始まる
+        self.segment_start_sample = self.last_speech_sample
+        if self.partial_transcriber is not None:
+            # 確定済みの部分は再送せず、残りだけを認識して最終結果にする
+            context["transcribe"] = self.partial_transcriber.finish(audio_data)
+        return audio_data, context
+
+    def _finalize_segment(self, audio_data, context, recognized_text):
+        """認識結果からメタデータを作り、コールバックを呼んで (audio_data, metadata) を返す"""
+        wake_word = self.wakeword_detector.find(recognized_text)
 
         # メタデータ作成
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         metadata = {
-            "timestamp": timestamp,
-            "is_wake_word": is_wake,
+            "timestamp": context["timestamp"],
+            "is_wake_word": wake_word is not None,
+            "wake_word": wake_word.phrase if wake_word is not None else None,
             "text": recognized_text,
             "sample_rate": self.sample_rate,
-            "channels": self.channels
+            "channels": self.channels,
+            "start_offset": context["start_offset"],
+            "end_offset": context["end_offset"],
+            "source_id": context["source_id"],
+            # 1回のリクエストにまとめた元の区間の境界（まとめていなければ区間自身の1件）
+            "segments": context.get("segments") or [{
+                "timestamp": context["timestamp"],
+                "start_offset": context["start_offset"],
+                "end_offset": context["end_offset"],
+            }],
+            "is_final": True
         }
+        if "closed_at" in context:
+            # 発話の終わり（区間を閉じた時点）から認識結果が出るまでの秒数
+            metadata["latency"] = time.monotonic() - context["closed_at"]
+        # 認識に失敗した区間は、空の結果と区別できるように理由を残す
+        if context.get("error"):
+            metadata["error"] = context["error"]
+        if self.metrics.enabled:
+            if "latency" in metadata:
+                self.metrics.histogram("voicescribe_speech_end_to_text_seconds", "発話の終わりから認識結果が出るまでの遅延",
+                                       buckets=DURATION_BUCKETS).observe(metadata["latency"])
+            if context.get("error"):
+                self.metrics.counter("voicescribe_recognition_errors_total", "認識に失敗した区間の数").inc()
         
         # コールバック実行
         if self.on_speech_detected:
             self.on_speech_detected(audio_data, metadata)
         
-        # バッファクリア
-        self.speech_buffer = []
-        
         return audio_data, metadata
 
+    def _dequeue_blocks(self):
+        """
+        録音キューからブロックを取り出す。
+        空ならタイムアウト付きで待ち、溜まっている分はまとめて1つの配列（sample_rateのモノラル）にして返す。
+        タイムアウトまで何も来なければ None を返す。
+        """
+        audio, timestamps = self.capture_buffer.read(timeout=self.queue_timeout)
+        if not timestamps:
+            self._record_capture_losses()
+            return None
+
+        now = time.monotonic()
+        depth = len(timestamps)
+        stats = self.queue_stats
+        stats["depth"] = depth
+        stats["peak_depth"] = max(stats["peak_depth"], depth)
+        for enqueued_at in timestamps:
+            latency_ms = (now - enqueued_at) * 1000.0
+            stats["blocks"] += 1
+            stats["last_latency_ms"] = latency_ms
+            stats["max_latency_ms"] = max(stats["max_latency_ms"], latency_ms)
+            stats["total_latency_ms"] += latency_ms
+
+        if self.metrics.enabled:
+            self.metrics.gauge("voicescribe_queue_depth", "取り出し時点の録音キューの深さ").set(depth)
+            latency = self.metrics.histogram("voicescribe_queue_latency_seconds", "録音してからキューを取り出すまでの遅延")
+            for enqueued_at in timestamps:
+                latency.observe(now - enqueued_at)
+        self._record_capture_losses()
+        return self._convert(audio)
+
+    def _record_capture_losses(self):
+        """録音キューで捨てた音声と、デバイス側のあふれを前回からの差分で計測に足す"""
+        if not self.metrics.enabled:
+            return
+        buffer_stats = self.capture_buffer.get_stats()
+        reported = self._reported_losses
+        dropped = buffer_stats["dropped_samples"] - reported["dropped_samples"]
+        overflows = buffer_stats["overflows"] - reported["overflows"]
+        if dropped:
+            self.metrics.counter("voicescribe_capture_dropped_seconds_total", "録音キューが満杯で捨てた音声の長さ").inc(
+                dropped / self.capture_sample_rate, policy=self.capture_buffer.policy)
+        if overflows:
+            self.metrics.counter("voicescribe_capture_overflows_total", "デバイス側で入力があふれた回数").inc(overflows)
+        reported["dropped_samples"] = buffer_stats["dropped_samples"]
+        reported["overflows"] = buffer_stats["overflows"]
+
+    def get_queue_stats(self):
+        """キュー深さ・デキュー遅延と、録音キューでの取りこぼし（dropped_*, overflows）の統計を返す"""
+        stats = dict(self.queue_stats)
+        buffer_stats = self.capture_buffer.get_stats()
+        stats.update({key: buffer_stats[key] for key in ("policy", "capacity", "dropped_blocks", "dropped_samples", "overflows")})
+        stats["dropped_seconds"] = buffer_stats["dropped_samples"] / self.capture_sample_rate
+        stats["peak_backlog"] = buffer_stats["peak_backlog"]
+        blocks = stats["blocks"]
+        stats["avg_latency_ms"] = stats["total_latency_ms"] / blocks if blocks else 0.0
+        return stats
+
+    def get_gate_stats(self):
+        """VADの一次判定の統計（モデルを呼ばずに済んだ窓の割合など）を返す"""
+        gate = self.vad_service.energy_gate
+        return gate.get_stats() if gate is not None else None
+
+    def _should_degrade(self) -> bool:
+        """degrade方針で、直前に取り出したブロック数が degrade_backlog 以上ならVADを軽くする"""
+        if self.capture_buffer.policy != "degrade" or self.queue_stats["depth"] < self.degrade_backlog:
+            return False
+        self.queue_stats["degraded_blocks"] += self.queue_stats["depth"]
+        return True
+
+    def _score(self, audio: np.ndarray, degraded: bool):
+        if degraded:
+            return self.vad_service.score_stream(audio.reshape(-1), self.sample_rate, self.vad_stream, degraded=True)
+        return self.vad_service.score_stream(audio.reshape(-1), self.sample_rate, self.vad_stream)
+
+    def process_audio(self, audio: np.ndarray, degraded: bool = False):
+        """
+        任意長の音声をVADの窓単位で処理する。
+        溜まった窓はVADServiceで順に推論し、閉じた音声区間 (audio_data, context) のリストを返す。
+        degraded=True ならモデルを通さず一次判定だけで判定する（処理が追いつかないとき用）。
+        音声認識はここでは行わないわ。
+        """
+        if not self.metrics.enabled:
+            frames, probs = self._score(audio, degraded)
+            return self.process_scored_windows(frames, probs)
+
+        started = time.perf_counter()
+        frames, probs = self._score(audio, degraded)
+        vad_seconds = time.perf_counter() - started
+        segments = self.process_scored_windows(frames, probs)
+        record_block_metrics(self.metrics, audio.size / self.sample_rate, vad_seconds, time.perf_counter() - started)
+        return segments
+
+    def process_scored_windows(self, frames: np.ndarray, probs: np.ndarray):
+        """
+        VADで推論済みの窓 (frames, probs) を区間検出にかけて、閉じた音声区間のリストを返す。
+        区間中の発話確率が低い窓も区間に含めるから、発話の途中の音声を取りこぼさないわ。
+        複数ソースをまとめて推論する場合はこちらを直接呼ぶ。
+        """
+        if len(frames) == 0:
+            return []
+        # 最大長で分割するときは、区間の後半で一番静かな窓で切る
+        energies = np.sqrt(np.mean(np.square(frames), axis=1))
+
+        segments = []
+        cursor = 0
+        for event in self.segmenter.process(probs, energies):
+            self._consume_windows(frames[cursor:event.index])
+            cursor = event.index
+            if event.kind == "open":
+                self._open_segment()
+                continue
+            if event.kind == "close":
+                segment = self._close_segment(event.trim, event.discard)
+            else:
+                segment = self._split_segment(event.keep, event.discard)
+            if segment is not None:
+                segments.append(segment)
+        self._consume_windows(frames[cursor:])
+
+        if self.partial_transcriber is not None and self.is_speech_active:
+            # 発話中の短い無音で、そこまでを確定させるかどうかは部分認識側で判断する
+            pause = self.segmenter.silence_run * self.window_size / self.sample_rate
+            self.partial_transcriber.update(self.speech_buffer.view(), pause)
+        return segments
+
+    def _consume_windows(self, frames: np.ndarray):
+        """窓の列を、区間中なら音声バッファに、区間外ならプリバッファに入れる"""
+        if len(frames) == 0:
+            return
+        audio = frames.reshape(-1)
+        self.processed_samples += audio.size
+        if self.is_speech_active:
+            self.speech_buffer.append(audio)
+        else:
+            self.update_pre_buffer(audio)
+
+    def _open_segment(self):
+        """音声区間開始。プリロールを区間の先頭に入れておく"""
+        self.is_speech_active = True
+        print("AudioController: 音声区間開始")
+        self.segment_start_sample = self.processed_samples - len(self.pre_buffer)
+        self.speech_buffer.append(self.pre_buffer.get())
+        self.pre_buffer.clear()
+        self._reset_partial()
+
+    def _reset_partial(self):
+        """部分認識を新しい区間の状態にする（部分結果にタイムスタンプとソースを付ける）"""
+        if self.partial_transcriber is not None:
+            self.partial_transcriber.reset({
+                "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+                "source_id": self.source_id
+            })
+
+    def _close_segment(self, trim_windows: int, discard: bool):
+        """
+        十分な無音期間で音声区間終了。末尾の無音は区間から外して次のプリロールに回す。
+        発話が短すぎる区間は捨ててNoneを返すわ。
+        """
+        self.is_speech_active = False
+        trim = min(trim_windows * self.window_size, len(self.speech_buffer))
+        self.pre_buffer.clear()
+        if trim:
+            self.update_pre_buffer(self.speech_buffer.view()[-trim:])
+            self.speech_buffer.truncate(len(self.speech_buffer) - trim)
+        self.last_speech_sample = self.processed_samples - trim
+
+        if discard:
+            print("AudioController: 発話が短すぎるため区間を破棄します")
+            self.speech_buffer.clear()
+            if self.partial_transcriber is not None:
+                self.partial_transcriber.reset()
+            return None
+        print("AudioController: 音声区間終了")
+        return self._take_segment()
+
+    def _split_segment(self, keep_windows: int, discard: bool):
+        """最大長に達したので発話の途中でも切り出し、静かな所より後ろは次の区間に回す"""
+        print("AudioController: 最大発話長に達したため切り出します")
+        keep = min(keep_windows * self.window_size, len(self.speech_buffer))
+        tail = self.speech_buffer.view()[len(self.speech_buffer) - keep:].copy()
+        self.speech_buffer.truncate(len(self.speech_buffer) - keep)
+        self.last_speech_sample = self.processed_samples - keep
+
+        if discard:
+            self.speech_buffer.clear()
+            self.segment_start_sample = self.last_speech_sample
+            segment = None
+        else:
+            segment = self._take_segment()
+        # 捨てた（または切り出した）音声の確定済み認識を、続きの区間に持ち越さない
+        self._reset_partial()
+        self.speech_buffer.append(tail)
+        return segment
+
+    def submit(self, audio_data, context):
+        """
+        process_audio が返した区間 (audio_data, context) を認識に回す。リクエスト枠が少なければ、まとめられるまで溜めておくわ。
+        認識待ちが上限に達していれば、先に終わった区間の (audio_data, metadata) を返す（ジェネレータ）。
+        """
+        if self.coalescer is None:
+            yield from self._submit_request(audio_data, context)
+            return
+        for request in self.coalescer.add(audio_data, context):
+            yield from self._submit_request(*request)
+
+    def _submit_request(self, audio_data, context):
+        """
+        認識リクエストを認識プールに投入する。
+        未回収の区間が上限に達していたら、先頭の結果が出るまで待って先に返す（バックプレッシャー）。
+        """
+        pool = self.transcription_pool
+        if pool.is_full:
+            for result in pool.pop_completed(wait=True):
+                yield self._finalize_segment(*result)
+        pool.submit(audio_data, self.sample_rate, context, transcribe=context.pop("transcribe", None))
+
+    def collect(self, drain=False):
+        """認識が終わった区間を発話順に返す。drain=Trueなら全部終わるまで待つ"""
+        if self.coalescer is not None:
+            # 溜めていた区間は、待ち時間が過ぎたか枠が回復したら（drain時は必ず）認識に回す
+            for request in self.coalescer.flush() if drain else self.coalescer.poll():
+                yield from self._submit_request(*request)
+        pool = self.transcription_pool
+        results = pool.drain() if drain else pool.pop_completed()
+        for result in results:
+            yield self._finalize_segment(*result)
+
+    def flush(self):
+        """処理中の音声区間があれば閉じて認識に回す（入力の終わりに呼ぶ。ジェネレータ）"""
+        event = self.segmenter.flush()
+        if event is None or not self.is_speech_active:
+            return
+        segment = self._close_segment(event.trim, event.discard)
+        if segment is not None:
+            yield from self.submit(*segment)
+
+    def reset(self):
+        """
+        区間検出の状態を初期化し、認識プールを用意する。
+        マイクを使わず process_audio → submit → collect → flush と外から音声を流し込む場合は、最初にこれを呼ぶわ。
+        """
+        self.segmenter.reset()
+        self.is_speech_active = False
+        self.processed_samples = 0
+        self.segment_start_sample = 0
+        self.last_speech_sample = 0
+        self.pre_buffer.clear()
+        self.speech_buffer.clear()
+        self.vad_service.reset_stream(self.vad_stream)
+        if self.converter is not None:
+            self.converter.reset()
+        self.transcription_pool = TranscriptionPool(
+            self.stt_service,
+            max_workers=self.transcription_workers,
+            max_pending=self.max_pending_transcriptions,
+            executor=self.transcription_executor,
+            metrics=self.metrics
+        )
+
+    def close(self):
+        """認識プールと部分認識のスレッドを片付ける（共有のスレッドプールは止めない）"""
+        if self.transcription_pool is not None:
+            self.transcription_pool.shutdown()
+        if self.partial_transcriber is not None:
+            self.partial_transcriber.shutdown()
+
+    def process_blocks(self, blocks):
+        """
+        マイクの代わりに音声ブロックの列（ファイルなど）を処理して、区間ごとの結果を発話順に返す。
+        キューを介さず呼び出し側のペースで処理するから、実時間より速く回せるわ。
+        """
+        self.reset()
+        try:
+            for block in blocks:
+                for segment in self.process_audio(block):
+                    yield from self.submit(*segment)
+                yield from self.collect()
+            # 最後まで続いていた区間も認識に回す
+            yield from self.flush()
+            yield from self.collect(drain=True)
+        finally:
+            self.transcription_pool.shutdown()
+
     def run_forever(self):
-        """常時ループで音声を取り続け、音声区間のみを返す"""
-        silence_counter = 0.0
+        """
+        常時ループで音声を取り続け、音声区間のみを返す。
+        音声認識はスレッドプールで並行に実行し、結果は発話順に返すわ。
+        """
+        self.reset()
         print("AudioController: ループ開始。Ctrl+Cで終了してちょうだい。")
 
-        while self.is_running:
-            try:
-                if not self.audio_queue.empty():
-                    chunk = self.audio_queue.get()
-                    flattened_chunk = chunk.flatten()
-
-                    # VADで音声判定
-                    is_speech = self.vad_service.is_speech(flattened_chunk, self.sample_rate)
-
-                    if is_speech:
-                        # 音声区間
-                        silence_counter = 0
-                        if not self.is_speech_active:
-                            # 音声区間開始
-                            self.is_speech_active = True
-                            print("AudioController: 音声区間開始")
-                        self.speech_buffer.append(flattened_chunk)
-                    else:
-                        # 無音区間
-                        silence_counter += len(flattened_chunk) / self.sample_rate
-                        # 音声区間外ならプリバッファを更新
-                        if not self.is_speech_active:
-                            self.update_pre_buffer(flattened_chunk)
-
-                        if silence_counter >= self.silence_duration and self.is_speech_active:
-                            # 十分な無音期間で音声区間終了
-                            self.is_speech_active = False
-                            print("AudioController: 音声区間終了")
-                            yield self.process_speech_segment()
-                            silence_counter = 0
-                            # プリバッファをクリアして再開
-                            self.pre_buffer = []
-
-                else:
-                    time.sleep(0.01)
-
-            except KeyboardInterrupt:
-                print("AudioController: Ctrl+Cを検知。停止するわ。")
-                if self.is_speech_active:
-                    # 終了時に処理中の音声があれば返す
-                    yield self.process_speech_segment()
-                break
-            except Exception as e:
-                print(f"AudioController: ループ中にエラー発生 {e}")
-                if self.is_speech_active:
-                    # エラー時に処理中の音声があれば返す
-                    yield self.process_speech_segment()
+        try:
+            while self.is_running:
+                try:
+                    # ブロッキング待ちで取り出し、滞留分はまとめてVADにかける
+                    audio = self._dequeue_blocks()
+                    if audio is not None:
+                        for segment in self.process_audio(audio, degraded=self._should_degrade()):
+                            yield from self.submit(*segment)
+                    # 認識が終わった区間を発話順に返す
+                    yield from self.collect()
+                    if self.partial_transcriber is not None and self.is_speech_active:
+                        self.partial_transcriber.poll()
+                    # ファイルなどのソースを最後まで処理したら、続いていた区間も認識に回して終わる
+                    if self.source_finished and len(self.capture_buffer) == 0:
+                        # 変換フィルタに残っている末尾も押し出してから閉じる
+                        if self.converter is not None:
+                            for segment in self.process_audio(self.converter.flush()):
+                                yield from self.submit(*segment)
+                        yield from self.flush()
+                        self.is_running = False
+
+                except KeyboardInterrupt:
+                    print("AudioController: Ctrl+Cを検知。停止するわ。")
+                    # 終了時に処理中の音声があれば認識に回す
+                    yield from self.flush()
+                    break
+                except Exception as e:
+                    print(f"AudioController: ループ中にエラー発生 {e}")
+                    # エラー時に処理中の音声があれば認識に回す
+                    yield from self.flush()
+
+            # 認識待ちの区間を全部返してから終わる
+            yield from self.collect(drain=True)
+        finally:
+            self.transcription_pool.shutdown()
 
         print("AudioController: run_forever終了")
 
@@ -252,15 +810,12 @@ class AudioController:
         """利用可能なオーディオデバイスの一覧を表示する"""
         print("利用可能なオーディオデバイス一覧:")
         print("-" * 70)
-        devices = sd.query_devices()
-        
         input_devices = []
         
-        for i, device in enumerate(devices):
-            if device['max_input_channels'] > 0:  # 入力デバイス（マイク）のみ表示
-                mark = '* ' if device.get('default_input') else '  '
-                print(f"{mark}{i}: {device['name']} (入力チャンネル: {device['max_input_channels']})")
-                input_devices.append((i, device['name']))
+        for i, device in list_input_devices():  # 入力デバイス（マイク）のみ表示
+            mark = '* ' if device.get('default_input') else '  '
+            print(f"{mark}{i}: {device['name']} (入力チャンネル: {device['max_input_channels']})")
+            input_devices.append((i, device['name']))
                 
         print("-" * 70)
         print("* がデフォルトの入力デバイス")
@@ -0,0 +1,124 @@
+# application/batch_transcriber.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.domain.resampler import AudioConverter
+from src.application.audio_controller import AudioController
+from src.infrastructure.audio_file_reader import AudioFileReader
+from src.infrastructure.transcript_writer import FORMATS, TranscriptWriter, format_offset
+
+
+class BatchTranscriber:
+    """
+    録音済みの音声ファイルを、マイク入力と同じVAD区間検出と認識の流れで文字起こしするクラス。
+    ファイルはブロック単位で読みながら実時間より速く処理し、複数ファイルを並行に回すわ。
+    VADモデルと認識サービスは全ファイルで共有する。
+    """
+
+    def __init__(
+        self,
+        output_dir=None,          # 文字起こしの出力先（省略時は入力ファイルと同じ場所）
+        max_concurrent_files=4,   # 同時に処理するファイル数
+        transcription_workers=4,  # 全ファイルで共有する音声認識の並行数
+        block_duration=1.0,       # 1回に読み込む長さ（秒）
+        output_format="timed",    # 出力形式（timed, text, jsonl, srt, vtt）
+        **controller_options      # AudioControllerに渡す設定（silence_duration, recognition_serviceなど）
+    ):
+        self.output_dir = output_dir
+        self.max_concurrent_files = max(int(max_concurrent_files), 1)
+        self.block_duration = block_duration
+        if output_format not in FORMATS:
+            raise ValueError(f"BatchTranscriber: 出力形式は {', '.join(FORMATS)} のどれかにしてちょうだい")
+        self.output_format = output_format
+        self.executor = ThreadPoolExecutor(max_workers=max(int(transcription_workers), 1),
+                                           thread_name_prefix="batch-transcription")
+        controller_options.setdefault("transcription_workers", transcription_workers)
+        self.controller_options = controller_options
+
+        # 最初のコントローラでVADモデルと認識サービスを読み込み、以後のファイルで使い回す
+        template = self._create_controller()
+        self.vad_service = template.vad_service
+        self.stt_service = template.stt_service
+        self.sample_rate = template.sample_rate
+
+    def _create_controller(self):
+        options = dict(self.controller_options)
+        if getattr(self, "vad_service", None) is not None:
+            options["vad_service"] = self.vad_service
+            options["recognition_service"] = self.stt_service
+        # ファイルは process_blocks で直接渡すから、録音キューは持たない
+        return AudioController(transcription_executor=self.executor, capture_buffer_blocks=0, **options)
+
+    def output_path(self, input_path: str) -> str:
+        """入力ファイルに対応する出力ファイルのパス"""
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        directory = self.output_dir or os.path.dirname(input_path)
+        return os.path.join(directory, stem + FORMATS[self.output_format].extension)
+
+    def transcribe_file(self, input_path: str):
+        """
+        1ファイルを文字起こしして出力ファイルに書き込み、処理結果の要約を返す。
+        """
+        started = time.monotonic()
+        reader = AudioFileReader(input_path)
+        reader.block_size = int(self.block_duration * reader.sample_rate)
+        blocks = reader.blocks()
+        if reader.sample_rate != self.sample_rate:
+            # 44.1kHz/48kHzなどのファイルは読みながら変換する（読み込みはモノラルにまとめ済み）
+            blocks = AudioConverter(reader.sample_rate, 1, self.sample_rate).convert_blocks(blocks)
+
+        controller = self._create_controller()
+        output_path = self.output_path(input_path)
+        if os.path.exists(output_path):
+            # 再実行したときは前回の結果に追記せず作り直す
+            os.remove(output_path)
+
+        segments = 0
+        # 1ファイル分は溜めてまとめて書く（時間での書き出しは要らない）
+        with TranscriptWriter(output_path, format=self.output_format, flush_interval=None) as writer:
+            for _, metadata in controller.process_blocks(blocks):
+                # 何も聞き取れなかった区間は書かない。失敗した区間は抜けが分かるように残す
+                if not metadata["text"] and not metadata.get("error"):
+                    continue
+                writer.write(metadata)
+                segments += 1
+
+        elapsed = time.monotonic() - started
+        return {
+            "input": input_path,
+            "output": output_path,
+            "segments": segments,
+            "duration": reader.duration,
+            "elapsed": elapsed,
+            # 実時間比（1より小さいほど実時間より速い）
+            "real_time_factor": elapsed / reader.duration if reader.duration else 0.0,
+        }
+
+    def run(self, input_paths):
+        """複数のファイルを並行に文字起こしし、ファイルごとの要約のリストを返す"""
+        summaries = []
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_files, thread_name_prefix="batch-file") as pool:
+            futures = {pool.submit(self.transcribe_file, path): path for path in input_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    print(f"BatchTranscriber: {path} の処理に失敗したわ: {e}")
+                    continue
+                print(f"BatchTranscriber: {path} -> {summary['output']} "
+                      f"({summary['segments']}区間, 実時間比 {summary['real_time_factor']:.3f})")
+                summaries.append(summary)
+
+        total_audio = sum(s["duration"] for s in summaries)
+        elapsed = time.monotonic() - started
+        if elapsed > 0:
+            print(f"BatchTranscriber: {len(summaries)}ファイル / 音声 {total_audio:.1f}秒 を "
+                  f"{elapsed:.1f}秒で処理したわ（{total_audio / elapsed:.1f}倍速）")
+        return summaries
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,254 @@
+# application/multi_source_controller.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.domain.audio_buffer import BlockRingBuffer
+from src.domain.energy_gate import EnergyGate
+from src.domain.resampler import AudioConverter
+from src.domain.vad_service import VADService
+from src.application.audio_controller import AudioController, record_block_metrics
+from src.infrastructure.audio_source import MicrophoneSource
+from src.infrastructure.metrics import get_metrics
+
+
+class CaptureSource:
+    """
+    録音する入力ソース（マイクデバイスとそのチャンネル）の指定。
+    1台の多チャンネルマイクをチャンネルごとに別ソースとして扱うこともできるわ。
+    """
+
+    def __init__(self, device=None, channel=0, source_id=None):
+        self.device = device    # マイクデバイスID（Noneならデフォルトマイク）
+        self.channel = channel  # デバイス内のチャンネル番号（0始まり）
+        self.source_id = source_id or f"{'default' if device is None else device}:{channel}"
+
+    @classmethod
+    def parse(cls, spec: str):
+        """
+        "名前=デバイス:チャンネル" 形式の文字列から作る。名前とチャンネルは省略できる。
+        例: "1", "1:0", "窓側=2:1", "default:1"
+        """
+        source_id, _, target = spec.rpartition("=")
+        device, _, channel = target.partition(":")
+        device = None if device in ("", "default") else int(device)
+        return cls(device=device, channel=int(channel or 0), source_id=source_id or None)
+
+    def __repr__(self):
+        return f"CaptureSource({self.source_id!r}, device={self.device}, channel={self.channel})"
+
+
+class MultiSourceController:
+    """
+    複数のマイク（または多チャンネルマイクの各チャンネル）を1プロセスで同時に録音して文字起こしするクラス。
+    Sileroモデル・音声認識サービス・認識用スレッドプールは全ソースで1つを共有し、
+    ソースごとに持つのはVADの隠れ状態と区間検出用のバッファだけにしてるわ。
+    VADは各ソースの同じ時刻の窓をバッチにまとめて推論するから、どのソースも同じペースで進む。
+    結果のメタデータには source_id が付く。
+    """
+
+    def __init__(
+        self,
+        sources,                  # CaptureSourceのリスト
+        sample_rate=16000,
+        block_size=512,
+        capture_sample_rate=None,  # 録音デバイスのサンプルレート。Noneなら sample_rate のまま録音する
+        silence_threshold=0.5,    # VADの閾値
+        queue_timeout=0.1,        # キュー待ちの最大ブロック時間（秒）
+        capture_buffer_blocks=256,  # デバイスごとの録音キューに溜められるブロック数。超えた分は捨てる
+        overflow_policy="drop_oldest",  # 録音キューが満杯のとき: drop_oldest, drop_newest（degrade は drop_oldest と同じ扱い）
+        transcription_workers=2,  # 全ソースで共有する音声認識の並行数
+        recognition_service="google",  # 使用する音声認識サービス（google, openai, groq, local）
+        **controller_options      # ソースごとのAudioControllerに渡す設定（silence_durationなど）
+    ):
+        if not sources:
+            raise ValueError("MultiSourceController: ソースを1つ以上指定してちょうだい")
+        ids = [source.source_id for source in sources]
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"MultiSourceController: ソースIDが重複しているわ: {ids}")
+
+        self.sources = list(sources)
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.capture_sample_rate = capture_sample_rate or sample_rate
+        self.capture_block_size = max(int(round(block_size * self.capture_sample_rate / sample_rate)), 1)
+        self.queue_timeout = queue_timeout
+        self.metrics = controller_options.get("metrics") or get_metrics()
+
+        # 共有するモデルとスレッドプール（一次判定のノイズフロアはソースごとのストリームに持つ）
+        min_amplitude = controller_options.get("min_amplitude", 0.01)
+        self.vad_service = VADService(
+            threshold=silence_threshold,
+            energy_gate=EnergyGate(min_amplitude=min_amplitude) if min_amplitude is not None else None
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max(int(transcription_workers), 1),
+                                           thread_name_prefix="transcription")
+
+        # ソースごとの区間検出（最初のコントローラで作った認識サービスとウェイクワードの照合器を後のソースで使い回す）
+        self.controllers = {}
+        stt_service = recognition_service
+        for source in self.sources:
+            controller = AudioController(
+                sample_rate=sample_rate,
+                block_size=block_size,
+                recognition_service=stt_service,
+                transcription_workers=transcription_workers,
+                vad_service=self.vad_service,
+                transcription_executor=self.executor,
+                source_id=source.source_id,
+                capture_buffer_blocks=0,  # 録音はデバイスごとのキューで受けるから、ソースごとには持たない
+                **controller_options
+            )
+            stt_service = controller.stt_service
+            controller_options["wakeword_detector"] = controller.wakeword_detector
+            self.controllers[source.source_id] = controller
+
+        # デバイスごとに必要なチャンネル数（一番大きいチャンネル番号まで開く）
+        self.device_channels = {}
+        for source in self.sources:
+            self.device_channels[source.device] = max(self.device_channels.get(source.device, 0), source.channel + 1)
+
+        # デバイスごとの録音キュー（書き込みの通知は1つのイベントにまとめて、処理ループはそれだけを待つ）
+        self._ready = threading.Event()
+        self.capture_buffers = {
+            device: BlockRingBuffer(capacity=capture_buffer_blocks, block_size=self.capture_block_size,
+                                    channels=channels, policy=overflow_policy, ready=self._ready)
+            for device, channels in self.device_channels.items()
+        }
+        # デバイスのサンプルレートで録るときは、ソースごとに自分のチャンネルを取り出して変換する（フィルタの状態もソースごと）
+        self.converters = {}
+        if self.capture_sample_rate != sample_rate:
+            self.converters = {
+                source.source_id: AudioConverter(self.capture_sample_rate, self.device_channels[source.device],
+                                                 sample_rate, mix="select", channel=source.channel)
+                for source in self.sources
+            }
+        self.is_running = False
+        self.streams = []
+
+    def _make_callback(self, device):
+        capture_buffer = self.capture_buffers[device]
+
+        def callback(indata, frames, time_info, status):
+            if status is not None and getattr(status, "input_overflow", False):
+                capture_buffer.record_overflow()
+            if self.is_running:
+                capture_buffer.write(indata, time.monotonic())
+        return callback
+
+    def start_listening(self):
+        """全デバイスの入力ストリームを開始する"""
+        print(f"MultiSourceController: 録音開始（{len(self.sources)}ソース / {len(self.device_channels)}デバイス）")
+        self.is_running = True
+        for device, channels in self.device_channels.items():
+            stream = MicrophoneSource(
+                sample_rate=self.capture_sample_rate,
+                channels=channels,
+                dtype=np.float32,
+                block_size=self.capture_block_size,
+                device=device
+            )
+            stream.start(self._make_callback(device))
+            self.streams.append(stream)
+
+    def stop_listening(self):
+        """全デバイスの入力ストリームを停止する"""
+        print("MultiSourceController: 録音停止")
+        self.is_running = False
+        self._ready.set()
+        for stream in self.streams:
+            stream.stop()
+        self.streams = []
+
+    def _dequeue_blocks(self):
+        """録音キューに溜まったブロックをデバイスごとにまとめて取り出して返す"""
+        self._ready.wait(self.queue_timeout)
+        self._ready.clear()
+        blocks = {}
+        for device, capture_buffer in self.capture_buffers.items():
+            audio, timestamps = capture_buffer.read()
+            if timestamps:
+                blocks[device] = audio
+        return blocks
+
+    def get_capture_stats(self):
+        """デバイスごとの録音キューの統計（取りこぼし・あふれ・最大滞留）を返す"""
+        return {device: capture_buffer.get_stats() for device, capture_buffer in self.capture_buffers.items()}
+
+    def process_device_blocks(self, device_blocks):
+        """
+        デバイスごとの (フレーム数, チャンネル数) のブロックをソースに振り分け、
+        全ソースをまとめてVAD推論して、閉じた区間を (controller, segment) のリストで返す。
+        """
+        requests, controllers = [], []
+        for source in self.sources:
+            block = device_blocks.get(source.device)
+            if block is None:
+                continue
+            controller = self.controllers[source.source_id]
+            converter = self.converters.get(source.source_id)
+            audio = converter.process(block) if converter is not None else block[:, source.channel]
+            requests.append((audio, controller.vad_stream))
+            controllers.append(controller)
+
+        started = time.perf_counter()
+        scored = self.vad_service.score_streams(requests, self.sample_rate)
+        vad_seconds = time.perf_counter() - started
+
+        segments = []
+        for controller, (frames, probs) in zip(controllers, scored):
+            for segment in controller.process_scored_windows(frames, probs):
+                segments.append((controller, segment))
+
+        if self.metrics.enabled and requests:
+            # 全ソースを1回でまとめて推論しているから、実時間比は1ソース分の長さに対して測る
+            record_block_metrics(self.metrics, len(requests[0][0]) / self.sample_rate,
+                                 vad_seconds, time.perf_counter() - started)
+        return segments
+
+    def run_forever(self):
+        """
+        全ソースの音声を取り続け、認識結果を (audio_data, metadata) で返す。
+        順番はソースごとに発話順になるわ。
+        """
+        for controller in self.controllers.values():
+            controller.reset()
+        for converter in self.converters.values():
+            converter.reset()
+        print("MultiSourceController: ループ開始。Ctrl+Cで終了してちょうだい。")
+
+        try:
+            while self.is_running:
+                try:
+                    device_blocks = self._dequeue_blocks()
+                    if device_blocks:
+                        for controller, segment in self.process_device_blocks(device_blocks):
+                            yield from controller.submit(*segment)
+                    for controller in self.controllers.values():
+                        yield from controller.collect()
+                        if controller.partial_transcriber is not None and controller.is_speech_active:
+                            controller.partial_transcriber.poll()
+
+                except KeyboardInterrupt:
+                    print("MultiSourceController: Ctrl+Cを検知。停止するわ。")
+                    for controller in self.controllers.values():
+                        yield from controller.flush()
+                    break
+                except Exception as e:
+                    print(f"MultiSourceController: ループ中にエラー発生 {e}")
+                    for controller in self.controllers.values():
+                        yield from controller.flush()
+
+            for controller in self.controllers.values():
+                yield from controller.collect(drain=True)
+        finally:
+            for controller in self.controllers.values():
+                controller.transcription_pool.shutdown()
+
+        print("MultiSourceController: run_forever終了")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,113 @@
+# application/segment_coalescer.py
+
+import time
+
+import numpy as np
+
+
+class SegmentCoalescer:
+    """
+    認識リクエストの残り枠が少ないときに、隣り合う短い区間を1回のリクエストにまとめるクラス。
+    枠に余裕があれば区間はそのまま通し、足りなければ溜めておいて、
+    まとめた長さが max_duration に達したとき・max_wait 秒待ったとき・枠が回復したときに1つにして出すわ。
+    まとめた区間の元の境界とタイムスタンプは context["segments"] に残す。
+    認識結果はまとめた音声全体で1つになり、区間ごとの文字には分けられない（segments に text は入らない）わ。
+    """
+
+    def __init__(
+        self,
+        rate_limiter,              # TokenBucket
+        sample_rate=16000,
+        max_duration=30.0,         # まとめた音声の最大長（秒）
+        max_wait=10.0,             # 溜めておく最大時間（秒）
+        gap_duration=0.3,          # まとめるときに区間の間に挟む無音（秒）
+        reserve_tokens=1.0,        # 残りトークンがこれ以下なら「枠が少ない」とみなす
+        clock=time.monotonic
+    ):
+        self.rate_limiter = rate_limiter
+        self.sample_rate = sample_rate
+        self.max_samples = int(max_duration * sample_rate)
+        self.max_wait = max_wait
+        self.gap = np.zeros(int(gap_duration * sample_rate), dtype=np.float32)
+        self.reserve_tokens = reserve_tokens
+        self._clock = clock
+        self._pending = []  # (audio_data, context)
+        self._pending_samples = 0
+        self._first_added = None
+        self.stats = {"segments": 0, "requests": 0, "coalesced": 0}
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def is_tight(self) -> bool:
+        """認識リクエストの残り枠が少ないかどうか"""
+        return self.rate_limiter.available() <= self.reserve_tokens
+
+    def add(self, audio_data, context):
+        """区間を受け取り、今すぐ認識に回せる (audio_data, context) のリストを返す"""
+        self.stats["segments"] += 1
+        if context.get("transcribe") is not None:
+            # 部分認識つきの区間は専用の認識関数を持つからまとめられない
+            return self.flush() + [self._single(audio_data, context)]
+
+        if len(audio_data) >= self.max_samples or (not self._pending and not self.is_tight()):
+            return self.flush() + [self._single(audio_data, context)]
+
+        ready = []
+        if self._pending_samples + len(self.gap) + len(audio_data) > self.max_samples:
+            ready = self.flush()
+        if not self._pending:
+            self._first_added = self._clock()
+        self._pending.append((audio_data, context))
+        self._pending_samples += len(audio_data) + (len(self.gap) if len(self._pending) > 1 else 0)
+        return ready
+
+    def poll(self):
+        """待ち時間が過ぎたか枠が回復していれば、溜めた区間をまとめて返す"""
+        if not self._pending:
+            return []
+        if self._clock() - self._first_added >= self.max_wait or not self.is_tight():
+            return self.flush()
+        return []
+
+    def flush(self):
+        """溜めている区間をすべてまとめて返す"""
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, []
+        self._pending_samples = 0
+        self._first_added = None
+        if len(pending) == 1:
+            return [self._single(*pending[0])]
+
+        pieces = []
+        for i, (audio_data, _) in enumerate(pending):
+            if i:
+                pieces.append(self.gap)
+            pieces.append(audio_data)
+        first, last = pending[0][1], pending[-1][1]
+        context = dict(first)
+        context["end_offset"] = last["end_offset"]
+        # 発話の終わりからの遅延は、最後に閉じた区間から測る
+        closed = [ctx["closed_at"] for _, ctx in pending if "closed_at" in ctx]
+        if closed:
+            context["closed_at"] = max(closed)
+        context["segments"] = [self._boundary(ctx) for _, ctx in pending]
+        self.stats["requests"] += 1
+        self.stats["coalesced"] += len(pending)
+        print(f"SegmentCoalescer: リクエスト枠が少ないから {len(pending)}区間をまとめて認識するわ")
+        return [(np.concatenate(pieces), context)]
+
+    def _single(self, audio_data, context):
+        self.stats["requests"] += 1
+        context.setdefault("segments", [self._boundary(context)])
+        return audio_data, context
+
+    @staticmethod
+    def _boundary(context):
+        return {
+            "timestamp": context["timestamp"],
+            "start_offset": context["start_offset"],
+            "end_offset": context["end_offset"],
+        }
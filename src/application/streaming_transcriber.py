@@ -0,0 +1,131 @@
+# application/streaming_transcriber.py
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def join_texts(parts):
+    """
+    分割して認識したテキストをつなぐ。
+    英数字どうしの境目だけ空白を入れ、日本語はそのまま連結するわ。
+    """
+    result = ""
+    for part in parts:
+        part = (part or "").strip()
+        if not part:
+            continue
+        if result and result[-1].isascii() and result[-1].isalnum() and part[0].isascii() and part[0].isalnum():
+            result += " "
+        result += part
+    return result
+
+
+class StreamingTranscriber:
+    """
+    発話が続いている間に、伸びていく音声区間を途中まで認識して部分結果を出すクラス。
+
+    - 発話中の短い無音（commit_pause秒以上）で、そこまでの音声を「確定」として1回だけ認識する
+    - interval秒ぶん音声が伸びるたびに、未確定部分だけを暫定認識する（同時に1本まで）
+    - 区間が閉じたら、確定済みのテキストに未確定部分の認識結果をつないで最終結果にする
+    確定済みの音声は二度と送らないわ。
+    """
+
+    def __init__(self, stt_service, sample_rate, interval=1.0, commit_pause=0.3, min_commit_duration=0.5,
+                 on_partial_result=None):
+        self.stt_service = stt_service
+        self.sample_rate = sample_rate
+        self.interval_samples = int(interval * sample_rate)
+        self.commit_pause = commit_pause
+        self.min_commit_samples = int(min_commit_duration * sample_rate)
+        self.on_partial_result = on_partial_result
+        # 部分認識は順番どおりに1本ずつ流す
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="partial-transcription")
+        self.reset()
+
+    def reset(self, context=None):
+        """新しい音声区間の開始時に状態を初期化する"""
+        self.context = context or {}
+        self._committed = []           # 確定部分の認識（Future）を時間順に保持
+        self._committed_samples = 0    # 確定済みのサンプル数
+        self._provisional = None       # 未確定部分の暫定認識（Future）
+        self._provisional_start = 0    # 暫定認識を投げた時点の確定サンプル数
+        self._provisional_text = ""    # 最後に終わった暫定認識の結果（次が終わるまで表示し続ける）
+        self._provisional_text_start = 0
+        self._last_partial_samples = 0  # 最後に暫定認識を投げた時点の区間長
+        self._last_text = ""
+
+    def update(self, segment_audio: np.ndarray, pause_duration: float):
+        """
+        区間に窓が追加されるたびに呼ぶ。
+        segment_audio はプリロール込みの区間全体（ビューでいい）、pause_duration は現在続いている無音の秒数。
+        """
+        n = len(segment_audio)
+        uncommitted = n - self._committed_samples
+
+        # 発話中の短い無音で、そこまでを確定させる
+        if pause_duration >= self.commit_pause and uncommitted >= self.min_commit_samples:
+            chunk = segment_audio[self._committed_samples:n]
+            self._committed.append(self.executor.submit(self.stt_service.transcribe, chunk, self.sample_rate))
+            self._committed_samples = n
+            return
+
+        # 一定量伸びたら未確定部分を暫定認識する（前の暫定認識が終わっていなければ見送る）
+        in_flight = self._provisional is not None and not self._provisional.done()
+        if uncommitted > 0 and not in_flight and n - self._last_partial_samples >= self.interval_samples:
+            chunk = segment_audio[self._committed_samples:n]
+            self._provisional = self.executor.submit(self.stt_service.transcribe, chunk, self.sample_rate)
+            self._provisional_start = self._committed_samples
+            self._last_partial_samples = n
+
+    def poll(self):
+        """終わった部分認識をまとめて、テキストが変わっていれば部分結果のコールバックを呼ぶ"""
+        parts = []
+        for future in self._committed:
+            if not future.done():
+                break
+            parts.append(self._result(future))
+        else:
+            # 確定部分が全部そろっていて、暫定認識がその続きなら後ろにつなぐ
+            provisional = self._provisional
+            if provisional is not None and provisional.done():
+                self._provisional_text = self._result(provisional)
+                self._provisional_text_start = self._provisional_start
+                self._provisional = None
+            if self._provisional_text_start == self._committed_samples:
+                parts.append(self._provisional_text)
+
+        text = join_texts(parts)
+        if text and text != self._last_text:
+            self._last_text = text
+            if self.on_partial_result:
+                metadata = dict(self.context)
+                metadata.update({"text": text, "is_final": False})
+                self.on_partial_result(text, metadata)
+
+    def finish(self, segment_audio: np.ndarray):
+        """
+        区間が閉じたときに呼び、最終結果を作る関数を返す。
+        返した関数は transcribe(audio_data, sample_rate) と同じ形で、認識プールに渡せるわ。
+        """
+        committed = list(self._committed)
+        tail = segment_audio[self._committed_samples:]
+        self.reset()
+
+        def transcribe_final(audio_data, sample_rate):
+            parts = [self._result(future) for future in committed]
+            if len(tail) > 0:
+                parts.append(self.stt_service.transcribe(tail, sample_rate))
+            return join_texts(parts)
+
+        return transcribe_final
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    @staticmethod
+    def _result(future):
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"StreamingTranscriber: 部分認識中にエラーが発生したわ: {e}")
+            return ""
@@ -0,0 +1,403 @@
+# application/transcription_server.py
+
+import asyncio
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from src.domain.resampler import AudioConverter
+from src.application.audio_controller import AudioController
+from src.infrastructure.audio_source import StdinSource
+from src.infrastructure.metrics import get_metrics
+from src.infrastructure.transcript_writer import JsonlFormat
+
+
+# 受け取ったPCMの形式（標準入力のソースと同じもの）
+SAMPLE_FORMATS = StdinSource.SAMPLE_FORMATS
+
+# 受信側のキューに入れる、クライアントからの終了の印
+_END = object()    # 残りを認識して最終結果を返してから閉じる
+_ABORT = object()  # 何も返さずに閉じる（クライアントが先に切断した）
+
+# 接続を閉じるときのコード（RFC 6455）
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+
+
+class StreamSession:
+    """
+    1接続分の音声ストリーム。区間検出の状態（AudioController）を接続ごとに持ち、
+    VADモデル・認識サービス・認識用スレッドプールはサーバー全体で共有するわ。
+    process / poll / finish はイベントループではなくスレッドプールから呼ぶ（認識待ちでブロックすることがあるから）。
+    """
+
+    def __init__(self, session_id, controller, sample_rate=16000, channels=1, sample_format="s16le"):
+        self.session_id = session_id
+        self.controller = controller
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype, self.scale = SAMPLE_FORMATS[sample_format]
+        self.frame_bytes = self.dtype.itemsize * channels
+        self.converter = AudioConverter(sample_rate, channels, controller.sample_rate)
+        if self.converter.is_passthrough:
+            self.converter = None
+        self.received_samples = 0
+        self._pending = b""  # フレームに満たない端数のバイト
+        controller.reset()
+
+    @property
+    def received_seconds(self) -> float:
+        return self.received_samples / self.sample_rate
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """PCMのバイト列を (フレーム数, チャンネル数) のfloat32にする。フレームの端数は次に持ち越す"""
+        data = self._pending + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32)
+        if self.scale != 1.0:
+            samples /= self.scale
+        self.received_samples += len(samples) // self.channels
+        return samples.reshape(-1, self.channels)
+
+    def process(self, audio: np.ndarray):
+        """受け取った音声を区間検出に通し、認識が終わった区間のメタデータを返す"""
+        if self.converter is not None:
+            audio = self.converter.process(audio)
+        else:
+            audio = audio.reshape(-1)
+        # 共有のVADモデルの呼び出しはVADServiceの中で排他しているから、区間検出は接続ごとに並行して進む
+        segments = self.controller.process_audio(audio)
+        results = []
+        for segment in segments:
+            results.extend(metadata for _, metadata in self.controller.submit(*segment))
+        return results + self.poll()
+
+    def poll(self):
+        """音声が来ていない間も、認識が終わった区間と部分結果を拾う"""
+        results = list(self.controller.collect())
+        partial = self.controller.partial_transcriber
+        if partial is not None and self.controller.is_speech_active:
+            partial.poll()
+        return [metadata for _, metadata in results]
+
+    def finish(self):
+        """続いていた区間も閉じて、全区間の認識が終わるまで待って返す"""
+        results = []
+        if self.converter is not None:
+            segments = self.controller.process_audio(self.converter.flush())
+            for segment in segments:
+                results.extend(self.controller.submit(*segment))
+        results.extend(self.controller.flush())
+        results.extend(self.controller.collect(drain=True))
+        return [metadata for _, metadata in results]
+
+    def close(self):
+        """認識プールを片付ける（共有のスレッドプールは止めない）"""
+        self.controller.close()
+
+
+def final_message(metadata):
+    """区間の認識結果をクライアントへ送るJSONにする（JSONL出力と同じ項目）"""
+    message = {"type": "final"}
+    message.update({key: metadata[key] for key in JsonlFormat.FIELDS if metadata.get(key) is not None})
+    return message
+
+
+def partial_message(metadata):
+    message = {"type": "partial", "text": metadata["text"]}
+    if metadata.get("source_id") is not None:
+        message["source_id"] = metadata["source_id"]
+    return message
+
+
+class TranscriptionServer:
+    """
+    WebSocketで受けた複数クライアントの音声を、まとめて文字起こしするサーバー（asyncio）。
+    クライアントは ws://HOST:PORT/stream?sample_rate=48000&channels=2&format=s16le につないでPCMをバイナリで送り、
+    区間ごとの結果（type=final）と発話中の部分結果（type=partial）をJSONで受け取るわ。
+    {"type": "end"} を送ると残りを認識して {"type": "end"} を返してから閉じる。
+
+    - 同時接続数は max_connections まで。超えた接続はHTTP 503で断る
+    - 接続ごとの受信キューは max_queued_chunks 個まで。処理が追いつかなければ読むのを止めて、
+      TCPの流量制御でクライアント側の送信を待たせる（メモリは増えない）
+    - 区間検出は接続ごと、VADモデルと認識サービスは全接続で共有する
+    GET /health で接続数などをJSONで返す。
+    WebSocketの通信は websockets ライブラリに任せる（サーバーモードでしか使わないから、start() まで読み込まない）。
+    """
+
+    STREAM_PATH = "/stream"
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=8765,
+        max_connections=16,        # 同時に受け付ける接続数
+        max_queued_chunks=32,      # 接続ごとの受信キューの長さ（メッセージ数）
+        max_message_size=1 << 20,  # 1メッセージの最大バイト数
+        poll_interval=0.1,         # 音声が来ていない間に認識結果を拾う間隔（秒）
+        transcription_workers=4,   # 全接続で共有する音声認識の並行数
+        metrics=None,
+        **controller_options       # 接続ごとのAudioControllerに渡す設定（recognition_service, silence_durationなど）
+    ):
+        self.host = host
+        self.port = port
+        self.max_connections = max(int(max_connections), 1)
+        self.max_queued_chunks = max(int(max_queued_chunks), 1)
+        self.max_message_size = max_message_size
+        self.poll_interval = poll_interval
+        self.metrics = metrics if metrics is not None else get_metrics()
+        controller_options.setdefault("transcription_workers", transcription_workers)
+        controller_options.setdefault("metrics", self.metrics)
+        # 接続ごとのコントローラは録音しないから、録音キューは持たない
+        controller_options["capture_buffer_blocks"] = 0
+        self.controller_options = controller_options
+
+        self.transcription_executor = ThreadPoolExecutor(max_workers=max(int(transcription_workers), 1),
+                                                         thread_name_prefix="server-transcription")
+        # 接続ごとの区間検出と認識待ちを回すスレッド（1接続に1本あれば互いに待たされない）
+        self.session_executor = ThreadPoolExecutor(max_workers=self.max_connections,
+                                                   thread_name_prefix="server-session")
+
+        # 最初のコントローラでVADモデルと認識サービス、ウェイクワードの照合器を用意し、以後の接続で使い回す
+        template = self._create_controller(None)
+        self.vad_service = template.vad_service
+        self.stt_service = template.stt_service
+        self.wakeword_detector = template.wakeword_detector
+        self.sample_rate = template.sample_rate
+        # 雛形そのものは接続に使わないから、部分認識のスレッドなどはすぐ片付ける
+        template.close()
+
+        self._session_ids = itertools.count(1)
+        self._connections = set()
+        self.stats = {"accepted": 0, "rejected": 0, "completed": 0, "aborted": 0}
+        self.server = None
+
+    def _create_controller(self, session_id):
+        options = dict(self.controller_options)
+        if getattr(self, "vad_service", None) is not None:
+            options["vad_service"] = self.vad_service
+            options["recognition_service"] = self.stt_service
+            options["wakeword_detector"] = self.wakeword_detector
+        return AudioController(transcription_executor=self.transcription_executor, source_id=session_id, **options)
+
+    @property
+    def active_connections(self) -> int:
+        return len(self._connections)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats.update({"active": self.active_connections, "max_connections": self.max_connections})
+        return stats
+
+    async def start(self):
+        """待ち受けを始める。port=0 なら空いているポートを使い、self.port に入れる"""
+        from websockets.asyncio.server import serve
+        # ライブラリ側の受信バッファも小さくしておくと、受信キューが満杯のときにすぐ読むのを止める
+        self.server = await serve(self._handle, self.host, self.port,
+                                  process_request=self._process_request, process_response=self._process_response,
+                                  max_size=self.max_message_size, max_queue=self.max_queued_chunks)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"TranscriptionServer: ws://{self.host}:{self.port}{self.STREAM_PATH} で待ち受けるわ"
+              f"（同時接続 {self.max_connections} まで）")
+        return self
+
+    async def stop(self):
+        """新しい接続を断り、つながっている接続を閉じて（1001）、それぞれの片付けが終わってから止める"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    def run(self):
+        """Ctrl+Cまで動かす"""
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            print("TranscriptionServer: Ctrl+Cを検知。停止するわ。")
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.session_executor.shutdown(wait=True)
+        self.transcription_executor.shutdown(wait=True)
+
+    def _process_request(self, connection, request):
+        """ハンドシェイクの前に、WebSocket以外のリクエストと形式の誤りにHTTPで返事をする"""
+        url = urlsplit(request.path)
+        if url.path == "/health":
+            return self._respond(connection, 200, dict(self.get_stats(), status="ok"))
+        if url.path != self.STREAM_PATH:
+            return self._respond(connection, 404, {"error": f"{url.path} は無いわ"})
+        try:
+            self._parse_format(dict(parse_qsl(url.query)))
+        except ValueError as e:
+            return self._respond(connection, 400, {"error": str(e)})
+        # WebSocketのヘッダーが無ければ、ライブラリが426で断る
+        return None
+
+    def _process_response(self, connection, request, response):
+        """ハンドシェイクが通る接続だけ、同時接続数の上限を見て受け付ける"""
+        if response.status_code != 101:
+            return None
+        # 受け付けの判定と登録の間に await を挟まないから、同時に来ても上限を超えない
+        if self.active_connections >= self.max_connections:
+            self.stats["rejected"] += 1
+            self.metrics.counter("voicescribe_server_rejected_total", "同時接続数の上限で断った接続の数").inc()
+            return self._respond(connection, 503, {"error": "同時接続数の上限に達しているわ"},
+                                 headers={"Retry-After": "1"})
+        self._connections.add(connection)
+        self.stats["accepted"] += 1
+        self._record_connections()
+        # ハンドシェイクの途中で切れてハンドラが呼ばれなくても数え漏れないように、接続のタスクが終わったら外す
+        asyncio.current_task().add_done_callback(lambda _: self._release(connection))
+        return None
+
+    def _release(self, connection):
+        self._connections.discard(connection)
+        self._record_connections()
+
+    @staticmethod
+    def _respond(connection, status, body, headers=None):
+        """WebSocketにしない接続へ返す、JSONの本文を付けたHTTPレスポンスを作る"""
+        response = connection.respond(status, json.dumps(body, ensure_ascii=False))
+        del response.headers["Content-Type"]
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
+        for name, value in (headers or {}).items():
+            response.headers[name] = value
+        return response
+
+    async def _handle(self, websocket):
+        """1接続分の処理（受け付けの判定は _process_request と _process_response で済んでいる）"""
+        from websockets.exceptions import ConnectionClosed
+        loop = asyncio.get_running_loop()
+        session = None
+        try:
+            stream_format = self._parse_format(dict(parse_qsl(urlsplit(websocket.request.path).query)))
+            session_id = f"session-{next(self._session_ids)}"
+            # コントローラの用意（VADストリームなど）もスレッドで行う
+            session = await loop.run_in_executor(self.session_executor, self._create_session, session_id, stream_format)
+            await self._run_session(websocket, session)
+        except ConnectionClosed as e:
+            print(f"TranscriptionServer: 接続を閉じたわ: {e}")
+        finally:
+            if session is not None:
+                # 認識中の区間が終わるのを待つことがあるから、イベントループを止めないようにスレッドで片付ける
+                await loop.run_in_executor(self.session_executor, session.close)
+
+    def _parse_format(self, query):
+        """接続URLのクエリから音声の形式を読む"""
+        try:
+            sample_rate = int(query.get("sample_rate", self.sample_rate))
+            channels = int(query.get("channels", 1))
+        except ValueError:
+            raise ValueError("sample_rate と channels は整数で指定してちょうだい") from None
+        sample_format = query.get("format", "s16le")
+        if not 8000 <= sample_rate <= 192000:
+            raise ValueError(f"未対応のサンプルレートよ: {sample_rate}")
+        if not 1 <= channels <= 32:
+            raise ValueError(f"未対応のチャンネル数よ: {channels}")
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"format は {', '.join(SAMPLE_FORMATS)} のどれかにしてちょうだい")
+        return {"sample_rate": sample_rate, "channels": channels, "sample_format": sample_format}
+
+    def _create_session(self, session_id, stream_format):
+        return StreamSession(session_id, self._create_controller(session_id), **stream_format)
+
+    def _record_connections(self):
+        self.metrics.gauge("voicescribe_server_connections", "つながっているストリームの数").set(self.active_connections)
+
+    async def _run_session(self, websocket, session):
+        loop = asyncio.get_running_loop()
+        inbox = asyncio.Queue(maxsize=self.max_queued_chunks)
+        outbox = asyncio.Queue()
+        if session.controller.partial_transcriber is not None:
+            # 部分結果は認識のスレッドから届くから、イベントループに渡してから送る
+            session.controller.partial_transcriber.on_partial_result = lambda text, metadata: loop.call_soon_threadsafe(
+                outbox.put_nowait, partial_message(metadata))
+
+        await websocket.send(json.dumps({"type": "ready", "session": session.session_id, "sample_rate": self.sample_rate}))
+        receiver = asyncio.create_task(self._receive(websocket, session, inbox, outbox))
+        sender = asyncio.create_task(self._send(websocket, outbox))
+        try:
+            ending = await self._process(session, inbox, outbox)
+            if ending == _END:
+                outbox.put_nowait({"type": "end", "received_seconds": session.received_seconds})
+                self.stats["completed"] += 1
+            else:
+                self.stats["aborted"] += 1
+            outbox.put_nowait(None)
+            await sender
+        finally:
+            receiver.cancel()
+            sender.cancel()
+            await asyncio.gather(receiver, sender, return_exceptions=True)
+        await websocket.close(CLOSE_NORMAL if ending == _END else CLOSE_GOING_AWAY)
+
+    async def _receive(self, websocket, session, inbox, outbox):
+        """クライアントからのメッセージを受信キューに入れる。キューが満杯なら空くまで読まない"""
+        from websockets.exceptions import ConnectionClosed
+        try:
+            while True:
+                message = await websocket.recv()
+                if isinstance(message, bytes):
+                    audio = session.decode(message)
+                    if len(audio):
+                        await inbox.put(audio)
+                    continue
+                try:
+                    command = json.loads(message)
+                except json.JSONDecodeError:
+                    command = None
+                if isinstance(command, dict) and command.get("type") == "end":
+                    await inbox.put(_END)
+                    return
+                outbox.put_nowait({"type": "error", "message": "知らないメッセージよ（音声はバイナリで、終わりは {\"type\": \"end\"}）"})
+        except ConnectionClosed:
+            # 先に切断された（大きすぎるメッセージなどで、ライブラリが閉じた場合も含む）
+            await inbox.put(_ABORT)
+
+    async def _send(self, websocket, outbox):
+        """送信キューのメッセージを順に送る。クライアントが読まなければここで待つ"""
+        from websockets.exceptions import ConnectionClosed
+        while True:
+            message = await outbox.get()
+            if message is None:
+                return
+            try:
+                await websocket.send(json.dumps(message, ensure_ascii=False))
+            except ConnectionClosed:
+                return
+
+    async def _process(self, session, inbox, outbox):
+        """受信キューの音声を区間検出と認識に回し、結果を送信キューに入れる。終わり方（_END / _ABORT）を返す"""
+        loop = asyncio.get_running_loop()
+        audio_seconds = self.metrics.counter("voicescribe_server_audio_seconds_total", "サーバーが受け取った音声の長さ")
+        while True:
+            try:
+                item = await asyncio.wait_for(inbox.get(), self.poll_interval)
+            except asyncio.TimeoutError:
+                item = None
+            if item is _ABORT:
+                return _ABORT
+            if item is _END:
+                results = await loop.run_in_executor(self.session_executor, session.finish)
+            elif item is None:
+                results = await loop.run_in_executor(self.session_executor, session.poll)
+            else:
+                audio_seconds.inc(len(item) / session.sample_rate)
+                results = await loop.run_in_executor(self.session_executor, session.process, item)
+            for metadata in results:
+                outbox.put_nowait(final_message(metadata))
+            if item is _END:
+                return _END
@@ -0,0 +1,103 @@
+# application/transcription_worker.py
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.infrastructure.metrics import RATIO_BUCKETS, get_metrics
+
+
+class TranscriptionPool:
+    """
+    音声認識サービスの呼び出しをスレッドプールで非同期に実行するクラス。
+    同時実行数と未回収の区間数に上限を持ち、結果は投入した順番どおりに返すわ。
+    executor を渡すと、複数のプールで1つのスレッドプールを共有できる（停止は渡した側の責任）。
+    """
+
+    def __init__(self, stt_service, max_workers=2, max_pending=8, executor=None, metrics=None):
+        self.stt_service = stt_service
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.max_workers = max(int(max_workers), 1)
+        # 投入済みで未回収の区間数の上限（実行待ちを含む）
+        self.max_pending = max(int(max_pending), self.max_workers)
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="transcription"
+        )
+        self._pending = deque()  # (future, audio_data, context) を投入順に保持
+
+    @property
+    def pending_count(self) -> int:
+        """未回収の区間数"""
+        return len(self._pending)
+
+    @property
+    def is_full(self) -> bool:
+        """これ以上投入すると上限を超えるかどうか"""
+        return len(self._pending) >= self.max_pending
+
+    def submit(self, audio_data, sample_rate, context=None, transcribe=None):
+        """
+        区間を認識キューに投入する。
+        上限に達している場合は呼び出し側で先に pop_completed(wait=True) して空きを作ること。
+        transcribe を渡すと stt_service.transcribe の代わりにそれを呼ぶわ。
+        """
+        if self.is_full:
+            raise RuntimeError("TranscriptionPool: 未回収の区間が上限に達しているわ")
+        fn = transcribe or self.stt_service.transcribe
+        if self.metrics.enabled:
+            fn = self._timed(fn)
+        future = self.executor.submit(fn, audio_data, sample_rate)
+        self._pending.append((future, audio_data, context))
+
+    def pop_completed(self, wait=False):
+        """
+        先頭から順に完了済みの結果を取り出し、(audio_data, context, text) のリストで返す。
+        wait=True なら先頭の1件が終わるまで待つから、必ず1件以上の空きができるわ。
+        """
+        results = []
+        if wait and self._pending:
+            results.append(self._pop_head())
+        while self._pending and self._pending[0][0].done():
+            results.append(self._pop_head())
+        return results
+
+    def drain(self):
+        """未回収の区間をすべて待って投入順に返す"""
+        results = []
+        while self._pending:
+            results.append(self._pop_head())
+        return results
+
+    def shutdown(self):
+        """スレッドプールを停止する（共有のスレッドプールは止めない）"""
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
+
+    def _timed(self, fn):
+        """認識にかかった時間と、音声の長さに対する実時間比を記録するように包む"""
+        def transcribe(audio_data, sample_rate):
+            started = time.perf_counter()
+            try:
+                return fn(audio_data, sample_rate)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.metrics.histogram("voicescribe_recognition_seconds", "1区間の音声認識にかかった時間").observe(elapsed)
+                if audio_data.size:
+                    self.metrics.histogram("voicescribe_real_time_factor", "処理時間 / 音声の長さ（1未満なら実時間より速い）",
+                                           buckets=RATIO_BUCKETS).observe(elapsed * sample_rate / audio_data.size,
+                                                                          stage="recognition")
+        return transcribe
+
+    def _pop_head(self):
+        future, audio_data, context = self._pending.popleft()
+        try:
+            text = future.result()
+        except Exception as e:
+            print(f"TranscriptionPool: 音声認識中にエラーが発生したわ: {e}")
+            text = ""
+            # 空の結果と区別できるように、失敗したことを区間に残しておく
+            if context is not None:
+                context["error"] = str(e)
+        return audio_data, context, text
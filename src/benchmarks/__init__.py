@@ -0,0 +1,4 @@
+from .fixtures import AudioFixture, synthetic_fixture, load_fixture
+from .stub_services import StubRecognitionService
+from .scoring import score_segmentation
+from .runner import BenchmarkScenario, run_scenario, run_suite, compare_results
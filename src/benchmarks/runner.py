@@ -0,0 +1,233 @@
+# benchmarks/runner.py
+
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Windowsには無いから、プロセスの最大常駐メモリは測らない
+    resource = None
+
+from src.application.audio_controller import AudioController
+from src.domain.energy_gate import EnergyGate
+from src.domain.vad_service import VADService
+from src.infrastructure.metrics import MetricsRegistry
+from src.benchmarks.scoring import percentiles, score_segmentation
+from src.benchmarks.stub_services import StubRecognitionService
+
+
+# 結果ファイルの形式のバージョン（項目の意味を変えたら上げる）
+RESULT_VERSION = 1
+
+# compare_results で比べる項目と、値が大きい方が良いかどうか
+COMPARED_METRICS = {
+    "vad_blocks_per_second": True,
+    "real_time_factor": False,
+    "latency_p50": False,
+    "latency_p90": False,
+    "latency_p99": False,
+    "traced_peak_mb": False,
+    "frame_f1": True,
+    "segment_recall": True,
+}
+
+
+class BenchmarkScenario:
+    """1回の計測の条件（ブロックサイズ・サンプルレート・認識の遅延・投入の速さ）"""
+
+    def __init__(
+        self,
+        block_size=512,
+        sample_rate=16000,
+        recognition_latency=0.05,  # 偽の認識サービスの遅延（秒）
+        recognition_jitter=0.0,    # 遅延のばらつき（秒）
+        pace=0.0,                  # 実時間の何倍速で音声を流すか。0なら待たずに流す
+        transcription_workers=4
+    ):
+        self.block_size = block_size
+        self.sample_rate = sample_rate
+        self.recognition_latency = recognition_latency
+        self.recognition_jitter = recognition_jitter
+        self.pace = pace
+        self.transcription_workers = transcription_workers
+
+    @property
+    def name(self) -> str:
+        return f"sr{self.sample_rate}-block{self.block_size}"
+
+    def to_dict(self):
+        return dict(vars(self), name=self.name)
+
+
+def _paced(blocks, interval):
+    """マイクと同じ間隔でブロックを渡す"""
+    next_at = time.perf_counter()
+    for block in blocks:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        next_at += interval
+        yield block
+
+
+def create_vad_service(threshold=0.5, min_amplitude=0.01, backend=None):
+    """全シナリオで共有するVADServiceを作り、モデルを読み込んでおく（読み込み時間は計測に入れない）"""
+    vad_service = VADService(
+        threshold=threshold,
+        backend=backend,
+        energy_gate=EnergyGate(min_amplitude=min_amplitude) if min_amplitude is not None else None
+    )
+    vad_service.load()
+    return vad_service
+
+
+def warm_up(vad_service, sample_rate):
+    """最初の推論だけ遅いから、計測の前に1回通しておく"""
+    stream = vad_service.create_stream()
+    noise = np.random.default_rng(0).uniform(-0.3, 0.3, sample_rate).astype(np.float32)
+    vad_service.score_stream(noise, sample_rate, stream)
+
+
+def run_scenario(fixture, scenario, vad_service, **controller_options):
+    """
+    フィクスチャの音声をマイクの代わりにAudioControllerへ流し、1シナリオ分の計測結果を返す。
+    controller_options はAudioControllerにそのまま渡す（silence_durationなど）。
+    """
+    fixture = fixture.resampled(scenario.sample_rate)
+    registry = MetricsRegistry()
+    service = StubRecognitionService(latency=scenario.recognition_latency, jitter=scenario.recognition_jitter)
+    controller = AudioController(
+        sample_rate=scenario.sample_rate,
+        block_size=scenario.block_size,
+        recognition_service=service,
+        vad_service=vad_service,
+        transcription_workers=scenario.transcription_workers,
+        metrics=registry,
+        **controller_options
+    )
+    blocks = fixture.blocks(scenario.block_size)
+    if scenario.pace:
+        blocks = _paced(blocks, scenario.block_size / scenario.sample_rate / scenario.pace)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = list(controller.process_blocks(blocks))
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    vad = registry.histogram("voicescribe_vad_seconds")
+    detected = [(metadata["start_offset"], metadata["end_offset"]) for _, metadata in results]
+    latencies = [metadata["latency"] for _, metadata in results if "latency" in metadata]
+
+    result = scenario.to_dict()
+    result.update({
+        "audio_seconds": fixture.duration,
+        "elapsed_seconds": elapsed,
+        "real_time_factor": elapsed / fixture.duration if fixture.duration else 0.0,
+        "vad_blocks": vad.count(),
+        "vad_seconds": vad.sum(),
+        "vad_blocks_per_second": vad.count() / vad.sum() if vad.sum() else 0.0,
+        "recognition_requests": service.calls,
+        "traced_peak_mb": traced_peak / (1024 * 1024),
+        "rss_high_water_mb": _rss_high_water_mb(),
+    })
+    result.update({f"latency_{key}": value for key, value in percentiles(latencies).items()})
+    result.update(score_segmentation(detected, fixture.speech_intervals, fixture.duration))
+    gate_stats = controller.get_gate_stats()
+    if gate_stats is not None:
+        result["gate_skip_ratio"] = gate_stats["skip_ratio"]
+    return result
+
+
+def run_suite(fixture, block_sizes=(256, 512, 1024), sample_rates=(8000, 16000), vad_service=None,
+              recognition_latency=0.05, recognition_jitter=0.0, pace=0.0, transcription_workers=4,
+              **controller_options):
+    """ブロックサイズ×サンプルレートの全組み合わせを計測して、結果ファイルの中身（辞書）を返す"""
+    vad_service = vad_service or create_vad_service()
+    scenarios = []
+    for sample_rate in sample_rates:
+        warm_up(vad_service, sample_rate)
+        for block_size in block_sizes:
+            scenario = BenchmarkScenario(
+                block_size=block_size,
+                sample_rate=sample_rate,
+                recognition_latency=recognition_latency,
+                recognition_jitter=recognition_jitter,
+                pace=pace,
+                transcription_workers=transcription_workers
+            )
+            print(f"benchmark: {scenario.name} を計測中...", file=sys.stderr)
+            scenarios.append(run_scenario(fixture, scenario, vad_service, **controller_options))
+
+    return {
+        "version": RESULT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment_info(vad_service),
+        "fixture": {
+            "name": fixture.name,
+            "duration": fixture.duration,
+            "sample_rate": fixture.sample_rate,
+            "speech_segments": len(fixture.speech_intervals),
+        },
+        "scenarios": scenarios,
+    }
+
+
+def compare_results(current, baseline, metrics=COMPARED_METRICS):
+    """
+    2つの結果をシナリオ名ごとに比べて、(シナリオ, 項目, 前回, 今回, 変化率, 良くなったか) のリストを返す。
+    片方にしか無いシナリオは比べない。
+    """
+    previous = {scenario["name"]: scenario for scenario in baseline["scenarios"]}
+    rows = []
+    for scenario in current["scenarios"]:
+        before = previous.get(scenario["name"])
+        if before is None:
+            continue
+        for metric, higher_is_better in metrics.items():
+            old, new = before.get(metric), scenario.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            improved = new > old if higher_is_better else new < old
+            rows.append((scenario["name"], metric, old, new, change, improved))
+    return rows
+
+
+def environment_info(vad_service=None):
+    """結果を比べるときに必要な実行環境（コミット・バージョン・CPU数）"""
+    return {
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "vad_backend": getattr(getattr(vad_service, "backend", None), "name", None),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _rss_high_water_mb():
+    """プロセスの最大常駐メモリ（MB）。Linuxはキロバイト、macOSはバイトで返ってくる"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
@@ -0,0 +1,53 @@
+# benchmarks/scoring.py
+
+import numpy as np
+
+
+def _mask(intervals, duration, resolution):
+    """区間のリストを resolution 秒刻みの発話マスクにする"""
+    n = int(np.ceil(duration / resolution))
+    mask = np.zeros(n, dtype=bool)
+    for start, end in intervals:
+        mask[max(int(start / resolution), 0):min(int(np.ceil(end / resolution)), n)] = True
+    return mask
+
+
+def score_segmentation(detected, reference, duration, resolution=0.01):
+    """
+    切り出した区間を正解区間と比べる。
+    - frame_*: resolution 秒刻みで発話かどうかを比べた適合率・再現率・F1
+    - segment_recall: 正解の発話のうち、どれかの区間と重なっていた割合（取りこぼしの少なさ）
+    - false_segments: どの正解とも重ならない区間の数（物音などでの誤検出）
+    - fragmentation: 正解1つあたりに重なった区間の数の平均（1より大きいと発話が細切れ）
+    """
+    detected_mask = _mask(detected, duration, resolution)
+    reference_mask = _mask(reference, duration, resolution)
+    true_positive = np.count_nonzero(detected_mask & reference_mask)
+    precision = true_positive / max(np.count_nonzero(detected_mask), 1)
+    recall = true_positive / max(np.count_nonzero(reference_mask), 1)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    def overlaps(a, b):
+        return a[0] < b[1] and b[0] < a[1]
+
+    hits = [sum(1 for d in detected if overlaps(d, r)) for r in reference]
+    false_segments = sum(1 for d in detected if not any(overlaps(d, r) for r in reference))
+    found = [n for n in hits if n]
+    return {
+        "frame_precision": float(precision),
+        "frame_recall": float(recall),
+        "frame_f1": float(f1),
+        "segment_recall": len(found) / len(reference) if reference else 1.0,
+        "false_segments": false_segments,
+        "fragmentation": float(np.mean(found)) if found else 0.0,
+        "detected_segments": len(detected),
+        "reference_segments": len(reference),
+    }
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """値のリストの分位点を {"p50": ..., ...} にする（値が無ければNone）"""
+    if not values:
+        return {f"p{p}": None for p in points}
+    result = np.percentile(np.asarray(values, dtype=np.float64), points)
+    return {f"p{p}": float(v) for p, v in zip(points, result)}
@@ -0,0 +1,31 @@
+# benchmarks/stub_services.py
+
+import threading
+import time
+
+import numpy as np
+
+
+class StubRecognitionService:
+    """
+    APIを呼ばない音声認識サービスの代わり。決まった遅延（とばらつき）だけ待って、音声の長さを文字列で返すわ。
+    ネットワークや課金に左右されずに、認識待ちを含めたパイプラインの遅延を測るために使う。
+    """
+
+    language = "ja-JP"
+    model_name = "stub"
+
+    def __init__(self, latency=0.05, jitter=0.0, seed=0):
+        self.latency = latency  # 1リクエストの遅延（秒）
+        self.jitter = jitter    # 遅延のばらつき（標準偏差、秒）
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._rng.normal(0.0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return f"{len(audio_data) / sample_rate:.2f}s"
@@ -1,3 +1,6 @@
+from .audio_buffer import AudioRingBuffer, BlockRingBuffer, SegmentBuffer
+from .energy_gate import EnergyGate
+from .phrase_matcher import AhoCorasick, PhraseMatch, PhraseMatcher, normalize_text
+from .resampler import AudioConverter, ChannelMixer, PolyphaseResampler, resample
 from .vad_service import VADService
 from .wakeword_detector import WakewordDetector
-
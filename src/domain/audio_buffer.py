@@ -0,0 +1,277 @@
+# domain/audio_buffer.py
+
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    事前確保したNumPy配列によるリングバッファ。
+    音声区間開始前のプリロールを、最新 capacity サンプル分だけ保持するわ。
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        self.capacity = max(int(capacity), 0)
+        self._buffer = np.zeros(self.capacity, dtype=dtype)
+        self._end = 0   # 次に書き込む位置
+        self._size = 0  # 保持しているサンプル数
+
+    def __len__(self):
+        return self._size
+
+    def append(self, chunk: np.ndarray):
+        """チャンクを追記する。容量を超えた分は古い方から上書きする"""
+        if self.capacity == 0:
+            return
+        chunk = chunk.reshape(-1)
+        n = chunk.size
+        if n >= self.capacity:
+            # 容量以上なら末尾だけを先頭から詰め直す
+            self._buffer[:] = chunk[n - self.capacity:]
+            self._end = 0
+            self._size = self.capacity
+            return
+
+        first = min(n, self.capacity - self._end)
+        self._buffer[self._end:self._end + first] = chunk[:first]
+        self._buffer[:n - first] = chunk[first:]
+        self._end = (self._end + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def get(self) -> np.ndarray:
+        """
+        保持している音声を古い順に返す。
+        折り返していなければコピーせずビューを返すわ。
+        """
+        start = (self._end - self._size) % self.capacity if self.capacity else 0
+        if start + self._size <= self.capacity:
+            return self._buffer[start:start + self._size]
+        return np.concatenate((self._buffer[start:], self._buffer[:self._end]))
+
+    def clear(self):
+        """保持している音声を破棄する"""
+        self._end = 0
+        self._size = 0
+
+
+class SegmentBuffer:
+    """
+    音声区間を連続したメモリに溜めていく可変長バッファ。
+    容量は倍々で確保するから追記は償却O(1)で、最大長を超えた分は受け付けないわ。
+    """
+
+    def __init__(self, initial_capacity: int = 16000, max_samples: int = None, dtype=np.float32):
+        self.initial_capacity = max(int(initial_capacity), 1)
+        self.max_samples = max_samples
+        self.dtype = dtype
+        self._buffer = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def is_full(self) -> bool:
+        """最大長に達しているかどうか"""
+        return self.max_samples is not None and self._size >= self.max_samples
+
+    def append(self, chunk: np.ndarray) -> int:
+        """チャンクを追記し、実際に追記できたサンプル数を返す"""
+        chunk = chunk.reshape(-1)
+        n = chunk.size
+        if self.max_samples is not None:
+            n = min(n, self.max_samples - self._size)
+        if n <= 0:
+            return 0
+
+        self._reserve(self._size + n)
+        self._buffer[self._size:self._size + n] = chunk[:n]
+        self._size += n
+        return n
+
+    def view(self) -> np.ndarray:
+        """溜まっている音声をコピーせずに返す"""
+        if self._buffer is None:
+            return np.zeros(0, dtype=self.dtype)
+        return self._buffer[:self._size]
+
+    def detach(self) -> np.ndarray:
+        """
+        溜まっている音声をビューのまま取り出し、バッファを空にする。
+        取り出した配列の領域は以後上書きされないから、呼び出し側がそのまま持っていていいわ。
+        """
+        audio = self.view()
+        self._buffer = None
+        self._size = 0
+        return audio
+
+    def truncate(self, size: int):
+        """先頭から size サンプルだけ残して、後ろを捨てる"""
+        self._size = min(max(int(size), 0), self._size)
+
+    def clear(self):
+        """溜まっている音声を破棄する（領域は再利用する）"""
+        self._size = 0
+
+    def _reserve(self, required: int):
+        """required サンプルが入るように容量を倍々で確保する"""
+        if self._buffer is None:
+            capacity = self.initial_capacity
+        elif required <= self._buffer.size:
+            return
+        else:
+            capacity = self._buffer.size
+        while capacity < required:
+            capacity *= 2
+        if self.max_samples is not None:
+            capacity = min(capacity, max(self.max_samples, required))
+
+        new_buffer = np.empty(capacity, dtype=self.dtype)
+        if self._buffer is not None:
+            new_buffer[:self._size] = self._buffer[:self._size]
+        self._buffer = new_buffer
+
+
+class BlockRingBuffer:
+    """
+    録音コールバックと処理ループの間に置く、事前確保した固定長ブロックのリングバッファ。
+    書き込むのはコールバック（1スレッド）、読むのは処理ループ（1スレッド）だけという前提で、ロックを取らないわ。
+    - 書き込み側は _head、読み出し側は _tail だけを進める
+    - スロットごとの通し番号 _seq で、読んでいる途中に上書きされたブロックを見分ける
+    満杯のときの振る舞いは policy で決める。
+    - "drop_oldest": 一番古いブロックを上書きする（遅れても最新の音声を優先）
+    - "drop_newest": 新しいブロックを捨てる（取りこぼしは最新側に寄せる）
+    - "degrade":     drop_oldest と同じだが、溜まり具合を見て処理側がVADを軽くして追いつく（AudioController側で判断）
+    """
+
+    POLICIES = ("drop_oldest", "drop_newest", "degrade")
+
+    def __init__(self, capacity=256, block_size=512, channels=1, dtype=np.float32, policy="drop_oldest", ready=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"BlockRingBuffer: 満杯時の方針は {', '.join(self.POLICIES)} のどれかにしてちょうだい")
+        self.capacity = max(int(capacity), 1)
+        self.block_size = int(block_size)
+        self.channels = int(channels)
+        self.policy = policy
+        self._blocks = np.zeros((self.capacity, self.block_size, self.channels), dtype=dtype)
+        self._lengths = np.zeros(self.capacity, dtype=np.int64)
+        self._timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self._seq = np.full(self.capacity, -1, dtype=np.int64)  # スロットに入っているブロックの通し番号（書き込み中は-1）
+        self._head = 0  # 次に書き込むブロックの通し番号（書き込み側だけが進める）
+        self._tail = 0  # 次に読むブロックの通し番号（読み出し側だけが進める）
+        # 書き込みを知らせるイベント（複数のリングを1つの読み出しループで待つときは共有する）
+        self._ready = ready or threading.Event()
+        # 書き込み側の統計
+        self._written_blocks = 0
+        self._written_samples = 0
+        self._dropped_newest_blocks = 0
+        self._dropped_newest_samples = 0
+        self._overflows = 0
+        # 読み出し側の統計
+        self._read_blocks = 0
+        self._overwritten_blocks = 0
+        self._peak_backlog = 0
+
+    def __len__(self):
+        """溜まっているブロック数（上書きで失われた分は含めない）"""
+        return min(self._head - self._tail, self.capacity)
+
+    def write(self, block: np.ndarray, timestamp: float = 0.0) -> int:
+        """
+        (フレーム数, チャンネル数) のブロックを書き込み、書き込めたフレーム数を返す。
+        block_size より長いブロックは複数のスロットに分けて入れる。
+        """
+        block = block.reshape(len(block), -1)
+        written = 0
+        for start in range(0, len(block), self.block_size):
+            piece = block[start:start + self.block_size]
+            n = len(piece)
+            if self.policy == "drop_newest" and self._head - self._tail >= self.capacity:
+                self._dropped_newest_blocks += 1
+                self._dropped_newest_samples += n
+                continue
+            slot = self._head % self.capacity
+            self._seq[slot] = -1
+            self._blocks[slot, :n] = piece
+            self._lengths[slot] = n
+            self._timestamps[slot] = timestamp
+            self._seq[slot] = self._head
+            self._head += 1
+            self._written_blocks += 1
+            self._written_samples += n
+            written += n
+        self._ready.set()
+        return written
+
+    def record_overflow(self):
+        """デバイス側（PortAudio）で入力があふれたことを記録する"""
+        self._overflows += 1
+
+    def wake(self):
+        """read() で待っている読み出し側を起こす"""
+        self._ready.set()
+
+    def read(self, timeout=None):
+        """
+        溜まっているブロックをまとめて取り出し、(音声, ブロックごとの書き込み時刻のリスト) を返す。
+        音声は (フレーム数, チャンネル数) の新しい配列。何も無ければ timeout 秒まで待って、無ければ空配列を返す。
+        timeout=None なら待たない（共有したイベントを呼び出し側で待つとき用）。
+        """
+        if timeout is not None:
+            if self._head == self._tail:
+                self._ready.wait(timeout)
+            self._ready.clear()
+
+        head = self._head
+        tail = max(self._tail, head - self.capacity)
+        overwritten = tail - self._tail
+        self._peak_backlog = max(self._peak_backlog, head - self._tail)
+
+        indices = range(tail, head)
+        slots = [i % self.capacity for i in indices]
+        lengths = [int(self._lengths[slot]) for slot in slots]
+        audio = np.empty((sum(lengths), self.channels), dtype=self._blocks.dtype)
+        timestamps = []
+        position = 0
+        keep = np.ones(len(audio), dtype=bool)
+        for i, slot, n in zip(indices, slots, lengths):
+            before = self._seq[slot]
+            audio[position:position + n] = self._blocks[slot, :n]
+            timestamp = self._timestamps[slot]
+            # コピーの前後で通し番号が変わっていたら、読んでいる間に上書きされている
+            if before != i or self._seq[slot] != i:
+                keep[position:position + n] = False
+                overwritten += 1
+            else:
+                timestamps.append(float(timestamp))
+            position += n
+
+        self._tail = head
+        self._overwritten_blocks += overwritten
+        self._read_blocks += len(timestamps)
+        if not keep.all():
+            audio = audio[keep]
+        return audio, timestamps
+
+    def get_stats(self):
+        """
+        書き込み・読み出し・取りこぼしの統計を返す。
+        上書きで失ったブロックの長さは分からないから、dropped_samples はそれを block_size で数える。
+        """
+        # まだ読みに来ていないが、もう上書きされてしまった分も含める
+        overwritten = self._overwritten_blocks + max(self._head - self._tail - self.capacity, 0)
+        dropped_blocks = self._dropped_newest_blocks + overwritten
+        dropped_samples = self._dropped_newest_samples + overwritten * self.block_size
+        return {
+            "policy": self.policy,
+            "capacity": self.capacity,
+            "backlog": len(self),
+            "peak_backlog": min(self._peak_backlog, self.capacity),
+            "written_blocks": self._written_blocks,
+            "written_samples": self._written_samples,
+            "read_blocks": self._read_blocks,
+            "dropped_blocks": dropped_blocks,
+            "dropped_samples": dropped_samples,
+            "overflows": self._overflows,
+        }
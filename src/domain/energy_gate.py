@@ -0,0 +1,123 @@
+# domain/energy_gate.py
+
+import numpy as np
+
+
+class EnergyGateState:
+    """
+    ストリームごとのゲートの状態。
+    マイクごとに背景ノイズの大きさは違うから、ノイズフロアはストリーム単位で追いかけるわ。
+    """
+
+    def __init__(self, noise_floor: float):
+        self.noise_floor = noise_floor  # 推定した背景ノイズのRMS
+        self.hangover_left = 0          # 通過後、あと何窓を無条件で通すか
+        self.is_open = False            # 直前の窓を通したかどうか
+
+
+class EnergyGate:
+    """
+    ニューラルVADの前に置く、軽い一次判定。
+    窓ごとのRMS・ピーク・ゼロ交差率をNumPyでまとめて計算し、
+    明らかに無音（またはサーッというノイズ）な窓はSileroモデルに渡さずに落とすわ。
+
+    - ピークが min_amplitude 未満の窓は落とす（デジタル無音など）
+    - RMSがノイズフロアの snr_ratio 倍未満の窓は落とす
+    - ゼロ交差率が max_zcr を超える窓（ヒスノイズ寄り）は、さらに noisy_ratio 倍の余裕を求める
+    - 一度通したら hangover_windows 窓は続けて通す（語尾の弱い子音を切らないため）
+    ノイズフロアは、呼び出しごとの一番静かな窓のRMSに向かって、下がるときは速く・上がるときはゆっくり追従する。
+    """
+
+    def __init__(
+        self,
+        min_amplitude=0.01,      # これ未満のピークは無音扱い
+        snr_ratio=2.0,           # ノイズフロアに対して必要なRMSの倍率
+        max_zcr=0.25,            # これを超えるゼロ交差率はノイズ寄りとみなす
+        noisy_ratio=2.0,         # ノイズ寄りの窓に追加で求めるRMSの倍率
+        hangover_windows=8,      # 通過後に続けて通す窓数
+        initial_noise_floor=0.003,  # ノイズフロアの初期値（RMS）
+        floor_rise_rate=0.05,    # ノイズフロアが上がるときの追従率（0〜1）
+        max_noise_floor=0.05     # ノイズフロアの上限（話し続けても発話を背景と見なさないように）
+    ):
+        self.min_amplitude = min_amplitude
+        self.snr_ratio = snr_ratio
+        self.max_zcr = max_zcr
+        self.noisy_ratio = noisy_ratio
+        self.hangover_windows = hangover_windows
+        self.initial_noise_floor = initial_noise_floor
+        self.floor_rise_rate = floor_rise_rate
+        self.max_noise_floor = max_noise_floor
+        self.reset_stats()
+
+    def create_state(self) -> EnergyGateState:
+        return EnergyGateState(self.initial_noise_floor)
+
+    def reset_stats(self):
+        self.stats = {
+            "windows": 0,          # 判定した窓数
+            "passed": 0,           # モデルに渡した窓数
+            "skipped_quiet": 0,    # 振幅・エネルギー不足で落とした窓数
+            "skipped_noisy": 0,    # ゼロ交差率が高く、エネルギーも足りずに落とした窓数
+        }
+
+    def get_stats(self):
+        """判定の統計を返す（skip_ratio はモデルを呼ばずに済んだ窓の割合）"""
+        stats = dict(self.stats)
+        windows = stats["windows"]
+        stats["skipped"] = windows - stats["passed"]
+        stats["skip_ratio"] = stats["skipped"] / windows if windows else 0.0
+        return stats
+
+    @staticmethod
+    def features(frames: np.ndarray):
+        """(窓数, 窓サイズ) の配列から、窓ごとの (RMS, ピーク, ゼロ交差率) を返す"""
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        peak = np.max(np.abs(frames), axis=1)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(frames.shape[1] - 1, 1)
+        return rms, peak, zcr
+
+    def apply(self, frames: np.ndarray, state: EnergyGateState) -> np.ndarray:
+        """
+        窓ごとにモデルへ渡すかどうかを判定し、boolの配列を返す。
+        判定には呼び出し前のノイズフロアを使い、ノイズフロアの更新は呼び出しの最後に1回だけ行うわ。
+        """
+        n = len(frames)
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+
+        rms, peak, zcr = self.features(frames)
+        required = state.noise_floor * self.snr_ratio
+        noisy = zcr > self.max_zcr
+        loud = peak >= self.min_amplitude
+        energetic = rms >= np.where(noisy, required * self.noisy_ratio, required)
+        passed = loud & energetic
+
+        # 通過した窓から hangover_windows 窓先までを通す（前回の呼び出しの持ち越し分も含む）
+        mask = passed.copy()
+        if self.hangover_windows > 0:
+            hangover = np.convolve(passed.astype(np.int32), np.ones(self.hangover_windows + 1, dtype=np.int32))[:n]
+            mask |= hangover > 0
+        mask[:min(state.hangover_left, n)] = True
+
+        passed_idx = np.flatnonzero(passed)
+        if passed_idx.size:
+            state.hangover_left = max(self.hangover_windows - (n - 1 - passed_idx[-1]), 0)
+        else:
+            state.hangover_left = max(state.hangover_left - n, 0)
+        state.is_open = bool(mask[-1])
+
+        # ノイズフロアを、この呼び出しで一番静かな窓に寄せる
+        quietest = float(rms.min())
+        if quietest < state.noise_floor:
+            state.noise_floor = quietest
+        else:
+            state.noise_floor += self.floor_rise_rate * (quietest - state.noise_floor)
+        state.noise_floor = min(state.noise_floor, self.max_noise_floor)
+
+        skipped = ~mask
+        self.stats["windows"] += n
+        self.stats["passed"] += int(np.count_nonzero(mask))
+        self.stats["skipped_noisy"] += int(np.count_nonzero(skipped & noisy & loud))
+        self.stats["skipped_quiet"] += int(np.count_nonzero(skipped & ~(noisy & loud)))
+        return mask
@@ -0,0 +1,356 @@
+# domain/phrase_matcher.py
+
+import unicodedata
+from collections import deque
+
+
+# ひらがなはカタカナに寄せる（ゝゞ も ヽヾ に）
+_KANA_FOLD = {code: code + 0x60 for code in list(range(0x3041, 0x3097)) + [0x309D, 0x309E]}
+
+# 読み比べに使わない文字の種類（句読点・空白・制御文字）
+_IGNORED_CATEGORIES = ("P", "Z", "C")
+
+# カナとヘボン式ローマ字の対応（2文字の拗音を先に引く）
+_ROMAJI_ROWS = [
+    ("", "アイウエオ"), ("k", "カキクケコ"), ("s", "サシスセソ"), ("t", "タチツテト"), ("n", "ナニヌネノ"),
+    ("h", "ハヒフヘホ"), ("m", "マミムメモ"), ("r", "ラリルレロ"), ("g", "ガギグゲゴ"), ("z", "ザジズゼゾ"),
+    ("d", "ダヂヅデド"), ("b", "バビブベボ"), ("p", "パピプペポ"),
+]
+_ROMAJI_EXCEPTIONS = {"シ": "shi", "チ": "chi", "ツ": "tsu", "フ": "fu", "ジ": "ji", "ヂ": "ji", "ヅ": "zu"}
+_ROMAJI_DIGRAPH_HEADS = {"キ": "ky", "シ": "sh", "チ": "ch", "ニ": "ny", "ヒ": "hy", "ミ": "my", "リ": "ry",
+                         "ギ": "gy", "ジ": "j", "ヂ": "j", "ビ": "by", "ピ": "py"}
+
+
+def _build_kana_to_romaji():
+    table = {}
+    for consonant, row in _ROMAJI_ROWS:
+        for kana, vowel in zip(row, "aiueo"):
+            table[kana] = _ROMAJI_EXCEPTIONS.get(kana, consonant + vowel)
+    table.update({"ヤ": "ya", "ユ": "yu", "ヨ": "yo", "ワ": "wa", "ヲ": "o", "ン": "n", "ヴ": "vu"})
+    for small, normal in zip("ァィゥェォャュョヮ", "アイウエオヤユヨワ"):
+        table[small] = table[normal]
+    for head, prefix in _ROMAJI_DIGRAPH_HEADS.items():
+        for small, vowel in zip("ャュョ", "auo"):
+            table[head + small] = prefix + vowel
+    for head, consonant in (("フ", "f"), ("ヴ", "v"), ("ウ", "w")):
+        for small, vowel in zip("ァィェォ", "aieo"):
+            table[head + small] = consonant + vowel
+    return table
+
+
+_KANA_TO_ROMAJI = _build_kana_to_romaji()
+
+# ローマ字からカナへ。同じ綴りは表の先にある方（ジ・ズ・オ）を使い、訓令式の綴りも受け付ける
+_ROMAJI_TO_KANA = {}
+for _kana, _romaji in _KANA_TO_ROMAJI.items():
+    if _kana[-1] not in "ァィゥェォャュョヮ" or len(_kana) == 2:
+        _ROMAJI_TO_KANA.setdefault(_romaji, _kana)
+_ROMAJI_TO_KANA.update({"si": "シ", "ti": "チ", "tu": "ツ", "hu": "フ", "zi": "ジ", "di": "ヂ", "du": "ヅ",
+                        "wo": "ヲ", "sya": "シャ", "syu": "シュ", "syo": "ショ", "tya": "チャ", "tyu": "チュ",
+                        "tyo": "チョ", "zya": "ジャ", "zyu": "ジュ", "zyo": "ジョ", "jya": "ジャ", "jyu": "ジュ",
+                        "jyo": "ジョ"})
+del _kana, _romaji
+
+# これより短いローマ字・カナの読み替えは足さない（"ai" が英文の中の said に当たるような誤検出を避ける）
+MIN_VARIANT_LENGTH = 3
+
+
+def normalize_text(text: str, ignore_punctuation: bool = True):
+    """
+    照合用に文字列を正規化する。NFKCで全角・半角をそろえ、大文字小文字を畳み、ひらがなをカタカナに寄せるわ。
+    ignore_punctuation=True なら句読点と空白を落とす（「アウラ、」や「ア ウ ラ」も同じになる）。
+    戻り値は (正規化した文字列, 各文字の元の文字列での位置) で、見つけた位置を元の文字列に戻すのに使う。
+    """
+    chars, positions = [], []
+    for index, ch in enumerate(text):
+        for c in unicodedata.normalize("NFKC", ch).casefold():
+            category = unicodedata.category(c)
+            if category[0] == "M":
+                # 半角カナの濁点などは、前の文字と合成できれば合成する（できなければ落とす）
+                if chars:
+                    composed = unicodedata.normalize("NFC", chars[-1] + c)
+                    if len(composed) == 1:
+                        chars[-1] = composed.translate(_KANA_FOLD)
+                continue
+            if ignore_punctuation and category[0] in _IGNORED_CATEGORIES:
+                continue
+            chars.append(c.translate(_KANA_FOLD))
+            positions.append(index)
+    return "".join(chars), positions
+
+
+def to_romaji(kana: str):
+    """正規化済みのカナをヘボン式のローマ字にする。カナ以外（漢字など）が混ざっていれば None"""
+    result = []
+    i = 0
+    geminate = False
+    while i < len(kana):
+        if kana[i] == "ッ":
+            geminate = True
+            i += 1
+            continue
+        if kana[i] == "ー":  # 長音は綴らない（ラーメン → ramen）
+            i += 1
+            continue
+        syllable = _KANA_TO_ROMAJI.get(kana[i:i + 2]) if i + 1 < len(kana) else None
+        if syllable is not None:
+            i += 2
+        else:
+            syllable = _KANA_TO_ROMAJI.get(kana[i])
+            if syllable is None:
+                return None
+            i += 1
+        if geminate:
+            syllable = ("t" if syllable.startswith("ch") else syllable[0]) + syllable
+            geminate = False
+        result.append(syllable)
+    return "".join(result)
+
+
+def to_kana(romaji: str):
+    """ローマ字（空白区切りの単語）をカタカナにする。読めない綴りが混ざっていれば None"""
+    words = romaji.split()
+    if not words:
+        return None
+    result = []
+    for word in words:
+        i = 0
+        while i < len(word):
+            c, following = word[i], word[i + 1:i + 2]
+            if c == "n" and following not in ("a", "i", "u", "e", "o", "y"):
+                # 子音の前と語末の n は「ン」。nn の後に母音が無ければ2文字で「ン」
+                result.append("ン")
+                i += 2 if following == "n" and word[i + 2:i + 3] not in ("a", "i", "u", "e", "o", "y") else 1
+                continue
+            if c == following and c not in "aiueo" or (c == "t" and word[i + 1:i + 3] == "ch"):
+                result.append("ッ")
+                i += 1
+                continue
+            for length in (3, 2, 1):
+                kana = _ROMAJI_TO_KANA.get(word[i:i + length])
+                if kana is not None:
+                    result.append(kana)
+                    i += length
+                    break
+            else:
+                return None
+    return "".join(result)
+
+
+class PhraseMatch:
+    """見つけたフレーズ。start/end と text は元の（正規化する前の）文字列での位置と中身"""
+
+    def __init__(self, phrase, value, start: int, end: int, text: str, distance: int = 0):
+        self.phrase = phrase      # 登録したフレーズ
+        self.value = value        # フレーズに結び付けた値（コマンド名など。無ければフレーズ自身）
+        self.start = start
+        self.end = end
+        self.text = text
+        self.distance = distance  # 編集距離（完全一致なら0）
+
+    def __eq__(self, other):
+        return isinstance(other, PhraseMatch) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return (f"PhraseMatch({self.phrase!r}, start={self.start}, end={self.end}, "
+                f"text={self.text!r}, distance={self.distance})")
+
+
+class AhoCorasick:
+    """
+    複数の文字列を一度に探すオートマトン（Aho-Corasick法）。
+    文字列の数がいくつあっても、テキストを1回なめるだけで全部の出現位置がわかるわ。
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                child = self.goto[node].get(ch)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][ch] = child
+                node = child
+            self.output[node].append(pattern_id)
+
+        # 浅い節点から順に、一致に失敗したときの戻り先と、そこで見つかる文字列をつないでおく
+        goto, fail, output = self.goto, self.fail, self.output
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                fallback = fail[node]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(ch, 0)
+                if target == child:
+                    continue
+                fail[child] = target
+                if output[target]:
+                    output[child] = output[child] + output[target]
+
+    def iter(self, text: str):
+        """(終わりの位置, 文字列の番号) を見つけた順に返す"""
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for index, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern_id in output[node]:
+                yield index + 1, pattern_id
+
+
+class PhraseMatcher:
+    """
+    たくさんのフレーズ（ウェイクワードやコマンド）を、認識結果の中から一度に探すクラス。
+    作るときにフレーズを正規化して1つのAho-Corasickオートマトンにまとめるから、
+    探す時間はフレーズの数ではなく認識結果の長さで決まるわ。
+
+    - 全角・半角、大文字小文字、ひらがな・カタカナの違いは無視する（normalize_text）
+    - romaji=True なら、カナのフレーズはローマ字でも、ローマ字のフレーズはカナでも当たる
+    - max_distance > 0 なら、編集距離がそれ以下の言い間違い・誤認識も当てる（あいまい一致）。
+      フレーズを max_distance+1 個に割った断片のどれかは必ずそのまま現れるから、
+      断片が当たったところだけ編集距離を計算する。短いフレーズほど誤検出しやすいので、
+      許す距離は (長さ-1)//3 まで（3文字以下は完全一致だけ）にしている
+    phrases は文字列のリストか、{フレーズ: 値} の辞書（値はコマンド名など、見つけたときに返すもの）。
+    """
+
+    def __init__(self, phrases, max_distance: int = 0, romaji: bool = True, ignore_punctuation: bool = True):
+        items = phrases.items() if hasattr(phrases, "items") else ((phrase, phrase) for phrase in phrases)
+        self.phrases = []             # (フレーズ, 値)
+        self.max_distance = max(int(max_distance), 0)
+        self.romaji = romaji
+        self.ignore_punctuation = ignore_punctuation
+
+        self._variants = []           # (正規化した綴り, フレーズの番号, 許す編集距離)
+        seen = set()
+        for phrase, value in items:
+            phrase_index = len(self.phrases)
+            self.phrases.append((phrase, value))
+            for variant in self._spell_variants(phrase):
+                if (variant, phrase_index) not in seen:
+                    seen.add((variant, phrase_index))
+                    distance = min(self.max_distance, (len(variant) - 1) // 3)
+                    self._variants.append((variant, phrase_index, distance))
+
+        # オートマトンに入れる文字列と、その正体（綴りの番号, 綴りの中での断片の位置。完全一致なら None）
+        patterns, self._keys = [], []
+        for variant_index, (variant, _, distance) in enumerate(self._variants):
+            patterns.append(variant)
+            self._keys.append((variant_index, None))
+            if distance:
+                bounds = [len(variant) * i // (distance + 1) for i in range(distance + 2)]
+                for start, end in zip(bounds[:-1], bounds[1:]):
+                    patterns.append(variant[start:end])
+                    self._keys.append((variant_index, start))
+        self._automaton = AhoCorasick(patterns)
+        self._pattern_lengths = [len(pattern) for pattern in patterns]
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _spell_variants(self, phrase):
+        """フレーズの照合用の綴り（正規化したもの、ローマ字・カナの読み替え）"""
+        normalized, _ = normalize_text(phrase, self.ignore_punctuation)
+        if not normalized:
+            return []
+        variants = [normalized]
+        if self.romaji:
+            # ローマ字の単語はカナに、カナはローマ字に読み替える（単語の区切りを使うので空白を落とす前に）
+            alternative = to_kana(unicodedata.normalize("NFKC", phrase).casefold()) or to_romaji(normalized)
+            if alternative and len(alternative) >= MIN_VARIANT_LENGTH and alternative != normalized:
+                variants.append(alternative)
+        return variants
+
+    def find_all(self, text: str, overlapping: bool = False):
+        """
+        text の中で見つけたフレーズを、位置の順に PhraseMatch のリストで返す。
+        overlapping=False なら、重なるものは編集距離の小さい方、同じなら長い方だけを残す（コマンドの振り分け向け）。
+        overlapping=True なら、別のフレーズ同士の重なりは全部返す。
+        """
+        if not text or not self._variants:
+            return []
+        normalized, positions = normalize_text(text, self.ignore_punctuation)
+
+        found = {}        # (フレーズの番号, 始まり, 終わり) → 編集距離
+        candidates = set()  # あいまい一致を確かめる (綴りの番号, 綴りが始まっていそうな位置)
+        for end, pattern_id in self._automaton.iter(normalized):
+            variant_index, offset = self._keys[pattern_id]
+            start = end - self._pattern_lengths[pattern_id]
+            if offset is None:
+                found[(self._variants[variant_index][1], start, end)] = 0
+            else:
+                candidates.add((variant_index, start - offset))
+
+        for variant_index, anchor in candidates:
+            variant, phrase_index, distance = self._variants[variant_index]
+            low = max(anchor - distance, 0)
+            high = min(anchor + len(variant) + distance, len(normalized))
+            alignment = _best_alignment(variant, normalized, low, high, distance)
+            if alignment is not None:
+                cost, start, end = alignment
+                key = (phrase_index, start, end)
+                found[key] = min(found.get(key, cost), cost)
+
+        # 重なりの少ない方から良いものを取る（同じフレーズの重なりは常に1つにまとめる）
+        ranked = sorted(found.items(), key=lambda item: (item[1], item[0][1] - item[0][2], item[0][1]))
+        taken = []
+        for (phrase_index, start, end), cost in ranked:
+            if any(start < other_end and other_start < end and (not overlapping or other_index == phrase_index)
+                   for other_index, other_start, other_end, _ in taken):
+                continue
+            taken.append((phrase_index, start, end, cost))
+
+        matches = []
+        for phrase_index, start, end, cost in sorted(taken, key=lambda match: (match[1], match[2])):
+            phrase, value = self.phrases[phrase_index]
+            original_start, original_end = positions[start], positions[end - 1] + 1
+            matches.append(PhraseMatch(phrase, value, original_start, original_end,
+                                       text[original_start:original_end], cost))
+        return matches
+
+    def search(self, text: str):
+        """一番前で見つけたフレーズを返す（無ければ None）"""
+        matches = self.find_all(text)
+        return matches[0] if matches else None
+
+
+def _best_alignment(pattern: str, text: str, low: int, high: int, max_distance: int):
+    """
+    text[low:high] の中で pattern に一番近い部分を探す（始まりと終わりは自由な編集距離のDP）。
+    編集距離が max_distance 以下なら (距離, 始まり, 終わり) を返す。同じ距離なら前から始まる長い方を選ぶわ。
+    """
+    size = len(pattern)
+    costs = list(range(size + 1))
+    starts = [low] * (size + 1)
+    best = None
+    for position in range(low, high):
+        ch = text[position]
+        new_costs = [0] * (size + 1)
+        new_starts = [position + 1] * (size + 1)
+        for j in range(1, size + 1):
+            cost, start = costs[j - 1] + (pattern[j - 1] != ch), starts[j - 1]
+            if costs[j] + 1 < cost:
+                cost, start = costs[j] + 1, starts[j]
+            if new_costs[j - 1] + 1 < cost:
+                cost, start = new_costs[j - 1] + 1, new_starts[j - 1]
+            new_costs[j], new_starts[j] = cost, start
+        costs, starts = new_costs, new_starts
+        end = position + 1
+        if costs[size] <= max_distance and end > starts[size]:
+            candidate = (costs[size], starts[size], -end)
+            if best is None or candidate < best:
+                best = candidate
+    if best is None:
+        return None
+    return best[0], best[1], -best[2]
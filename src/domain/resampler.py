@@ -0,0 +1,207 @@
+# domain/resampler.py
+
+import itertools
+from math import gcd
+
+import numpy as np
+
+
+def design_lowpass(up: int, down: int, zero_crossings: int = 16, rolloff: float = 0.94,
+                   beta: float = 8.6) -> np.ndarray:
+    """
+    up倍して down分の1にするときの低域通過フィルタ（カイザー窓付きsinc）。
+    低い方のナイキスト周波数の rolloff 倍で切り、片側 zero_crossings 個のゼロ交差まで持つわ。
+    up倍の補間で下がる振幅を戻すため、係数は up 倍してある。
+    """
+    factor = max(up, down)
+    cutoff = rolloff / (2.0 * factor)  # アップサンプル後の1サンプルあたりの周期数
+    length = 2 * zero_crossings * factor + 1
+    n = np.arange(length) - (length - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+    return (taps * up).astype(np.float64)
+
+
+class PolyphaseResampler:
+    """
+    ブロックごとに呼べる、状態付きのポリフェーズ・リサンプラ。
+    up/down（48000→16000なら 1/3、44100→16000なら 160/441）の有理数倍で変換し、
+    出力1サンプルあたり taps_per_phase 回の積和だけを計算するわ（アップサンプルした0は掛けない）。
+    ブロックの境目で途切れないように、直前の入力をフィルタ長だけ持ち越す。
+    同じ入力なら、どう区切って渡しても1回でまとめて渡したのと同じ出力になる。
+    出力はフィルタの分だけ delay サンプル遅れる（最後は flush() で押し出す）。
+    """
+
+    def __init__(self, input_rate: int, output_rate: int, zero_crossings: int = 16, rolloff: float = 0.94):
+        if input_rate <= 0 or output_rate <= 0:
+            raise ValueError(f"PolyphaseResampler: サンプルレートは正の整数にしてちょうだい: {input_rate} → {output_rate}")
+        divisor = gcd(int(input_rate), int(output_rate))
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        self.up = self.output_rate // divisor
+        self.down = self.input_rate // divisor
+
+        # フィルタを位相ごとに並べ替えた表。phases[p, k] は入力の k サンプル前に掛ける係数
+        taps = design_lowpass(self.up, self.down, zero_crossings, rolloff)
+        self.taps_per_phase = -(-len(taps) // self.up)
+        padded = np.zeros(self.taps_per_phase * self.up)
+        padded[:len(taps)] = taps
+        self.phases = padded.reshape(self.taps_per_phase, self.up).T.astype(np.float32)
+        # フィルタの中心までの遅れ（出力サンプル数）
+        self.delay = (len(taps) - 1) / 2 / self.down
+        self.reset()
+
+    def reset(self):
+        """持ち越しを捨てて、無音が続いていた状態に戻す"""
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._consumed = 0   # これまでに受け取った入力サンプル数
+        self._produced = 0   # これまでに出した出力サンプル数
+
+    def output_length(self, n_input: int) -> int:
+        """あと n_input サンプル渡したときに出てくる出力サンプル数"""
+        total = self._consumed + n_input
+        return max(-(-total * self.up // self.down) - self._produced, 0)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """1ブロック分（モノラル）を変換して、出せるだけの出力を返す"""
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        if self.up == self.down:
+            return block.copy()
+        buffer = np.concatenate([self._history, block])
+        # buffer[0] が入力の何サンプル目か
+        origin = self._consumed - len(self._history)
+        self._consumed += len(block)
+
+        count = self.output_length(0)
+        output = np.zeros(count, dtype=np.float32)
+        if count:
+            # 出力 n はアップサンプル後の n*down の位置。その直前の入力と位相を求める
+            positions = (self._produced + np.arange(count)) * self.down
+            newest = positions // self.up - origin
+            phase = positions % self.up
+            # 各出力に使う入力を新しい順に並べた (出力数, タップ数) のビュー（コピーしない）
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps_per_phase)[:, ::-1]
+            output[:] = np.einsum("ij,ij->i", windows[newest - self.taps_per_phase + 1], self.phases[phase])
+            self._produced += count
+
+        self._history = buffer[len(buffer) - len(self._history):].copy()
+        return output
+
+    def flush(self) -> np.ndarray:
+        """フィルタに残っている分を、無音を足して押し出す"""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        return self.process(np.zeros(int(np.ceil(self.delay * self.down / self.up)) + 1, dtype=np.float32))
+
+
+def resample(audio: np.ndarray, input_rate: int, output_rate: int) -> np.ndarray:
+    """
+    まとまった音声を一度に変換する。フィルタの遅れは取り除いて、長さを output_rate に合わせて返すわ。
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    if input_rate == output_rate:
+        return audio
+    converted = list(AudioConverter(input_rate, 1, output_rate).convert_blocks([audio]))
+    return np.concatenate(converted) if converted else np.zeros(0, dtype=np.float32)
+
+
+class ChannelMixer:
+    """
+    多チャンネルの (フレーム数, チャンネル数) のブロックをモノラルにする。
+    - mean: 全チャンネルの平均
+    - select: channel で指定した1チャンネルだけ
+    - loudest: 一番大きいチャンネルを使う（簡易ビームフォーミング）。
+      エネルギーを平滑化し、今のチャンネルより switch_ratio 倍大きいときだけ切り替えるから、ばたつかない。
+    """
+
+    MODES = ("mean", "select", "loudest")
+
+    def __init__(self, channels: int, mode: str = "mean", channel: int = 0,
+                 smoothing: float = 0.9, switch_ratio: float = 2.0):
+        if mode not in self.MODES:
+            raise ValueError(f"ChannelMixer: モードは {', '.join(self.MODES)} のどれかにしてちょうだい")
+        if not 0 <= channel < channels:
+            raise ValueError(f"ChannelMixer: チャンネル {channel} は無いわ（{channels}チャンネル）")
+        self.channels = channels
+        self.mode = mode
+        self.channel = channel              # select のチャンネル。loudest では今使っているチャンネル
+        self.smoothing = smoothing          # エネルギーの平滑化係数（0〜1。大きいほどゆっくり追う）
+        self.switch_ratio = switch_ratio    # 切り替えに必要なエネルギーの倍率
+        self.initial_channel = channel
+        self.reset()
+
+    def reset(self):
+        """平滑化したエネルギーと選んでいるチャンネルを最初に戻す"""
+        self.energy = np.zeros(self.channels)
+        self.channel = self.initial_channel
+        self.switches = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim == 1:
+            return block
+        if self.channels == 1:
+            return block[:, 0]
+        if self.mode == "mean":
+            return block.mean(axis=1, dtype=np.float32)
+        if self.mode == "loudest" and len(block):
+            power = np.einsum("ij,ij->j", block, block) / len(block)
+            self.energy = self.smoothing * self.energy + (1 - self.smoothing) * power
+            loudest = int(np.argmax(self.energy))
+            if loudest != self.channel and self.energy[loudest] > self.switch_ratio * self.energy[self.channel]:
+                self.channel = loudest
+                self.switches += 1
+        return block[:, self.channel]
+
+
+class AudioConverter:
+    """
+    デバイスのままの形式（サンプルレート・チャンネル数）で録った音声を、
+    VADと音声認識が使う形式（既定は16kHzモノラル）に変換する。チャンネルをまとめてから変換するわ。
+    """
+
+    def __init__(self, input_rate: int, input_channels: int = 1, output_rate: int = 16000,
+                 mix: str = "mean", channel: int = 0):
+        self.input_rate = input_rate
+        self.input_channels = input_channels
+        self.output_rate = output_rate
+        self.mixer = ChannelMixer(input_channels, mode=mix, channel=channel)
+        self.resampler = PolyphaseResampler(input_rate, output_rate)
+
+    @property
+    def is_passthrough(self) -> bool:
+        """変換が要らない（もともと出力と同じ形式）かどうか"""
+        return self.input_rate == self.output_rate and self.input_channels == 1
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        return self.resampler.process(self.mixer.process(block))
+
+    def flush(self) -> np.ndarray:
+        return self.resampler.flush()
+
+    def reset(self):
+        self.mixer.reset()
+        self.resampler.reset()
+
+    def convert_blocks(self, blocks):
+        """
+        最後まで分かっているブロックの列（ファイルなど）を変換して順に返す。
+        フィルタの遅れの分を先頭から削り、最後は押し出して、元の長さに合わせるわ。
+        """
+        self.reset()
+        skip = int(round(self.resampler.delay))
+        consumed = produced = 0
+        for block in itertools.chain(blocks, [None]):
+            if block is None:
+                converted = self.flush()
+            else:
+                consumed += len(block)
+                converted = self.process(block)
+            if skip:
+                dropped = min(skip, len(converted))
+                converted, skip = converted[dropped:], skip - dropped
+            if block is None:
+                expected = int(round(consumed * self.output_rate / self.input_rate))
+                converted = converted[:max(expected - produced, 0)]
+            produced += len(converted)
+            if len(converted):
+                yield converted
@@ -0,0 +1,166 @@
+# domain/speech_segmenter.py
+
+import numpy as np
+
+
+class SegmentEvent:
+    """
+    区間検出のイベント。index はそのとき渡された窓の列の中での位置で、
+    「index番目の窓の直前」で起きたことを表すわ（それより前の窓は処理済み）。
+
+    - "open":  index番目の窓から区間が始まる
+    - "close": 区間が終わる。末尾の trim 窓は無音のハングオーバーだから区間から外す。
+               discard=True なら発話が短すぎるので捨てる
+    - "split": 区間が最大長に達したので切り出す。末尾の keep 窓は次の区間の先頭に回す
+    """
+
+    def __init__(self, kind: str, index: int, trim: int = 0, keep: int = 0, discard: bool = False):
+        self.kind = kind
+        self.index = index
+        self.trim = trim
+        self.keep = keep
+        self.discard = discard
+
+    def __eq__(self, other):
+        return isinstance(other, SegmentEvent) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return (f"SegmentEvent({self.kind!r}, index={self.index}, trim={self.trim}, "
+                f"keep={self.keep}, discard={self.discard})")
+
+
+class SpeechSegmenter:
+    """
+    VADの発話確率の列から音声区間を切り出す状態機械。
+    音声デバイスやモデルに依存せず、確率（と窓ごとのエネルギー）の配列だけで動くわ。
+
+    - 区間の開始は onset_threshold 以上、継続は offset_threshold 以上で判定する（ヒステリシス）
+    - 区間中の短い無音は区間に含めたまま、hangover_windows 窓続いたら区間を閉じる
+    - 発話の窓が min_speech_windows 未満の区間は捨てる（一瞬の物音でAPIを呼ばない）
+    - max_segment_windows に達したら、区間の後半で一番エネルギーの小さい窓で切り分ける
+    判定は窓ごとのループではなく、次のイベントが起きる位置を配列演算で探して進めるわ。
+    """
+
+    def __init__(
+        self,
+        onset_threshold=0.5,      # 区間を開始する発話確率
+        offset_threshold=0.35,    # 区間を継続する発話確率（onset以下）
+        hangover_windows=31,      # これだけ無音の窓が続いたら区間を閉じる
+        min_speech_windows=3,     # 区間として認める最小の発話窓数
+        max_segment_windows=None,  # 区間の最大窓数。Noneで無制限
+        split_search_ratio=0.5    # 最大長での分割点を、区間のこの割合より後ろから探す
+    ):
+        if offset_threshold > onset_threshold:
+            raise ValueError("SpeechSegmenter: offset_threshold は onset_threshold 以下にしてちょうだい")
+        self.onset_threshold = onset_threshold
+        self.offset_threshold = offset_threshold
+        self.hangover_windows = max(int(hangover_windows), 1)
+        self.min_speech_windows = max(int(min_speech_windows), 0)
+        self.max_segment_windows = None if max_segment_windows is None else max(int(max_segment_windows), 2)
+        self.split_search_ratio = split_search_ratio
+        self.reset()
+
+    @classmethod
+    def from_durations(cls, window_duration: float, silence_duration=1.0, min_speech_duration=0.1,
+                       max_segment_duration=None, **kwargs):
+        """秒数の指定から窓数に換算して作る"""
+        return cls(
+            hangover_windows=int(round(silence_duration / window_duration)),
+            min_speech_windows=int(np.ceil(min_speech_duration / window_duration)),
+            max_segment_windows=None if max_segment_duration is None else int(max_segment_duration / window_duration),
+            **kwargs
+        )
+
+    def reset(self):
+        """区間の途中状態を破棄する"""
+        self.is_active = False
+        self.silence_run = 0  # 区間中で現在続いている無音の窓数
+        self.segment_windows = 0  # 処理中の区間の窓数
+        self._energies = []   # 区間内の窓ごとのエネルギー（配列のリスト）
+        self._speech = []     # 区間内の窓ごとの発話判定（配列のリスト）
+
+    def process(self, probs: np.ndarray, energies: np.ndarray = None):
+        """
+        窓ごとの発話確率を処理して、起きたイベントのリストを返す。
+        energies は最大長で分割するときの分割点探しに使う（省略時は発話確率で代用）。
+        """
+        probs = np.asarray(probs, dtype=np.float32)
+        energies = probs if energies is None else np.asarray(energies, dtype=np.float32)
+        n = len(probs)
+        events = []
+        i = 0
+        while i < n:
+            if not self.is_active:
+                onsets = np.flatnonzero(probs[i:] >= self.onset_threshold)
+                if onsets.size == 0:
+                    break
+                i += int(onsets[0])
+                self.is_active = True
+                self.silence_run = 0
+                events.append(SegmentEvent("open", i))
+                continue
+            i = self._advance(probs, energies, i, events)
+        return events
+
+    def flush(self):
+        """処理中の区間を閉じるイベントを返す（区間中でなければNone）。録音を止めるときに使う"""
+        if not self.is_active:
+            return None
+        return self._close(0)
+
+    def _advance(self, probs, energies, i, events) -> int:
+        """区間中の窓を次のイベント（終了か最大長）まで進め、次に処理する位置を返す"""
+        sustain = probs[i:] >= self.offset_threshold
+        m = len(sustain)
+        idx = np.arange(m)
+
+        # 各窓の時点で続いている無音の窓数（前回の呼び出しからの持ち越し込み）
+        last_sustain = np.maximum.accumulate(np.where(sustain, idx, -1))
+        silence_run = np.where(last_sustain >= 0, idx - last_sustain, self.silence_run + idx + 1)
+
+        end = m
+        kind = None
+        closes = np.flatnonzero(silence_run >= self.hangover_windows)
+        if closes.size:
+            end, kind = int(closes[0]) + 1, "close"
+        if self.max_segment_windows is not None:
+            remaining = self.max_segment_windows - self.segment_windows
+            if remaining < end:
+                end, kind = remaining, "split"
+
+        self._energies.append(energies[i:i + end])
+        self._speech.append(sustain[:end])
+        self.segment_windows += end
+        self.silence_run = int(silence_run[end - 1]) if end > 0 else self.silence_run
+        i += end
+
+        if kind == "close":
+            events.append(self._close(i))
+        elif kind == "split":
+            events.append(self._split(i))
+        return i
+
+    def _close(self, index: int) -> SegmentEvent:
+        trim = min(self.silence_run, self.segment_windows)
+        speech_windows = int(sum(np.count_nonzero(s) for s in self._speech))
+        event = SegmentEvent("close", index, trim=trim, discard=speech_windows < self.min_speech_windows)
+        self.reset()
+        return event
+
+    def _split(self, index: int) -> SegmentEvent:
+        energies = np.concatenate(self._energies)
+        speech = np.concatenate(self._speech)
+        n = len(energies)
+        start = min(int(n * self.split_search_ratio), n - 1)
+        cut = start + int(np.argmin(energies[start:]))
+        if cut == 0:
+            cut = n - 1
+        keep = n - cut
+
+        speech_windows = int(np.count_nonzero(speech[:cut]))
+        event = SegmentEvent("split", index, keep=keep, discard=speech_windows < self.min_speech_windows)
+        # 切り分けた後ろ側を、続きの区間として持ち直す
+        self._energies = [energies[cut:]]
+        self._speech = [speech[cut:]]
+        self.segment_windows = keep
+        return event
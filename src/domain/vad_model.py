@@ -0,0 +1,258 @@
+# domain/vad_model.py
+
+import hashlib
+import importlib.util
+import os
+from contextlib import nullcontext
+
+import numpy as np
+
+# 実行時に使うモデルファイル名（バックエンドごと）
+MODEL_FILES = {"torch": "silero_vad.jit", "onnx": "silero_vad.onnx"}
+
+# requirements.txt で固定している silero-vad==6.2.3 に同梱されたモデルのSHA-256
+KNOWN_SHA256 = {
+    "silero_vad.jit": "e1122837f4154c511485fe0b9c64455f7b929c96fbb8d79fbdb336383ebd3720",
+    "silero_vad.onnx": "1a153a22f4509e292a94e67d6f9b85e8deb25b4988682b7e174c65279d8788e3",
+}
+
+
+def _package_data_dir():
+    """silero-vad パッケージのモデル置き場（パッケージ自体はimportしないからtorchも読まない）"""
+    try:
+        spec = importlib.util.find_spec("silero_vad")
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return os.path.join(list(spec.submodule_search_locations)[0], "data")
+
+
+def _hub_cache_dirs():
+    """torch.hub.load で一度ダウンロード済みなら、そのキャッシュの場所"""
+    torch_home = os.getenv("TORCH_HOME") or os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "torch")
+    repo = os.path.join(torch_home, "hub", "snakers4_silero-vad_master")
+    return [os.path.join(repo, "src", "silero_vad", "data"), os.path.join(repo, "files")]
+
+
+def resolve_model_path(backend: str, model_path: str = None):
+    """
+    モデルファイルの場所を決める。見つからなければNoneを返す。
+    優先順: 引数 > 環境変数 SILERO_VAD_MODEL > silero-vad パッケージ同梱 > torch.hub のキャッシュ
+    """
+    explicit = model_path or os.getenv("SILERO_VAD_MODEL")
+    if explicit:
+        if not os.path.isfile(explicit):
+            raise FileNotFoundError(f"VADモデルが見つからないわ: {explicit}")
+        return explicit
+
+    filename = MODEL_FILES[backend]
+    for directory in [_package_data_dir()] + _hub_cache_dirs():
+        if directory and os.path.isfile(os.path.join(directory, filename)):
+            return os.path.join(directory, filename)
+    return None
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_checksum(path: str, expected: str = None):
+    """
+    モデルファイルのSHA-256を確認する。
+    期待値は引数 > 環境変数 SILERO_VAD_SHA256 > 固定値の順で決める。
+    自動で見つけたモデル（パッケージ同梱と torch.hub のキャッシュ）は同じ固定値で照合し、
+    期待値が無い（SILERO_VAD_MODEL で指定した任意のモデル）なら確認しないわ。
+    """
+    expected = expected or os.getenv("SILERO_VAD_SHA256")
+    pinned = False
+    if not expected and _is_default_location(path):
+        expected = KNOWN_SHA256.get(os.path.basename(path))
+        pinned = True
+    if not expected:
+        return
+    actual = file_sha256(path)
+    if actual != expected.lower():
+        hint = ""
+        if pinned:
+            # torch.hub のキャッシュは固定した版と違うモデルのことがある。使うなら明示してもらう
+            hint = "。使うなら SILERO_VAD_MODEL と SILERO_VAD_SHA256 で指定してちょうだい"
+        raise ValueError(f"VADモデルのチェックサムが一致しないわ: {path} ({actual} != {expected}){hint}")
+
+
+def _is_default_location(path: str) -> bool:
+    """resolve_model_path が自動で探す場所（パッケージ同梱・torch.hub のキャッシュ）のファイルかどうか"""
+    directory = os.path.dirname(os.path.abspath(path))
+    return any(candidate and directory == os.path.abspath(candidate)
+               for candidate in [_package_data_dir()] + _hub_cache_dirs())
+
+
+class OnnxSileroModel:
+    """
+    ONNX Runtime で Silero VAD を動かすラッパー。torchは使わない。
+    TorchScript版と同じ呼び出し方・隠れ状態の属性（_state, _context, _last_sr, _last_batch_size）を持たせて、
+    VADServiceからはどちらのバックエンドも同じように扱えるようにしてるわ。
+    """
+
+    CONTEXT_SIZES = {16000: 64, 8000: 32}
+    WINDOW_SIZES = {16000: 512, 8000: 256}
+
+    def __init__(self, session):
+        self.session = session
+        self.reset_states()
+
+    def reset_states(self):
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._context = np.zeros(0, dtype=np.float32)
+        self._last_sr = 0
+        self._last_batch_size = 0
+
+    def __call__(self, x, sr: int):
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[None, :]
+        if sr not in self.WINDOW_SIZES:
+            raise ValueError(f"Supported sampling rates: {list(self.WINDOW_SIZES)}")
+        if x.shape[-1] != self.WINDOW_SIZES[sr]:
+            raise ValueError(f"Provided number of samples is {x.shape[-1]} "
+                             f"(Supported values: 256 for 8000 sample rate, 512 for 16000)")
+
+        batch_size = x.shape[0]
+        context_size = self.CONTEXT_SIZES[sr]
+        if (not self._last_batch_size or (self._last_sr and self._last_sr != sr)
+                or self._last_batch_size != batch_size):
+            self.reset_states()
+            self._state = np.zeros((2, batch_size, 128), dtype=np.float32)
+        if not len(self._context):
+            self._context = np.zeros((batch_size, context_size), dtype=np.float32)
+
+        x = np.concatenate([self._context, x], axis=1)
+        out, state = self.session.run(None, {"input": x, "state": self._state, "sr": np.array(sr, dtype=np.int64)})
+        self._state = state
+        self._context = x[:, -context_size:]
+        self._last_sr = sr
+        self._last_batch_size = batch_size
+        return out
+
+
+class TorchVADBackend:
+    """
+    TorchScript版のSileroモデルを読むバックエンド。
+    torchのimportとモデルの読み込みは load() まで遅らせるわ。
+    ローカルにモデルが無いときだけ、従来どおり torch.hub から取得する。
+    """
+
+    name = "torch"
+
+    def __init__(self, model_path=None, sha256=None):
+        self.model_path = model_path
+        self.sha256 = sha256
+
+    def load(self):
+        import torch
+        if self.model_path is None:
+            print("VADService: ローカルにモデルが無いから torch.hub から取得するわ")
+            model, _ = torch.hub.load(repo_or_dir='snakers4/silero-vad', model='silero_vad')
+            return model
+        verify_checksum(self.model_path, self.sha256)
+        model = torch.jit.load(self.model_path, map_location="cpu")
+        model.eval()
+        return model
+
+    @staticmethod
+    def as_input(frames: np.ndarray):
+        import torch
+        return torch.from_numpy(frames)
+
+    @staticmethod
+    def to_numpy(output) -> np.ndarray:
+        return output.detach().numpy().reshape(-1)
+
+    @staticmethod
+    def zeros(*shape):
+        import torch
+        return torch.zeros(*shape)
+
+    @staticmethod
+    def concat(arrays, axis: int):
+        import torch
+        return torch.cat(arrays, dim=axis)
+
+    @staticmethod
+    def copy(array):
+        return array.clone()
+
+    @staticmethod
+    def inference():
+        import torch
+        return torch.no_grad()
+
+
+class OnnxVADBackend:
+    """ONNX Runtime版のバックエンド。torchが無い環境でも動き、起動も軽いわ。"""
+
+    name = "onnx"
+
+    def __init__(self, model_path=None, sha256=None):
+        if model_path is None:
+            raise FileNotFoundError(
+                "VADService: ONNXのVADモデルが見つからないわ。silero-vad をインストールするか、"
+                "SILERO_VAD_MODEL でモデルファイルを指定してちょうだい"
+            )
+        self.model_path = model_path
+        self.sha256 = sha256
+
+    def load(self):
+        import onnxruntime
+        verify_checksum(self.model_path, self.sha256)
+        options = onnxruntime.SessionOptions()
+        # 窓ごとの小さな推論だから、スレッドを増やしても速くならない
+        options.inter_op_num_threads = 1
+        options.intra_op_num_threads = 1
+        session = onnxruntime.InferenceSession(self.model_path, sess_options=options,
+                                               providers=["CPUExecutionProvider"])
+        return OnnxSileroModel(session)
+
+    @staticmethod
+    def as_input(frames: np.ndarray):
+        return frames
+
+    @staticmethod
+    def to_numpy(output) -> np.ndarray:
+        return np.asarray(output).reshape(-1)
+
+    @staticmethod
+    def zeros(*shape):
+        return np.zeros(shape, dtype=np.float32)
+
+    @staticmethod
+    def concat(arrays, axis: int):
+        return np.concatenate(arrays, axis=axis)
+
+    @staticmethod
+    def copy(array):
+        return array.copy()
+
+    @staticmethod
+    def inference():
+        return nullcontext()
+
+
+BACKENDS = {"torch": TorchVADBackend, "onnx": OnnxVADBackend}
+
+
+def create_vad_backend(backend: str = None, model_path: str = None, sha256: str = None):
+    """
+    VADモデルのバックエンドを作る（モデルはまだ読み込まない）。
+    backend を省略すると環境変数 VAD_BACKEND（torch / onnx）、それも無ければ torch を使うわ。
+    """
+    backend = (backend or os.getenv("VAD_BACKEND") or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"VADService: 未対応のバックエンドよ: {backend}（torch / onnx）")
+    return BACKENDS[backend](resolve_model_path(backend, model_path), sha256)
+
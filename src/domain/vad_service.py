@@ -1,23 +1,77 @@
 # domain/vad_service.py
 
+import threading
 import numpy as np
-import torch
+
+from src.domain.energy_gate import EnergyGate
+from src.domain.vad_model import create_vad_backend
+
+
+class VADStreamState:
+    """
+    ストリーミング推論用の状態を保持するクラス。
+    窓に満たない未処理サンプルと、Sileroモデルの隠れ状態を呼び出しをまたいで持ち越すわ。
+    """
+
+    def __init__(self, gate_state=None):
+        self.remainder = np.zeros(0, dtype=np.float32)  # 窓に満たず次回に持ち越すサンプル
+        self.model_state = None  # (state, context, last_sr, last_batch_size)
+        self.gate_state = gate_state  # 一次判定（EnergyGate）の状態。ゲート無しならNone
+
+    def reset(self):
+        """持ち越しサンプルと隠れ状態を破棄する（推定済みのノイズフロアは引き継ぐ）"""
+        self.remainder = np.zeros(0, dtype=np.float32)
+        self.model_state = None
+        if self.gate_state is not None:
+            self.gate_state.hangover_left = 0
+            self.gate_state.is_open = False
+
 
 class VADService:
     """
     Silero VAD を利用して音声データの音声/無音判定をするクラス。
     無音になったらファイルを切り出すなどのロジックを
     ここを通して行えるようにしているわ。
+    モデルはローカルのファイルから読み、torchやonnxruntimeのimportも含めて最初の推論まで遅らせる。
+    energy_gate を渡すと、明らかな無音の窓はモデルに通さず発話確率0として扱うわ。
     """
 
-    def __init__(self, threshold=0.5):
+    # Sileroモデルが受け付ける窓サイズ（サンプル数）
+    WINDOW_SIZES = {16000: 512, 8000: 256}
+    # 窓の前につなぐ直前のサンプル数と、隠れ状態の次元
+    CONTEXT_SIZES = {16000: 64, 8000: 32}
+    STATE_SIZE = 128
+
+    def __init__(self, threshold=0.5, backend=None, model_path=None, sha256=None, energy_gate=None):
         self.threshold = threshold
-        # Silero VADモデルをロード
-        self.model, utils = torch.hub.load(
-            repo_or_dir='snakers4/silero-vad',
-            model='silero_vad'
-        )
-        self.get_speech_timestamps, self.get_speech_probs, *_ = utils
+        self.energy_gate = energy_gate
+        # モデルの場所だけ先に決めておき、読み込みは最初に使うときに行う
+        self.backend = create_vad_backend(backend, model_path, sha256)
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._silence_states = {}  # サンプルレートごとの、無音を読ませた後の隠れ状態
+        self._fallback_gate = None  # ゲート無しの設定でVADを軽くするときに使う一次判定
+        # ストリーミングモードの既定ストリーム
+        self.stream = self.create_stream()
+        # モデルの隠れ状態を出し入れするから、複数スレッドから使うときは推論を直列化する
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Silero VADモデル（初回アクセス時に読み込む）"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self.backend.load()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def load(self):
+        """モデルを先に読み込んでおく（最初の推論で待たせたくない場合に呼ぶ）"""
+        return self.model
 
     def is_speech(self, audio_chunk: np.ndarray, sample_rate: int) -> bool:
         """
@@ -28,8 +82,8 @@ class VADService:
 
         # たまに短すぎてValueErrorが発生するから、回避してる
         try:
-            tensor_audio = torch.from_numpy(audio_chunk)
-            prob = self.model(tensor_audio, sample_rate)
+            model = self.model
+            prob = model(self.backend.as_input(audio_chunk), sample_rate)
             return prob >= self.threshold
         except ValueError:
             # Chunkが短い場合など
@@ -37,3 +91,234 @@ class VADService:
         except Exception as e:
             print(f"VADService: 予期せぬエラー {e}")
             return False
+
+    def window_size(self, sample_rate: int) -> int:
+        """サンプルレートに対応するモデルの窓サイズを返す"""
+        if sample_rate not in self.WINDOW_SIZES:
+            raise ValueError(f"VADService: 未対応のサンプルレートよ: {sample_rate}")
+        return self.WINDOW_SIZES[sample_rate]
+
+    def create_stream(self) -> VADStreamState:
+        """新しいストリーミング状態を作る"""
+        gate_state = self.energy_gate.create_state() if self.energy_gate is not None else None
+        return VADStreamState(gate_state)
+
+    def reset_stream(self, stream: VADStreamState = None):
+        """ストリーミング状態を初期化する（省略時は既定ストリーム）"""
+        (stream or self.stream).reset()
+
+    def score_stream(self, audio_chunk: np.ndarray, sample_rate: int, stream: VADStreamState = None,
+                     degraded: bool = False):
+        """
+        任意長の音声をモデルの窓サイズに切り直して、溜まった窓を時系列順に推論する。
+        窓に満たない端数は次回の呼び出しに持ち越すから、短いチャンクも捨てないわ。
+        degraded=True ならモデルを通さず、一次判定を通った窓を発話確率1とする（処理が追いつかないとき用）。
+
+        Returns:
+            (frames, probs): frames は (窓数, 窓サイズ) の配列、probs は窓ごとの発話確率
+        """
+        stream = stream or self.stream
+        frames = self._split_windows(audio_chunk, self.window_size(sample_rate), stream)
+        return frames, self.score_windows(frames, sample_rate, stream, degraded)
+
+    def score_windows(self, frames: np.ndarray, sample_rate: int, stream: VADStreamState = None,
+                      degraded: bool = False) -> np.ndarray:
+        """
+        窓サイズに切り済みの (窓数, 窓サイズ) の配列を推論して、窓ごとの発話確率を返す。
+        窓の切り出しを別の場所（別プロセスの呼び出し側など）で済ませたときに使う。
+        """
+        stream = stream or self.stream
+        probs = np.zeros(len(frames), dtype=np.float32)
+        if len(frames) == 0:
+            return probs
+        if degraded:
+            probs[:] = self._degraded_gate(frames, stream)
+            # モデルが聞いていない間の隠れ状態は当てにならないから、無音を聞いた状態から再開する
+            state, context = self._silence_state(sample_rate)
+            self._store_state(stream, state, context, sample_rate)
+            return probs
+
+        mask = self._gate(frames, stream)
+        if mask is None:
+            probs[:] = self._forward_windows(frames, sample_rate, stream)
+        elif mask.any():
+            probs[mask] = self._forward_windows(frames[mask], sample_rate, stream)
+        self._close_gate(mask, stream, sample_rate)
+        return probs
+
+    def score_streams(self, requests, sample_rate: int):
+        """
+        複数ストリームの音声をまとめて推論する（複数マイクで1つのモデルを共有する用）。
+        各ストリームの同じ時刻の窓をバッチ軸に積んで1回で推論するから、
+        ストリームが増えてもモデル呼び出しの回数は一番長いストリームの窓数で済むわ。
+
+        Args:
+            requests: (audio_chunk, stream) のリスト
+        Returns:
+            requestsと同じ順番の (frames, probs) のリスト
+        """
+        window = self.window_size(sample_rate)
+        streams = [stream for _, stream in requests]
+        frames_list = [self._split_windows(audio, window, stream) for audio, stream in requests]
+        masks = [self._gate(frames, stream) if len(frames) else None for frames, stream in zip(frames_list, streams)]
+        # 一次判定を通った窓だけを推論する
+        selected = [frames if mask is None else frames[mask] for frames, mask in zip(frames_list, masks)]
+        selected_probs = [np.zeros(len(frames), dtype=np.float32) for frames in selected]
+
+        # 窓数の多い順に並べると、各時刻で推論するストリームは常に先頭からk個になる
+        order = sorted((i for i, frames in enumerate(selected) if len(frames)),
+                       key=lambda i: len(selected[i]), reverse=True)
+        if order:
+            with self._lock:
+                self._forward_batched([selected[i] for i in order], [selected_probs[i] for i in order],
+                                      [streams[i] for i in order], sample_rate)
+
+        results = []
+        for frames, mask, probs, stream in zip(frames_list, masks, selected_probs, streams):
+            if mask is not None:
+                full = np.zeros(len(frames), dtype=np.float32)
+                full[mask] = probs
+                probs = full
+                self._close_gate(mask, stream, sample_rate)
+            results.append((frames, probs))
+        return results
+
+    def _gate(self, frames: np.ndarray, stream: VADStreamState):
+        """一次判定でモデルに渡す窓のマスクを返す（ゲート無しならNone）"""
+        if self.energy_gate is None:
+            return None
+        if stream.gate_state is None:
+            stream.gate_state = self.energy_gate.create_state()
+        with self._lock:
+            return self.energy_gate.apply(frames, stream.gate_state)
+
+    def _degraded_gate(self, frames: np.ndarray, stream: VADStreamState) -> np.ndarray:
+        """一次判定だけで窓ごとの発話（True/False）を決める。ゲート無しの設定でも既定のゲートを使う"""
+        if self.energy_gate is not None:
+            return self._gate(frames, stream)
+        if self._fallback_gate is None:
+            self._fallback_gate = EnergyGate()
+        if stream.gate_state is None:
+            stream.gate_state = self._fallback_gate.create_state()
+        with self._lock:
+            return self._fallback_gate.apply(frames, stream.gate_state)
+
+    def _close_gate(self, mask, stream: VADStreamState, sample_rate: int):
+        """
+        ゲートが閉じたまま終わったら、モデルの隠れ状態を「無音を聞き続けた状態」に置き換える。
+        落とした窓をモデルが聞いていたのと近い状態から次の発話を推論できるわ。
+        """
+        if mask is not None and len(mask) and not mask[-1]:
+            state, context = self._silence_state(sample_rate)
+            self._store_state(stream, state, context, sample_rate)
+
+    def _silence_state(self, sample_rate: int):
+        """無音を1秒ぶん読ませたあとの隠れ状態（サンプルレートごとに1回だけ作る）"""
+        if sample_rate not in self._silence_states:
+            stream = VADStreamState()
+            silence = np.zeros((sample_rate // self.window_size(sample_rate), self.window_size(sample_rate)),
+                               dtype=np.float32)
+            self._forward_windows(silence, sample_rate, stream)
+            state, context, _, _ = stream.model_state
+            self._silence_states[sample_rate] = (state, context)
+        return self._silence_states[sample_rate]
+
+    @staticmethod
+    def _split_windows(audio_chunk: np.ndarray, window: int, stream: VADStreamState) -> np.ndarray:
+        """持ち越しサンプルをつないで (窓数, 窓サイズ) に切り、端数をストリームに持ち越す"""
+        audio = np.asarray(audio_chunk, dtype=np.float32).reshape(-1)
+        if stream.remainder.size:
+            audio = np.concatenate((stream.remainder, audio))
+
+        n_windows = audio.size // window
+        used = n_windows * window
+        stream.remainder = audio[used:].copy()
+        return audio[:used].reshape(n_windows, window)
+
+    def speech_probs(self, audio_chunk: np.ndarray, sample_rate: int, stream: VADStreamState = None) -> np.ndarray:
+        """score_stream の発話確率だけを返す"""
+        _, probs = self.score_stream(audio_chunk, sample_rate, stream)
+        return probs
+
+    def _forward_windows(self, frames: np.ndarray, sample_rate: int, stream: VADStreamState) -> np.ndarray:
+        """
+        窓の列を時系列順に、1窓ずつモデルに通す（Pythonのループで窓の数だけモデルを呼ぶ）。
+        連続する窓は隠れ状態でつながっているからバッチ軸には積めないわ。
+        まとめて済ませているのは、テンソルへの変換とストリームの隠れ状態の出し入れ（呼び出しごとに1回）だけ。
+        """
+        probs = np.empty(len(frames), dtype=np.float32)
+        model = self.model
+        tensor_frames = self.backend.as_input(frames)
+        with self._lock:
+            self._restore_model_state(stream)
+            try:
+                with self.backend.inference():
+                    for i in range(len(frames)):
+                        probs[i] = self.backend.to_numpy(model(tensor_frames[i:i + 1], sample_rate))[0]
+            finally:
+                self._save_model_state(stream)
+        return probs
+
+    def _forward_batched(self, frames_list, probs_list, streams, sample_rate: int):
+        """
+        窓数の多い順に並んだストリームを、時刻ごとにバッチ推論する。
+        隠れ状態はバッチ軸に積んだまま回し、推論が終わったストリームの分だけ切り出して戻すわ。
+        """
+        model, backend = self.model, self.backend
+        states, contexts = zip(*(self._initial_state(stream, sample_rate) for stream in streams))
+        state = backend.concat(states, axis=1)
+        context = backend.concat(contexts, axis=0)
+        active = len(streams)
+        try:
+            with backend.inference():
+                for t in range(len(frames_list[0])):
+                    while len(frames_list[active - 1]) <= t:
+                        # 窓を使い切ったストリームは状態を退避してバッチから外す
+                        active -= 1
+                        self._store_state(streams[active], state[:, active:active + 1], context[active:active + 1],
+                                          sample_rate)
+                    state, context = state[:, :active], context[:active]
+                    batch = backend.as_input(np.stack([frames[t] for frames in frames_list[:active]]))
+                    model._state = state
+                    model._context = context
+                    model._last_sr = sample_rate
+                    model._last_batch_size = active
+                    out = backend.to_numpy(model(batch, sample_rate))
+                    for probs, prob in zip(probs_list, out):
+                        probs[t] = prob
+                    state, context = model._state, model._context
+        finally:
+            for i in range(active):
+                self._store_state(streams[i], state[:, i:i + 1], context[i:i + 1], sample_rate)
+
+    def _initial_state(self, stream: VADStreamState, sample_rate: int):
+        """ストリームの隠れ状態を (state, context) のテンソルで返す（未初期化ならゼロ）"""
+        if stream.model_state is not None:
+            state, context, last_sr, _ = stream.model_state
+            if last_sr == sample_rate and len(state) and len(context):
+                return state, context
+        return (self.backend.zeros(2, 1, self.STATE_SIZE),
+                self.backend.zeros(1, self.CONTEXT_SIZES[sample_rate]))
+
+    def _store_state(self, stream: VADStreamState, state, context, sample_rate: int):
+        stream.model_state = (self.backend.copy(state), self.backend.copy(context), sample_rate, 1)
+
+    def _restore_model_state(self, stream: VADStreamState):
+        """ストリームの隠れ状態をモデルに読み込む"""
+        if stream.model_state is None:
+            self.model.reset_states()
+            return
+        state, context, last_sr, last_batch_size = stream.model_state
+        self.model._state = state
+        self.model._context = context
+        self.model._last_sr = last_sr
+        self.model._last_batch_size = last_batch_size
+
+    def _save_model_state(self, stream: VADStreamState):
+        """モデルの隠れ状態をストリームに退避する"""
+        stream.model_state = (
+            self.model._state,
+            self.model._context,
+            self.model._last_sr,
+            self.model._last_batch_size,
+        )
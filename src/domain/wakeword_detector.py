@@ -1,22 +1,32 @@
 # domain/wakeword_detector.py
 
+from src.domain.phrase_matcher import PhraseMatcher
+
+
 class WakewordDetector:
     """
     ウェイクワード（例：アウラ）が含まれるかどうかを
     文字列解析で判定するクラス。
+    照合は作るときに組み立てた PhraseMatcher で行うから、ウェイクワードが何千個あっても
+    認識結果を1回なめるだけで済むわ。ひらがな・カタカナ・全角・ローマ字の違いは無視する。
     """
 
-    def __init__(self, wakewords=None):
+    def __init__(self, wakewords=None, max_distance=0, romaji=True):
         # デフォルトのウェイクワードを設定
         self.wakewords = wakewords if wakewords else ["アウラ", "あうら", "aura"]
+        # max_distance > 0 なら、その編集距離までの誤認識も当てる
+        self.matcher = PhraseMatcher(self.wakewords, max_distance=max_distance, romaji=romaji)
 
     def detect(self, recognized_text: str) -> bool:
         """
         音声認識結果にウェイクワードが含まれるかどうかを返す。
         """
+        return self.find(recognized_text) is not None
+
+    def find(self, recognized_text: str):
+        """
+        音声認識結果の中で最初に見つけたウェイクワード（PhraseMatch）を返す。無ければ None。
+        """
         if not recognized_text:
-            return False
-        for w in self.wakewords:
-            if w.lower() in recognized_text.lower():
-                return True
-        return False
+            return None
+        return self.matcher.search(recognized_text)
@@ -0,0 +1,170 @@
+# infrastructure/audio_encoder.py
+
+import io
+import struct
+import threading
+import time
+import numpy as np
+
+from src.infrastructure.metrics import get_metrics
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
+    # FLAC/Opusを使わないならsoundfile（libsndfile）は無くても動く
+    sf = None
+
+
+class EncodedAudio:
+    """
+    エンコード済みの音声データ。
+    data はエンコーダのバッファを指すmemoryviewだから、コピーせずにAPIへ渡せるわ。
+    """
+
+    def __init__(self, data: memoryview, audio_format: str, filename: str, mime_type: str):
+        self.data = data
+        self.format = audio_format
+        self.filename = filename
+        self.mime_type = mime_type
+
+    def __len__(self):
+        return self.data.nbytes
+
+    def as_file(self):
+        """data をコピーせずに読み出すファイルライクオブジェクトを返す"""
+        return _MemoryviewReader(self.data)
+
+
+class _MemoryviewReader(io.RawIOBase):
+    """memoryviewをファイルとして読み出すための最小限のリーダー"""
+
+    def __init__(self, data: memoryview):
+        self._data = data.cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._data) - self._pos)
+        b[:n] = self._data[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = len(self._data) + offset
+        self._pos = max(0, min(self._pos, len(self._data)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class AudioEncoder:
+    """
+    float32のNumPy音声をアップロード用の形式に変換するクラス。
+    int16への変換は1回だけで、スレッドごとに使い回すバッファに直接書き込むわ。
+
+    対応形式:
+        wav   : 16bit PCMのWAV（最も大きいけど、どのAPIでも使える）
+        pcm16 : ヘッダ無しの16bit PCM（speech_recognitionのAudioData向け）
+        flac  : 可逆圧縮（soundfileが必要）
+        ogg   : OGGコンテナのOpus（soundfileが必要）
+    """
+
+    SUPPORTED_FORMATS = ("wav", "pcm16", "flac", "ogg")
+    COMPRESSED_FORMATS = ("flac", "ogg")
+
+    _WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+    _MIME_TYPES = {
+        "wav": "audio/wav",
+        "pcm16": "audio/L16",
+        "flac": "audio/flac",
+        "ogg": "audio/ogg",
+    }
+
+    def __init__(self, audio_format="wav", metrics=None):
+        self.metrics = metrics if metrics is not None else get_metrics()
+        audio_format = (audio_format or "wav").lower()
+        if audio_format not in self.SUPPORTED_FORMATS:
+            raise ValueError(f"AudioEncoder: 未対応の形式よ: {audio_format}")
+        if audio_format in self.COMPRESSED_FORMATS and sf is None:
+            print(f"AudioEncoder: soundfileが無いから {audio_format} の代わりに wav を使うわ")
+            audio_format = "wav"
+        self.format = audio_format
+        self._local = threading.local()
+
+    def encode(self, audio_data: np.ndarray, sample_rate: int) -> EncodedAudio:
+        """
+        音声を設定された形式に変換する。
+        wav/pcm16 の戻り値は同じスレッドで次に encode するまで有効よ。
+        """
+        metrics = self.metrics
+        if not metrics.enabled:
+            return self._encode(audio_data, sample_rate)
+        started = time.perf_counter()
+        encoded = self._encode(audio_data, sample_rate)
+        metrics.histogram("voicescribe_encode_seconds", "アップロード形式への変換にかかった時間").observe(
+            time.perf_counter() - started, format=self.format)
+        return encoded
+
+    def _encode(self, audio_data: np.ndarray, sample_rate: int) -> EncodedAudio:
+        if self.format in self.COMPRESSED_FORMATS:
+            return self._encode_compressed(audio_data, sample_rate)
+
+        header_size = self._WAV_HEADER.size if self.format == "wav" else 0
+        n_samples = audio_data.size
+        data_size = n_samples * 2
+        buffer = self._get_buffer(header_size + data_size)
+
+        if header_size:
+            self._WAV_HEADER.pack_into(
+                buffer, 0,
+                b"RIFF", 36 + data_size, b"WAVE",
+                b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+                b"data", data_size
+            )
+        pcm = np.frombuffer(buffer, dtype="<i2", count=n_samples, offset=header_size)
+        self.to_pcm16(audio_data, out=pcm)
+
+        view = memoryview(buffer)[:header_size + data_size]
+        return EncodedAudio(view, self.format, f"audio.{self._extension()}", self._MIME_TYPES[self.format])
+
+    @staticmethod
+    def to_pcm16(audio_data: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """[-1, 1] のfloat音声をクリップしてint16に変換する"""
+        scaled = np.clip(audio_data.reshape(-1), -1.0, 1.0)
+        scaled *= 32767
+        if out is None:
+            return scaled.astype("<i2")
+        np.copyto(out, scaled, casting="unsafe")
+        return out
+
+    def _encode_compressed(self, audio_data: np.ndarray, sample_rate: int) -> EncodedAudio:
+        """soundfileでFLAC/Opusに圧縮する"""
+        bio = io.BytesIO()
+        if self.format == "flac":
+            sf.write(bio, audio_data.reshape(-1), sample_rate, format="FLAC", subtype="PCM_16")
+        else:
+            sf.write(bio, audio_data.reshape(-1), sample_rate, format="OGG", subtype="OPUS")
+        return EncodedAudio(bio.getbuffer(), self.format, f"audio.{self.format}", self._MIME_TYPES[self.format])
+
+    def _get_buffer(self, size: int) -> bytearray:
+        """スレッドごとの出力バッファを返す。足りなければ作り直す"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or len(buffer) < size:
+            # エクスポート中のmemoryviewがあるとリサイズできないから新しく確保する
+            buffer = bytearray(max(size, 2 * len(buffer) if buffer else size))
+            self._local.buffer = buffer
+        return buffer
+
+    def _extension(self):
+        return "pcm" if self.format == "pcm16" else self.format
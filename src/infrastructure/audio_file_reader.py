@@ -0,0 +1,82 @@
+# infrastructure/audio_file_reader.py
+
+import wave
+import numpy as np
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):
+    # WAV以外（FLAC/OGGなど）を読まないならsoundfileは無くても動く
+    sf = None
+
+
+class AudioFileReader:
+    """
+    音声ファイルを先頭からブロック単位で読み出すクラス。
+    ファイル全体をメモリに載せず、float32のモノラルに変換して返すわ。
+    WAVは標準ライブラリで読み、それ以外はsoundfileがあれば使う。
+    """
+
+    def __init__(self, path: str, block_size: int = 16000):
+        self.path = path
+        self.block_size = block_size
+        if path.lower().endswith(".wav"):
+            with wave.open(path, 'rb') as wf:
+                self.sample_rate = wf.getframerate()
+                self.channels = wf.getnchannels()
+                self.frames = wf.getnframes()
+        elif sf is not None:
+            info = sf.info(path)
+            self.sample_rate = info.samplerate
+            self.channels = info.channels
+            self.frames = info.frames
+        else:
+            raise ValueError(f"AudioFileReader: WAV以外を読むにはsoundfileが必要よ: {path}")
+
+    @property
+    def duration(self) -> float:
+        """ファイルの長さ（秒）"""
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def blocks(self):
+        """ブロックごとに (block_size,) のfloat32モノラル配列を返すジェネレータ"""
+        if self.path.lower().endswith(".wav"):
+            yield from self._wav_blocks()
+        else:
+            for block in sf.blocks(self.path, blocksize=self.block_size, dtype='float32', always_2d=True):
+                yield self._to_mono(block)
+
+    def _wav_blocks(self):
+        with wave.open(self.path, 'rb') as wf:
+            sample_width = wf.getsampwidth()
+            while True:
+                data = wf.readframes(self.block_size)
+                if not data:
+                    break
+                samples = self._decode_pcm(data, sample_width)
+                yield self._to_mono(samples.reshape(-1, self.channels))
+
+    @staticmethod
+    def _decode_pcm(data: bytes, sample_width: int) -> np.ndarray:
+        """WAVのPCMバイト列を [-1, 1] のfloat32に変換する"""
+        if sample_width == 1:
+            # 8bitは符号なし
+            return (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+        if sample_width == 2:
+            return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+        if sample_width == 3:
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                       | (raw[:, 2].astype(np.int32) << 16))
+            samples = np.where(samples & 0x800000, samples - 0x1000000, samples)
+            return samples.astype(np.float32) / 8388608.0
+        if sample_width == 4:
+            return np.frombuffer(data, dtype='<i4').astype(np.float32) / 2147483648.0
+        raise ValueError(f"AudioFileReader: 未対応のサンプル幅よ: {sample_width}")
+
+    @staticmethod
+    def _to_mono(block: np.ndarray) -> np.ndarray:
+        """複数チャンネルなら平均してモノラルにする"""
+        if block.shape[1] == 1:
+            return block[:, 0]
+        return block.mean(axis=1, dtype=np.float32)
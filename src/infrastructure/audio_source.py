@@ -0,0 +1,230 @@
+# infrastructure/audio_source.py
+
+import sys
+import threading
+import time
+
+import numpy as np
+
+from src.infrastructure.audio_file_reader import AudioFileReader
+
+
+def _import_sounddevice():
+    """sounddeviceはマイクを使うときだけ読み込む（音声デバイスの無い環境でも他のソースは使えるように）"""
+    import sounddevice as sd
+    return sd
+
+
+def list_input_devices():
+    """入力チャンネルを持つデバイスを (ID, デバイス情報) のリストで返す"""
+    sd = _import_sounddevice()
+    return [(i, device) for i, device in enumerate(sd.query_devices()) if device['max_input_channels'] > 0]
+
+
+def find_input_device(device_name):
+    """名前（部分一致）で入力デバイスのIDを探す。見つからなければNone"""
+    for i, device in list_input_devices():
+        if device_name.lower() in device['name'].lower():
+            return i
+    return None
+
+
+def native_input_format(device=None):
+    """
+    デバイスが変換なしで録音できる (サンプルレート, チャンネル数) を返す。
+    PortAudioに変換させずに録って、こちらで16kHzモノラルにするときに使うわ。
+    """
+    sd = _import_sounddevice()
+    info = sd.query_devices(device, 'input')
+    return int(info['default_samplerate']), int(info['max_input_channels'])
+
+
+class MicrophoneSource:
+    """
+    マイクからの録音。sounddeviceの入力ストリームをそのまま包むだけよ。
+    コールバックは sounddevice と同じ (indata, frames, time_info, status) で呼ばれる。
+    """
+
+    def __init__(self, sample_rate=16000, channels=1, dtype=np.float32, block_size=512, device=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = dtype
+        self.block_size = block_size
+        self.device = device  # マイクデバイスID（Noneならデフォルトマイク）
+        self.stream = None
+
+    def start(self, callback, on_finished=None):
+        """録音を始める（マイクに終わりは無いから on_finished は呼ばれない）"""
+        sd = _import_sounddevice()
+        if self.device is not None:
+            try:
+                device_info = sd.query_devices(self.device)
+                print(f"使用マイク: {device_info['name']} (ID: {self.device})")
+            except Exception as e:
+                print(f"マイク情報取得エラー: {e}")
+                print("デフォルトマイクを使用します。")
+                self.device = None
+        else:
+            print("デフォルトマイクを使用します。")
+
+        self.stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            dtype=self.dtype,
+            blocksize=self.block_size,
+            callback=callback,
+            device=self.device
+        )
+        self.stream.start()
+
+    def stop(self):
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class ReplaySource:
+    """
+    メモリ上の音声をマイクの代わりに block_size ずつコールバックへ渡すソース。
+    pace=1.0 なら実時間と同じ間隔で、2.0 なら倍速で、0 なら待たずに渡す。
+    同じ音声なら毎回同じ区切りのブロックになるから、テストや計測の入力に使える。
+    最後まで渡したら on_finished を呼ぶ。
+    """
+
+    def __init__(self, audio, sample_rate=16000, block_size=512, pace=1.0, repeat=1):
+        audio = np.asarray(audio, dtype=np.float32)
+        self.audio = audio.reshape(-1, 1) if audio.ndim == 1 else audio
+        self.sample_rate = sample_rate
+        self.channels = self.audio.shape[1]
+        self.block_size = block_size
+        self.pace = pace      # 実時間の何倍速で渡すか。0なら待たない
+        self.repeat = repeat  # 何回繰り返すか
+        self.stats = {"blocks": 0, "late_blocks": 0}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, callback, on_finished=None):
+        """別スレッドでブロックを渡し始める"""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback, on_finished),
+                                        name=f"{type(self).__name__}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def wait(self, timeout=None) -> bool:
+        """最後まで渡し終わるのを待つ。終わっていればTrue"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def blocks(self):
+        """渡すブロック（(block_size, channels) のfloat32配列）を順に返す"""
+        for _ in range(self.repeat):
+            for start in range(0, len(self.audio), self.block_size):
+                yield self.audio[start:start + self.block_size]
+
+    def _run(self, callback, on_finished):
+        interval = self.block_size / self.sample_rate / self.pace if self.pace else 0.0
+        next_at = time.monotonic()
+        try:
+            for block in self.blocks():
+                if self._stopped.is_set():
+                    return
+                if interval:
+                    delay = next_at - time.monotonic()
+                    if delay > 0:
+                        # stop()ですぐ抜けられるように、sleepではなくEventで待つ
+                        if self._stopped.wait(delay):
+                            return
+                    elif delay < -interval:
+                        self.stats["late_blocks"] += 1
+                    next_at += interval
+                callback(block, len(block), None, None)
+                self.stats["blocks"] += 1
+        finally:
+            if on_finished is not None and not self._stopped.is_set():
+                on_finished()
+
+
+class FileSource(ReplaySource):
+    """
+    音声ファイルをマイクの代わりに再生するソース。ファイル全体は読み込まず、少しずつ読みながら渡すわ。
+    sample_rate はファイルのサンプルレートになる。
+    """
+
+    def __init__(self, path, block_size=512, pace=1.0, repeat=1):
+        self.reader = AudioFileReader(path, block_size=block_size)
+        super().__init__(np.zeros((0, 1), dtype=np.float32), sample_rate=self.reader.sample_rate,
+                         block_size=block_size, pace=pace, repeat=repeat)
+        self.path = path
+
+    def blocks(self):
+        for _ in range(self.repeat):
+            for block in self.reader.blocks():
+                yield block.reshape(-1, 1)
+
+
+class StdinSource(ReplaySource):
+    """
+    標準入力（パイプ）から生のPCMを読むソース。他のプロセスの音声をループバックデバイス無しで流し込める。
+    例: ffmpeg -i input.mp3 -f s16le -ac 1 -ar 16000 - | python main.py --capture -
+    読めた分をすぐ渡す（ペースは書き込む側が決める）。
+    """
+
+    SAMPLE_FORMATS = {
+        "s16le": (np.dtype('<i2'), 32768.0),
+        "f32le": (np.dtype('<f4'), 1.0),
+    }
+
+    def __init__(self, stream=None, sample_rate=16000, channels=1, block_size=512, sample_format="s16le"):
+        if sample_format not in self.SAMPLE_FORMATS:
+            raise ValueError(f"StdinSource: サンプル形式は {', '.join(self.SAMPLE_FORMATS)} のどれかにしてちょうだい")
+        super().__init__(np.zeros((0, channels), dtype=np.float32), sample_rate=sample_rate,
+                         block_size=block_size, pace=0)
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self.dtype, self.scale = self.SAMPLE_FORMATS[sample_format]
+
+    def blocks(self):
+        frame_bytes = self.dtype.itemsize * self.channels
+        block_bytes = frame_bytes * self.block_size
+        pending = b""
+        while True:
+            data = self.stream.read(block_bytes - len(pending))
+            if not data:
+                break
+            pending += data
+            if len(pending) < block_bytes:
+                continue
+            yield self._decode(pending)
+            pending = b""
+        # 最後の端数（フレームに満たないバイトは捨てる）
+        usable = len(pending) - len(pending) % frame_bytes
+        if usable:
+            yield self._decode(pending[:usable])
+
+    def _decode(self, data: bytes) -> np.ndarray:
+        samples = np.frombuffer(data, dtype=self.dtype).astype(np.float32)
+        if self.scale != 1.0:
+            samples /= self.scale
+        return samples.reshape(-1, self.channels)
+
+
+def open_audio_source(spec=None, sample_rate=16000, channels=1, block_size=512, pace=1.0, device=None):
+    """
+    指定から入力ソースを作る。
+    - None / "mic": マイク（device で選ぶ）
+    - "-": 標準入力の16bit PCM（sample_rate, channels のとおりに読む）
+    - それ以外: 音声ファイルを pace 倍速で再生
+    """
+    if spec in (None, "mic"):
+        return MicrophoneSource(sample_rate=sample_rate, channels=channels, block_size=block_size, device=device)
+    if spec == "-":
+        return StdinSource(sample_rate=sample_rate, channels=channels, block_size=block_size)
+    return FileSource(spec, block_size=block_size, pace=pace)
@@ -0,0 +1,187 @@
+# infrastructure/cached_recognition_service.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.infrastructure.audio_encoder import AudioEncoder
+
+
+class TranscriptionCache:
+    """
+    認識結果を音声の内容で引けるようにするキャッシュ。
+    メモリ上のLRUと、任意でSQLiteのディスク層を持つ。ディスク層は合計サイズで古い順に追い出すわ。
+    複数のスレッド（認識プール）から同時に使われる前提でロックを取る。
+    """
+
+    def __init__(
+        self,
+        max_entries=1024,          # メモリに保持する件数
+        db_path=None,              # ディスク層のSQLiteファイル（Noneならメモリのみ）
+        max_disk_bytes=64 * 1024 * 1024  # ディスク層に保持するテキストの合計サイズ（バイト）
+    ):
+        self.max_entries = max(int(max_entries), 0)
+        self.db_path = db_path
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,  # ディスク層から追い出した件数
+        }
+
+        self._db = None
+        self._disk_bytes = 0
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS transcriptions ("
+                " key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS transcriptions_accessed ON transcriptions (accessed)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM transcriptions").fetchone()[0]
+
+    def get(self, key: str):
+        """キャッシュを引く。無ければNone"""
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return text
+
+            if self._db is not None:
+                row = self._db.execute("SELECT text FROM transcriptions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE transcriptions SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, text: str):
+        """認識結果を保存する"""
+        with self._lock:
+            self._remember(key, text)
+            self.stats["stores"] += 1
+            if self._db is None:
+                return
+            size = len(text.encode("utf-8")) + len(key)
+            old = self._db.execute("SELECT size FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, text, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time())
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._evict_disk()
+            self._db.commit()
+
+    def get_stats(self):
+        """ヒット率などの統計を返す"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, text: str):
+        """メモリ層に入れ、あふれた分は使われていない順に捨てる"""
+        if self.max_entries == 0:
+            return
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """ディスク層が上限を超えていたら、最後に使われたのが古い順に消す"""
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM transcriptions ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                return
+            for key, size in rows:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                self._db.execute("DELETE FROM transcriptions WHERE key = ?", (key,))
+                self._disk_bytes -= size
+                self.stats["evictions"] += 1
+
+
+class CachedRecognitionService:
+    """
+    任意の音声認識サービスを包んで、同じ音声の認識結果をキャッシュから返すデコレータ。
+    キーは16bit PCMにした音声のハッシュ（BLAKE2b）に、サービスの cache_namespace（バックエンド・モデル・言語）と
+    サンプルレートを加えたもの。cache_namespace を持たないサービスはクラス名・モデル・言語で分ける。
+    バッチの再実行や重複した録音では、認識済みの区間にAPIを呼ばないわ。
+    空の結果はエラーの可能性があるからキャッシュしない。
+    """
+
+    def __init__(self, service, cache: TranscriptionCache = None):
+        self.service = service
+        self.cache = cache or TranscriptionCache()
+        self.language = getattr(service, "language", None)
+        self.namespace = getattr(service, "cache_namespace", None) or "|".join([
+            type(service).__name__,
+            str(getattr(service, "model_name", "")),
+            str(self.language or ""),
+        ])
+
+    @property
+    def cache_namespace(self):
+        return self.namespace
+
+    def cache_key(self, audio_data: np.ndarray, sample_rate: int) -> str:
+        """音声の内容とサービスの設定から、キャッシュのキーを作る"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{self.namespace}|{sample_rate}|".encode("utf-8"))
+        digest.update(AudioEncoder.to_pcm16(np.asarray(audio_data, dtype=np.float32)).tobytes())
+        return digest.hexdigest()
+
+    def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
+        if audio_data is None or audio_data.size == 0:
+            return ""
+        key = self.cache_key(audio_data, sample_rate)
+        text = self.cache.get(key)
+        if text is not None:
+            return text
+
+        text = self.service.transcribe(audio_data, sample_rate)
+        if text:
+            self.cache.put(key, text)
+        return text
+
+    def get_stats(self):
+        return self.cache.get_stats()
+
+    def close(self):
+        """包んだサービスを片付ける（キャッシュは作った側が閉じる）"""
+        close = getattr(self.service, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,259 @@
+# infrastructure/failover_recognition_service.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from src.infrastructure.metrics import Histogram, LATENCY_BUCKETS
+from src.infrastructure.recognition_error import RecognitionError
+
+
+class BackendHealth:
+    """
+    1つの認識バックエンドの健康状態（サーキットブレーカー）とレイテンシの記録。
+    - closed:    普通に使う
+    - open:      連続で失敗したので reset_timeout 秒は使わない
+    - half_open: 休ませた後のお試し中。成功すればclosed、失敗すればまたopen
+    """
+
+    def __init__(self, name, service, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        # レート制限で包まれていたら外して持つ。トークン待ちは締め切りの外で済ませるため
+        self.rate_limiter = getattr(service, "rate_limiter", None)
+        if self.rate_limiter is not None:
+            service = service.service
+        self.service = service
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.histogram = Histogram(f"{name}_latency_seconds", buckets=LATENCY_BUCKETS)
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "late": 0}
+        self._lock = threading.Lock()
+
+    def acquire_token(self):
+        """レート制限があれば、リクエストを送れるようになるまで待つ"""
+        if self.rate_limiter is None:
+            return
+        waited = self.rate_limiter.acquire()
+        if waited:
+            print(f"FailoverRecognitionService: {self.name} のリクエスト上限のため {waited:.1f}秒待ったわ")
+
+    def record_call(self):
+        with self._lock:
+            self.stats["calls"] += 1
+
+    def is_available(self) -> bool:
+        """今リクエストを送ってよいか。休ませ終わったopenはhalf_openにする"""
+        with self._lock:
+            if self.state == "open" and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                print(f"FailoverRecognitionService: {self.name} をお試しで再開するわ")
+            return self.state != "open"
+
+    def record_success(self, latency: float, deadline: float):
+        """呼び出しの成功を記録する（締め切り後に返った分はレイテンシだけ）"""
+        with self._lock:
+            self.histogram.observe(latency)
+            if latency > deadline:
+                self.stats["late"] += 1
+                return
+            self.stats["successes"] += 1
+            self.consecutive_failures = 0
+            if self.state != "closed":
+                print(f"FailoverRecognitionService: {self.name} が復帰したわ")
+            self.state = "closed"
+
+    def record_failure(self):
+        """呼び出しの失敗を記録する"""
+        with self._lock:
+            self.stats["failures"] += 1
+            self._failed()
+
+    def record_timeout(self):
+        """締め切りまでに返らなかったことを失敗として記録する"""
+        with self._lock:
+            self.stats["timeouts"] += 1
+            self._failed()
+
+    def _failed(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                print(f"FailoverRecognitionService: {self.name} の失敗が続いたから {self.reset_timeout:.0f}秒休ませるわ")
+            self.state = "open"
+            self.opened_at = self._clock()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["state"] = self.state
+            stats["p50"] = self.histogram.quantile(0.5)
+            stats["p90"] = self.histogram.quantile(0.9)
+        return stats
+
+
+class FailoverRecognitionService:
+    """
+    複数の音声認識バックエンドを束ねて、1つのサービスとして使えるようにするクラス。
+    - 失敗・締め切り超過のときは次のバックエンドに切り替える（フェイルオーバー）
+    - 失敗が続いたバックエンドはサーキットブレーカーでしばらく外す
+    - レイテンシのヒストグラムを見て、速いバックエンドを優先する
+    - race=True なら上位2つに同時に送り、先に返った空でない結果を使う
+    全部のバックエンドが失敗したときは、空文字列ではなくRecognitionErrorを送出するわ。
+    バックエンドは失敗を例外で知らせる（raise_errors=True）ように作っておくこと。
+    RateLimitedRecognitionService で包んだバックエンドは、トークンを取ってから締め切りを数え始める。
+    """
+
+    def __init__(
+        self,
+        backends,                 # (名前, サービス) のリスト。並び順が初期の優先順
+        deadline=10.0,            # 1バックエンドあたりの締め切り（秒）
+        race=False,               # 上位2つに同時に送るか
+        failure_threshold=3,      # 連続でこれだけ失敗したらサーキットを開く
+        reset_timeout=30.0,       # サーキットを開いてから再開を試すまでの秒数
+        latency_quantile=0.9,     # 優先順を決めるレイテンシの分位点
+        min_latency_samples=5,    # レイテンシで並べ替えるのに必要な実績数
+        clock=time.monotonic
+    ):
+        if not backends:
+            raise ValueError("FailoverRecognitionService: バックエンドを1つ以上指定してちょうだい")
+        self.backends = [
+            BackendHealth(name, service, failure_threshold=failure_threshold,
+                          reset_timeout=reset_timeout, clock=clock)
+            for name, service in backends
+        ]
+        self.deadline = deadline
+        self.race = race
+        self.latency_quantile = latency_quantile
+        self.min_latency_samples = min_latency_samples
+        self.language = getattr(backends[0][1], "language", None)
+        self.model_name = "+".join(name for name, _ in backends)
+        # 締め切りを過ぎた呼び出しも裏で動き続けるから、スレッドは多めに持つ
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.backends),
+                                            thread_name_prefix="recognition-backend")
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "failovers": 0, "races": 0, "errors": 0}
+
+    @property
+    def cache_namespace(self):
+        """どのバックエンドの結果が返るかは分からないから、全バックエンドの名前をつなげる"""
+        namespaces = [getattr(backend.service, "cache_namespace", None) for backend in self.backends]
+        if None in namespaces:
+            return None
+        return "+".join(namespaces)
+
+    def ranked_backends(self):
+        """使えるバックエンドを優先順に並べる。全部休み中なら、一番早く休ませたものを使う"""
+        ranked = []
+        for index, backend in enumerate(self.backends):
+            if not backend.is_available():
+                continue
+            latency = None
+            if backend.histogram.count() >= self.min_latency_samples:
+                latency = backend.histogram.quantile(self.latency_quantile)
+            # 実績の無いものは実績のあるものの後に設定順で並べる（お試し中のものも順番どおり1回送ってみる）
+            ranked.append((latency is None, latency or 0.0, index, backend))
+        if not ranked:
+            return [min(self.backends, key=lambda b: b.opened_at)]
+        return [entry[-1] for entry in sorted(ranked, key=lambda entry: entry[:3])]
+
+    def close(self):
+        """バックエンドを片付ける。締め切りを過ぎて裏で動いている呼び出しは待たない"""
+        self._executor.shutdown(wait=False)
+        for backend in self.backends:
+            close = getattr(backend.service, "close", None)
+            if close is not None:
+                close()
+
+    def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
+        if audio_data is None or audio_data.size == 0:
+            return ""
+        self._count("requests")
+        backends = self.ranked_backends()
+        errors = []
+
+        if self.race and len(backends) >= 2:
+            self._count("races")
+            text = self._race(backends[:2], audio_data, sample_rate, errors)
+            if text is not None:
+                return text
+            backends = backends[2:]
+
+        for backend in backends:
+            if errors:
+                self._count("failovers")
+                print(f"FailoverRecognitionService: {backend.name} に切り替えるわ")
+            backend.acquire_token()
+            future = self._submit(backend, audio_data, sample_rate)
+            try:
+                return future.result(timeout=self.deadline)
+            except FutureTimeoutError:
+                backend.record_timeout()
+                errors.append(f"{backend.name}: {self.deadline}秒の締め切りを過ぎたわ")
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+
+        self._count("errors")
+        raise RecognitionError("全バックエンドで認識に失敗したわ（" + " / ".join(errors) + "）")
+
+    def _count(self, key):
+        # 認識プールの複数スレッドから同時に呼ばれるから、ロックを取って数える
+        with self._lock:
+            self.stats[key] += 1
+
+    def _submit(self, backend, audio_data, sample_rate):
+        backend.record_call()
+        return self._executor.submit(self._call, backend, audio_data, sample_rate)
+
+    def _call(self, backend, audio_data, sample_rate):
+        """スレッド内でバックエンドを呼び、結果を記録してから返す"""
+        started = time.monotonic()
+        try:
+            text = backend.service.transcribe(audio_data, sample_rate)
+        except Exception:
+            backend.record_failure()
+            raise
+        backend.record_success(time.monotonic() - started, self.deadline)
+        return text
+
+    def _race(self, backends, audio_data, sample_rate, errors):
+        """
+        同じ音声を複数のバックエンドに送り、先に返った空でない結果を返す。
+        全部が空を返したら空文字列、1つも成功しなければNone（呼び出し側で次を試す）。
+        """
+        for backend in backends:
+            backend.acquire_token()
+        futures = {self._submit(backend, audio_data, sample_rate): backend for backend in backends}
+        pending = set(futures)
+        deadline = time.monotonic() + self.deadline
+        succeeded = False
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(f"{futures[future].name}: {future.exception()}")
+                    continue
+                succeeded = True
+                if future.result():
+                    return future.result()
+        for future in pending:
+            futures[future].record_timeout()
+            errors.append(f"{futures[future].name}: {self.deadline}秒の締め切りを過ぎたわ")
+        return "" if succeeded else None
+
+    def get_stats(self):
+        """全体とバックエンドごとの統計を返す"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["backends"] = {backend.name: backend.get_stats() for backend in self.backends}
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
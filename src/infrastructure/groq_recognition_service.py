@@ -1,45 +1,79 @@
 # infrastructure/groq_recognition_service.py
 
 import os
-import io
-import wave
 import numpy as np
 from groq import Groq
 
+from src.infrastructure.audio_encoder import AudioEncoder
+from src.infrastructure.recognition_error import RecognitionError
+from src.infrastructure.http_transport import TransportConfig, RequestExecutor
+
 class GroqRecognitionService:
     """
     Groq APIを使って音声をテキストに変換するクラス。
     Whisper Large V3 Turboモデルを利用するわ。
     """
 
-    def __init__(self, language="ja-JP"):
+    # Groq APIが受け付けるアップロード形式
+    SUPPORTED_FORMATS = ("flac", "ogg", "wav")
+    backend = "groq"
+    # 使用するモデル
+    model_name = "whisper-large-v3-turbo"
+
+    def __init__(self, language="ja-JP", audio_format=None, transport=None, raise_errors=False, metrics=None):
+        # Trueなら失敗時に空文字列ではなくRecognitionErrorを送出する
+        self.raise_errors = raise_errors
         self.language = language
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        # 通信設定（省略時は環境変数 GROQ_TIMEOUT などから読み込む）
+        self.transport = transport or TransportConfig.from_env("GROQ")
+        self.http_client = self.transport.create_http_client()
+        # リトライは RequestExecutor 側で締め切りに合わせて行うから、SDKのリトライは切っておく
+        self.client = Groq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            http_client=self.http_client,
+            max_retries=0
+        )
+        self.executor = RequestExecutor(self.transport, name=self.__class__.__name__, metrics=metrics)
+        # アップロード形式（省略時は環境変数 GROQ_AUDIO_FORMAT、なければflac）
+        audio_format = (audio_format or os.getenv("GROQ_AUDIO_FORMAT") or "flac").lower()
+        if audio_format not in self.SUPPORTED_FORMATS:
+            print(f"GroqRecognitionService: {audio_format} は使えないから wav にするわ")
+            audio_format = "wav"
+        self.encoder = AudioEncoder(audio_format, metrics=metrics)
+
+    @property
+    def cache_namespace(self) -> str:
+        """認識結果のキャッシュを分ける名前（バックエンド・モデル・言語）"""
+        return f"{self.backend}|{self.model_name}|{self.language or ''}"
+
+    def close(self):
+        """ヘッジ用のスレッドとコネクションプールを片付ける"""
+        self.executor.close()
+        self.http_client.close()
 
     def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
         """
-        NumPy配列をWAVに変換してGroq APIで音声認識を行う。
+        NumPy配列をアップロード形式に変換してGroq APIで音声認識を行う。
         """
         if audio_data is None or audio_data.size == 0:
             return ""
 
-        # NumPy配列 → WAVバイナリに変換
-        with io.BytesIO() as wav_buffer:
-            with wave.open(wav_buffer, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)  # 16bit
-                wf.setframerate(sample_rate)
-                wf.writeframes((audio_data * 32767).astype('int16').tobytes())
-
-            try:
-                # バッファを巻き戻してGroq APIに送信
-                wav_buffer.seek(0)
-                transcription = self.client.audio.transcriptions.create(
-                    file=("audio.wav", wav_buffer.read()),
-                    model="whisper-large-v3-turbo",
-                    response_format="verbose_json"
+        # NumPy配列 → アップロード用バイナリに変換（コピーせずに渡す）
+        encoded = self.encoder.encode(audio_data, sample_rate)
+
+        try:
+            # ヘッジ時は同じ音声を別リクエストでも送るから、ファイルは呼び出しごとに作る
+            transcription = self.executor.call(
+                lambda timeout: self.client.audio.transcriptions.create(
+                    file=(encoded.filename, encoded.as_file(), encoded.mime_type),
+                    model=self.model_name,
+                    response_format="verbose_json",
+                    timeout=timeout
                 )
-                return transcription.text
-            except Exception as e:
-                print(f"GroqRecognitionService: 予期せぬエラーが発生したわ: {e}")
-                return ""
\ No newline at end of file
+            )
+            return transcription.text
+        except Exception as e:
+            if self.raise_errors:
+                raise RecognitionError(f"予期せぬエラーが発生したわ: {e}", self.model_name) from e
+            print(f"GroqRecognitionService: 予期せぬエラーが発生したわ: {e}")
+            return ""
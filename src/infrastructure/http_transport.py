@@ -0,0 +1,208 @@
+# infrastructure/http_transport.py
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+
+from src.infrastructure.metrics import Histogram, LATENCY_BUCKETS, get_metrics
+
+
+class TransportConfig:
+    """
+    OpenAI/GroqのSDKに渡すHTTP通信の設定。
+    コネクションプール、keep-alive、リクエストごとの締め切り、リトライ、ヘッジをまとめて持つわ。
+    """
+
+    def __init__(
+        self,
+        timeout=15.0,                # 1リクエストの締め切り（秒）。リトライ込みの上限
+        connect_timeout=3.0,         # 接続確立のタイムアウト（秒）
+        max_connections=8,           # プールの最大接続数
+        max_keepalive_connections=4,  # keep-aliveで保持する接続数
+        keepalive_expiry=60.0,       # keep-alive接続を保持する秒数
+        max_retries=2,               # 失敗時の再試行回数
+        backoff_base=0.25,           # バックオフの基準秒数
+        backoff_max=4.0,             # バックオフの上限秒数
+        hedge=False,                 # ヘッジ（遅いリクエストの複製送信）を行うか
+        hedge_quantile=0.95,         # ヘッジ開始を決めるレイテンシの分位点
+        hedge_delay=2.0,             # レイテンシの実績が少ないうちのヘッジ開始秒数
+        hedge_min_samples=20         # 分位点を使い始めるのに必要な実績数
+    ):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+
+    @classmethod
+    def from_env(cls, prefix: str):
+        """
+        環境変数から設定を読み込む（例: OPENAI_TIMEOUT, OPENAI_MAX_RETRIES, OPENAI_HEDGE）。
+        未設定の項目はデフォルト値のまま。
+        """
+        config = cls()
+        for name, cast in (
+            ("timeout", float),
+            ("connect_timeout", float),
+            ("max_connections", int),
+            ("max_keepalive_connections", int),
+            ("keepalive_expiry", float),
+            ("max_retries", int),
+            ("backoff_base", float),
+            ("backoff_max", float),
+            ("hedge_quantile", float),
+            ("hedge_delay", float),
+            ("hedge_min_samples", int),
+        ):
+            value = os.getenv(f"{prefix}_{name.upper()}")
+            if value:
+                setattr(config, name, cast(value))
+        hedge = os.getenv(f"{prefix}_HEDGE")
+        if hedge:
+            config.hedge = hedge.lower() in ("1", "true", "yes", "on")
+        return config
+
+    def create_http_client(self) -> httpx.Client:
+        """設定どおりのコネクションプールを持つhttpxクライアントを作る"""
+        return httpx.Client(
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+        )
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """再試行して意味のあるエラーかどうかを判定する"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in (408, 409, 429) or status_code >= 500
+    # SDKの接続エラー・タイムアウト（openai/groqで同名のクラス）
+    return any(c.__name__ == "APIConnectionError" for c in type(error).__mro__)
+
+
+class RequestExecutor:
+    """
+    SDK呼び出しに締め切り付きのリトライとヘッジを掛けるクラス。
+    呼び出す関数は残り時間（秒）を受け取り、それをSDKのtimeoutに渡すこと。
+    ヘッジするときは最初のリクエストとヘッジをどちらもプールで送り、先に成功した方を使うわ。
+    """
+
+    def __init__(self, config: TransportConfig, name="RequestExecutor", metrics=None):
+        self.config = config
+        self.name = name
+        self.metrics = metrics if metrics is not None else get_metrics()
+        # ヘッジの待ち時間を決めるレイテンシの実績（計測を切っていても記録する）
+        self.latency = Histogram(f"{name}_latency_seconds", buckets=LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+        self._hedge_pool = None
+        if config.hedge:
+            # 1回の呼び出しで最初のリクエストとヘッジの2本を使う。同時に送れるのは接続プールの数までだから、
+            # その2倍あればヘッジが順番待ちで遅れることはないわ
+            self._hedge_pool = ThreadPoolExecutor(max_workers=2 * max(int(config.max_connections), 1),
+                                                  thread_name_prefix=f"{name}-hedge")
+        self.stats = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    def call(self, fn):
+        """fn(timeout) を実行して結果を返す。最終的に失敗したら最後の例外を送出する"""
+        deadline = time.monotonic() + self.config.timeout
+        self._count("requests")
+        if self._hedge_pool is None:
+            return self._call_with_retries(fn, deadline)
+        return self._call_hedged(fn, deadline)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self):
+        """ヘッジ用のスレッドを止める（送信中のヘッジが終わるまで待つ）"""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=True)
+
+    def _count(self, key):
+        # 認識プールの複数スレッドから同時に呼ばれるから、ロックを取って数える
+        with self._lock:
+            self.stats[key] += 1
+
+    def hedge_delay(self) -> float:
+        """ヘッジを送るまでの待ち時間（実績レイテンシの分位点）"""
+        if self.latency.count() < self.config.hedge_min_samples:
+            return self.config.hedge_delay
+        return self.latency.quantile(self.config.hedge_quantile)
+
+    def _call_with_retries(self, fn, deadline):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{self.name}: 締め切りを過ぎたわ")
+            started = time.monotonic()
+            try:
+                result = fn(remaining)
+            except Exception as e:
+                self.metrics.counter("voicescribe_backend_errors_total", "認識バックエンドへのリクエストの失敗数").inc(
+                    backend=self.name)
+                if attempt >= self.config.max_retries or not is_retryable_error(e):
+                    raise
+                # 指数バックオフにフルジッタを掛けて待つ
+                backoff = min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt))
+                sleep = random.uniform(0, backoff)
+                if time.monotonic() + sleep >= deadline:
+                    raise
+                attempt += 1
+                self._count("retries")
+                print(f"{self.name}: 再試行するわ ({attempt}/{self.config.max_retries}): {e}")
+                time.sleep(sleep)
+                continue
+            latency = time.monotonic() - started
+            self.latency.observe(latency)
+            self.metrics.histogram("voicescribe_backend_request_seconds", "認識バックエンドへの1リクエストの通信時間").observe(
+                latency, backend=self.name)
+            return result
+
+    def _call_hedged(self, fn, deadline):
+        """
+        最初のリクエストがヘッジの待ち時間内に返らなければ、同じリクエストをもう1本送る。
+        先に成功した方の結果を返し、遅い方はSDKのtimeoutまで走らせたまま手放すわ。
+        """
+        primary = self._hedge_pool.submit(self._call_with_retries, fn, deadline)
+        delay = min(self.hedge_delay(), max(deadline - time.monotonic(), 0))
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self._count("hedges")
+        hedge = self._hedge_pool.submit(self._call_with_retries, fn, deadline)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    self._count("hedge_wins")
+                return result
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"{self.name}: 締め切りを過ぎたわ")
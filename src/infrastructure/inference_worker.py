@@ -0,0 +1,468 @@
+# infrastructure/inference_worker.py
+
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.domain.vad_service import VADService
+from src.infrastructure.metrics import get_metrics
+from src.infrastructure.recognition_error import RecognitionError
+
+
+# torchやスレッドを抱えた親をforkすると固まることがあるから、子プロセスは常にspawnで作る
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class _WorkerProcess:
+    """
+    共有メモリ1枚と双方向パイプでつながった子プロセス。
+    音声は共有メモリに書き、パイプには位置と長さの小さなタプルだけを流すわ（サンプルはpickleしない）。
+    """
+
+    def __init__(self, target, nbytes, args, name, start_timeout):
+        self.target = target
+        self.nbytes = nbytes
+        self.args = args
+        self.name = name
+        self.start_timeout = start_timeout
+        self.process = None
+        self.conn = None
+        self.shm = None
+        self.info = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        self.shm = shared_memory.SharedMemory(create=True, size=self.nbytes)
+        self.conn, child_conn = _CONTEXT.Pipe()
+        self.process = _CONTEXT.Process(target=self.target, args=(child_conn, self.shm.name) + self.args,
+                                        name=self.name, daemon=True)
+        self.process.start()
+        child_conn.close()
+        # モデルの読み込みが終わるまで待つ
+        if not self.conn.poll(self.start_timeout):
+            self.stop()
+            raise RuntimeError(f"{self.name}: {self.start_timeout}秒待っても子プロセスが起動しなかったわ")
+        kind, payload = self.conn.recv()
+        if kind != "ready":
+            self.stop()
+            raise RuntimeError(f"{self.name}: 子プロセスの起動に失敗したわ: {payload}")
+        self.info = payload
+
+    def array(self, dtype, count, offset=0) -> np.ndarray:
+        """共有メモリ上の領域をNumPy配列として見る（コピーしない）"""
+        return np.ndarray((count,), dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def stop(self, timeout=5.0):
+        if self.process is not None:
+            try:
+                if self.process.is_alive():
+                    self.conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        if self.conn is not None:
+            self.conn.close()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        self.process = self.conn = self.shm = None
+
+
+class RemoteVADStream:
+    """
+    別プロセスのVADに対応するストリームの手元側。
+    窓に満たない端数だけをここで持ち、隠れ状態と一次判定の状態は子プロセス側に stream_id で持つわ。
+    """
+
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.remainder = np.zeros(0, dtype=np.float32)
+        self.pending_reset = False  # 次の推論の前に子プロセス側の状態を初期化するか
+
+    def reset(self):
+        self.remainder = np.zeros(0, dtype=np.float32)
+        self.pending_reset = True
+
+
+class _RemoteGateStats:
+    """子プロセス側の一次判定の統計を、EnergyGate と同じ get_stats() で取り出す"""
+
+    def __init__(self, service):
+        self._service = service
+
+    def get_stats(self):
+        return self._service.request_gate_stats()
+
+
+def _vad_worker_main(conn, shm_name, max_windows, options):
+    """VADの子プロセス。共有メモリの窓を推論して、発話確率を同じ共有メモリに書き戻す"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    window = max(VADService.WINDOW_SIZES.values())
+    frames_buffer = np.ndarray((max_windows * window,), dtype=np.float32, buffer=shm.buf)
+    probs_buffer = np.ndarray((max_windows,), dtype=np.float32, buffer=shm.buf, offset=max_windows * window * 4)
+    try:
+        try:
+            vad_service = VADService(**options)
+            vad_service.load()
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            return
+        conn.send(("ready", None))
+        streams = {}
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message[0] == "stop":
+                break
+            if message[0] == "gate_stats":
+                gate = vad_service.energy_gate
+                conn.send(("ok", gate.get_stats() if gate is not None else None))
+                continue
+            _, stream_id, n_windows, window_size, sample_rate, degraded, reset = message
+            stream = streams.get(stream_id)
+            if stream is None:
+                stream = streams[stream_id] = vad_service.create_stream()
+            elif reset:
+                stream.reset()
+            try:
+                frames = frames_buffer[:n_windows * window_size].reshape(n_windows, window_size)
+                probs_buffer[:n_windows] = vad_service.score_windows(frames, sample_rate, stream, degraded)
+                conn.send(("ok", None))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        # 共有メモリを閉じる前に、領域を見ている配列を手放す
+        del frames_buffer, probs_buffer
+        shm.close()
+
+
+class ProcessVADService:
+    """
+    VADの推論を別プロセスで行うVADService。
+    torchの推論がGILを握って録音コールバックを待たせないように、モデルは子プロセスに置くわ。
+    - 窓への切り出しは手元で行い、窓は共有メモリに書いて子プロセスに渡す（サンプルはpickleしない）
+    - 子プロセスはstart()で起動し、stop()で止める（start前に推論すればその場で起動する）
+    - 子プロセスが落ちていたら1回だけ起動し直して推論をやり直す（隠れ状態は初期化される）
+    VADService と同じく create_stream / reset_stream / score_stream を持つから、AudioController からはそのまま使える。
+    """
+
+    WINDOW_SIZES = VADService.WINDOW_SIZES
+
+    def __init__(
+        self,
+        threshold=0.5,
+        backend=None,
+        model_path=None,
+        sha256=None,
+        energy_gate=None,
+        max_windows=512,     # 1回で子プロセスに渡せる窓数（共有メモリの大きさを決める）
+        start_timeout=120.0  # 子プロセスの起動（モデルの読み込み）を待つ秒数
+    ):
+        self.threshold = threshold
+        # 一次判定は子プロセス側で行う。統計だけ取り出せるようにしておく
+        self.energy_gate = _RemoteGateStats(self) if energy_gate is not None else None
+        self.max_windows = max(int(max_windows), 1)
+        self._options = dict(threshold=threshold, backend=backend, model_path=model_path, sha256=sha256,
+                             energy_gate=energy_gate)
+        window = max(self.WINDOW_SIZES.values())
+        self._worker = _WorkerProcess(
+            _vad_worker_main,
+            nbytes=self.max_windows * (window + 1) * 4,
+            args=(self.max_windows, self._options),
+            name="vad-worker",
+            start_timeout=start_timeout
+        )
+        self._lock = threading.Lock()
+        self._stream_ids = itertools.count()
+        self.stats = {"requests": 0, "windows": 0, "restarts": 0}
+        self.stream = self.create_stream()
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker.is_alive
+
+    def start(self):
+        """子プロセスを起動してモデルを読み込ませる（起動済みなら何もしない）"""
+        with self._lock:
+            self._ensure_started()
+        return self
+
+    def load(self):
+        return self.start()
+
+    def stop(self):
+        """子プロセスを止めて共有メモリを解放する"""
+        with self._lock:
+            self._worker.stop()
+
+    def _ensure_started(self):
+        if not self._worker.is_alive:
+            if self._worker.process is not None:
+                # 止めていないのに子プロセスが終わっていた（隠れ状態は子プロセスと一緒に消えている）
+                print("ProcessVADService: VADの子プロセスが終了していたから起動し直すわ")
+                self.stats["restarts"] += 1
+                self._worker.stop()
+            self._worker.start()
+            self._frames = self._worker.array(np.float32, self.max_windows * max(self.WINDOW_SIZES.values()))
+            self._probs = self._worker.array(np.float32, self.max_windows, offset=self._frames.nbytes)
+
+    def window_size(self, sample_rate: int) -> int:
+        if sample_rate not in self.WINDOW_SIZES:
+            raise ValueError(f"ProcessVADService: 未対応のサンプルレートよ: {sample_rate}")
+        return self.WINDOW_SIZES[sample_rate]
+
+    def create_stream(self) -> RemoteVADStream:
+        return RemoteVADStream(next(self._stream_ids))
+
+    def reset_stream(self, stream: RemoteVADStream = None):
+        (stream or self.stream).reset()
+
+    def score_stream(self, audio_chunk: np.ndarray, sample_rate: int, stream: RemoteVADStream = None,
+                     degraded: bool = False):
+        """VADService.score_stream と同じく (frames, probs) を返す。推論だけを子プロセスで行う"""
+        stream = stream or self.stream
+        frames = VADService._split_windows(audio_chunk, self.window_size(sample_rate), stream)
+        return frames, self.score_windows(frames, sample_rate, stream, degraded)
+
+    def score_windows(self, frames: np.ndarray, sample_rate: int, stream: RemoteVADStream = None,
+                      degraded: bool = False) -> np.ndarray:
+        stream = stream or self.stream
+        probs = np.zeros(len(frames), dtype=np.float32)
+        with self._lock:
+            for start in range(0, len(frames), self.max_windows):
+                chunk = frames[start:start + self.max_windows]
+                try:
+                    probs[start:start + len(chunk)] = self._request(chunk, sample_rate, stream, degraded)
+                except (EOFError, OSError):
+                    print("ProcessVADService: VADの子プロセスが応答しないから起動し直すわ")
+                    self.stats["restarts"] += 1
+                    self._worker.stop()
+                    probs[start:start + len(chunk)] = self._request(chunk, sample_rate, stream, degraded)
+        return probs
+
+    def _request(self, frames, sample_rate, stream, degraded):
+        self._ensure_started()
+        n_windows, window = frames.shape
+        self._frames[:n_windows * window] = frames.reshape(-1)
+        self._worker.conn.send(("score", stream.stream_id, n_windows, window, sample_rate, bool(degraded),
+                                stream.pending_reset))
+        stream.pending_reset = False
+        kind, payload = self._worker.conn.recv()
+        if kind != "ok":
+            raise RuntimeError(f"ProcessVADService: 子プロセスで推論に失敗したわ: {payload}")
+        self.stats["requests"] += 1
+        self.stats["windows"] += n_windows
+        return self._probs[:n_windows].copy()
+
+    def request_gate_stats(self):
+        """子プロセス側の一次判定の統計（子プロセスが動いていなければNone）"""
+        with self._lock:
+            if not self._worker.is_alive:
+                return None
+            self._worker.conn.send(("gate_stats",))
+            return self._worker.conn.recv()[1]
+
+
+def _recognition_worker_main(conn, shm_name, slots, slot_samples, service_class, service_options):
+    """音声認識の子プロセス。共有メモリのスロットにある音声を認識して、テキストをパイプで返す"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    buffers = [np.ndarray((slot_samples,), dtype=np.float32, buffer=shm.buf, offset=i * slot_samples * 4)
+               for i in range(slots)]
+    send_lock = threading.Lock()
+    try:
+        try:
+            service = service_class(**service_options)
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            return
+        conn.send(("ready", {"model_name": getattr(service, "model_name", None),
+                             "language": getattr(service, "language", None)}))
+
+        def run(request_id, slot, n_samples, sample_rate):
+            try:
+                reply = ("ok", request_id, service.transcribe(buffers[slot][:n_samples], sample_rate))
+            except Exception as e:
+                reply = ("error", request_id, str(e))
+            with send_lock:
+                conn.send(reply)
+
+        with ThreadPoolExecutor(max_workers=slots, thread_name_prefix="recognition") as executor:
+            while True:
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    break
+                if message[0] == "stop":
+                    break
+                executor.submit(run, *message[1:])
+    finally:
+        del buffers
+        shm.close()
+
+
+class ProcessRecognitionService:
+    """
+    音声認識サービス（ローカルWhisperなど、CPUで推論するもの）を別プロセスで動かすクラス。
+    - service_class(**service_options) を子プロセスで作る（モデルの読み込みも子プロセスで行う）
+    - 音声は slots 個ある共有メモリのスロットに書いて渡し、テキストだけがパイプで返ってくる
+    - 同時に投げられるのはスロットの数まで。それ以上は空くまで待つ
+    - request_timeout 秒待っても返らなければ子プロセスが固まったとみなして止め、RecognitionErrorにする
+    子プロセスはstart()で起動し、stop()で止める（start前に認識すればその場で起動する。落ちていたら起動し直す）。
+    """
+
+    def __init__(
+        self,
+        service_class,            # 子プロセスで作る音声認識サービスのクラス（importできる場所にあること）
+        service_options=None,     # そのクラスに渡す引数
+        model_name=None,          # キャッシュのキーなどに使うモデル名（省略時はクラス名）
+        language=None,
+        slots=2,                  # 同時に認識できる数
+        max_seconds=120.0,        # 1区間の最大長（秒）。スロットの大きさを決める
+        sample_rate=16000,
+        start_timeout=300.0,      # 子プロセスの起動（モデルの読み込み）を待つ秒数
+        request_timeout=300.0,    # 1区間の認識結果を待つ秒数
+        metrics=None              # 計測値の入れ物（省略時はプロセス全体の設定）。子プロセスには渡さない
+    ):
+        self.model_name = model_name or service_class.__name__
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.language = language
+        # キャッシュは子プロセスで動かすサービスと同じ名前で分ける（同じプロセスで動かしたときの結果も使える）
+        self.backend = getattr(service_class, "backend", service_class.__name__)
+        self.slots = max(int(slots), 1)
+        self.slot_samples = int(max_seconds * sample_rate)
+        self.request_timeout = request_timeout
+        self._worker = _WorkerProcess(
+            _recognition_worker_main,
+            nbytes=self.slots * self.slot_samples * 4,
+            args=(self.slots, self.slot_samples, service_class, dict(service_options or {})),
+            name="recognition-worker",
+            start_timeout=start_timeout
+        )
+        self._lock = threading.Lock()
+        # 起動と停止を1つずつ行うためのロック（_lock より先に取る）
+        self._start_lock = threading.Lock()
+        # スロットは子プロセスを起動し直しても同じものを使い回す。待っているスレッドがいるから作り直さない
+        self._free_slots = list(range(self.slots))
+        self._slot_available = threading.Semaphore(self.slots)
+        self._pending = {}  # リクエストID → (Future, スロット)
+        self._request_ids = itertools.count()
+        self._receiver = None
+
+    @property
+    def cache_namespace(self) -> str:
+        """認識結果のキャッシュを分ける名前（バックエンド・モデル・言語）"""
+        return f"{self.backend}|{self.model_name}|{self.language or ''}"
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker.is_alive
+
+    def start(self):
+        """子プロセスを起動して、結果を受け取るスレッドを動かす（起動済みなら何もしない）"""
+        with self._start_lock:
+            if self._worker.is_alive:
+                return self
+            if self._worker.process is not None:
+                # 止めていないのに子プロセスが終わっていた。共有メモリとパイプを片付けてから起動し直す
+                print("ProcessRecognitionService: 音声認識の子プロセスが終了していたから起動し直すわ")
+                self._stop()
+            with self._lock:
+                self._worker.start()
+                self._buffers = [self._worker.array(np.float32, self.slot_samples, offset=i * self.slot_samples * 4)
+                                 for i in range(self.slots)]
+                self._receiver = threading.Thread(target=self._receive, args=(self._worker.conn,),
+                                                  name="recognition-receiver", daemon=True)
+                self._receiver.start()
+        return self
+
+    def stop(self):
+        """子プロセスを止める。返ってきていないリクエストはエラーにする"""
+        with self._start_lock:
+            self._stop()
+
+    def _stop(self, timeout=5.0):
+        with self._lock:
+            self._buffers = []
+            self._worker.stop(timeout)
+            self._fail_pending("音声認識の子プロセスを止めたわ")
+        if self._receiver is not None:
+            self._receiver.join()
+            self._receiver = None
+
+    def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
+        if audio_data is None or audio_data.size == 0:
+            return ""
+        audio = np.asarray(audio_data, dtype=np.float32).reshape(-1)
+        if audio.size > self.slot_samples:
+            raise RecognitionError(f"区間が長すぎて共有メモリのスロットに入らないわ（{audio.size}サンプル）",
+                                   self.model_name)
+        self.start()
+
+        self._slot_available.acquire()
+        future = Future()
+        started = time.monotonic()
+        with self._lock:
+            slot = self._free_slots.pop()
+            request_id = next(self._request_ids)
+            self._pending[request_id] = (future, slot)
+            try:
+                self._buffers[slot][:audio.size] = audio
+                self._worker.conn.send(("transcribe", request_id, slot, audio.size, sample_rate))
+            except (OSError, ValueError, IndexError, AttributeError) as e:
+                self._release(request_id)
+                raise RecognitionError(f"音声認識の子プロセスに送れなかったわ: {e}", self.model_name) from e
+        try:
+            text = future.result(timeout=self.request_timeout)
+        except FutureTimeoutError:
+            # 子プロセスが生きたまま応答しない。終わるのを待たずに止めておけば、次の認識で起動し直す
+            print(f"ProcessRecognitionService: {self.request_timeout}秒待っても認識が返らないから子プロセスを止めるわ")
+            with self._start_lock:
+                self._stop(timeout=0)
+            raise RecognitionError(f"{self.request_timeout}秒待っても音声認識の子プロセスが応答しなかったわ",
+                                   self.model_name) from None
+        self.metrics.histogram("voicescribe_backend_request_seconds", "認識バックエンドへの1リクエストの通信時間").observe(
+            time.monotonic() - started, backend=self.model_name)
+        return text
+
+    def _release(self, request_id):
+        """リクエストを片付けてスロットを返す（ロックを取ってから呼ぶ）"""
+        future, slot = self._pending.pop(request_id)
+        self._free_slots.append(slot)
+        self._slot_available.release()
+        return future
+
+    def _fail_pending(self, message):
+        for request_id in list(self._pending):
+            future = self._release(request_id)
+            future.set_exception(RecognitionError(message, self.model_name))
+
+    def _receive(self, conn):
+        """子プロセスからの結果を受け取り、待っているリクエストに渡す"""
+        while True:
+            try:
+                kind, request_id, payload = conn.recv()
+            except (EOFError, OSError, TypeError, ValueError):
+                break
+            with self._lock:
+                if request_id not in self._pending:
+                    continue
+                future = self._release(request_id)
+            if kind == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(RecognitionError(payload, self.model_name))
+        with self._lock:
+            self._fail_pending("音声認識の子プロセスが終了したわ")
@@ -0,0 +1,120 @@
+# infrastructure/local_recognition_service.py
+
+import os
+import threading
+import time
+import numpy as np
+
+from src.domain.resampler import resample
+from src.infrastructure.metrics import get_metrics
+from src.infrastructure.recognition_error import RecognitionError
+
+
+class LocalRecognitionService:
+    """
+    faster-whisper（CTranslate2）を使ってローカルのCPUで音声認識するクラス。
+    ネットワーク不要で、モデルはプロセス内で1回だけ読み込んで使い回すわ。
+    """
+
+    # 読み込み済みモデルのキャッシュ（同じ設定のインスタンス間で共有する）
+    _models = {}
+    _models_lock = threading.Lock()
+
+    # Whisperモデルの入力サンプルレート
+    MODEL_SAMPLE_RATE = 16000
+    backend = "local"
+
+    def __init__(
+        self,
+        language="ja-JP",
+        model_name=None,     # モデル名またはパス（省略時は環境変数 LOCAL_WHISPER_MODEL、なければsmall）
+        compute_type=None,   # 量子化の種類（省略時は環境変数 LOCAL_WHISPER_COMPUTE_TYPE、なければint8）
+        cpu_threads=None,    # 推論スレッド数（省略時は環境変数 LOCAL_WHISPER_THREADS、0で自動）
+        num_workers=1,       # 同時に推論できる数（認識プールのワーカー数に合わせる）
+        beam_size=1,         # ビームサーチ幅（1で貪欲法。速度優先）
+        warmup=True,         # 読み込み直後に空の音声で1回推論しておくか
+        raise_errors=False,  # Trueなら失敗時に空文字列ではなくRecognitionErrorを送出する
+        metrics=None         # 計測値の入れ物（省略時はプロセス全体の設定）
+    ):
+        # "ja-JP" → "ja" のように言語コードだけを使う
+        self.language = language.split("-")[0] if language else None
+        self.model_name = self.resolve_model_name(model_name)
+        self.compute_type = compute_type or os.getenv("LOCAL_WHISPER_COMPUTE_TYPE") or "int8"
+        if cpu_threads is None:
+            cpu_threads = int(os.getenv("LOCAL_WHISPER_THREADS") or 0)
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.beam_size = beam_size
+        self.raise_errors = raise_errors
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.model = self._get_model(warmup)
+
+    @property
+    def cache_namespace(self) -> str:
+        """認識結果のキャッシュを分ける名前（バックエンド・モデル・言語）"""
+        return f"{self.backend}|{self.model_name}|{self.language or ''}"
+
+    @staticmethod
+    def resolve_model_name(model_name=None) -> str:
+        """使うモデル名（省略時は環境変数 LOCAL_WHISPER_MODEL、なければsmall）"""
+        return model_name or os.getenv("LOCAL_WHISPER_MODEL") or "small"
+
+    def _get_model(self, warmup):
+        """キャッシュからモデルを取り出す。無ければ読み込んでウォームアップする"""
+        key = (self.model_name, self.compute_type, self.cpu_threads, self.num_workers)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None:
+                print(f"LocalRecognitionService: モデル {self.model_name} ({self.compute_type}) を読み込むわ")
+                model = self._create_model()
+                if warmup:
+                    self._run(model, np.zeros(self.MODEL_SAMPLE_RATE, dtype=np.float32))
+                self._models[key] = model
+        return model
+
+    def _create_model(self):
+        """faster-whisperのモデルを作る（重いimportはここまで遅らせる）"""
+        from faster_whisper import WhisperModel
+        return WhisperModel(
+            self.model_name,
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.num_workers
+        )
+
+    def _run(self, model, audio: np.ndarray) -> str:
+        segments, _ = model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=self.beam_size,
+            condition_on_previous_text=False,
+            vad_filter=False  # 区間の切り出しはこちらのVADで済んでいる
+        )
+        # segmentsはジェネレータなので、ここで実際に推論が走る
+        return "".join(segment.text for segment in segments).strip()
+
+    def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
+        """
+        NumPy配列をそのままローカルモデルに渡して音声認識を行う。
+        """
+        if audio_data is None or audio_data.size == 0:
+            return ""
+
+        audio = np.asarray(audio_data, dtype=np.float32).reshape(-1)
+        if sample_rate != self.MODEL_SAMPLE_RATE:
+            # モデルは16kHz固定なので合わせる
+            audio = resample(audio, sample_rate, self.MODEL_SAMPLE_RATE)
+
+        try:
+            started = time.monotonic()
+            text = self._run(self.model, audio)
+            # ローカルは通信が無いから、推論時間をバックエンドの処理時間として記録する
+            self.metrics.histogram("voicescribe_backend_request_seconds", "認識バックエンドへの1リクエストの通信時間").observe(
+                time.monotonic() - started, backend="local")
+            return text
+        except Exception as e:
+            if self.raise_errors:
+                raise RecognitionError(f"予期せぬエラーが発生したわ: {e}", self.model_name) from e
+            print(f"LocalRecognitionService: 予期せぬエラーが発生したわ: {e}")
+            return ""
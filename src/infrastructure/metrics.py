@@ -0,0 +1,314 @@
+# infrastructure/metrics.py
+
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# よく使うバケット（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DURATION_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+RATIO_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label_value(value):
+    """Prometheusのテキスト形式で、ラベルの値に入れられない \\ と " と改行をエスケープする"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """増える一方の値（件数・合計秒数など）"""
+
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """上下する値（キューの深さなど）"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """値の分布をバケットごとの件数で持つ（Prometheusと同じく各バケットは上端以下の件数）"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # ラベル → [バケットごとの件数（+Inf込み）, 合計, 件数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series[2] if series else 0
+
+    def sum(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series[1] if series else 0.0
+
+    def quantile(self, q, **labels):
+        """
+        q分位点のおおよその値。実績が無ければNone。
+        Prometheusの histogram_quantile と同じく、バケットの中では値が一様に散らばっているとみなして補間するわ。
+        一番大きい区切りを超えたバケット（+Inf）に当たったら、その区切りを返す。
+        """
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if series is None:
+                return None
+            counts, count = list(series[0]), series[2]
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for upper, n in zip(self.buckets, counts):
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * max(rank - seen, 0) / n
+            seen += n
+            lower = upper
+        return self.buckets[-1]
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    samples.append((f"{self.name}_bucket", key + (("le", _format_number(bound)),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {"labels": dict(key), "count": count, "sum": total,
+                 "buckets": dict(zip([_format_number(b) for b in self.buckets + (float("inf"),)], counts))}
+                for key, (counts, total, count) in self._series.items()
+            ]
+
+
+class MetricsRegistry:
+    """
+    パイプラインの計測値（カウンタ・ゲージ・ヒストグラム）をまとめて持つ入れ物。
+    同じ名前で何度取り出しても同じ計測器が返るから、使う側は毎回名前で引けばいいわ。
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, **kwargs)
+        return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=""):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Prometheusのテキスト形式で全計測値を書き出す"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """全計測値を辞書にする（JSONに書き出す用）"""
+        return {metric.name: {"type": metric.kind, "series": metric.snapshot()}
+                for metric in list(self._metrics.values())}
+
+
+class _NullMetric:
+    """何もしない計測器"""
+
+    def inc(self, value=1, **labels):
+        pass
+
+    def set(self, value, **labels):
+        pass
+
+    def observe(self, value, **labels):
+        pass
+
+
+class NullMetrics:
+    """
+    計測しないときの入れ物。呼び出しは全部何もしないから、計測点を残したままでもほぼ負荷にならないわ。
+    時間を測るのも惜しい所では enabled を見て計測ごと飛ばすこと。
+    """
+
+    enabled = False
+    _metric = _NullMetric()
+
+    def counter(self, name, help=""):
+        return self._metric
+
+    def gauge(self, name, help=""):
+        return self._metric
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        return self._metric
+
+    def render_prometheus(self) -> str:
+        return ""
+
+    def snapshot(self):
+        return {}
+
+
+NULL_METRICS = NullMetrics()
+_current = NULL_METRICS
+
+
+def get_metrics():
+    """プロセス全体で使う計測の入れ物（既定では何もしないNullMetrics）"""
+    return _current
+
+
+def set_metrics(metrics):
+    """プロセス全体で使う計測の入れ物を差し替える。Noneで計測を止める"""
+    global _current
+    _current = metrics or NULL_METRICS
+    return _current
+
+
+class PrometheusExporter:
+    """計測値を http://host:port/metrics でPrometheusのテキスト形式で返すサーバ"""
+
+    def __init__(self, metrics, port=9464, host="127.0.0.1"):
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # アクセスのたびに標準エラーへ出さない
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        print(f"PrometheusExporter: http://{self.server.server_address[0]}:{self.port}/metrics で計測値を公開するわ")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class JsonlMetricsDumper:
+    """計測値のスナップショットを interval 秒ごとにJSONLファイルへ1行ずつ追記するクラス"""
+
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dumper", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def dump(self):
+        record = {"time": time.time(), "metrics": self.metrics.snapshot()}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def stop(self):
+        """止める前に最後のスナップショットを書く"""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.dump()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.dump()
@@ -0,0 +1,118 @@
+# infrastructure/rate_limiter.py
+
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限。
+    1リクエストで1トークンを使い、トークンは一定の速さで補充されるわ。
+    足りないときは捨てずに、補充されるまで待つ。
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate            # 1秒あたりに補充されるトークン数
+        self.capacity = capacity    # 貯められるトークンの上限（バースト）
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0}
+
+    @classmethod
+    def for_quota(cls, requests: int, period: float = 60.0, burst: int = 3, clock=time.monotonic):
+        """
+        「period秒あたりrequests回まで」の制限を、どのperiod秒を切り取っても超えないように作る。
+        バースト分を先に使っても上限に収まるよう、補充の速さはその分だけ落とすわ。
+        """
+        burst = max(min(burst, requests), 1)
+        return cls(rate=max(requests - burst, 1) / period, capacity=burst, clock=clock)
+
+    def available(self) -> float:
+        """今使えるトークン数"""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self) -> bool:
+        """トークンがあれば1つ使ってTrue、無ければ待たずにFalse"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.stats["acquired"] += 1
+                return True
+            return False
+
+    def acquire(self):
+        """トークンが補充されるまで待ってから1つ使う"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats["acquired"] += 1
+                    if waited:
+                        self.stats["waited"] += 1
+                        self.stats["wait_seconds"] += waited
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+def rate_limit_from_env(prefix: str, default: int = 0) -> int:
+    """環境変数 {prefix}_RATE_LIMIT（1分あたりのリクエスト数、0で無制限）を読む"""
+    value = os.getenv(f"{prefix}_RATE_LIMIT")
+    return int(value) if value else default
+
+
+class RateLimitedRecognitionService:
+    """
+    音声認識サービスを包んで、リクエスト数をトークンバケットで制限するデコレータ。
+    上限を超えそうなときは認識スレッドの中で待つから、区間は捨てずに順番待ちになるわ。
+    """
+
+    def __init__(self, service, rate_limiter: TokenBucket):
+        self.service = service
+        self.rate_limiter = rate_limiter
+        self.language = getattr(service, "language", None)
+        self.model_name = getattr(service, "model_name", None)
+
+    @property
+    def cache_namespace(self):
+        # 制限の有無で認識結果は変わらないから、包んだサービスの名前をそのまま使う
+        return getattr(self.service, "cache_namespace", None)
+
+    def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
+        if audio_data is None or audio_data.size == 0:
+            return ""
+        waited = self.rate_limiter.acquire()
+        if waited:
+            print(f"RateLimitedRecognitionService: リクエスト上限のため {waited:.1f}秒待ったわ")
+        return self.service.transcribe(audio_data, sample_rate)
+
+    def close(self):
+        close = getattr(self.service, "close", None)
+        if close is not None:
+            close()
+
+
+def find_rate_limiter(service):
+    """デコレータで包まれたサービスをたどって、レート制限があればそのバケットを返す"""
+    while service is not None:
+        limiter = getattr(service, "rate_limiter", None)
+        if limiter is not None:
+            return limiter
+        service = getattr(service, "service", None)
+    return None
@@ -0,0 +1,13 @@
+# infrastructure/recognition_error.py
+
+
+class RecognitionError(Exception):
+    """
+    音声認識サービスの呼び出しに失敗したことを表す例外。
+    各サービスは raise_errors=True のときだけ、空文字列を返す代わりにこれを送出するわ。
+    「何も聞き取れなかった（空の結果）」と「APIが失敗した」を区別したいとき（フェイルオーバーなど）に使う。
+    """
+
+    def __init__(self, message, service_name=None):
+        super().__init__(message)
+        self.service_name = service_name
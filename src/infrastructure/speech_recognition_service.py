@@ -1,10 +1,13 @@
 # infrastructure/speech_recognition_service.py
 
 import speech_recognition as sr
-import io
-import wave
 import numpy as np
 import os
+import time
+
+from src.infrastructure.audio_encoder import AudioEncoder
+from src.infrastructure.metrics import get_metrics
+from src.infrastructure.recognition_error import RecognitionError
 
 class SpeechRecognitionService:
     """
@@ -12,51 +15,80 @@ class SpeechRecognitionService:
     Google Speech APIなど、デフォルトの認識エンジンを利用可能。
     """
 
-    def __init__(self, language="ja-JP"):
+    # speech_recognitionへの渡し方（送信時のFLAC変換はライブラリ側で行われる）
+    SUPPORTED_FORMATS = ("pcm16", "wav")
+    backend = "google"
+
+    def __init__(self, language="ja-JP", audio_format=None, raise_errors=False, metrics=None):
         self.language = language
+        # 計測値の入れ物（省略時はプロセス全体の設定）
+        self.metrics = metrics if metrics is not None else get_metrics()
+        # Trueなら失敗時に空文字列ではなくRecognitionErrorを送出する
+        self.raise_errors = raise_errors
         self.recognizer = sr.Recognizer()
         self.api_key = os.getenv("GOOGLE_API_KEY")
+        # Cloud Speech APIと無料枠では認識結果が変わりうるから区別する
+        self.model_name = "google_cloud" if self.api_key else "google"
+        # 受け渡し形式（省略時は環境変数 GOOGLE_AUDIO_FORMAT、なければpcm16）
+        audio_format = (audio_format or os.getenv("GOOGLE_AUDIO_FORMAT") or "pcm16").lower()
+        if audio_format not in self.SUPPORTED_FORMATS:
+            print(f"SpeechRecognitionService: {audio_format} は使えないから pcm16 にします")
+            audio_format = "pcm16"
+        self.encoder = AudioEncoder(audio_format, metrics=self.metrics)
+
+    @property
+    def cache_namespace(self) -> str:
+        """認識結果のキャッシュを分ける名前（バックエンド・モデル・言語）"""
+        return f"{self.backend}|{self.model_name}|{self.language or ''}"
 
     def transcribe(self, audio_data: np.ndarray, sample_rate: int) -> str:
         """
-        NumPy配列をWAVに変換して音声認識を行う。
+        NumPy配列を16bit PCMに変換して音声認識を行う。
         Google Cloud Speech APIキーがある場合はそれを使用し、
         ない場合は無料枠のGoogle Speech Recognitionを使用する。
         """
         if audio_data is None or audio_data.size == 0:
             return ""
 
-        # NumPy配列 → WAVバイナリに変換
-        with io.BytesIO() as wav_buffer:
-            with wave.open(wav_buffer, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)  # 16bit
-                wf.setframerate(sample_rate)
-                wf.writeframes((audio_data * 32767).astype('int16').tobytes())
-
-            # バッファを巻き戻してspeech_recognitionに渡す
-            wav_buffer.seek(0)
-            with sr.AudioFile(wav_buffer) as source:
+        # NumPy配列 → 16bit PCMに変換
+        encoded = self.encoder.encode(audio_data, sample_rate)
+        if encoded.format == "pcm16":
+            # WAVを組み立てて読み直さず、PCMから直接AudioDataを作る
+            audio = sr.AudioData(encoded.data.tobytes(), sample_rate, 2)
+        else:
+            with sr.AudioFile(encoded.as_file()) as source:
                 audio = self.recognizer.record(source)
 
-            try:
-                # Google Cloud Speech APIキーがある場合はそれを使用
-                if self.api_key:
-                    text = self.recognizer.recognize_google_cloud(
-                        audio, 
-                        language=self.language,
-                        credentials_json=self.api_key
-                    )
-                else:
-                    # 無料枠のGoogle Speech Recognition（1分間に20回までのリクエスト制限あり）
-                    text = self.recognizer.recognize_google(audio, language=self.language)
-                return text
-            except sr.UnknownValueError:
-                # 音声がはっきりしない場合
-                return ""
-            except sr.RequestError as e:
-                print(f"SpeechRecognitionService: APIへのリクエストに失敗しました: {e}")
-                return ""
-            except Exception as e:
-                print(f"SpeechRecognitionService: 予期せぬエラーが発生しました: {e}")
-                return ""
+        metrics = self.metrics
+        started = time.monotonic()
+        try:
+            # Google Cloud Speech APIキーがある場合はそれを使用
+            if self.api_key:
+                text = self.recognizer.recognize_google_cloud(
+                    audio, 
+                    language=self.language,
+                    credentials_json=self.api_key
+                )
+            else:
+                # 無料枠のGoogle Speech Recognition（1分間に20回までのリクエスト制限あり）
+                text = self.recognizer.recognize_google(audio, language=self.language)
+            metrics.histogram("voicescribe_backend_request_seconds", "認識バックエンドへの1リクエストの通信時間").observe(
+                time.monotonic() - started, backend=self.model_name)
+            return text
+        except sr.UnknownValueError:
+            # 音声がはっきりしない場合
+            metrics.histogram("voicescribe_backend_request_seconds", "認識バックエンドへの1リクエストの通信時間").observe(
+                time.monotonic() - started, backend=self.model_name)
+            return ""
+        except sr.RequestError as e:
+            metrics.counter("voicescribe_backend_errors_total", "認識バックエンドへのリクエストの失敗数").inc(
+                backend=self.model_name)
+            if self.raise_errors:
+                raise RecognitionError(f"APIへのリクエストに失敗しました: {e}", self.model_name) from e
+            print(f"SpeechRecognitionService: APIへのリクエストに失敗しました: {e}")
+            return ""
+        except Exception as e:
+            if self.raise_errors:
+                raise RecognitionError(f"予期せぬエラーが発生しました: {e}", self.model_name) from e
+            print(f"SpeechRecognitionService: 予期せぬエラーが発生しました: {e}")
+            return ""
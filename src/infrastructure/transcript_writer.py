@@ -0,0 +1,265 @@
+# infrastructure/transcript_writer.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+
+def format_offset(seconds: float, separator: str = ".") -> str:
+    """秒数を HH:MM:SS.mmm 形式にする（SRTは separator="," で HH:MM:SS,mmm）"""
+    millis = int(round(max(seconds, 0.0) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+class TextFormat:
+    """これまでどおりの1行形式: [タイムスタンプ] 種類: テキスト"""
+
+    extension = ".txt"
+
+    def header(self) -> str:
+        return ""
+
+    def format(self, metadata, index: int) -> str:
+        prefix = "ウェイクワード" if metadata.get("is_wake_word") else "音声認識"
+        text = metadata.get("text", "")
+        if metadata.get("error"):
+            # 認識に失敗した区間も、どこが抜けたか分かるように残す
+            prefix = "認識失敗"
+            text = f"({metadata['start_offset']:.1f}s-{metadata['end_offset']:.1f}s) {metadata['error']}"
+        # 複数マイクで録音している場合はどのソースの発話かを付ける
+        if metadata.get("source_id") is not None:
+            prefix = f"{metadata['source_id']} {prefix}"
+        return f"[{metadata['timestamp']}] {prefix}: {text}\n"
+
+
+class TimedTextFormat:
+    """区間の位置付きの1行形式: [HH:MM:SS.mmm --> HH:MM:SS.mmm] テキスト（ファイル文字起こし向け）"""
+
+    extension = ".txt"
+
+    def header(self) -> str:
+        return ""
+
+    def format(self, metadata, index: int) -> str:
+        start = format_offset(metadata["start_offset"])
+        end = format_offset(metadata["end_offset"])
+        text = metadata.get("text", "")
+        if metadata.get("error"):
+            text = f"(認識失敗: {metadata['error']})"
+        if metadata.get("source_id") is not None:
+            text = f"{metadata['source_id']}: {text}"
+        return f"[{start} --> {end}] {text}\n"
+
+
+class JsonlFormat:
+    """1区間1行のJSON。後から機械的に集計する用"""
+
+    extension = ".jsonl"
+    FIELDS = ("timestamp", "start_offset", "end_offset", "source_id", "text", "is_wake_word", "wake_word", "error",
+              "segments")
+
+    def header(self) -> str:
+        return ""
+
+    def format(self, metadata, index: int) -> str:
+        record = {key: metadata[key] for key in self.FIELDS if metadata.get(key) is not None}
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class SrtFormat:
+    """SubRip字幕。番号・時間・テキスト・空行の組で1区間"""
+
+    extension = ".srt"
+
+    def header(self) -> str:
+        return ""
+
+    def format(self, metadata, index: int) -> str:
+        start = format_offset(metadata["start_offset"], ",")
+        end = format_offset(metadata["end_offset"], ",")
+        return f"{index}\n{start} --> {end}\n{_caption(metadata)}\n\n"
+
+
+class VttFormat:
+    """WebVTT字幕。ファイルの先頭に WEBVTT ヘッダを書く"""
+
+    extension = ".vtt"
+
+    def header(self) -> str:
+        return "WEBVTT\n\n"
+
+    def format(self, metadata, index: int) -> str:
+        start = format_offset(metadata["start_offset"])
+        end = format_offset(metadata["end_offset"])
+        return f"{start} --> {end}\n{_caption(metadata)}\n\n"
+
+
+def _caption(metadata) -> str:
+    """字幕に出すテキスト（改行は字幕の区切りと紛れるから空白にする）"""
+    text = " ".join(str(metadata.get("text", "")).splitlines())
+    if metadata.get("source_id") is not None:
+        text = f"{metadata['source_id']}: {text}"
+    return text
+
+
+FORMATS = {
+    "text": TextFormat,
+    "timed": TimedTextFormat,
+    "jsonl": JsonlFormat,
+    "srt": SrtFormat,
+    "vtt": VttFormat,
+}
+
+
+class TranscriptWriter:
+    """
+    認識結果をファイルに書き出すクラス。ファイルは開いたままにして、行をメモリに溜めてまとめて書くわ。
+    - 溜めた量が flush_bytes を超えたとき、または前回から flush_interval 秒経ったときに書き出す
+      （新しい結果が来なくても、裏のスレッドが時間で書き出す）
+    - rotate_bytes / rotate_interval を超えたら、今のファイルを時刻付きの名前に os.replace で
+      一度に付け替えてから新しいファイルを開く（読む側が書きかけの回転済みファイルを見ることはない）
+    複数のソースやスレッドから同時に書いても行が混ざらないようにロックを取る。
+    """
+
+    def __init__(
+        self,
+        path,                     # 出力ファイルのパス
+        format="text",            # 出力形式（text, timed, jsonl, srt, vtt）
+        flush_interval=1.0,       # 書き出しの最大間隔（秒）。Noneなら時間では書き出さない
+        flush_bytes=64 * 1024,    # これだけ溜まったら書き出す（バイト）
+        rotate_bytes=None,        # ファイルがこの大きさを超えたら回転する（バイト）。Noneで回転しない
+        rotate_interval=None,     # ファイルを開いてからこの秒数が経ったら回転する。Noneで回転しない
+        fsync=False,              # 書き出しのたびにディスクまで同期するか
+        clock=time.monotonic
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"TranscriptWriter: 出力形式は {', '.join(FORMATS)} のどれかにしてちょうだい")
+        self.path = path
+        self.format_name = format
+        self.formatter = FORMATS[format]()
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval = rotate_interval
+        self.fsync = fsync
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered_bytes = 0
+        self.stats = {"records": 0, "flushes": 0, "rotations": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+
+        self._closed = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="transcript-writer", daemon=True)
+            self._flusher.start()
+
+    def write(self, metadata):
+        """1区間分の結果を書き込む（実際にファイルへ書くのは溜まってから）"""
+        with self._lock:
+            if self._should_rotate():
+                self._rotate()
+            self._index += 1
+            line = self.formatter.format(metadata, self._index)
+            self._buffer.append(line)
+            self._buffered_bytes += len(line.encode("utf-8"))
+            self.stats["records"] += 1
+            if (self._buffered_bytes >= self.flush_bytes
+                    or (self.flush_interval is not None
+                        and self._clock() - self._last_flush >= self.flush_interval)):
+                self._flush()
+
+    def flush(self):
+        """溜めている行をファイルに書き出す"""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """書き残しを書き出してファイルを閉じる"""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if self._file is not None:
+                self._flush()
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = self._clock()
+        self._last_flush = self._opened_at
+        self._size = self._file.tell()
+        # 追記するときは字幕の番号を続きから振る
+        self._index = self._count_existing_records() if self._size and self.format_name == "srt" else 0
+        if self._size == 0:
+            header = self.formatter.header()
+            if header:
+                self._file.write(header)
+                self._size += len(header.encode("utf-8"))
+
+    def _count_existing_records(self) -> int:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if " --> " in line)
+
+    def _flush(self):
+        if not self._buffer or self._file is None:
+            self._last_flush = self._clock()
+            return
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size += self._buffered_bytes
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_flush = self._clock()
+        self.stats["flushes"] += 1
+
+    def _should_rotate(self) -> bool:
+        if self.rotate_bytes is not None and self._size + self._buffered_bytes >= self.rotate_bytes:
+            return True
+        if self.rotate_interval is not None and self._clock() - self._opened_at >= self.rotate_interval:
+            return self._size + self._buffered_bytes > len(self.formatter.header().encode("utf-8"))
+        return False
+
+    def _rotate(self):
+        """今のファイルを書き切って閉じ、時刻付きの名前に付け替えて新しいファイルを開く"""
+        self._flush()
+        self._file.close()
+        os.replace(self.path, self.rotated_path())
+        self.stats["rotations"] += 1
+        self._open()
+
+    def rotated_path(self) -> str:
+        """回転後のファイル名（output.txt → output.20250101_120000.txt）"""
+        stem, extension = os.path.splitext(self.path)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        candidate = f"{stem}.{stamp}{extension}"
+        counter = 1
+        while os.path.exists(candidate):
+            candidate = f"{stem}.{stamp}_{counter}{extension}"
+            counter += 1
+        return candidate
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                if self._buffer:
+                    self._flush()
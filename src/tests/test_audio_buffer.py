@@ -0,0 +1,108 @@
+import pytest
+import numpy as np
+import threading
+from domain.audio_buffer import AudioRingBuffer, BlockRingBuffer, SegmentBuffer
+
+def test正常系_リングバッファが容量を超えた分を古い方から捨てること():
+    ring = AudioRingBuffer(5)
+    ring.append(np.arange(3, dtype=np.float32))
+    ring.append(np.arange(3, 7, dtype=np.float32))
+    assert len(ring) == 5
+    assert np.array_equal(ring.get(), np.arange(2, 7))
+
+def test正常系_リングバッファが折り返していなければビューを返すこと():
+    ring = AudioRingBuffer(8)
+    ring.append(np.ones(4, dtype=np.float32))
+    assert np.shares_memory(ring.get(), ring._buffer)
+
+def test正常系_リングバッファに容量以上のチャンクを追記すると末尾だけ残ること():
+    ring = AudioRingBuffer(4)
+    ring.append(np.arange(10, dtype=np.float32))
+    assert np.array_equal(ring.get(), np.arange(6, 10))
+    ring.clear()
+    assert len(ring) == 0
+    assert ring.get().size == 0
+
+def test正常系_セグメントバッファが拡張しながら連続領域に追記すること():
+    buffer = SegmentBuffer(initial_capacity=4)
+    for i in range(5):
+        buffer.append(np.full(3, i, dtype=np.float32))
+    assert len(buffer) == 15
+    assert np.array_equal(buffer.view(), np.repeat(np.arange(5), 3))
+
+def test正常系_セグメントバッファが最大長で追記を打ち切ること():
+    buffer = SegmentBuffer(initial_capacity=4, max_samples=10)
+    assert buffer.append(np.ones(8, dtype=np.float32)) == 8
+    assert buffer.append(np.ones(8, dtype=np.float32)) == 2
+    assert buffer.is_full
+    assert buffer.append(np.ones(1, dtype=np.float32)) == 0
+
+def test正常系_detachした音声が以後の追記で上書きされないこと():
+    buffer = SegmentBuffer(initial_capacity=8)
+    buffer.append(np.ones(4, dtype=np.float32))
+    audio = buffer.detach()
+    buffer.append(np.zeros(4, dtype=np.float32))
+    assert len(buffer) == 4
+    assert np.array_equal(audio, np.ones(4))
+
+def test正常系_セグメントバッファの末尾を切り詰められること():
+    buffer = SegmentBuffer(initial_capacity=4)
+    buffer.append(np.arange(6, dtype=np.float32))
+    buffer.truncate(4)
+    assert np.array_equal(buffer.view(), np.arange(4))
+    buffer.append(np.array([9], dtype=np.float32))
+    assert np.array_equal(buffer.view(), [0, 1, 2, 3, 9])
+
+def test正常系_ブロックリングが書き込んだ順にまとめて返すこと():
+    ring = BlockRingBuffer(capacity=4, block_size=4)
+    ring.write(np.arange(4, dtype=np.float32).reshape(-1, 1), 1.0)
+    ring.write(np.arange(4, 10, dtype=np.float32).reshape(-1, 1), 2.0)  # 長いブロックは2スロットに分ける
+
+    audio, timestamps = ring.read()
+
+    assert np.array_equal(audio[:, 0], np.arange(10))
+    assert timestamps == [1.0, 2.0, 2.0]
+    assert len(ring) == 0
+    assert ring.read()[0].shape == (0, 1)
+
+def test正常系_満杯のとき新しい方を捨てる方針なら書き込みを捨てて数えること():
+    ring = BlockRingBuffer(capacity=2, block_size=2, policy="drop_newest")
+    for i in range(4):
+        ring.write(np.full((2, 1), i, dtype=np.float32))
+
+    audio, _ = ring.read()
+
+    assert np.array_equal(audio[:, 0], [0, 0, 1, 1])
+    stats = ring.get_stats()
+    assert stats["dropped_blocks"] == 2
+    assert stats["dropped_samples"] == 4
+    assert stats["peak_backlog"] == 2
+
+def test正常系_読み出し中に上書きされても壊れたブロックを返さないこと():
+    ring = BlockRingBuffer(capacity=8, block_size=64)
+    stop = threading.Event()
+
+    def produce():
+        i = 0
+        while not stop.is_set():
+            ring.write(np.full((64, 1), i % 1000, dtype=np.float32))
+            i += 1
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    try:
+        for _ in range(200):
+            audio, timestamps = ring.read(timeout=0.01)
+            blocks = audio.reshape(-1, 64)
+            # どのブロックも1回の書き込みの値だけでできている
+            assert np.all(blocks == blocks[:, :1])
+            assert len(blocks) == len(timestamps)
+    finally:
+        stop.set()
+        producer.join()
+    stats = ring.get_stats()
+    assert stats["read_blocks"] + stats["dropped_blocks"] + len(ring) == stats["written_blocks"]
+
+def test異常系_ブロックリングが未知の方針を受け付けないこと():
+    with pytest.raises(ValueError):
+        BlockRingBuffer(policy="block")
@@ -1,51 +1,236 @@
 # tests/test_audio_controller.py
 
+import time
 import pytest
 import numpy as np
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 from application.audio_controller import AudioController
+from domain.wakeword_detector import WakewordDetector
 
 @pytest.fixture
 def controller():
     return AudioController()
 
-def test正常系_run_foreverで無音を検知してファイル保存すること(controller):
+def test正常系_滞留したブロックを1回でまとめて取り出すこと(controller):
     fake_chunk = np.zeros((512, 1), dtype=np.float32)
+    for _ in range(3):
+        controller.capture_buffer.write(fake_chunk, 0.0)
 
-    # キューに何回か無音チャンクをput
-    for _ in range(5):
-        controller.audio_queue.put(fake_chunk)
-
-    with patch.object(controller, 'save_to_wav') as mock_save:
-        with patch.object(controller.stt_service, 'transcribe', return_value=""):
-            controller.is_running = True
-            # run_foreverを少しだけ走らせる
-            with patch('time.sleep', side_effect=Exception("StopLoop")):
-                try:
-                    controller.run_forever()
-                except Exception as e:
-                    # time.sleepへのパッチでループ強制脱出
-                    pass
-
-        assert mock_save.called  # ファイル保存メソッドが呼び出されたか
-
-def test正常系_wakeword検出時にファイル名にwake_wordが含まれること(controller):
-    fake_chunk = np.ones((512, 1), dtype=np.float32)  # ある程度振幅あり
-    controller.audio_queue.put(fake_chunk)
-
-    # Wakeword検出するようにモック
-    with patch.object(controller.stt_service, 'transcribe', return_value="アウラです"), \
-         patch.object(controller.wakeword_detector, 'detect', return_value=True), \
-         patch.object(controller, 'save_to_wav') as mock_save:
-        controller.is_running = True
-        with patch('time.sleep', side_effect=Exception("StopLoop")):
-            try:
-                controller.run_forever()
-            except:
-                pass
-
-        # save_to_wavが呼ばれた際の引数を確認
-        assert mock_save.called
-        args, kwargs = mock_save.call_args
-        filename = args[1]
-        assert "wake_word" in filename
+    audio = controller._dequeue_blocks()
+
+    assert audio.shape == (512 * 3, 1)
+    assert len(controller.capture_buffer) == 0
+    stats = controller.get_queue_stats()
+    assert stats["peak_depth"] == 3
+    assert stats["blocks"] == 3
+    assert stats["avg_latency_ms"] > 0
+
+def test正常系_キューが空ならタイムアウトでNoneを返すこと(controller):
+    controller.queue_timeout = 0.01
+    assert controller._dequeue_blocks() is None
+
+class AmplitudeVAD:
+    """振幅で発話確率を決める、テスト用のVADServiceの代わり"""
+
+    threshold = 0.5
+    energy_gate = None
+
+    def create_stream(self):
+        return None
+
+    def reset_stream(self, stream=None):
+        pass
+
+    def score_stream(self, audio_chunk, sample_rate, stream=None):
+        frames = audio_chunk[:len(audio_chunk) // 512 * 512].reshape(-1, 512)
+        return frames, (np.abs(frames).max(axis=1) > 0.1).astype(np.float32)
+
+class LengthService:
+    def transcribe(self, audio_data, sample_rate):
+        return str(len(audio_data))
+
+class StoppingService:
+    """認識したらコントローラを止める、テスト用の認識サービス"""
+
+    def __init__(self, controller, text):
+        self.controller = controller
+        self.text = text
+
+    def transcribe(self, audio_data, sample_rate):
+        self.controller.is_running = False
+        return self.text
+
+def run_queued(controller, audio, text):
+    """マイクの代わりにキューへ音声を積んで、run_foreverの結果を全部返す"""
+    controller.stt_service = StoppingService(controller, text)
+    for start in range(0, len(audio), 512):
+        controller.capture_buffer.write(audio[start:start + 512].reshape(-1, 1), time.monotonic())
+    controller.is_running = True
+    return list(controller.run_forever())
+
+def test正常系_run_foreverで無音を検知して区間を返すこと():
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0)
+    speech = np.full(512 * 10, 0.5, dtype=np.float32)
+    audio = np.concatenate([speech, np.zeros(512 * 20, dtype=np.float32)])
+
+    results = run_queued(controller, audio, "こんにちは")
+
+    assert len(results) == 1
+    segment, metadata = results[0]
+    # 末尾の無音は区間に含めない
+    assert len(segment) == 512 * 10
+    assert metadata["text"] == "こんにちは"
+    assert metadata["is_wake_word"] is False
+
+def test正常系_ウェイクワードを検出したらメタデータに印が付くこと():
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0,
+                                 wakeword_detector=WakewordDetector(["フリーレン", "アウラ"]))
+    speech = np.full(512 * 10, 0.5, dtype=np.float32)
+    audio = np.concatenate([speech, np.zeros(512 * 20, dtype=np.float32)])
+
+    results = run_queued(controller, audio, "あうらです")
+
+    assert results[0][1]["is_wake_word"] is True
+    # どのウェイクワードに当たったかも付く
+    assert results[0][1]["wake_word"] == "アウラ"
+
+def test正常系_発話中の短い無音も区間に含めて取りこぼさないこと():
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0)
+    speech = np.full(512 * 10, 0.5, dtype=np.float32)
+    gap = np.zeros(512 * 5, dtype=np.float32)
+    audio = np.concatenate([gap, speech, gap, speech, np.zeros(512 * 20, dtype=np.float32)])
+
+    results = list(controller.process_blocks([audio]))
+
+    assert len(results) == 1
+    # 発話 + 途中の無音 + 発話。末尾の無音は含めない
+    assert results[0][1]["text"] == str(512 * 25)
+
+def test正常系_短すぎる発話は認識に回さないこと():
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, min_speech_duration=0.1)
+    blip = np.full(512, 0.5, dtype=np.float32)
+    audio = np.concatenate([np.zeros(512 * 5, dtype=np.float32), blip, np.zeros(512 * 20, dtype=np.float32)])
+
+    assert list(controller.process_blocks([audio])) == []
+
+def test正常系_リクエスト枠が少ないときは短い区間をまとめて認識すること():
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0, rate_limit=1)
+    speech = np.full(512 * 10, 0.5, dtype=np.float32)
+    silence = np.zeros(512 * 20, dtype=np.float32)
+    audio = np.concatenate([speech, silence, speech, silence, speech, silence])
+
+    results = list(controller.process_blocks([audio]))
+
+    assert len(results) == 1
+    metadata = results[0][1]
+    assert len(metadata["segments"]) == 3
+    assert [s["start_offset"] < s["end_offset"] for s in metadata["segments"]] == [True] * 3
+    # 3区間と、その間に挟んだ無音の分
+    assert metadata["text"] == str(512 * 10 * 3 + int(0.3 * 16000) * 2)
+
+def test正常系_計測を有効にすると区間とVADと発話終わりからの遅延を記録すること():
+    from infrastructure.metrics import MetricsRegistry
+    registry = MetricsRegistry()
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0, metrics=registry)
+    speech = np.full(512 * 10, 0.5, dtype=np.float32)
+    audio = np.concatenate([speech, np.zeros(512 * 20, dtype=np.float32)])
+
+    list(controller.process_blocks([audio]))
+
+    assert registry.counter("voicescribe_segments_total").value(source=None) == 1
+    assert registry.histogram("voicescribe_segment_duration_seconds").count() == 1
+    assert registry.histogram("voicescribe_vad_seconds").count() == 1
+    assert registry.histogram("voicescribe_speech_end_to_text_seconds").count() == 1
+    assert registry.histogram("voicescribe_real_time_factor").count(stage="vad") == 1
+
+def test正常系_録音キューが満杯なら古いブロックを捨てて捨てた量を数えること():
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 capture_buffer_blocks=4)
+    controller.is_running = True
+    for i in range(6):
+        controller._audio_callback(np.full((512, 1), i, dtype=np.float32), 512, None, None)
+
+    audio = controller._dequeue_blocks()
+
+    # 最初の2ブロックは上書きされ、残りの4ブロックが古い順に返る
+    assert [int(v) for v in audio[::512, 0]] == [2, 3, 4, 5]
+    stats = controller.get_queue_stats()
+    assert stats["dropped_blocks"] == 2
+    assert stats["dropped_seconds"] == 512 * 2 / 16000
+
+def test正常系_デバイス側のあふれを数えること():
+    class Status:
+        input_overflow = True
+
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService())
+    controller.is_running = True
+    controller._audio_callback(np.zeros((512, 1), dtype=np.float32), 512, None, Status())
+
+    assert controller.get_queue_stats()["overflows"] == 1
+
+def test正常系_溜まりすぎたらVADを軽くして処理すること():
+    class DegradableVAD(AmplitudeVAD):
+        def __init__(self):
+            self.degraded_calls = 0
+
+        def score_stream(self, audio_chunk, sample_rate, stream=None, degraded=False):
+            self.degraded_calls += degraded
+            return super().score_stream(audio_chunk, sample_rate, stream)
+
+    vad = DegradableVAD()
+    controller = AudioController(vad_service=vad, recognition_service=LengthService(),
+                                 capture_buffer_blocks=8, overflow_policy="degrade", degrade_backlog=4)
+    controller.is_running = True
+
+    for blocks in (5, 2):
+        for _ in range(blocks):
+            controller._audio_callback(np.full((512, 1), 0.5, dtype=np.float32), 512, None, None)
+        audio = controller._dequeue_blocks()
+        controller.process_audio(audio, degraded=controller._should_degrade())
+
+    # 5ブロック溜まったときだけ軽くする
+    assert vad.degraded_calls == 1
+    assert controller.get_queue_stats()["degraded_blocks"] == 5
+
+def start_partial_segment():
+    """部分認識ありで、発話中の無音で途中までを確定させた区間を作る"""
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(), source_id="mic",
+                                 partial_interval=10.0, silence_duration=0.5, pre_buffer_duration=0.0)
+    controller.reset()
+    audio = np.concatenate([np.full(512 * 20, 0.5), np.zeros(512 * 12), np.full(512 * 10, 0.5)]).astype(np.float32)
+    for start in range(0, len(audio), 512):
+        controller.process_audio(audio[start:start + 512])
+    # 10窓（0.32秒）の無音でそこまでが確定する
+    assert controller.partial_transcriber._committed_samples == 512 * 30
+    return controller
+
+def test正常系_最大長で切り出した区間は確定済みの認識と残りをつないで最終結果にすること():
+    controller = start_partial_segment()
+
+    audio_data, context = controller._split_segment(4, discard=False)
+
+    assert len(audio_data) == 512 * 38
+    assert context["transcribe"](audio_data, 16000) == f"{512 * 30} {512 * 8}"
+    # 続きの区間の部分結果にもタイムスタンプとソースが付く
+    partial = controller.partial_transcriber
+    assert partial._committed_samples == 0
+    assert partial.context["source_id"] == "mic" and "timestamp" in partial.context
+    controller.partial_transcriber.shutdown()
+
+def test正常系_最大長で捨てた区間の確定済みの認識を次の区間に持ち込まないこと():
+    controller = start_partial_segment()
+
+    assert controller._split_segment(4, discard=True) is None
+
+    partial = controller.partial_transcriber
+    assert partial._committed == [] and partial._committed_samples == 0
+    assert partial.context["source_id"] == "mic"
+    tail = controller.speech_buffer.view()
+    assert partial.finish(tail)(tail, 16000) == str(512 * 4)
+    controller.partial_transcriber.shutdown()
@@ -0,0 +1,51 @@
+import io
+import wave
+import pytest
+import numpy as np
+from infrastructure.audio_encoder import AudioEncoder
+
+@pytest.fixture
+def audio():
+    t = np.arange(16000) / 16000
+    return (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+def test正常系_wav形式で正しいヘッダとPCMを出力すること(audio):
+    encoded = AudioEncoder("wav").encode(audio, 16000)
+
+    with wave.open(io.BytesIO(encoded.data), 'rb') as wf:
+        assert wf.getnchannels() == 1
+        assert wf.getsampwidth() == 2
+        assert wf.getframerate() == 16000
+        frames = np.frombuffer(wf.readframes(wf.getnframes()), dtype='<i2')
+    assert np.array_equal(frames, AudioEncoder.to_pcm16(audio))
+    assert encoded.filename == "audio.wav"
+
+def test正常系_同じスレッドでは出力バッファを使い回すこと(audio):
+    encoder = AudioEncoder("pcm16")
+    first = encoder.encode(audio, 16000)
+    second = encoder.encode(audio[:8000], 16000)
+    assert isinstance(first.data, memoryview)
+    assert first.data.obj is second.data.obj
+    assert len(second) == 16000
+
+def test正常系_範囲外の振幅をクリップして変換すること():
+    pcm = AudioEncoder.to_pcm16(np.array([-2.0, -1.0, 0.0, 1.0, 2.0], dtype=np.float32))
+    assert pcm.tolist() == [-32767, -32767, 0, 32767, 32767]
+
+def test正常系_as_fileで全データを読み出せること(audio):
+    encoded = AudioEncoder("wav").encode(audio, 16000)
+    reader = encoded.as_file()
+    assert reader.read() == encoded.data.tobytes()
+    reader.seek(0)
+    assert reader.read(4) == b"RIFF"
+
+def test正常系_flac形式がwavより小さくなること(audio):
+    pytest.importorskip("soundfile")
+    wav = AudioEncoder("wav").encode(audio, 16000)
+    flac = AudioEncoder("flac").encode(audio, 16000)
+    assert flac.filename == "audio.flac"
+    assert len(flac) < len(wav)
+
+def test異常系_未対応の形式はValueErrorになること():
+    with pytest.raises(ValueError):
+        AudioEncoder("mp3")
@@ -0,0 +1,154 @@
+# tests/test_audio_source.py
+
+import io
+import threading
+import time
+import wave
+import numpy as np
+import pytest
+from infrastructure.audio_source import ReplaySource, FileSource, StdinSource, open_audio_source, MicrophoneSource
+from application.audio_controller import AudioController
+
+def collect(source):
+    """ソースを最後まで流して、渡されたブロックを返す"""
+    blocks = []
+    finished = threading.Event()
+    source.start(lambda indata, frames, time_info, status: blocks.append(indata.copy()), on_finished=finished.set)
+    assert finished.wait(5)
+    return blocks
+
+def test正常系_リプレイは同じ区切りのブロックを最後まで渡して終了を知らせること():
+    audio = np.arange(1300, dtype=np.float32)
+    source = ReplaySource(audio, block_size=512, pace=0)
+
+    blocks = collect(source)
+
+    assert [b.shape for b in blocks] == [(512, 1), (512, 1), (276, 1)]
+    assert np.array_equal(np.concatenate(blocks)[:, 0], audio)
+    assert source.stats["blocks"] == 3
+
+def test正常系_実時間のペースで渡すこと():
+    source = ReplaySource(np.zeros(1600, dtype=np.float32), sample_rate=16000, block_size=160, pace=1.0)
+
+    started = time.monotonic()
+    collect(source)
+
+    # 10ブロック × 10ms。最初のブロックは待たずに渡す
+    assert time.monotonic() - started >= 0.08
+
+def test正常系_停止したら途中で渡すのをやめること():
+    source = ReplaySource(np.zeros(16000 * 10, dtype=np.float32), block_size=1600, pace=1.0)
+    blocks = []
+    source.start(lambda indata, *args: blocks.append(indata))
+    time.sleep(0.05)
+    source.stop()
+
+    assert 0 < len(blocks) < 100
+
+def test正常系_標準入力の16bitPCMをブロックに切って読むこと():
+    samples = (np.arange(1100) - 550).astype('<i2')
+    source = StdinSource(stream=io.BytesIO(samples.tobytes() + b"\x01"), block_size=512)
+
+    blocks = collect(source)
+
+    assert [len(b) for b in blocks] == [512, 512, 76]
+    assert np.allclose(np.concatenate(blocks)[:, 0], samples / 32768.0)
+
+def test正常系_音声ファイルを少しずつ読みながら渡すこと(tmp_path):
+    path = str(tmp_path / "input.wav")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(8000)
+        wf.writeframes(np.full(1000, 16384, dtype=np.int16).tobytes())
+
+    source = open_audio_source(path, block_size=400, pace=0)
+    blocks = collect(source)
+
+    assert isinstance(source, FileSource)
+    assert source.sample_rate == 8000
+    assert [len(b) for b in blocks] == [400, 400, 200]
+    assert np.allclose(np.concatenate(blocks), 0.5)
+
+def test正常系_指定が無ければマイクになること():
+    assert isinstance(open_audio_source(None), MicrophoneSource)
+
+class AmplitudeVAD:
+    """振幅で発話確率を決める、テスト用のVADServiceの代わり"""
+
+    threshold = 0.5
+    energy_gate = None
+
+    def create_stream(self):
+        return None
+
+    def reset_stream(self, stream=None):
+        pass
+
+    def score_stream(self, audio_chunk, sample_rate, stream=None):
+        frames = audio_chunk[:len(audio_chunk) // 512 * 512].reshape(-1, 512)
+        return frames, (np.abs(frames).max(axis=1) > 0.1).astype(np.float32)
+
+class LengthService:
+    def transcribe(self, audio_data, sample_rate):
+        return str(len(audio_data))
+
+def test正常系_コントローラがリプレイを最後まで処理して自分で止まること():
+    speech = np.full(512 * 10, 0.5, dtype=np.float32)
+    silence = np.zeros(512 * 20, dtype=np.float32)
+    # 最後の発話は無音で閉じずにソースが終わる
+    audio = np.concatenate([speech, silence, speech])
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0,
+                                 audio_source=ReplaySource(audio, block_size=512, pace=0))
+
+    controller.start_listening()
+    try:
+        results = list(controller.run_forever())
+    finally:
+        controller.stop_listening()
+
+    assert [metadata["text"] for _, metadata in results] == [str(512 * 10)] * 2
+    assert controller.get_queue_stats()["blocks"] == 40
+
+def test正常系_形式の違うソースは16kHzモノラルに変換して処理すること():
+    speech = np.full(1536 * 10, 0.5, dtype=np.float32)
+    silence = np.zeros(1536 * 20, dtype=np.float32)
+    mono = np.concatenate([silence, speech, silence])
+    # 48kHzのステレオ。左チャンネルは無音
+    stereo = np.stack([np.zeros_like(mono), mono], axis=1)
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0, channel_mix="loudest",
+                                 audio_source=ReplaySource(stereo, sample_rate=48000, block_size=1536, pace=0))
+
+    controller.start_listening()
+    try:
+        results = list(controller.run_forever())
+    finally:
+        controller.stop_listening()
+
+    assert (controller.capture_sample_rate, controller.capture_channels) == (48000, 2)
+    assert controller.capture_block_size == 1536
+    # 48kHzの1536サンプルが16kHzの512サンプルになる（フィルタの遅れの分だけ前後の窓にずれることがある）
+    assert len(results) == 1
+    assert int(results[0][1]["text"]) == pytest.approx(512 * 10, abs=512)
+    assert results[0][1]["channels"] == 1
+
+def test正常系_ソースが終わったら変換フィルタに残った末尾も処理すること():
+    # 最後の発話は無音で閉じずにソースが終わる
+    mono = np.concatenate([np.zeros(1536 * 20, dtype=np.float32), np.full(1536 * 10, 0.5, dtype=np.float32)])
+    controller = AudioController(vad_service=AmplitudeVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0,
+                                 audio_source=ReplaySource(mono, sample_rate=48000, block_size=1536, pace=0))
+    processed = []
+    process_audio = controller.process_audio
+    controller.process_audio = lambda audio, degraded=False: processed.append(audio.size) or process_audio(audio, degraded)
+
+    controller.start_listening()
+    try:
+        list(controller.run_forever())
+    finally:
+        controller.stop_listening()
+
+    # 出力はフィルタの分だけ遅れるから、元の長さ（16kHzで512*30）より後ろまで押し出して処理している
+    assert sum(processed) > 512 * 30
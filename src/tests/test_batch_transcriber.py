@@ -0,0 +1,107 @@
+import wave
+import pytest
+import numpy as np
+from application.batch_transcriber import BatchTranscriber, format_offset
+from infrastructure.audio_file_reader import AudioFileReader
+
+class EnergyVAD:
+    """振幅だけで発話を判定する、テスト用のVADServiceの代わり"""
+
+    threshold = 0.5
+
+    def create_stream(self):
+        return {"remainder": np.zeros(0, dtype=np.float32)}
+
+    def reset_stream(self, stream=None):
+        stream["remainder"] = np.zeros(0, dtype=np.float32)
+
+    def score_stream(self, audio_chunk, sample_rate, stream=None):
+        audio = np.concatenate((stream["remainder"], audio_chunk.astype(np.float32)))
+        n = audio.size // 512
+        stream["remainder"] = audio[n * 512:]
+        frames = audio[:n * 512].reshape(n, 512)
+        return frames, (np.abs(frames).max(axis=1) > 0.1).astype(np.float32)
+
+class LengthService:
+    def transcribe(self, audio_data, sample_rate):
+        return f"{len(audio_data) / sample_rate:.1f}秒"
+
+def write_wav(path, audio, sample_rate=16000, channels=1):
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        frames = np.repeat(audio[:, None], channels, axis=1)
+        wf.writeframes((frames * 32767).astype('<i2').tobytes())
+
+def make_recording():
+    silence = np.zeros(16000, dtype=np.float32)
+    speech = np.full(16000, 0.5, dtype=np.float32)
+    return np.concatenate([silence, speech, silence, silence, speech, silence])
+
+@pytest.fixture
+def transcriber(tmp_path):
+    transcriber = BatchTranscriber(
+        output_dir=str(tmp_path / "out"),
+        max_concurrent_files=2,
+        vad_service=EnergyVAD(),
+        recognition_service=LengthService(),
+        silence_duration=0.5,
+        pre_buffer_duration=0.0
+    )
+    yield transcriber
+    transcriber.shutdown()
+
+def test正常系_ファイルを区間ごとにオフセット付きで書き出すこと(tmp_path, transcriber):
+    path = tmp_path / "meeting.wav"
+    write_wav(path, make_recording())
+
+    summary = transcriber.transcribe_file(str(path))
+
+    assert summary["segments"] == 2
+    lines = (tmp_path / "out" / "meeting.txt").read_text(encoding="utf-8").splitlines()
+    # オフセットはVADの窓（512サンプル = 32ms）単位になる
+    starts = [float(line[7:13]) for line in lines]
+    assert starts[0] == pytest.approx(1.0, abs=0.032)
+    assert starts[1] == pytest.approx(4.0, abs=0.032)
+    assert lines[0].endswith("1.0秒")
+
+def test正常系_複数ファイルを並行に処理すること(tmp_path, transcriber):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"rec{i}.wav"
+        write_wav(path, make_recording(), channels=2)
+        paths.append(str(path))
+
+    summaries = transcriber.run(paths)
+
+    assert sorted(s["input"] for s in summaries) == sorted(paths)
+    assert all(s["segments"] == 2 for s in summaries)
+
+def test正常系_サンプルレートが違うファイルは16kHzに変換して処理すること(tmp_path, transcriber):
+    path = tmp_path / "cd.wav"
+    write_wav(path, np.repeat(make_recording(), 441)[::160], sample_rate=44100)
+
+    summary = transcriber.transcribe_file(str(path))
+
+    assert summary["segments"] == 2
+    assert summary["duration"] == pytest.approx(6.0)
+    lines = (tmp_path / "out" / "cd.txt").read_text(encoding="utf-8").splitlines()
+    starts = [float(line[7:13]) for line in lines]
+    assert starts[0] == pytest.approx(1.0, abs=0.032)
+    assert starts[1] == pytest.approx(4.0, abs=0.032)
+    assert lines[0].endswith("1.0秒")
+
+def test正常系_WAVをブロック単位でモノラルに変換して読むこと(tmp_path):
+    path = tmp_path / "stereo.wav"
+    write_wav(path, np.linspace(-0.5, 0.5, 1000, dtype=np.float32), channels=2)
+
+    reader = AudioFileReader(str(path), block_size=300)
+    blocks = list(reader.blocks())
+
+    assert [len(b) for b in blocks] == [300, 300, 300, 100]
+    assert reader.duration == pytest.approx(1000 / 16000)
+    assert np.allclose(np.concatenate(blocks), np.linspace(-0.5, 0.5, 1000), atol=1e-4)
+
+def test正常系_秒数をタイムコード形式にすること():
+    assert format_offset(3723.4567) == "01:02:03.457"
@@ -0,0 +1,117 @@
+# tests/test_benchmarks.py
+
+import json
+import numpy as np
+from benchmarks.fixtures import AudioFixture, synthetic_fixture, load_fixture
+from benchmarks.scoring import score_segmentation, percentiles
+from benchmarks.runner import BenchmarkScenario, run_scenario, compare_results
+from benchmarks.stub_services import StubRecognitionService
+
+class AmplitudeVAD:
+    """振幅で発話確率を決める、テスト用のVADServiceの代わり"""
+
+    threshold = 0.5
+    energy_gate = None
+
+    def create_stream(self):
+        return None
+
+    def reset_stream(self, stream=None):
+        pass
+
+    def score_stream(self, audio_chunk, sample_rate, stream=None):
+        frames = audio_chunk[:len(audio_chunk) // 512 * 512].reshape(-1, 512)
+        return frames, (np.abs(frames).max(axis=1) > 0.1).astype(np.float32)
+
+def test正常系_同じシードなら同じ合成音声と正解区間になること():
+    a = synthetic_fixture(duration=10, seed=3)
+    b = synthetic_fixture(duration=10, seed=3)
+
+    assert np.array_equal(a.audio, b.audio)
+    assert a.speech_intervals == b.speech_intervals
+    assert a.duration == 10
+    assert all(0 <= start < end <= 10 for start, end in a.speech_intervals)
+
+def test正常系_リサンプルしても長さと正解区間が変わらないこと():
+    fixture = synthetic_fixture(duration=5)
+    resampled = fixture.resampled(8000)
+
+    assert resampled.sample_rate == 8000
+    assert len(resampled.audio) == 8000 * 5
+    assert resampled.speech_intervals == fixture.speech_intervals
+    assert [len(b) for b in resampled.blocks(3000)] == [3000] * 13 + [1000]
+
+def test正常系_Audacityのラベルと音声ファイルを読み込むこと(tmp_path):
+    import wave
+    path = tmp_path / "sample.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(np.zeros(16000, dtype=np.int16).tobytes())
+    (tmp_path / "sample.labels.txt").write_text("0.25\t0.75\tこんにちは\n", encoding="utf-8")
+
+    fixture = load_fixture(str(path))
+
+    assert fixture.duration == 1.0
+    assert fixture.speech_intervals == [(0.25, 0.75)]
+
+def test正常系_正解と同じ区間なら満点になること():
+    reference = [(1.0, 2.0), (3.0, 4.5)]
+
+    score = score_segmentation(reference, reference, duration=5.0)
+
+    assert score["frame_f1"] == 1.0
+    assert score["segment_recall"] == 1.0
+    assert score["false_segments"] == 0
+    assert score["fragmentation"] == 1.0
+
+def test正常系_取りこぼしと誤検出と細切れを数えること():
+    reference = [(1.0, 2.0), (3.0, 4.0)]
+    detected = [(1.0, 1.4), (1.6, 2.0), (4.5, 4.8)]
+
+    score = score_segmentation(detected, reference, duration=5.0)
+
+    assert score["segment_recall"] == 0.5
+    assert score["false_segments"] == 1
+    assert score["fragmentation"] == 2.0
+    assert 0 < score["frame_precision"] < 1
+    assert 0 < score["frame_recall"] < 1
+
+def test異常系_値が無ければ分位点はNoneになること():
+    assert percentiles([]) == {"p50": None, "p90": None, "p99": None}
+
+def test正常系_シナリオを計測して区間と遅延と速度を返すこと():
+    speech = np.full(16000, 0.5, dtype=np.float32)
+    silence = np.zeros(16000, dtype=np.float32)
+    fixture = AudioFixture("blocks", np.concatenate([silence, speech, silence, speech, silence]), 16000,
+                           [(1.0, 2.0), (3.0, 4.0)])
+    scenario = BenchmarkScenario(block_size=512, recognition_latency=0.0)
+
+    result = run_scenario(fixture, scenario, AmplitudeVAD(), silence_duration=0.5, pre_buffer_duration=0.0)
+
+    assert result["name"] == "sr16000-block512"
+    assert result["recognition_requests"] == 2
+    assert result["segment_recall"] == 1.0
+    assert result["frame_f1"] > 0.9
+    assert result["vad_blocks"] > 0
+    assert result["latency_p50"] is not None
+    assert result["real_time_factor"] > 0
+    json.dumps(result)  # そのままJSONに書き出せること
+
+def test正常系_前回の結果と比べて良し悪しを判定すること():
+    baseline = {"scenarios": [{"name": "a", "vad_blocks_per_second": 100.0, "latency_p50": 0.2}]}
+    current = {"scenarios": [{"name": "a", "vad_blocks_per_second": 150.0, "latency_p50": 0.3},
+                             {"name": "b", "vad_blocks_per_second": 1.0}]}
+
+    rows = {metric: (change, improved) for _, metric, _, _, change, improved in compare_results(current, baseline)}
+
+    assert rows["vad_blocks_per_second"] == (0.5, True)
+    assert rows["latency_p50"][1] is False
+    assert len(rows) == 2
+
+def test正常系_偽の認識サービスは音声の長さを返すこと():
+    service = StubRecognitionService(latency=0.0)
+
+    assert service.transcribe(np.zeros(8000, dtype=np.float32), 16000) == "0.50s"
+    assert service.calls == 1
@@ -0,0 +1,103 @@
+# tests/test_cached_recognition_service.py
+
+import numpy as np
+from infrastructure.cached_recognition_service import CachedRecognitionService, TranscriptionCache
+from infrastructure.failover_recognition_service import FailoverRecognitionService
+from infrastructure.rate_limiter import RateLimitedRecognitionService, TokenBucket
+
+class CountingService:
+    language = "ja-JP"
+    model_name = "fake"
+
+    def __init__(self, text="こんにちは"):
+        self.text = text
+        self.calls = 0
+
+    def transcribe(self, audio_data, sample_rate):
+        self.calls += 1
+        return self.text
+
+def audio(seed=0):
+    return np.random.default_rng(seed).uniform(-0.5, 0.5, 16000).astype(np.float32)
+
+def test正常系_同じ音声は2回目からキャッシュを返すこと():
+    service = CountingService()
+    cached = CachedRecognitionService(service)
+
+    assert cached.transcribe(audio(), 16000) == "こんにちは"
+    assert cached.transcribe(audio().copy(), 16000) == "こんにちは"
+    assert cached.transcribe(audio(1), 16000) == "こんにちは"
+
+    assert service.calls == 2
+    stats = cached.get_stats()
+    assert (stats["memory_hits"], stats["misses"]) == (1, 2)
+
+def test正常系_サービスや言語やサンプルレートが違えば別のキーになること():
+    cache = TranscriptionCache()
+    ja = CachedRecognitionService(CountingService(), cache)
+    en_service = CountingService()
+    en_service.language = "en-US"
+    en = CachedRecognitionService(en_service, cache)
+
+    assert ja.cache_key(audio(), 16000) != en.cache_key(audio(), 16000)
+    assert ja.cache_key(audio(), 16000) != ja.cache_key(audio(), 8000)
+
+def test正常系_空の結果はキャッシュしないこと():
+    service = CountingService(text="")
+    cached = CachedRecognitionService(service)
+
+    cached.transcribe(audio(), 16000)
+    cached.transcribe(audio(), 16000)
+
+    assert service.calls == 2
+
+def test正常系_メモリ層は使われていない順に追い出すこと():
+    cache = TranscriptionCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+def test正常系_ディスク層は再起動後も残ること(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    service = CountingService()
+    cache = TranscriptionCache(db_path=db_path)
+    CachedRecognitionService(service, cache).transcribe(audio(), 16000)
+    cache.close()
+
+    # プロセスを再起動した想定
+    cache = TranscriptionCache(db_path=db_path)
+    assert CachedRecognitionService(service, cache).transcribe(audio(), 16000) == "こんにちは"
+    assert service.calls == 1
+    assert cache.get_stats()["disk_hits"] == 1
+    cache.close()
+
+def test正常系_ディスク層は上限サイズを超えたら古い順に消すこと(tmp_path):
+    cache = TranscriptionCache(max_entries=0, db_path=str(tmp_path / "cache.sqlite"), max_disk_bytes=100)
+    for i in range(5):
+        cache.put(f"key{i}", "x" * 30)
+
+    stats = cache.get_stats()
+    assert stats["disk_bytes"] <= 100
+    assert stats["evictions"] == 3
+    assert cache.get("key0") is None
+    assert cache.get("key4") == "x" * 30
+    cache.close()
+
+def test正常系_サービスのcache_namespaceでキーを分けラッパーはそれを引き継ぐこと():
+    service = CountingService()
+    service.cache_namespace = "fake|fake|ja-JP"
+    other = CountingService()
+    other.cache_namespace = "other|fake|ja-JP"
+    cache = TranscriptionCache()
+    plain = CachedRecognitionService(service, cache)
+    limited = CachedRecognitionService(RateLimitedRecognitionService(service, TokenBucket(1.0, 1.0)), cache)
+    failover = CachedRecognitionService(FailoverRecognitionService([("a", service), ("b", other)]), cache)
+
+    assert plain.namespace == "fake|fake|ja-JP"
+    # レート制限で包んでも同じキーになり、キャッシュを使い回せる
+    assert limited.cache_key(audio(), 16000) == plain.cache_key(audio(), 16000)
+    assert failover.namespace == "fake|fake|ja-JP+other|fake|ja-JP"
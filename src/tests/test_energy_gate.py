@@ -0,0 +1,64 @@
+# tests/test_energy_gate.py
+
+import numpy as np
+from domain.energy_gate import EnergyGate
+
+def make_frames(*blocks):
+    return np.concatenate(blocks).astype(np.float32).reshape(-1, 512)
+
+def voiced(n_windows, amplitude=0.3):
+    t = np.arange(n_windows * 512) / 16000
+    return amplitude * np.sin(2 * np.pi * 200 * t)
+
+def test正常系_デジタル無音の窓はすべて落とすこと():
+    gate = EnergyGate(hangover_windows=0)
+    state = gate.create_state()
+
+    mask = gate.apply(make_frames(np.zeros(512 * 10)), state)
+
+    assert not mask.any()
+    stats = gate.get_stats()
+    assert stats["skipped_quiet"] == 10
+    assert stats["skip_ratio"] == 1.0
+
+def test正常系_発話の窓は通しハングオーバー分だけ続けて通すこと():
+    gate = EnergyGate(hangover_windows=3)
+    state = gate.create_state()
+
+    mask = gate.apply(make_frames(np.zeros(512 * 2), voiced(2), np.zeros(512 * 6)), state)
+
+    assert mask.tolist() == [False, False, True, True, True, True, True, False, False, False]
+    assert gate.get_stats()["passed"] == 5
+
+def test正常系_ハングオーバーは次の呼び出しに持ち越すこと():
+    gate = EnergyGate(hangover_windows=4)
+    state = gate.create_state()
+
+    gate.apply(make_frames(np.zeros(512 * 2), voiced(1)), state)
+    mask = gate.apply(make_frames(np.zeros(512 * 6)), state)
+
+    assert mask.tolist() == [True, True, True, True, False, False]
+
+def test正常系_ゼロ交差率の高いノイズは大きなエネルギーを求めること():
+    rng = np.random.default_rng(0)
+    gate = EnergyGate(hangover_windows=0, initial_noise_floor=0.005)
+    state = gate.create_state()
+    hiss = rng.standard_normal(512 * 4) * 0.015
+
+    mask = gate.apply(make_frames(hiss), state)
+
+    assert not mask.any()
+    assert gate.get_stats()["skipped_noisy"] == 4
+    # 同じくらいのエネルギーでも、有声音なら通す
+    assert gate.apply(make_frames(voiced(2, amplitude=0.02)), state).all()
+
+def test正常系_ノイズフロアは下がるときは速く上がるときはゆっくり追従すること():
+    rng = np.random.default_rng(0)
+    gate = EnergyGate(initial_noise_floor=0.01, floor_rise_rate=0.1)
+    state = gate.create_state()
+
+    gate.apply(make_frames(rng.standard_normal(512 * 2) * 0.001), state)
+    assert state.noise_floor < 0.0015
+
+    gate.apply(make_frames(rng.standard_normal(512 * 2) * 0.02), state)
+    assert 0.0015 < state.noise_floor < 0.005
@@ -0,0 +1,124 @@
+# tests/test_failover_recognition_service.py
+
+import threading
+import pytest
+import numpy as np
+from infrastructure.failover_recognition_service import FailoverRecognitionService
+from infrastructure.rate_limiter import RateLimitedRecognitionService, TokenBucket
+from infrastructure.recognition_error import RecognitionError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeService:
+    language = "ja-JP"
+
+    def __init__(self, text="こんにちは", fail=False, block=None):
+        self.text = text
+        self.fail = fail
+        self.block = block  # セットされるまで返らないEvent
+        self.calls = 0
+
+    def transcribe(self, audio_data, sample_rate):
+        self.calls += 1
+        if self.block is not None:
+            self.block.wait(5)
+        if self.fail:
+            raise RecognitionError("落ちてるわ")
+        return self.text
+
+AUDIO = np.zeros(1600, dtype=np.float32)
+
+def test正常系_失敗したら次のバックエンドで認識すること():
+    service = FailoverRecognitionService([("a", FakeService(fail=True)), ("b", FakeService("予備"))])
+
+    assert service.transcribe(AUDIO, 16000) == "予備"
+    assert service.stats["failovers"] == 1
+
+def test正常系_締め切りを過ぎたら次のバックエンドに切り替えること():
+    release = threading.Event()
+    slow = FakeService("遅い", block=release)
+    service = FailoverRecognitionService([("slow", slow), ("fast", FakeService("速い"))], deadline=0.05)
+
+    assert service.transcribe(AUDIO, 16000) == "速い"
+    release.set()
+    service.shutdown()
+    assert service.get_stats()["backends"]["slow"]["timeouts"] == 1
+
+def test正常系_失敗が続いたらサーキットを開き時間が経てば再開すること():
+    clock = FakeClock()
+    broken = FakeService(fail=True)
+    service = FailoverRecognitionService([("broken", broken), ("ok", FakeService())],
+                                         failure_threshold=2, reset_timeout=30.0, clock=clock)
+
+    service.transcribe(AUDIO, 16000)
+    service.transcribe(AUDIO, 16000)
+    assert service.get_stats()["backends"]["broken"]["state"] == "open"
+
+    service.transcribe(AUDIO, 16000)
+    assert broken.calls == 2  # 開いている間は呼ばない
+
+    clock.now = 31.0
+    broken.fail = False
+    service.transcribe(AUDIO, 16000)
+    assert broken.calls == 3
+    assert service.get_stats()["backends"]["broken"]["state"] == "closed"
+
+def test正常系_レイテンシの実績が良いバックエンドを優先すること():
+    service = FailoverRecognitionService([("a", FakeService()), ("b", FakeService())], min_latency_samples=2)
+    for _ in range(2):
+        service.backends[0].histogram.observe(3.0)
+        service.backends[1].histogram.observe(0.3)
+
+    assert [backend.name for backend in service.ranked_backends()] == ["b", "a"]
+
+def test正常系_raceでは先に返った空でない結果を使うこと():
+    release = threading.Event()
+    service = FailoverRecognitionService(
+        [("slow", FakeService("遅い", block=release)), ("empty", FakeService("")), ("fast", FakeService("速い"))],
+        race=True
+    )
+    # 上位2つは遅いのと空を返すの。空は採用せず遅い方を待つ
+    timer = threading.Timer(0.05, release.set)
+    timer.start()
+    assert service.transcribe(AUDIO, 16000) == "遅い"
+    timer.join()
+
+def test異常系_全部失敗したらRecognitionErrorを送出すること():
+    service = FailoverRecognitionService([("a", FakeService(fail=True)), ("b", FakeService(fail=True))])
+
+    with pytest.raises(Exception, match="全バックエンドで認識に失敗"):
+        service.transcribe(AUDIO, 16000)
+
+def test正常系_レート制限のトークン待ちは締め切りに数えないこと():
+    limited = RateLimitedRecognitionService(FakeService("制限付き"), TokenBucket(5.0, 1.0))
+    service = FailoverRecognitionService([("limited", limited), ("spare", FakeService("予備"))], deadline=0.1)
+
+    # 2回目はトークンの補充を0.2秒待つが、締め切りを過ぎたことにはしない
+    assert [service.transcribe(AUDIO, 16000) for _ in range(2)] == ["制限付き", "制限付き"]
+    service.shutdown()
+
+    stats = service.get_stats()["backends"]["limited"]
+    assert (stats["calls"], stats["successes"], stats["timeouts"]) == (2, 2, 0)
+    assert limited.rate_limiter.stats["waited"] == 1
+
+def test正常系_複数スレッドから呼んでも統計を数え落とさないこと():
+    service = FailoverRecognitionService([("a", FakeService())])
+
+    def worker():
+        for _ in range(200):
+            service.transcribe(AUDIO, 16000)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    service.shutdown()
+
+    assert service.get_stats()["requests"] == 1600
+    assert service.get_stats()["backends"]["a"]["calls"] == 1600
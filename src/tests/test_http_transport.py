@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+import numpy as np
+from infrastructure.http_transport import TransportConfig, RequestExecutor, is_retryable_error
+from infrastructure.openai_recognition_service import OpenAIRecognitionService
+from infrastructure.metrics import MetricsRegistry, get_metrics
+
+class StubWhisperServer:
+    """
+    Whisper APIの代わりに応答する最小限のHTTPサーバ。
+    responses に (遅延秒, ステータス) を積んでおくと、その順に応答するわ。
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                index = len(stub.requests)
+                stub.requests.append(self.client_address)
+                delay, status = stub.responses[index] if index < len(stub.responses) else (0.0, 200)
+                time.sleep(delay)
+                body = json.dumps({"text": f"応答{index}"}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    server = StubWhisperServer()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    yield server
+    server.close()
+
+@pytest.fixture
+def audio():
+    return np.zeros(1600, dtype=np.float32)
+
+def make_service(**config):
+    return OpenAIRecognitionService(audio_format="wav", transport=TransportConfig(backoff_base=0.01, **config))
+
+def test正常系_サーバエラーをリトライして結果を返すこと(stub_server, audio):
+    stub_server.responses = [(0.0, 503), (0.0, 200)]
+    service = make_service(max_retries=2)
+
+    assert service.transcribe(audio, 16000) == "応答1"
+    assert len(stub_server.requests) == 2
+    assert service.executor.stats["retries"] == 1
+
+def test正常系_keep_aliveで同じ接続を使い回すこと(stub_server, audio):
+    service = make_service()
+    for _ in range(3):
+        service.transcribe(audio, 16000)
+    assert len(set(stub_server.requests)) == 1
+
+def test異常系_締め切りを過ぎたら空文字列を返すこと(stub_server, audio):
+    stub_server.responses = [(2.0, 200)]
+    service = make_service(timeout=0.3, max_retries=0)
+
+    started = time.monotonic()
+    assert service.transcribe(audio, 16000) == ""
+    assert time.monotonic() - started < 1.5
+
+def test正常系_遅いリクエストが失敗したら先に送っておいたヘッジの結果を使うこと(stub_server, audio):
+    stub_server.responses = [(0.6, 503), (0.0, 200)]
+    service = make_service(hedge=True, hedge_delay=0.1, max_retries=0)
+
+    started = time.monotonic()
+    assert service.transcribe(audio, 16000) == "応答1"
+    # 失敗が分かった時点でヘッジの結果はもう届いている
+    assert time.monotonic() - started < 1.0
+    assert service.executor.get_stats()["hedge_wins"] == 1
+    service.close()
+
+def test正常系_最初のリクエストが遅ければ先に返ったヘッジの結果を使うこと():
+    executor = RequestExecutor(TransportConfig(hedge=True, hedge_delay=0.05))
+    lock = threading.Lock()
+    calls = []
+
+    def request(timeout):
+        with lock:
+            calls.append(timeout)
+            index = len(calls)
+        # 最初のリクエストだけが遅い
+        time.sleep(1.0 if index == 1 else 0.0)
+        return index
+
+    started = time.monotonic()
+    assert executor.call(request) == 2
+    # 遅い最初のリクエストを待たずに返る
+    assert time.monotonic() - started < 0.5
+    executor.close()
+
+    assert executor.get_stats() == {"requests": 1, "retries": 0, "hedges": 1, "hedge_wins": 1}
+
+def test正常系_ヘッジのスレッド数は接続プールの数に合わせること():
+    executor = RequestExecutor(TransportConfig(hedge=True, max_connections=10))
+
+    assert executor._hedge_pool._max_workers == 20
+    executor.close()
+
+def test正常系_バックオフとヘッジの設定も環境変数から読むこと(monkeypatch):
+    monkeypatch.setenv("TEST_BACKOFF_BASE", "0.5")
+    monkeypatch.setenv("TEST_BACKOFF_MAX", "8")
+    monkeypatch.setenv("TEST_HEDGE_QUANTILE", "0.9")
+    monkeypatch.setenv("TEST_HEDGE_MIN_SAMPLES", "50")
+
+    config = TransportConfig.from_env("TEST")
+
+    assert (config.backoff_base, config.backoff_max) == (0.5, 8.0)
+    assert (config.hedge_quantile, config.hedge_min_samples) == (0.9, 50)
+
+def test正常系_速く返ったリクエストにはヘッジを送らないこと():
+    executor = RequestExecutor(TransportConfig(hedge=True, hedge_delay=0.2))
+    calls = []
+
+    assert executor.call(lambda timeout: calls.append(timeout) or "結果") == "結果"
+    executor.close()
+
+    assert len(calls) == 1
+    assert executor.get_stats()["hedges"] == 0
+
+def test正常系_複数スレッドから呼んでも統計を数え落とさないこと():
+    executor = RequestExecutor(TransportConfig())
+
+    def worker():
+        for _ in range(200):
+            executor.call(lambda timeout: None)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert executor.get_stats()["requests"] == 1600
+
+def test正常系_ヘッジの待ち時間が実績レイテンシの分位点になること():
+    executor = RequestExecutor(TransportConfig(hedge_min_samples=10, hedge_quantile=0.9))
+    for i in range(1, 11):
+        executor.latency.observe(0.1 * i)
+    # 0.6〜1.0秒の5件が入った (0.5, 1.0] のバケットの中で補間する
+    assert executor.hedge_delay() == pytest.approx(0.9)
+
+def test正常系_リトライ対象のエラーを判定できること():
+    class StatusError(Exception):
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    assert is_retryable_error(httpx.ConnectError("boom"))
+    assert is_retryable_error(StatusError(503))
+    assert is_retryable_error(StatusError(429))
+    assert not is_retryable_error(StatusError(400))
+    assert not is_retryable_error(ValueError("bad"))
+
+def test正常系_渡された計測の入れ物に通信時間を記録すること(stub_server, audio):
+    registry = MetricsRegistry()
+    service = OpenAIRecognitionService(audio_format="wav", transport=TransportConfig(), metrics=registry)
+
+    service.transcribe(audio, 16000)
+    service.close()
+
+    assert registry.histogram("voicescribe_backend_request_seconds").count(backend="OpenAIRecognitionService") == 1
+    assert registry.histogram("voicescribe_encode_seconds").count(format="wav") == 1
+    # プロセス全体の設定（既定は計測しない）には書かない
+    assert not get_metrics().enabled
@@ -0,0 +1,160 @@
+# tests/test_inference_worker.py
+
+import time
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from domain.energy_gate import EnergyGate
+from domain.vad_service import VADService
+from infrastructure.inference_worker import ProcessVADService, ProcessRecognitionService
+from infrastructure.audio_source import ReplaySource
+from application.audio_controller import AudioController
+from benchmarks.stub_services import StubRecognitionService
+
+@pytest.fixture(scope="module")
+def process_vad():
+    service = ProcessVADService(threshold=0.5, energy_gate=EnergyGate(min_amplitude=0.01)).start()
+    yield service
+    service.stop()
+
+def make_audio(seconds=2.0, sample_rate=16000):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    audio = 0.4 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    return (audio + rng.normal(0, 0.01, len(t))).astype(np.float32)
+
+def test正常系_別プロセスのVADが同じプロセスのVADと同じ確率を返すこと(process_vad):
+    local = VADService(threshold=0.5, energy_gate=EnergyGate(min_amplitude=0.01))
+    audio = make_audio()
+    local_stream, remote_stream = local.create_stream(), process_vad.create_stream()
+
+    for start in range(0, len(audio), 700):
+        chunk = audio[start:start + 700]
+        local_frames, local_probs = local.score_stream(chunk, 16000, local_stream)
+        remote_frames, remote_probs = process_vad.score_stream(chunk, 16000, remote_stream)
+        assert np.array_equal(local_frames, remote_frames)
+        assert np.allclose(local_probs, remote_probs, atol=1e-6)
+
+def test正常系_ストリームをリセットすると子プロセス側の状態も初期化されること(process_vad):
+    audio = make_audio(1.0)
+    stream = process_vad.create_stream()
+    _, first = process_vad.score_stream(audio, 16000, stream)
+    process_vad.reset_stream(stream)
+    assert stream.pending_reset
+
+    _, again = process_vad.score_stream(audio, 16000, stream)
+
+    assert not stream.pending_reset
+    assert np.allclose(first, again, atol=1e-6)
+
+def test正常系_一次判定の統計を子プロセスから取り出せること(process_vad):
+    process_vad.score_stream(np.zeros(16000, dtype=np.float32), 16000, process_vad.create_stream())
+
+    stats = process_vad.energy_gate.get_stats()
+
+    assert stats["skipped"] > 0
+
+def test正常系_子プロセスが落ちたら起動し直して推論を続けること():
+    service = ProcessVADService(threshold=0.5).start()
+    try:
+        service._worker.process.kill()
+        service._worker.process.join()
+
+        frames, probs = service.score_stream(make_audio(0.5), 16000)
+
+        assert len(probs) == len(frames) > 0
+        assert service.stats["restarts"] == 1
+        assert service.is_running
+    finally:
+        service.stop()
+    assert not service.is_running
+
+def test異常系_未対応のサンプルレートはエラーになること(process_vad):
+    with pytest.raises(ValueError):
+        process_vad.score_stream(np.zeros(1000, dtype=np.float32), 44100)
+
+def test正常系_音声認識を別プロセスで並行して行えること():
+    service = ProcessRecognitionService(StubRecognitionService, {"latency": 0.2}, slots=2, max_seconds=2.0)
+    try:
+        service.start()
+        assert service.model_name == "StubRecognitionService"
+        audio = [np.zeros(16000 * n // 2, dtype=np.float32) for n in (1, 2, 3, 4)]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            texts = list(executor.map(lambda a: service.transcribe(a, 16000), audio))
+
+        assert texts == ["0.50s", "1.00s", "1.50s", "2.00s"]
+        assert sorted(service._free_slots) == [0, 1]
+    finally:
+        service.stop()
+    assert not service.is_running
+
+def test異常系_スロットに入らない長さの音声はエラーになること():
+    service = ProcessRecognitionService(StubRecognitionService, slots=1, max_seconds=1.0)
+
+    with pytest.raises(Exception, match="長すぎ"):
+        service.transcribe(np.zeros(16001, dtype=np.float32), 16000)
+    # 送る前に弾くから子プロセスは起動しない
+    assert not service.is_running
+
+def test異常系_子プロセスでサービスを作れなければ起動時にエラーになること():
+    service = ProcessRecognitionService(StubRecognitionService, {"unknown_option": 1}, slots=1, max_seconds=1.0)
+
+    with pytest.raises(RuntimeError, match="起動に失敗"):
+        service.start()
+    assert not service.is_running
+
+def test正常系_音声認識の子プロセスが落ちていたら片付けてから起動し直すこと():
+    service = ProcessRecognitionService(StubRecognitionService, {"latency": 0}, slots=2, max_seconds=1.0)
+    try:
+        service.start()
+        old_shm = service._worker.shm.name
+        slot_available = service._slot_available
+        service._worker.process.kill()
+        service._worker.process.join()
+
+        assert service.transcribe(np.zeros(8000, dtype=np.float32), 16000) == "0.50s"
+
+        assert service.is_running
+        # 前の共有メモリは解放済みで、スロットを待つセマフォは作り直さない
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=old_shm)
+        assert service._slot_available is slot_available
+        assert sorted(service._free_slots) == [0, 1]
+    finally:
+        service.stop()
+
+def test異常系_子プロセスが応答しなければ待ち時間を過ぎたらエラーにすること():
+    service = ProcessRecognitionService(StubRecognitionService, {"latency": 2.0}, slots=1, max_seconds=1.0,
+                                        request_timeout=0.3)
+    try:
+        service.start()
+        started = time.monotonic()
+        with pytest.raises(Exception, match="応答しなかった"):
+            service.transcribe(np.zeros(8000, dtype=np.float32), 16000)
+
+        assert time.monotonic() - started < 1.5
+        # 固まった子プロセスは止めて、スロットも返している
+        assert not service.is_running
+        assert service._free_slots == [0]
+    finally:
+        service.stop()
+
+def test正常系_コントローラの録音開始で子プロセスを起動し停止で止めること():
+    audio = np.concatenate([np.zeros(8000), make_audio(1.0), np.zeros(32000)]).astype(np.float32)
+    controller = AudioController(recognition_service=StubRecognitionService(latency=0), silence_threshold=0.5,
+                                 audio_source=ReplaySource(audio, pace=0), inference_process=True)
+    assert type(controller.vad_service).__name__ == "ProcessVADService"
+    assert not controller.vad_service.is_running
+
+    controller.start_listening()
+    try:
+        assert controller.vad_service.is_running
+        results = list(controller.run_forever())
+    finally:
+        controller.stop_listening()
+
+    assert not controller.vad_service.is_running
+    assert controller.vad_service.stats["requests"] > 0
+    assert all(metadata["text"] for _, metadata in results)
@@ -0,0 +1,56 @@
+import pytest
+import numpy as np
+from types import SimpleNamespace
+from infrastructure.local_recognition_service import LocalRecognitionService
+
+class FakeWhisperModel:
+    """faster-whisperのWhisperModelの代わりに呼び出しを記録する偽モデル"""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append((audio, kwargs))
+        return iter([SimpleNamespace(text=" こんにちは"), SimpleNamespace(text="世界 ")]), None
+
+@pytest.fixture
+def created_models(monkeypatch):
+    created = []
+
+    def create_model(self):
+        model = FakeWhisperModel()
+        created.append(model)
+        return model
+
+    monkeypatch.setattr(LocalRecognitionService, "_models", {})
+    monkeypatch.setattr(LocalRecognitionService, "_create_model", create_model)
+    return created
+
+def test正常系_同じ設定のインスタンス間でモデルを使い回すこと(created_models):
+    first = LocalRecognitionService(model_name="tiny")
+    second = LocalRecognitionService(model_name="tiny")
+    LocalRecognitionService(model_name="tiny", compute_type="float32")
+
+    assert first.model is second.model
+    assert len(created_models) == 2
+
+def test正常系_読み込み直後にウォームアップ推論を行うこと(created_models):
+    LocalRecognitionService(model_name="tiny")
+    audio, kwargs = created_models[0].calls[0]
+    assert audio.size == 16000
+    assert kwargs["language"] == "ja"
+
+def test正常系_セグメントのテキストを連結して返すこと(created_models):
+    service = LocalRecognitionService(model_name="tiny", warmup=False)
+    assert service.transcribe(np.zeros(8000, dtype=np.float32), 16000) == "こんにちは世界"
+
+def test正常系_16kHz以外の音声をリサンプルして渡すこと(created_models):
+    service = LocalRecognitionService(model_name="tiny", warmup=False)
+    service.transcribe(np.zeros(48000, dtype=np.float32), 48000)
+    audio, _ = created_models[0].calls[-1]
+    assert audio.size == 16000
+    assert audio.dtype == np.float32
+
+def test異常系_空の音声に空文字列を返すこと(created_models):
+    service = LocalRecognitionService(model_name="tiny", warmup=False)
+    assert service.transcribe(np.array([], dtype=np.float32), 16000) == ""
@@ -0,0 +1,98 @@
+# tests/test_metrics.py
+
+import json
+import pytest
+import urllib.request
+import numpy as np
+from infrastructure.metrics import (
+    JsonlMetricsDumper, MetricsRegistry, NULL_METRICS, PrometheusExporter, get_metrics, set_metrics
+)
+from application.transcription_worker import TranscriptionPool
+
+def test正常系_ヒストグラムを累積バケットでPrometheus形式にすること():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("vad_seconds", "VADの時間", buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.5):
+        histogram.observe(value, source="a")
+    registry.counter("segments_total").inc(2)
+
+    text = registry.render_prometheus()
+
+    assert "# TYPE vad_seconds histogram" in text
+    assert 'vad_seconds_bucket{source="a",le="0.01"} 1' in text
+    assert 'vad_seconds_bucket{source="a",le="0.1"} 2' in text
+    assert 'vad_seconds_bucket{source="a",le="+Inf"} 3' in text
+    assert 'vad_seconds_count{source="a"} 3' in text
+    assert "segments_total 2" in text
+
+def test正常系_ヒストグラムの分位点をバケットの中で補間して求めること():
+    histogram = MetricsRegistry().histogram("latency_seconds", buckets=(0.1, 0.25, 1.0, 2.5))
+    for seconds in (0.1, 0.2, 0.3, 1.5):
+        histogram.observe(seconds)
+
+    assert histogram.quantile(0.5) == pytest.approx(0.25)
+    assert histogram.quantile(1.0) == pytest.approx(2.5)
+    assert histogram.quantile(0.75) == pytest.approx(1.0)
+    # 区切りを超えた値は一番大きい区切りとみなす
+    histogram.observe(10.0)
+    assert histogram.quantile(1.0) == 2.5
+    assert histogram.quantile(0.5, source="none") is None
+
+def test正常系_ラベルの値のバックスラッシュと引用符と改行をエスケープすること():
+    registry = MetricsRegistry()
+    registry.counter("errors_total").inc(backend='C:\\models\n"small"')
+
+    text = registry.render_prometheus()
+
+    assert 'errors_total{backend="C:\\\\models\\n\\"small\\""} 1' in text
+
+def test正常系_同じ名前なら同じ計測器を返すこと():
+    registry = MetricsRegistry()
+    registry.counter("requests_total").inc(backend="groq")
+    registry.counter("requests_total").inc(backend="groq")
+
+    assert registry.counter("requests_total").value(backend="groq") == 2
+
+def test正常系_既定では何も記録しないこと():
+    assert get_metrics() is NULL_METRICS
+    NULL_METRICS.histogram("x").observe(1.0)
+    assert NULL_METRICS.snapshot() == {}
+
+def test正常系_PrometheusのエンドポイントとJSONLの書き出し(tmp_path):
+    registry = MetricsRegistry()
+    registry.gauge("queue_depth").set(3)
+
+    exporter = PrometheusExporter(registry, port=0).start()
+    try:
+        body = urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics").read().decode("utf-8")
+    finally:
+        exporter.stop()
+    assert "queue_depth 3" in body
+
+    path = tmp_path / "metrics.jsonl"
+    dumper = JsonlMetricsDumper(registry, str(path), interval=60).start()
+    dumper.stop()
+    record = json.loads(path.read_text(encoding="utf-8").splitlines()[-1])
+    assert record["metrics"]["queue_depth"]["series"][0]["value"] == 3
+
+def test正常系_認識プールが認識時間と実時間比を記録すること():
+    class EchoService:
+        def transcribe(self, audio_data, sample_rate):
+            return "ok"
+
+    registry = MetricsRegistry()
+    pool = TranscriptionPool(EchoService(), max_workers=1, metrics=registry)
+    pool.submit(np.zeros(16000, dtype=np.float32), 16000, {})
+    pool.drain()
+    pool.shutdown()
+
+    assert registry.histogram("voicescribe_recognition_seconds").count() == 1
+    assert registry.histogram("voicescribe_real_time_factor").count(stage="recognition") == 1
+
+def test正常系_差し替えた入れ物をプロセス全体で使うこと():
+    registry = MetricsRegistry()
+    try:
+        assert set_metrics(registry) is get_metrics()
+    finally:
+        set_metrics(None)
+    assert get_metrics() is NULL_METRICS
@@ -0,0 +1,120 @@
+# tests/test_multi_source_controller.py
+
+import pytest
+import numpy as np
+from unittest.mock import patch
+from application.multi_source_controller import CaptureSource, MultiSourceController
+
+class EnergyVAD:
+    """振幅だけで発話を判定する、テスト用のVADServiceの代わり"""
+
+    def __init__(self, threshold=0.5, energy_gate=None):
+        self.threshold = threshold
+        self.energy_gate = energy_gate
+        self.batch_sizes = []
+
+    def create_stream(self):
+        return {"remainder": np.zeros(0, dtype=np.float32)}
+
+    def reset_stream(self, stream=None):
+        stream["remainder"] = np.zeros(0, dtype=np.float32)
+
+    def score_streams(self, requests, sample_rate):
+        self.batch_sizes.append(len(requests))
+        results = []
+        for audio, stream in requests:
+            audio = np.concatenate((stream["remainder"], audio))
+            n = audio.size // 512
+            stream["remainder"] = audio[n * 512:]
+            frames = audio[:n * 512].reshape(n, 512)
+            results.append((frames, (np.abs(frames).max(axis=1) > 0.1).astype(np.float32)))
+        return results
+
+class EchoService:
+    def transcribe(self, audio_data, sample_rate):
+        return f"{len(audio_data)}"
+
+@pytest.fixture
+def controller():
+    sources = [CaptureSource.parse("左=1:0"), CaptureSource.parse("右=1:1"), CaptureSource.parse("2")]
+    with patch("application.multi_source_controller.VADService", EnergyVAD):
+        controller = MultiSourceController(
+            sources,
+            recognition_service=EchoService(),
+            silence_duration=0.1,
+            pre_buffer_duration=0.0
+        )
+    yield controller
+    controller.shutdown()
+
+def test正常系_ソース指定の文字列を解釈すること():
+    source = CaptureSource.parse("窓側=2:1")
+    assert (source.source_id, source.device, source.channel) == ("窓側", 2, 1)
+    source = CaptureSource.parse("3")
+    assert (source.source_id, source.device, source.channel) == ("3:0", 3, 0)
+    source = CaptureSource.parse("default:1")
+    assert (source.device, source.channel) == (None, 1)
+
+def test異常系_ソースIDが重複するとエラーになること():
+    with patch("application.multi_source_controller.VADService", EnergyVAD):
+        with pytest.raises(ValueError):
+            MultiSourceController([CaptureSource(1, 0, "a"), CaptureSource(2, 0, "a")],
+                                  recognition_service=EchoService())
+
+def test正常系_モデルと認識サービスを全ソースで共有すること(controller):
+    controllers = list(controller.controllers.values())
+    assert all(c.vad_service is controller.vad_service for c in controllers)
+    assert all(c.stt_service is controllers[0].stt_service for c in controllers)
+    # VADの隠れ状態はソースごと
+    assert len({id(c.vad_stream) for c in controllers}) == 3
+    # デバイス1は2チャンネルで1本だけ開く
+    assert controller.device_channels == {1: 2, 2: 1}
+
+def test正常系_チャンネルごとに区間を検出してソースIDを付けること(controller):
+    speech = np.concatenate([np.full(4096, 0.5, dtype=np.float32), np.zeros(4096, dtype=np.float32)])
+    silence = np.zeros(8192, dtype=np.float32)
+    blocks = iter([
+        {1: np.stack([speech, silence], axis=1), 2: speech[:, None]},
+    ])
+
+    def dequeue():
+        try:
+            return next(blocks)
+        except StopIteration:
+            controller.is_running = False
+            return {}
+
+    controller.is_running = True
+    with patch.object(controller, "_dequeue_blocks", side_effect=dequeue):
+        results = list(controller.run_forever())
+
+    assert sorted(metadata["source_id"] for _, metadata in results) == ["2:0", "左"]
+    assert all(metadata["text"] == "4096" for _, metadata in results)
+    # 全ソースを1回のバッチ推論でまとめて処理する
+    assert controller.vad_service.batch_sizes == [3]
+
+def test正常系_デバイスのサンプルレートで録ってソースごとに変換すること():
+    sources = [CaptureSource.parse("左=1:0"), CaptureSource.parse("右=1:1")]
+    with patch("application.multi_source_controller.VADService", EnergyVAD):
+        controller = MultiSourceController(sources, recognition_service=EchoService(), capture_sample_rate=48000,
+                                           silence_duration=0.1, pre_buffer_duration=0.0)
+    try:
+        assert controller.capture_block_size == 1536
+        assert controller.capture_buffers[1].block_size == 1536
+        speech = np.concatenate([np.full(4096 * 3, 0.5, dtype=np.float32), np.zeros(4096 * 3, dtype=np.float32)])
+        block = np.stack([np.zeros_like(speech), speech], axis=1)
+
+        segments = controller.process_device_blocks({1: block})
+
+        # 48kHzの8192×3サンプルが16kHzの8192サンプルになり、右チャンネルだけが発話になる
+        assert [c.source_id for c, _ in segments] == ["右"]
+        assert len(segments[0][1][0]) == pytest.approx(4096, abs=512)
+    finally:
+        controller.shutdown()
+
+def test正常系_ソースごとのコントローラは録音キューを確保しないこと(controller):
+    # 録音はデバイスごとのキューだけで受ける
+    assert all(c.capture_buffer is None for c in controller.controllers.values())
+    assert set(controller.capture_buffers) == {1, 2}
+    with pytest.raises(ValueError):
+        controller.controllers["左"].start_listening()
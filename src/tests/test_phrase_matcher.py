@@ -0,0 +1,83 @@
+# tests/test_phrase_matcher.py
+
+import random
+import pytest
+from domain.phrase_matcher import AhoCorasick, PhraseMatcher, normalize_text, to_kana, to_romaji
+
+def test正常系_全角半角と大文字小文字とひらがなをそろえて元の位置を返すこと():
+    normalized, positions = normalize_text("ﾃﾞﾝｷ、ＯＮ！あうら")
+
+    assert normalized == "デンキonアウラ"
+    # 半角の濁点は前の文字と合成され、句読点は落ちる
+    assert positions == [0, 2, 3, 5, 6, 8, 9, 10]
+
+@pytest.mark.parametrize("kana, romaji", [
+    ("アウラ", "aura"), ("キョウト", "kyouto"), ("マッチャ", "matcha"), ("ラーメン", "ramen"), ("シンブン", "shinbun"),
+])
+def test正常系_カナとローマ字を読み替えること(kana, romaji):
+    assert to_romaji(kana) == romaji
+    assert to_kana(romaji) == kana.replace("ー", "")
+
+def test正常系_読めない綴りはNoneになること():
+    assert to_kana("hello") is None
+    assert to_romaji("電気") is None
+
+def test正常系_オートマトンが重なりや包含も含めて全部見つけること():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+
+    assert sorted(automaton.iter("ushers")) == [(4, 0), (4, 1), (6, 3)]
+
+def test正常系_どのフレーズがどこで当たったかを元の文字列の位置で返すこと():
+    matcher = PhraseMatcher({"電気をつけて": "light_on", "テレビを消して": "tv_off"})
+    text = "ねえ、電気をつけて。それとテレビを消して"
+
+    matches = matcher.find_all(text)
+
+    assert [(m.value, m.start, m.end, m.distance) for m in matches] == [("light_on", 3, 9, 0), ("tv_off", 13, 20, 0)]
+    assert text[matches[1].start:matches[1].end] == matches[1].text == "テレビを消して"
+
+def test正常系_カナのフレーズにローマ字でもローマ字のフレーズにカナでも当たること():
+    matcher = PhraseMatcher(["アウラ", "sakura"])
+
+    assert matcher.search("Hey AURA!").phrase == "アウラ"
+    assert matcher.search("さくらが咲いた").phrase == "sakura"
+    assert PhraseMatcher(["アウラ"], romaji=False).search("hey aura") is None
+
+def test正常系_あいまい一致なら編集距離の範囲で誤認識も当てること():
+    matcher = PhraseMatcher({"テレビを消して": "tv_off"}, max_distance=1)
+
+    match = matcher.search("テレビ消してください")
+
+    assert (match.value, match.text, match.distance) == ("tv_off", "テレビ消して", 1)
+    assert matcher.search("テレビを見て") is None
+    # あいまい一致を許さなければ当たらない
+    assert PhraseMatcher(["テレビを消して"]).search("テレビ消してください") is None
+
+def test正常系_短いフレーズはあいまい一致させないこと():
+    matcher = PhraseMatcher(["アウラ"], max_distance=2)
+
+    assert matcher.search("アウトです") is None
+    assert matcher.search("アウラです").distance == 0
+
+def test正常系_重なるときは完全一致で長い方を残すこと():
+    matcher = PhraseMatcher(["電気", "電気を消して", "電気をつけて"], max_distance=1)
+
+    assert [m.phrase for m in matcher.find_all("電気を消して")] == ["電気を消して"]
+    assert [m.phrase for m in matcher.find_all("電気を消して", overlapping=True)] == ["電気", "電気を消して"]
+
+def test正常系_何千個のフレーズから正しいものを見つけること():
+    rng = random.Random(0)
+    kana = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモラリルレロ"
+    phrases = {"".join(rng.choice(kana) for _ in range(rng.randint(5, 10))): f"command-{i}" for i in range(3000)}
+    target = list(phrases)[1234]
+    matcher = PhraseMatcher(phrases)
+
+    matches = matcher.find_all(f"えっと、{target}をお願い")
+
+    assert len(matcher) == 3000
+    assert [(m.phrase, m.value) for m in matches] == [(target, phrases[target])]
+
+def test異常系_空の文字列やフレーズでは何も見つけないこと():
+    assert PhraseMatcher(["アウラ"]).find_all("") == []
+    assert PhraseMatcher([]).search("アウラ") is None
+    assert PhraseMatcher(["、"]).search("、") is None
@@ -0,0 +1,71 @@
+# tests/test_rate_limiter.py
+
+import numpy as np
+from infrastructure.rate_limiter import RateLimitedRecognitionService, TokenBucket, find_rate_limiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class CountingService:
+    language = "ja-JP"
+    model_name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio_data, sample_rate):
+        self.calls += 1
+        return "こんにちは"
+
+def test正常系_バースト分を使い切ったら補充されるまで取れないこと():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, capacity=2, clock=clock)
+
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    clock.now = 2.0
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+def test正常系_どの1分間を切り取っても上限を超えないこと():
+    clock = FakeClock()
+    bucket = TokenBucket.for_quota(20, period=60.0, burst=3, clock=clock)
+
+    # 0.5秒ごとに取れるだけ取る
+    acquired = []
+    for step in range(600):
+        clock.now = step * 0.5
+        if bucket.try_acquire():
+            acquired.append(clock.now)
+
+    acquired = np.array(acquired)
+    for start in acquired:
+        in_window = np.count_nonzero((acquired >= start) & (acquired < start + 60.0))
+        assert in_window <= 20
+
+def test正常系_上限を超えたら捨てずに待ってから認識すること():
+    service = CountingService()
+    limited = RateLimitedRecognitionService(service, TokenBucket(rate=50.0, capacity=1))
+    audio = np.zeros(1600, dtype=np.float32)
+
+    assert limited.transcribe(audio, 16000) == "こんにちは"
+    assert limited.transcribe(audio, 16000) == "こんにちは"
+
+    assert service.calls == 2
+    assert limited.rate_limiter.stats["waited"] == 1
+
+def test正常系_包まれたサービスからレート制限を見つけること():
+    bucket = TokenBucket(rate=1.0, capacity=1)
+
+    class Wrapper:
+        def __init__(self, service):
+            self.service = service
+
+    assert find_rate_limiter(Wrapper(RateLimitedRecognitionService(CountingService(), bucket))) is bucket
+    assert find_rate_limiter(Wrapper(CountingService())) is None
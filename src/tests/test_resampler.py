@@ -0,0 +1,94 @@
+# tests/test_resampler.py
+
+import pytest
+import numpy as np
+from domain.resampler import AudioConverter, ChannelMixer, PolyphaseResampler, resample
+
+def tone(frequency, sample_rate, seconds=1.0):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    return np.sin(2 * np.pi * frequency * t).astype(np.float32)
+
+@pytest.mark.parametrize("input_rate", [48000, 44100, 22050, 8000])
+def test正常系_帯域内の音は形を保ったまま16kHzにすること(input_rate):
+    converted = resample(tone(1000, input_rate), input_rate, 16000)
+
+    assert len(converted) == 16000
+    expected = tone(1000, 16000)
+    # 端はフィルタが無音を見ているから除く
+    assert np.abs(converted - expected)[100:-100].max() < 1e-3
+
+@pytest.mark.parametrize("input_rate", [48000, 44100])
+def test正常系_16kHzのナイキストを超える音は落とすこと(input_rate):
+    converted = resample(tone(9000, input_rate), input_rate, 16000)
+
+    assert np.abs(converted[100:-100]).max() < 1e-3
+
+def test正常系_どう区切って渡しても一度に渡したのと同じ出力になること():
+    audio = np.random.default_rng(0).standard_normal(44100).astype(np.float32)
+    whole = PolyphaseResampler(44100, 16000).process(audio)
+
+    resampler = PolyphaseResampler(44100, 16000)
+    sizes = np.random.default_rng(1).integers(1, 3000, size=100)
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    parts = [resampler.process(audio[start:end]) for start, end in zip(bounds[:-1], bounds[1:]) if start < len(audio)]
+
+    assert np.array_equal(np.concatenate(parts), whole)
+
+def test正常系_比が整数ならブロックごとの出力数が一定になること():
+    resampler = PolyphaseResampler(48000, 16000)
+
+    assert (resampler.up, resampler.down) == (1, 3)
+    assert [len(resampler.process(np.zeros(1536, dtype=np.float32))) for _ in range(5)] == [512] * 5
+
+def test正常系_リセットすると前のブロックの影響が残らないこと():
+    audio = tone(440, 48000, 0.1)
+    resampler = PolyphaseResampler(48000, 16000)
+    first = resampler.process(audio)
+    resampler.process(np.ones(4800, dtype=np.float32))
+    resampler.reset()
+
+    assert np.array_equal(resampler.process(audio), first)
+
+def test異常系_サンプルレートが0以下ならエラーになること():
+    with pytest.raises(ValueError):
+        PolyphaseResampler(0, 16000)
+
+def test正常系_チャンネルを平均か指定でモノラルにすること():
+    block = np.array([[0.2, 0.4], [0.6, 0.8]], dtype=np.float32)
+
+    assert np.allclose(ChannelMixer(2, "mean").process(block), [0.3, 0.7])
+    assert np.allclose(ChannelMixer(2, "select", channel=1).process(block), [0.4, 0.8])
+
+def test正常系_一番大きいチャンネルへ余裕を持って切り替えること():
+    mixer = ChannelMixer(2, "loudest", smoothing=0.5, switch_ratio=2.0)
+    near = np.stack([np.full(100, 0.5), np.full(100, 0.4)], axis=1).astype(np.float32)
+    far = np.stack([np.full(100, 0.1), np.full(100, 0.8)], axis=1).astype(np.float32)
+
+    mixer.process(near)
+    # 少し大きいくらいでは切り替えない
+    assert mixer.channel == 0
+    mixer.process(far)
+    mixer.process(far)
+    assert mixer.channel == 1
+    assert mixer.switches == 1
+    assert np.allclose(mixer.process(far), 0.8)
+
+def test異常系_無いチャンネルやモードはエラーになること():
+    with pytest.raises(ValueError):
+        ChannelMixer(2, "select", channel=2)
+    with pytest.raises(ValueError):
+        ChannelMixer(2, "beamform")
+
+def test正常系_ファイルのブロック列を元の長さと位置のまま変換すること():
+    audio = np.zeros(48000, dtype=np.float32)
+    audio[24000:] = 0.5
+    stereo = np.stack([audio, audio], axis=1)
+    converter = AudioConverter(48000, 2, 16000)
+
+    converted = np.concatenate(list(converter.convert_blocks(stereo[i:i + 1000] for i in range(0, 48000, 1000))))
+
+    assert len(converted) == 16000
+    # 段差の位置は変わらない（フィルタの遅れを取り除いている）
+    assert np.argmax(converted > 0.25) == pytest.approx(8000, abs=1)
+    assert not converter.is_passthrough
+    assert AudioConverter(16000, 1, 16000).is_passthrough
@@ -0,0 +1,84 @@
+# tests/test_segment_coalescer.py
+
+import numpy as np
+from application.segment_coalescer import SegmentCoalescer
+
+class FixedLimiter:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def available(self):
+        return self.tokens
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def segment(start, seconds=1.0, sample_rate=16000):
+    audio = np.full(int(seconds * sample_rate), 0.1, dtype=np.float32)
+    context = {"timestamp": f"t{start}", "start_offset": float(start), "end_offset": start + seconds, "source_id": None}
+    return audio, context
+
+def test正常系_枠に余裕があればそのまま通すこと():
+    coalescer = SegmentCoalescer(FixedLimiter(5), gap_duration=0.0)
+
+    ready = coalescer.add(*segment(0))
+
+    assert len(ready) == 1
+    assert ready[0][1]["segments"] == [{"timestamp": "t0", "start_offset": 0.0, "end_offset": 1.0}]
+
+def test正常系_枠が少ないときは隣り合う区間を1つにまとめて境界を残すこと():
+    limiter = FixedLimiter(0.5)
+    coalescer = SegmentCoalescer(limiter, gap_duration=0.25)
+
+    assert coalescer.add(*segment(0)) == []
+    assert coalescer.add(*segment(3)) == []
+    assert coalescer.poll() == []
+
+    limiter.tokens = 3
+    (audio, context), = coalescer.poll()
+
+    assert len(audio) == 16000 * 2 + 4000
+    assert (context["start_offset"], context["end_offset"], context["timestamp"]) == (0.0, 4.0, "t0")
+    assert [s["start_offset"] for s in context["segments"]] == [0.0, 3.0]
+    assert coalescer.pending_count == 0
+
+def test正常系_最大長や待ち時間を超えたら枠が少なくても出すこと():
+    clock = FakeClock()
+    coalescer = SegmentCoalescer(FixedLimiter(0), max_duration=2.5, max_wait=5.0, gap_duration=0.0, clock=clock)
+
+    assert coalescer.add(*segment(0)) == []
+    assert coalescer.add(*segment(2)) == []
+    # 3つ目を足すと最大長を超えるから、それまでの2つを先に出す
+    (audio, context), = coalescer.add(*segment(4))
+    assert len(context["segments"]) == 2
+
+    clock.now = 5.0
+    (audio, context), = coalescer.poll()
+    assert context["segments"][0]["start_offset"] == 4.0
+
+def test正常系_専用の認識関数を持つ区間はまとめず順番を保つこと():
+    coalescer = SegmentCoalescer(FixedLimiter(0), gap_duration=0.0)
+    coalescer.add(*segment(0))
+    audio, context = segment(2)
+    context["transcribe"] = lambda audio_data, sample_rate: "部分"
+
+    ready = coalescer.add(audio, context)
+
+    assert [c["start_offset"] for _, c in ready] == [0.0, 2.0]
+
+def test正常系_まとめた区間は最後に閉じた時刻を持ち文字は区間ごとに分けないこと():
+    coalescer = SegmentCoalescer(FixedLimiter(0), gap_duration=0.0)
+    for start, closed_at in ((0, 10.0), (2, 12.5)):
+        audio, context = segment(start)
+        context["closed_at"] = closed_at
+        coalescer.add(audio, context)
+
+    (audio, context), = coalescer.flush()
+
+    assert context["closed_at"] == 12.5
+    # 認識結果はまとめた音声全体で1つだから、元の区間の境界には文字を持たせない
+    assert all("text" not in boundary for boundary in context["segments"])
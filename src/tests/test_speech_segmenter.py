@@ -0,0 +1,69 @@
+# tests/test_speech_segmenter.py
+
+import pytest
+import numpy as np
+from domain.speech_segmenter import SegmentEvent, SpeechSegmenter
+
+def probs(*runs):
+    """(確率, 窓数) の組から発話確率の列を作る"""
+    return np.concatenate([np.full(n, p, dtype=np.float32) for p, n in runs])
+
+def test正常系_開始と終了で異なる閾値を使うこと():
+    segmenter = SpeechSegmenter(onset_threshold=0.6, offset_threshold=0.3, hangover_windows=2, min_speech_windows=1)
+
+    # 0.4 では開始しないが、一度始まれば 0.4 でも継続する
+    events = segmenter.process(probs((0.4, 3), (0.8, 2), (0.4, 3), (0.1, 2)))
+
+    assert events == [SegmentEvent("open", 3), SegmentEvent("close", 10, trim=2)]
+
+def test正常系_区間中の短い無音は区間に含めたまま続けること():
+    segmenter = SpeechSegmenter(hangover_windows=3, min_speech_windows=1)
+
+    events = segmenter.process(probs((0.9, 2), (0.0, 2), (0.9, 2), (0.0, 3)))
+
+    assert events == [SegmentEvent("open", 0), SegmentEvent("close", 9, trim=3)]
+
+def test正常系_ハングオーバーは呼び出しをまたいで数えること():
+    segmenter = SpeechSegmenter(hangover_windows=4, min_speech_windows=1)
+
+    assert segmenter.process(probs((0.9, 2), (0.0, 2))) == [SegmentEvent("open", 0)]
+    assert segmenter.silence_run == 2
+    assert segmenter.process(probs((0.0, 3))) == [SegmentEvent("close", 2, trim=4)]
+    assert not segmenter.is_active
+
+def test正常系_発話が短すぎる区間は破棄扱いにすること():
+    segmenter = SpeechSegmenter(hangover_windows=2, min_speech_windows=3)
+
+    events = segmenter.process(probs((0.9, 2), (0.0, 2), (0.9, 3), (0.0, 2)))
+
+    assert events[1] == SegmentEvent("close", 4, trim=2, discard=True)
+    assert events[3] == SegmentEvent("close", 9, trim=2, discard=False)
+
+def test正常系_最大長に達したら後半の一番静かな窓で分割すること():
+    segmenter = SpeechSegmenter(hangover_windows=5, min_speech_windows=1, max_segment_windows=10)
+    energies = np.array([1, 1, 0.1, 1, 1, 1, 1, 0.2, 1, 1, 1, 1], dtype=np.float32)
+
+    events = segmenter.process(probs((0.9, 12)), energies)
+
+    # 前半の 0.1 ではなく、後半で一番静かな7番目で切り、後ろの3窓は次の区間に回す
+    assert events == [SegmentEvent("open", 0), SegmentEvent("split", 10, keep=3)]
+    assert segmenter.is_active
+    assert segmenter.segment_windows == 5
+
+def test正常系_区間中に止めたら末尾の無音を除いて閉じること():
+    segmenter = SpeechSegmenter(hangover_windows=10, min_speech_windows=1)
+    segmenter.process(probs((0.9, 4), (0.0, 3)))
+
+    assert segmenter.flush() == SegmentEvent("close", 0, trim=3)
+    assert segmenter.flush() is None
+
+def test正常系_秒数から窓数に換算すること():
+    segmenter = SpeechSegmenter.from_durations(0.032, silence_duration=1.0, min_speech_duration=0.1,
+                                               max_segment_duration=30.0)
+    assert segmenter.hangover_windows == 31
+    assert segmenter.min_speech_windows == 4
+    assert segmenter.max_segment_windows == 937
+
+def test異常系_継続の閾値が開始の閾値より大きいとエラーになること():
+    with pytest.raises(ValueError):
+        SpeechSegmenter(onset_threshold=0.3, offset_threshold=0.5)
@@ -0,0 +1,69 @@
+import pytest
+import numpy as np
+from application.streaming_transcriber import StreamingTranscriber, join_texts
+
+class RecordingService:
+    """送られた音声の長さを記録して、その長さを文字列で返すスタブ"""
+
+    def __init__(self):
+        self.sent = []
+
+    def transcribe(self, audio_data, sample_rate):
+        self.sent.append(len(audio_data))
+        return f"<{len(audio_data)}>"
+
+@pytest.fixture
+def service():
+    return RecordingService()
+
+@pytest.fixture
+def partials():
+    return []
+
+@pytest.fixture
+def transcriber(service, partials):
+    transcriber = StreamingTranscriber(
+        service, 100, interval=1.0, commit_pause=0.3, min_commit_duration=0.5,
+        on_partial_result=lambda text, metadata: partials.append((text, metadata))
+    )
+    yield transcriber
+    transcriber.shutdown()
+
+def wait_idle(transcriber):
+    transcriber.executor.submit(lambda: None).result()
+
+def test正常系_一定量伸びるたびに未確定部分を暫定認識すること(transcriber, service, partials):
+    audio = np.zeros(300, dtype=np.float32)
+    transcriber.update(audio[:50], 0.0)
+    transcriber.update(audio[:100], 0.0)
+    wait_idle(transcriber)
+    transcriber.poll()
+
+    assert service.sent == [100]
+    assert partials[-1][0] == "<100>"
+    assert partials[-1][1]["is_final"] is False
+
+def test正常系_発話中の無音で確定した音声を再送しないこと(transcriber, service, partials):
+    audio = np.zeros(500, dtype=np.float32)
+    transcriber.update(audio[:80], 0.0)
+    transcriber.update(audio[:80], 0.4)  # 短い無音でここまでを確定
+    transcriber.update(audio[:80], 0.5)  # 同じ無音の間は確定し直さない
+    transcriber.update(audio[:200], 0.0)
+    final = transcriber.finish(audio[:200])
+
+    assert final(audio[:200], 100) == "<80><120>"
+    assert service.sent == [80, 120]
+
+def test正常系_確定部分と暫定部分をつないで部分結果にすること(transcriber, partials):
+    audio = np.zeros(500, dtype=np.float32)
+    transcriber.update(audio[:60], 0.3)
+    transcriber.update(audio[:160], 0.0)
+    wait_idle(transcriber)
+    transcriber.poll()
+
+    assert partials[-1][0] == "<60><100>"
+
+def test正常系_英数字の境目だけ空白を入れてつなぐこと():
+    assert join_texts(["hello", "world"]) == "hello world"
+    assert join_texts(["こんにちは", "世界"]) == "こんにちは世界"
+    assert join_texts(["OK", "", None, "です"]) == "OKです"
@@ -0,0 +1,109 @@
+# tests/test_transcript_writer.py
+
+import json
+import pytest
+from infrastructure.transcript_writer import TranscriptWriter, format_offset
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def record(start, text="こんにちは", **extra):
+    metadata = {"timestamp": "20250101_120000", "start_offset": start, "end_offset": start + 1.5,
+                "text": text, "is_wake_word": False, "source_id": None}
+    metadata.update(extra)
+    return metadata
+
+def test正常系_溜まるまではファイルに書かずcloseで書き出すこと(tmp_path):
+    path = tmp_path / "out" / "output.txt"
+    writer = TranscriptWriter(str(path), flush_interval=None, flush_bytes=1024)
+
+    writer.write(record(0.0))
+    assert path.read_text(encoding="utf-8") == ""
+
+    writer.close()
+    assert path.read_text(encoding="utf-8") == "[20250101_120000] 音声認識: こんにちは\n"
+
+def test正常系_一定時間経ったら次の書き込みで書き出すこと(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "output.txt"
+    writer = TranscriptWriter(str(path), flush_interval=1.0, flush_bytes=1 << 20, clock=clock)
+
+    writer.write(record(0.0))
+    clock.now = 1.5
+    writer.write(record(2.0))
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    writer.close()
+
+def test正常系_jsonlに区間の位置を含めること(tmp_path):
+    path = tmp_path / "output.jsonl"
+    with TranscriptWriter(str(path), format="jsonl", flush_interval=None) as writer:
+        writer.write(record(1.0, source_id="窓側"))
+
+    line = json.loads(path.read_text(encoding="utf-8"))
+    assert (line["start_offset"], line["end_offset"], line["source_id"], line["text"]) == (1.0, 2.5, "窓側", "こんにちは")
+    assert "error" not in line
+
+def test正常系_srtは番号付きで追記時も番号を続けること(tmp_path):
+    path = tmp_path / "output.srt"
+    with TranscriptWriter(str(path), format="srt", flush_interval=None) as writer:
+        writer.write(record(0.0))
+    with TranscriptWriter(str(path), format="srt", flush_interval=None) as writer:
+        writer.write(record(3723.4567, "二つ目"))
+
+    assert path.read_text(encoding="utf-8") == (
+        "1\n00:00:00,000 --> 00:00:01,500\nこんにちは\n\n"
+        "2\n01:02:03,457 --> 01:02:04,957\n二つ目\n\n"
+    )
+
+def test正常系_vttはヘッダを1回だけ書くこと(tmp_path):
+    path = tmp_path / "output.vtt"
+    with TranscriptWriter(str(path), format="vtt", flush_interval=None) as writer:
+        writer.write(record(0.0))
+        writer.write(record(2.0))
+
+    text = path.read_text(encoding="utf-8")
+    assert text.startswith("WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nこんにちは\n\n")
+    assert text.count("WEBVTT") == 1
+
+def test正常系_大きさを超えたら付け替えて新しいファイルにすること(tmp_path):
+    path = tmp_path / "output.vtt"
+    with TranscriptWriter(str(path), format="vtt", flush_interval=None, flush_bytes=1, rotate_bytes=60) as writer:
+        for i in range(3):
+            writer.write(record(float(i)))
+        assert writer.stats["rotations"] >= 1
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert len(files) == writer.stats["rotations"] + 1
+    # 付け替えた先も新しいファイルも、どれも完結した字幕ファイルになっている
+    for name in files:
+        assert (tmp_path / name).read_text(encoding="utf-8").startswith("WEBVTT\n\n")
+
+def test正常系_時間が経ったら付け替えること(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "output.txt"
+    with TranscriptWriter(str(path), flush_interval=None, rotate_interval=60.0, clock=clock) as writer:
+        writer.write(record(0.0))
+        clock.now = 61.0
+        writer.write(record(1.0))
+
+    assert len(list(tmp_path.iterdir())) == 2
+    assert path.read_text(encoding="utf-8").count("\n") == 1
+
+def test正常系_認識失敗の区間も書き残すこと(tmp_path):
+    path = tmp_path / "output.txt"
+    with TranscriptWriter(str(path), flush_interval=None) as writer:
+        writer.write(record(1.0, "", error="全バックエンドで認識に失敗したわ"))
+
+    assert "認識失敗: (1.0s-2.5s) 全バックエンドで認識に失敗したわ" in path.read_text(encoding="utf-8")
+
+def test異常系_知らない形式は受け付けないこと(tmp_path):
+    with pytest.raises(ValueError):
+        TranscriptWriter(str(tmp_path / "output.doc"), format="doc")
+
+def test正常系_SRT用の区切りで時刻を整形すること():
+    assert format_offset(3723.4567, ",") == "01:02:03,457"
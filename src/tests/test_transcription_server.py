@@ -0,0 +1,336 @@
+# tests/test_transcription_server.py
+
+import asyncio
+import json
+import sys
+import threading
+import time
+import pytest
+import numpy as np
+from application.transcription_server import AudioController, TranscriptionServer, StreamSession
+
+websockets = pytest.importorskip("websockets")
+from websockets.asyncio.client import connect
+
+class EnergyVAD:
+    """振幅だけで発話を判定する、テスト用のVADServiceの代わり"""
+
+    threshold = 0.5
+    energy_gate = None
+
+    def create_stream(self):
+        return {"remainder": np.zeros(0, dtype=np.float32)}
+
+    def reset_stream(self, stream=None):
+        stream["remainder"] = np.zeros(0, dtype=np.float32)
+
+    def score_stream(self, audio_chunk, sample_rate, stream=None):
+        audio = np.concatenate((stream["remainder"], audio_chunk.astype(np.float32)))
+        n = audio.size // 512
+        stream["remainder"] = audio[n * 512:]
+        frames = audio[:n * 512].reshape(n, 512)
+        return frames, (np.abs(frames).max(axis=1) > 0.1).astype(np.float32)
+
+class LengthService:
+    def __init__(self, gate=None):
+        self.gate = gate
+
+    def transcribe(self, audio_data, sample_rate):
+        if self.gate is not None:
+            self.gate.wait(5)
+        return f"{len(audio_data) / sample_rate:.1f}秒"
+
+def make_recording(sample_rate=16000):
+    silence = np.zeros(sample_rate, dtype=np.float32)
+    speech = np.full(sample_rate, 0.5, dtype=np.float32)
+    return np.concatenate([silence, speech, silence, speech, silence])
+
+def pcm(audio):
+    return (np.asarray(audio) * 32767).astype("<i2").tobytes()
+
+def create_server(**options):
+    options.setdefault("recognition_service", LengthService())
+    return TranscriptionServer(port=0, vad_service=EnergyVAD(), silence_duration=0.5,
+                               pre_buffer_duration=0.0, **options)
+
+async def stream(port, data, query="", chunk_bytes=6400):
+    """PCMを少しずつ送って終わりを伝え、受け取ったメッセージを返す"""
+    async with connect(f"ws://127.0.0.1:{port}/stream{query}") as websocket:
+        messages = [json.loads(await websocket.recv())]
+        for start in range(0, len(data), chunk_bytes):
+            await websocket.send(data[start:start + chunk_bytes])
+        await websocket.send(json.dumps({"type": "end"}))
+        # サーバーが閉じるまで受け取る
+        async for message in websocket:
+            messages.append(json.loads(message))
+    return messages
+
+def run_with_server(server, scenario):
+    async def main():
+        await server.start()
+        try:
+            return await asyncio.wait_for(scenario(server.port), 20)
+        finally:
+            await server.stop()
+    try:
+        return asyncio.run(main())
+    finally:
+        server.shutdown()
+
+def test正常系_ストリームの区間ごとに最終結果を返して終わること():
+    server = create_server()
+
+    messages = run_with_server(server, lambda port: stream(port, pcm(make_recording())))
+
+    assert messages[0]["type"] == "ready"
+    finals = [m for m in messages if m["type"] == "final"]
+    assert [m["text"] for m in finals] == ["1.0秒", "1.0秒"]
+    assert finals[0]["start_offset"] == pytest.approx(1.0, abs=0.032)
+    assert finals[1]["start_offset"] == pytest.approx(3.0, abs=0.032)
+    assert finals[0]["source_id"] == messages[0]["session"]
+    assert messages[-1] == {"type": "end", "received_seconds": 5.0}
+    assert server.get_stats()["completed"] == 1
+
+def test正常系_48kHzステレオのストリームを16kHzモノラルにして処理すること():
+    server = create_server()
+    stereo = np.repeat(make_recording(48000)[:, None], 2, axis=1)
+
+    messages = run_with_server(server, lambda port: stream(port, pcm(stereo), "?sample_rate=48000&channels=2"))
+
+    finals = [m for m in messages if m["type"] == "final"]
+    # 変換フィルタのにじみで、区間の端が1フレーム（32ms）ほどずれることがある
+    assert [m["start_offset"] for m in finals] == pytest.approx([1.0, 3.0], abs=0.04)
+    assert [m["end_offset"] for m in finals] == pytest.approx([2.0, 4.0], abs=0.04)
+    assert messages[-1]["received_seconds"] == 5.0
+
+def test正常系_複数の接続を同時に処理し区間検出は接続ごとに分けること():
+    server = create_server()
+
+    async def scenario(port):
+        first = pcm(make_recording())
+        second = pcm(np.concatenate([np.zeros(16000), np.full(32000, 0.5), np.zeros(16000)]))
+        return await asyncio.gather(stream(port, first), stream(port, second, chunk_bytes=1000))
+
+    first, second = run_with_server(server, scenario)
+
+    assert [m["text"] for m in first if m["type"] == "final"] == ["1.0秒", "1.0秒"]
+    assert [m["text"] for m in second if m["type"] == "final"] == ["2.0秒"]
+    assert first[0]["session"] != second[0]["session"]
+    assert server.get_stats()["accepted"] == 2
+
+def test異常系_同時接続数の上限を超えたら503で断ること():
+    server = create_server(max_connections=1)
+
+    async def scenario(port):
+        websocket = await connect(f"ws://127.0.0.1:{port}/stream")
+        await websocket.recv()
+        with pytest.raises(websockets.InvalidStatus) as excinfo:
+            await connect(f"ws://127.0.0.1:{port}/stream")
+        health = await http_get(port, "/health")
+        await websocket.send(json.dumps({"type": "end"}))
+        async for _ in websocket:
+            pass
+        return excinfo.value.response, health
+
+    response, health = run_with_server(server, scenario)
+
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    assert health["active"] == 1 and health["rejected"] == 1
+    assert server.active_connections == 0
+
+async def http_request(port, path):
+    """WebSocketにせずにGETして、ステータスと本文を返す"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), body
+
+async def http_get(port, path):
+    return json.loads((await http_request(port, path))[1])
+
+def test異常系_未対応の形式は400で断ること():
+    server = create_server()
+
+    async def scenario(port):
+        with pytest.raises(websockets.InvalidStatus) as excinfo:
+            await connect(f"ws://127.0.0.1:{port}/stream?format=mp3")
+        return excinfo.value.response
+
+    response = run_with_server(server, scenario)
+
+    assert response.status_code == 400
+    assert "format" in json.loads(response.body)["error"]
+
+def test正常系_終わりを伝えずに切断したら結果を返さずに片付けること():
+    server = create_server()
+
+    async def scenario(port):
+        websocket = await connect(f"ws://127.0.0.1:{port}/stream")
+        await websocket.recv()
+        await websocket.send(pcm(make_recording()))
+        await websocket.close()
+        for _ in range(100):
+            if server.active_connections == 0:
+                break
+            await asyncio.sleep(0.05)
+
+    run_with_server(server, scenario)
+
+    assert server.get_stats()["aborted"] == 1
+    assert server.active_connections == 0
+
+def test正常系_受信キューが満杯ならクライアントからの読み込みを止めること():
+    gate = threading.Event()
+    server = create_server(recognition_service=LengthService(gate), max_queued_chunks=2)
+
+    class FakeWebSocket:
+        def __init__(self):
+            self.received = 0
+
+        async def recv(self):
+            self.received += 1
+            return pcm(np.full(512, 0.5))
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        session = server._create_session("test", {"sample_rate": 16000, "channels": 1, "sample_format": "s16le"})
+        inbox = asyncio.Queue(maxsize=server.max_queued_chunks)
+        receiver = asyncio.create_task(server._receive(websocket, session, inbox, asyncio.Queue()))
+        await asyncio.sleep(0.2)
+        # 2つ入れたところで、3つ目を入れられずに待っている
+        received = websocket.received
+        receiver.cancel()
+        return received, inbox.qsize()
+
+    try:
+        assert asyncio.run(scenario()) == (3, 2)
+    finally:
+        gate.set()
+        server.shutdown()
+
+def test正常系_フレームに満たない端数のバイトは次に持ち越すこと():
+    server = create_server()
+    try:
+        session = server._create_session("test", {"sample_rate": 16000, "channels": 2, "sample_format": "s16le"})
+        data = pcm(np.array([0.5, -0.5, 0.25, -0.25]))
+
+        first = session.decode(data[:5])
+        second = session.decode(data[5:])
+
+        assert first.shape == (1, 2) and second.shape == (1, 2)
+        assert np.allclose(np.concatenate([first, second]), [[0.5, -0.5], [0.25, -0.25]], atol=1e-4)
+        assert session.received_samples == 2
+        assert isinstance(session, StreamSession)
+    finally:
+        server.shutdown()
+
+def test正常系_接続ごとの区間検出はほかの接続を待たずに並行して進むこと():
+    barrier = threading.Barrier(2, timeout=5)
+
+    class MeetingVAD(EnergyVAD):
+        """2つの接続が同時に区間検出に入ったときだけ先へ進める"""
+
+        def score_stream(self, audio_chunk, sample_rate, stream=None):
+            barrier.wait()
+            return super().score_stream(audio_chunk, sample_rate, stream)
+
+    server = TranscriptionServer(port=0, vad_service=MeetingVAD(), recognition_service=LengthService(),
+                                 silence_duration=0.5, pre_buffer_duration=0.0)
+    try:
+        fmt = {"sample_rate": 16000, "channels": 1, "sample_format": "s16le"}
+        sessions = [server._create_session(f"s{i}", fmt) for i in range(2)]
+        chunk = np.full((512, 1), 0.5, dtype=np.float32)
+        threads = [threading.Thread(target=session.process, args=(chunk,)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        assert not barrier.broken
+        assert all(session.controller.is_speech_active for session in sessions)
+    finally:
+        server.shutdown()
+
+def test正常系_接続ごとのコントローラは録音キューを確保しないこと():
+    server = create_server()
+    try:
+        session = server._create_session("test", {"sample_rate": 16000, "channels": 1, "sample_format": "s16le"})
+        assert session.controller.capture_buffer is None
+    finally:
+        server.shutdown()
+
+def test正常系_接続の片付けで認識待ちがあってもほかの接続を止めないこと():
+    gate = threading.Event()
+    server = create_server(recognition_service=LengthService(gate), partial_interval=0.05)
+
+    async def scenario(port):
+        # 部分認識が終わらないまま切断した接続の片付け中も、別の接続は受け付けて応答する
+        websocket = await connect(f"ws://127.0.0.1:{port}/stream")
+        await websocket.recv()
+        speech = pcm(np.concatenate([np.zeros(16000), np.full(16000, 0.5)]))
+        for start in range(0, len(speech), 3200):
+            await websocket.send(speech[start:start + 3200])
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.1)
+        await websocket.close()
+        started = time.perf_counter()
+        await asyncio.sleep(0.2)
+        health = await http_get(port, "/health")
+        elapsed = time.perf_counter() - started
+        gate.set()
+        return health, elapsed
+
+    try:
+        health, elapsed = run_with_server(server, scenario)
+        assert health["status"] == "ok"
+        assert elapsed < 2
+    finally:
+        gate.set()
+
+def test異常系_WebSocketでない接続や知らないパスにはHTTPで返事をすること():
+    server = create_server()
+
+    async def scenario(port):
+        return [await http_request(port, path) for path in ("/stream", "/nowhere")]
+
+    (stream_status, _), (missing_status, missing) = run_with_server(server, scenario)
+
+    assert stream_status == 426
+    assert missing_status == 404 and "/nowhere" in json.loads(missing)["error"]
+    assert server.get_stats()["accepted"] == 0
+
+def test正常系_サーバーを止めるとつながっている接続を閉じて片付けること():
+    server = create_server()
+
+    async def main():
+        await server.start()
+        websocket = await connect(f"ws://127.0.0.1:{server.port}/stream")
+        await websocket.recv()
+        await websocket.send(pcm(make_recording()[:16000]))
+        await asyncio.wait_for(server.stop(), 5)
+        with pytest.raises(websockets.ConnectionClosed) as excinfo:
+            await websocket.recv()
+        return excinfo.value.rcvd.code
+
+    try:
+        assert asyncio.run(main()) == 1001
+    finally:
+        server.shutdown()
+
+    assert server.get_stats()["aborted"] == 1
+    assert server.active_connections == 0
+
+def test正常系_雛形のコントローラの部分認識はサーバーを作ったときに片付けること(monkeypatch):
+    streaming_transcriber = sys.modules[AudioController.__module__].StreamingTranscriber
+    closed = []
+    shutdown = streaming_transcriber.shutdown
+    monkeypatch.setattr(streaming_transcriber, "shutdown", lambda self: closed.append(self) or shutdown(self))
+
+    server = create_server(partial_interval=0.05)
+    try:
+        assert len(closed) == 1
+    finally:
+        server.shutdown()
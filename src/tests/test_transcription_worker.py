@@ -0,0 +1,71 @@
+import time
+import pytest
+import numpy as np
+from application.transcription_worker import TranscriptionPool
+
+class SlowService:
+    """音声の先頭値を秒数として待ってから、その値を文字列で返すスタブ"""
+
+    def transcribe(self, audio_data, sample_rate):
+        time.sleep(float(audio_data[0]))
+        return f"{audio_data[0]:.2f}"
+
+@pytest.fixture
+def pool():
+    pool = TranscriptionPool(SlowService(), max_workers=3, max_pending=3)
+    yield pool
+    pool.shutdown()
+
+def test正常系_後から投入した区間が先に終わっても投入順に返すこと(pool):
+    for delay in (0.2, 0.0, 0.1):
+        pool.submit(np.array([delay]), 16000, context={"delay": delay})
+
+    results = pool.drain()
+
+    assert [context["delay"] for _, context, _ in results] == [0.2, 0.0, 0.1]
+    assert [text for _, _, text in results] == ["0.20", "0.00", "0.10"]
+
+def test正常系_先頭が終わっていなければ後続の完了結果も返さないこと(pool):
+    pool.submit(np.array([0.2]), 16000)
+    pool.submit(np.array([0.0]), 16000)
+    time.sleep(0.05)
+
+    assert pool.pop_completed() == []
+    assert len(pool.pop_completed(wait=True)) == 2
+
+def test異常系_上限に達したら投入を拒否すること(pool):
+    for _ in range(3):
+        pool.submit(np.array([0.05]), 16000)
+
+    assert pool.is_full
+    with pytest.raises(RuntimeError):
+        pool.submit(np.array([0.0]), 16000)
+
+    pool.pop_completed(wait=True)
+    assert not pool.is_full
+
+def test異常系_認識中の例外を空文字列に変換すること():
+    class BrokenService:
+        def transcribe(self, audio_data, sample_rate):
+            raise ConnectionError("network down")
+
+    pool = TranscriptionPool(BrokenService(), max_workers=1, max_pending=1)
+    pool.submit(np.zeros(1), 16000)
+    (_, _, text), = pool.drain()
+    pool.shutdown()
+    assert text == ""
+
+def test異常系_認識に失敗した区間にエラーを残すこと():
+    class BrokenService:
+        def transcribe(self, audio_data, sample_rate):
+            raise RuntimeError("落ちてるわ")
+
+    pool = TranscriptionPool(BrokenService(), max_workers=1)
+    context = {}
+    pool.submit(np.zeros(10, dtype=np.float32), 16000, context)
+
+    (_, result_context, text), = pool.drain()
+    pool.shutdown()
+
+    assert text == ""
+    assert result_context["error"] == "落ちてるわ"
@@ -0,0 +1,69 @@
+# tests/test_vad_model.py
+
+import sys
+import pytest
+import numpy as np
+from domain.vad_model import create_vad_backend, resolve_model_path, verify_checksum, file_sha256
+from domain.vad_service import VADService
+
+def test正常系_環境変数で指定したモデルファイルを使うこと(tmp_path, monkeypatch):
+    model_file = tmp_path / "my_vad.onnx"
+    model_file.write_bytes(b"dummy")
+    monkeypatch.setenv("SILERO_VAD_MODEL", str(model_file))
+
+    assert resolve_model_path("onnx") == str(model_file)
+
+def test異常系_指定したモデルファイルが無いとエラーになること(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        resolve_model_path("torch", str(tmp_path / "missing.jit"))
+
+def test異常系_チェックサムが一致しないとエラーになること(tmp_path):
+    model_file = tmp_path / "my_vad.jit"
+    model_file.write_bytes(b"dummy")
+
+    verify_checksum(str(model_file), file_sha256(str(model_file)))
+    with pytest.raises(ValueError):
+        verify_checksum(str(model_file), "0" * 64)
+
+def test異常系_未対応のバックエンドはエラーになること():
+    with pytest.raises(ValueError):
+        create_vad_backend("tensorflow")
+
+def test正常系_モデルは最初の推論まで読み込まないこと():
+    vad_service = VADService(threshold=0.5)
+    assert vad_service._model is None
+
+    vad_service.speech_probs(np.zeros(1024, dtype=np.float32), 16000)
+    assert vad_service._model is not None
+
+def test正常系_ONNXバックエンドがtorch版と同じ発話確率を返すこと():
+    pytest.importorskip("onnxruntime")
+    rng = np.random.default_rng(0)
+    audio = rng.standard_normal(16000).astype(np.float32) * 0.1
+
+    torch_probs = VADService(backend="torch").speech_probs(audio, 16000)
+    onnx_service = VADService(backend="onnx")
+    onnx_probs = np.concatenate([onnx_service.speech_probs(audio[i:i + 1600], 16000)
+                                 for i in range(0, len(audio), 1600)])
+
+    assert isinstance(onnx_service.model._state, np.ndarray)
+    assert np.allclose(torch_probs, onnx_probs, atol=1e-3)
+
+def test異常系_torch_hubのキャッシュのモデルも固定したチェックサムで照合すること(tmp_path, monkeypatch):
+    monkeypatch.setenv("TORCH_HOME", str(tmp_path))
+    monkeypatch.delenv("SILERO_VAD_MODEL", raising=False)
+    monkeypatch.delenv("SILERO_VAD_SHA256", raising=False)
+    monkeypatch.setattr("domain.vad_model._package_data_dir", lambda: None)
+    cache_dir = tmp_path / "hub" / "snakers4_silero-vad_master" / "files"
+    cache_dir.mkdir(parents=True)
+    model_file = cache_dir / "silero_vad.onnx"
+    model_file.write_bytes(b"newer model")
+
+    path = resolve_model_path("onnx")
+
+    assert path == str(model_file)
+    with pytest.raises(ValueError, match="SILERO_VAD_SHA256"):
+        verify_checksum(path)
+    # 明示的にチェックサムを指定すれば使える
+    monkeypatch.setenv("SILERO_VAD_SHA256", file_sha256(path))
+    verify_checksum(path)
@@ -2,7 +2,7 @@
 import pytest
 import numpy as np
 import torch
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 from domain.vad_service import VADService
 
 @pytest.fixture
@@ -17,9 +17,9 @@ def test正常系_is_speechメソッドが音声を検出すること(vad_servic
     audio_chunk = np.sin(2 * np.pi * 440 * t)  # 440Hzのサイン波
     
     # モデルの戻り値をモック
-    with patch.object(vad_service.model, '__call__', return_value=torch.tensor(0.8)):
-        result = vad_service.is_speech(audio_chunk, sample_rate)
-        assert result == True
+    vad_service.model = MagicMock(return_value=torch.tensor(0.8))
+    result = vad_service.is_speech(audio_chunk, sample_rate)
+    assert result == True
 
 def test正常系_is_speechメソッドが無音を検出すること(vad_service):
     # 無音データ(ゼロ配列)を生成
@@ -27,9 +27,9 @@ def test正常系_is_speechメソッドが無音を検出すること(vad_servic
     sample_rate = 16000
     
     # モデルの戻り値をモック
-    with patch.object(vad_service.model, '__call__', return_value=torch.tensor(0.3)):
-        result = vad_service.is_speech(audio_chunk, sample_rate)
-        assert result == False
+    vad_service.model = MagicMock(return_value=torch.tensor(0.3))
+    result = vad_service.is_speech(audio_chunk, sample_rate)
+    assert result == False
 
 def test異常系_is_speechメソッドが空の配列に対してFalseを返すこと(vad_service):
     audio_chunk = np.array([])
@@ -42,15 +42,119 @@ def test異常系_is_speechメソッドがValueErrorを適切に処理するこ
     sample_rate = 16000
     
     # モデルがValueErrorを投げるようにモック
-    with patch.object(vad_service.model, '__call__', side_effect=ValueError):
-        result = vad_service.is_speech(audio_chunk, sample_rate)
-        assert result == False
+    vad_service.model = MagicMock(side_effect=ValueError)
+    result = vad_service.is_speech(audio_chunk, sample_rate)
+    assert result == False
 
 def test異常系_is_speechメソッドが予期せぬエラーを適切に処理すること(vad_service):
     audio_chunk = np.array([0.1, 0.2, 0.3])
     sample_rate = 16000
     
     # モデルが予期せぬエラーを投げるようにモック
-    with patch.object(vad_service.model, '__call__', side_effect=Exception("予期せぬエラー")):
-        result = vad_service.is_speech(audio_chunk, sample_rate)
-        assert result == False
+    vad_service.model = MagicMock(side_effect=Exception("予期せぬエラー"))
+    result = vad_service.is_speech(audio_chunk, sample_rate)
+    assert result == False
+
+class FakeStatefulModel:
+    """呼び出し回数を隠れ状態として持つ偽モデル"""
+
+    def __init__(self):
+        self.calls = []
+        self.reset_states()
+
+    def reset_states(self):
+        self._state = 0
+        self._context = None
+        self._last_sr = 0
+        self._last_batch_size = 0
+
+    def __call__(self, x, sr):
+        assert tuple(x.shape) == (1, 512)
+        self.calls.append(self._state)
+        self._state += 1
+        return torch.tensor([[0.9 if float(x.abs().max()) > 0 else 0.1]])
+
+def test正常系_score_streamが任意長の音声を窓に切り直して端数を持ち越すこと(vad_service):
+    vad_service.model = FakeStatefulModel()
+    sample_rate = 16000
+
+    frames, probs = vad_service.score_stream(np.ones(700, dtype=np.float32), sample_rate)
+    assert frames.shape == (1, 512)
+    assert probs.shape == (1,)
+    assert vad_service.stream.remainder.size == 188
+
+    # 短いチャンクでも捨てずに次の窓に使われること
+    frames, probs = vad_service.score_stream(np.zeros(400, dtype=np.float32), sample_rate)
+    assert frames.shape == (1, 512)
+    assert np.allclose(frames[0, :188], 1.0)
+    assert probs[0] == pytest.approx(0.9)
+
+def test正常系_score_streamがストリームごとに隠れ状態を保持すること(vad_service):
+    model = FakeStatefulModel()
+    vad_service.model = model
+    stream_a = vad_service.create_stream()
+    stream_b = vad_service.create_stream()
+
+    vad_service.speech_probs(np.ones(1024, dtype=np.float32), 16000, stream_a)
+    vad_service.speech_probs(np.ones(512, dtype=np.float32), 16000, stream_b)
+    vad_service.speech_probs(np.ones(512, dtype=np.float32), 16000, stream_a)
+
+    # stream_aは3窓目で状態2から、stream_bは状態0から始まること
+    assert model.calls == [0, 1, 0, 2]
+
+def test異常系_score_streamが窓に満たない音声に空配列を返すこと(vad_service):
+    vad_service.model = FakeStatefulModel()
+    frames, probs = vad_service.score_stream(np.zeros(100, dtype=np.float32), 16000)
+    assert frames.shape == (0, 512)
+    assert probs.size == 0
+
+def test正常系_score_streamsのバッチ推論がストリームごとの推論と一致すること(vad_service):
+    sample_rate = 16000
+    rng = np.random.default_rng(0)
+    audios = [rng.standard_normal(n).astype(np.float32) * 0.1 for n in (8000, 5000, 12000)]
+
+    expected = []
+    for audio in audios:
+        stream = vad_service.create_stream()
+        probs = [vad_service.score_stream(audio[i:i + 1000], sample_rate, stream)[1]
+                 for i in range(0, len(audio), 1000)]
+        expected.append(np.concatenate(probs))
+
+    streams = [vad_service.create_stream() for _ in audios]
+    actual = [[] for _ in audios]
+    for i in range(0, 12000, 1000):
+        results = vad_service.score_streams([(audio[i:i + 1000], stream) for audio, stream in zip(audios, streams)],
+                                            sample_rate)
+        for probs, (_, p) in zip(actual, results):
+            probs.append(p)
+
+    for exp, act in zip(expected, actual):
+        assert np.allclose(exp, np.concatenate(act), atol=1e-5)
+
+def test正常系_一次判定で落とした窓はモデルを通さず確率0になること():
+    from domain.energy_gate import EnergyGate
+    vad_service = VADService(threshold=0.5, energy_gate=EnergyGate(hangover_windows=0))
+    t = np.arange(512 * 4) / 16000
+    audio = np.concatenate([np.zeros(512 * 4), 0.3 * np.sin(2 * np.pi * 200 * t)]).astype(np.float32)
+
+    frames, probs = vad_service.score_stream(audio, 16000)
+
+    assert len(frames) == 8
+    assert np.all(probs[:4] == 0.0)
+    stats = vad_service.energy_gate.get_stats()
+    assert stats["passed"] == 4
+    assert stats["skip_ratio"] == 0.5
+
+def test正常系_VADを軽くするとモデルを通さず一次判定だけで判定すること(vad_service):
+    vad_service.model = MagicMock(side_effect=AssertionError("モデルは呼ばないはず"))
+    vad_service._silence_states[16000] = (None, None)
+    vad_service._store_state = MagicMock()
+    t = np.arange(512 * 4) / 16000
+    audio = np.concatenate([np.zeros(512 * 20), 0.3 * np.sin(2 * np.pi * 200 * t)]).astype(np.float32)
+
+    frames, probs = vad_service.score_stream(audio, 16000, degraded=True)
+
+    assert len(frames) == 24
+    assert np.all(probs[:20] == 0.0)
+    assert np.all(probs[20:] == 1.0)
+
@@ -37,3 +37,22 @@ def test正常系_detectメソッドが複数のウェイクワードのいず
     # デフォルトの "あうら" を含むテキスト
     result = detector.detect("あうらさんこんにちは")
     assert result == True
+
+def test正常系_ひらがなカタカナ全角ローマ字の違いを無視して検出すること():
+    custom_detector = WakewordDetector(wakewords=["フリーレン"])
+
+    assert custom_detector.detect("ふりーれん、起きて")
+    assert custom_detector.detect("ﾌﾘｰﾚﾝ")
+    assert custom_detector.detect("Frieren? いや furiren だ")
+
+def test正常系_findメソッドが見つけたウェイクワードと位置を返すこと(detector):
+    match = detector.find("ねえ、アウラ。")
+
+    assert (match.phrase, match.start, match.end) == ("アウラ", 3, 6)
+    assert detector.find("こんにちは") is None
+
+def test正常系_あいまい一致を指定すると誤認識したウェイクワードも検出すること():
+    fuzzy_detector = WakewordDetector(wakewords=["フリーレン"], max_distance=1)
+
+    assert fuzzy_detector.detect("フリーデン、こっちよ")
+    assert not WakewordDetector(wakewords=["フリーレン"]).detect("フリーデン、こっちよ")